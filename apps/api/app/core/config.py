@@ -11,6 +11,60 @@ class Settings(BaseModel):
     dev_auth_bypass: bool = os.getenv("DEV_AUTH_BYPASS", "false").lower() == "true"
     cors_allow_origins: list[str] = [origin.strip() for origin in os.getenv("CORS_ALLOW_ORIGINS", "http://localhost:3000").split(",") if origin.strip()]
     rate_limit_per_minute: int = int(os.getenv("RATE_LIMIT_PER_MINUTE", "30"))
+    redis_url: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    cache_backend: str = os.getenv("CACHE_BACKEND", "memory")
+    # Worker processes serving the API (read by uvicorn and gunicorn as well).
+    web_concurrency: int = int(os.getenv("WEB_CONCURRENCY", "1"))
+    cache_max_entries: int = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+    cache_ttl_seconds: int = int(os.getenv("CACHE_TTL_SECONDS", "300"))
+    rbac_policy_ttl_seconds: int = int(os.getenv("RBAC_POLICY_TTL_SECONDS", "5"))
+    event_bus_backend: str = os.getenv("EVENT_BUS_BACKEND", "memory")
+    event_history_size: int = int(os.getenv("EVENT_HISTORY_SIZE", "1000"))
+    event_subscriber_queue_size: int = int(os.getenv("EVENT_SUBSCRIBER_QUEUE_SIZE", "256"))
+    ingest_queue_capacity: int = int(os.getenv("INGEST_QUEUE_CAPACITY", "200000"))
+    ingest_batch_size: int = int(os.getenv("INGEST_BATCH_SIZE", "5000"))
+    ingest_flush_interval_ms: int = int(os.getenv("INGEST_FLUSH_INTERVAL_MS", "200"))
+    ingest_max_errors_reported: int = int(os.getenv("INGEST_MAX_ERRORS_REPORTED", "20"))
+    ingest_max_events_per_request: int = int(os.getenv("INGEST_MAX_EVENTS_PER_REQUEST", "50000"))
+    ingest_max_line_bytes: int = int(os.getenv("INGEST_MAX_LINE_BYTES", "1048576"))
+    dedup_window_seconds: float = float(os.getenv("DEDUP_WINDOW_SECONDS", "900"))
+    dedup_max_entries: int = int(os.getenv("DEDUP_MAX_ENTRIES", "100000"))
+    dedup_max_fingerprints: int = int(os.getenv("DEDUP_MAX_FINGERPRINTS", "500000"))
+    dedup_fingerprint_retention_seconds: float = float(os.getenv("DEDUP_FINGERPRINT_RETENTION_SECONDS", "86400"))
+    detect_retention_points: int = int(os.getenv("DETECT_RETENTION_POINTS", "240"))
+    detect_max_series: int = int(os.getenv("DETECT_MAX_SERIES", "50000"))
+    detect_z_threshold: float = float(os.getenv("DETECT_Z_THRESHOLD", "4.0"))
+    detect_mad_threshold: float = float(os.getenv("DETECT_MAD_THRESHOLD", "5.0"))
+    graph_import_batch_size: int = int(os.getenv("GRAPH_IMPORT_BATCH_SIZE", "1000"))
+    index_data_dir: str = os.getenv("INDEX_DATA_DIR", "var/indexes")
+    search_persist_every: int = int(os.getenv("SEARCH_PERSIST_EVERY", "200"))
+    retrieval_embedder: str = os.getenv("RETRIEVAL_EMBEDDER", "hashing")
+    retrieval_dimensions: int = int(os.getenv("RETRIEVAL_DIMENSIONS", "384"))
+    retrieval_ivf_threshold: int = int(os.getenv("RETRIEVAL_IVF_THRESHOLD", "50000"))
+    retrieval_ivf_probes: int = int(os.getenv("RETRIEVAL_IVF_PROBES", "16"))
+    rca_job_workers: int = int(os.getenv("RCA_JOB_WORKERS", "2"))
+    rca_evidence_workers: int = int(os.getenv("RCA_EVIDENCE_WORKERS", "4"))
+    rca_top_evidence: int = int(os.getenv("RCA_TOP_EVIDENCE", "20"))
+    rca_job_lease_seconds: float = float(os.getenv("RCA_JOB_LEASE_SECONDS", "60"))
+    rca_job_max_attempts: int = int(os.getenv("RCA_JOB_MAX_ATTEMPTS", "3"))
+    risk_refresh_seconds: float = float(os.getenv("RISK_REFRESH_SECONDS", "60"))
+    simulation_workers: int = int(os.getenv("SIMULATION_WORKERS", "4"))
+    simulation_parallel_cells: int = int(os.getenv("SIMULATION_PARALLEL_CELLS", "4000000"))
+    idempotency_ttl_seconds: int = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+    idempotency_max_entries: int = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+    remediation_workers: int = int(os.getenv("REMEDIATION_WORKERS", "4"))
+    remediation_target_concurrency: int = int(os.getenv("REMEDIATION_TARGET_CONCURRENCY", "1"))
+    remediation_job_timeout_seconds: float = float(os.getenv("REMEDIATION_JOB_TIMEOUT_SECONDS", "300"))
+    remediation_max_job_timeout_seconds: float = float(os.getenv("REMEDIATION_MAX_JOB_TIMEOUT_SECONDS", "3600"))
+    remediation_max_attempts: int = int(os.getenv("REMEDIATION_MAX_ATTEMPTS", "3"))
+    remediation_retry_backoff_seconds: float = float(os.getenv("REMEDIATION_RETRY_BACKOFF_SECONDS", "5"))
+    remediation_poll_seconds: float = float(os.getenv("REMEDIATION_POLL_SECONDS", "1.0"))
+    metrics_multiproc_dir: str = os.getenv("METRICS_MULTIPROC_DIR", "")
+    metrics_flush_seconds: float = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+    db_slow_query_ms: float = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+    db_slow_query_explain: bool = os.getenv("DB_SLOW_QUERY_EXPLAIN", "true").lower() == "true"
+    db_repeated_query_threshold: int = int(os.getenv("DB_REPEATED_QUERY_THRESHOLD", "10"))
+    db_query_stats_headers: bool = os.getenv("DB_QUERY_STATS_HEADERS", "false").lower() == "true"
 
 
 @lru_cache
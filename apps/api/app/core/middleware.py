@@ -1,6 +1,12 @@
-"""Security and CORS middleware configuration."""
+"""Security, CORS and metrics middleware configuration."""
+import time
+
 from fastapi import Request
 
+from app.core.config import get_settings
+from app.services.metrics import route_metrics
+from app.services.query_stats import begin_request, end_request
+
 
 def is_docs_endpoint(path: str) -> bool:
     """Check if the request path is a Swagger UI documentation endpoint."""
@@ -21,3 +27,60 @@ async def security_headers_middleware(request: Request, call_next):
         response.headers["Permissions-Policy"] = "geolocation=()"
     
     return response
+
+
+class MetricsMiddleware:
+    """Count and time every HTTP request against its matched route's series."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route_metrics(scope.get("route")).observe(status_code, time.perf_counter() - start)
+
+
+class QueryStatsMiddleware:
+    """Account SQL statements to the request that ran them, and report them in headers when enabled."""
+
+    def __init__(self, app):
+        self.app = app
+        self.headers = get_settings().db_query_stats_headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        queries, token = begin_request()
+
+        async def send_with_stats(message):
+            if self.headers and message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-query-count", str(queries.count).encode()))
+                headers.append((b"server-timing", f"db;dur={queries.seconds * 1000:.2f}".encode()))
+                repeated = queries.repeated(get_settings().db_repeated_query_threshold)
+                if repeated:
+                    value = ", ".join(f"{fingerprint}={count}" for fingerprint, count in repeated)
+                    headers.append((b"x-db-repeated-queries", value.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            route = scope.get("route")
+            end_request(queries, token, route.path if route is not None else "<unmatched>")
@@ -22,6 +22,7 @@ from app.db.models import (
     UserRole,
 )
 from app.services.audit import record_audit_event
+from app.services.cache import get_cache
 
 
 @dataclass
@@ -92,7 +93,7 @@ async def rate_limit_dependency(request: Request) -> None:
     _rate_limited(request)
 
 
-def _build_enforcer(session: Session, org_id: UUID) -> casbin.Enforcer:
+def _load_policies(session: Session, org_id: UUID) -> list[list[str]]:
     policies: list[list[str]] = []
     roles = {role.id: role for role in session.exec(select(Role).where(Role.org_id == org_id)).all()}
     permissions = {perm.id: perm for perm in session.exec(select(Permission)).all()}
@@ -105,6 +106,27 @@ def _build_enforcer(session: Session, org_id: UUID) -> casbin.Enforcer:
         role = roles.get(user_role.role_id)
         if role:
             policies.append(["g", str(user_role.user_id), role.name, str(org_id)])
+    return policies
+
+
+def _rbac_policies(session: Session, org_id: UUID) -> list[list[str]]:
+    """Policies for ``org_id``, cached only as long as a revoked role may stay in force.
+
+    A role change invalidates the cache of the worker that made it; with a
+    per-process backend the other workers only notice when their entry
+    expires, so there it is kept for RBAC_POLICY_TTL_SECONDS (0: not cached).
+    """
+    cache = get_cache()
+    if cache.shared:
+        return cache.get_or_load(org_id, "rbac.policies", lambda: _load_policies(session, org_id))
+    ttl_seconds = get_settings().rbac_policy_ttl_seconds
+    if ttl_seconds <= 0:
+        return _load_policies(session, org_id)
+    return cache.get_or_load(org_id, "rbac.policies", lambda: _load_policies(session, org_id), ttl_seconds=ttl_seconds)
+
+
+def _build_enforcer(session: Session, org_id: UUID) -> casbin.Enforcer:
+    policies = _rbac_policies(session, org_id)
     adapter = MemoryAdapter(policies)
     # Build a Casbin model from the model text and create the enforcer
     model = casbin.model.Model()
@@ -128,6 +150,7 @@ def _create_org_for_user(session: Session, user: User) -> UUID:
     if owner_role:
         session.add(UserRole(org_id=org.id, user_id=user.id, role_id=owner_role.id))
     session.commit()
+    get_cache().invalidate(org.id, "roles", "rbac.policies")
     return org.id
 
 
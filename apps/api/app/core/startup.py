@@ -4,11 +4,14 @@ from sqlmodel import Session, select
 from app.db.models import Org
 from app.db.session import engine
 from app.seed import seed_permissions, seed_roles, seed_sample_data
+from app.services.cache import check_cache_backend
 
 
 def init_application() -> None:
     """Initialize database and seed initial data."""
     from app.db.session import init_db
+
+    check_cache_backend()
     
     init_db()
     
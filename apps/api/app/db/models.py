@@ -2,6 +2,7 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Optional
 from uuid import UUID, uuid4
+from sqlalchemy import UniqueConstraint
 from sqlmodel import SQLModel, Field, Column, JSON
 
 
@@ -69,14 +70,31 @@ class Incident(SQLModel, table=True):
 
 
 class IncidentSignal(SQLModel, table=True):
+    __table_args__ = (UniqueConstraint("org_id", "fingerprint"),)
+
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     org_id: UUID = Field(index=True)
     incident_id: UUID = Field(index=True)
     type: str
+    service: Optional[str] = Field(default=None, index=True)
     payload: dict = Field(default_factory=dict, sa_column=Column(JSON))
+    fingerprint: Optional[str] = Field(default=None)
+    dedup_key: Optional[str] = Field(default=None, index=True)
+    occurrences: int = 1
+    observed_at: Optional[datetime] = Field(default=None)
+    first_seen_at: Optional[datetime] = Field(default=None)
+    last_seen_at: Optional[datetime] = Field(default=None)
     created_at: datetime = Field(default_factory=utc_now)
 
 
+class SignalFingerprint(SQLModel, table=True):
+    """Every ingested event fingerprint, including those collapsed into another row."""
+
+    org_id: UUID = Field(primary_key=True)
+    fingerprint: str = Field(primary_key=True)
+    created_at: datetime = Field(default_factory=utc_now, index=True)
+
+
 class IncidentHypothesis(SQLModel, table=True):
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     org_id: UUID = Field(index=True)
@@ -90,11 +108,30 @@ class IncidentSuspectedChange(SQLModel, table=True):
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     org_id: UUID = Field(index=True)
     incident_id: UUID = Field(index=True)
+    # Identify the suspected change: the ChangeRecord of the same org with this
+    # ``source`` whose ``external_id`` equals ``reference``.
     source: str
     reference: str
     created_at: datetime = Field(default_factory=utc_now)
 
 
+class ChangeRecord(SQLModel, table=True):
+    __table_args__ = (UniqueConstraint("org_id", "source", "external_id"),)
+
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    org_id: UUID = Field(index=True)
+    external_id: str
+    source: str = "changeiq"
+    kind: str = "deploy"
+    service: Optional[str] = Field(default=None, index=True)
+    environment: Optional[str] = Field(default=None, index=True)
+    summary: str = ""
+    started_at: datetime = Field(index=True)
+    ended_at: Optional[datetime] = Field(default=None)
+    details: dict = Field(default_factory=dict, sa_column=Column(JSON))
+    created_at: datetime = Field(default_factory=utc_now)
+
+
 class RemediationAction(SQLModel, table=True):
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     org_id: UUID = Field(index=True)
@@ -102,7 +139,31 @@ class RemediationAction(SQLModel, table=True):
     title: str
     status: str
     details: dict = Field(default_factory=dict, sa_column=Column(JSON))
+    # Bumped by every status transition; see app.services.remediation.
+    version: int = 0
+    created_at: datetime = Field(default_factory=utc_now)
+    updated_at: datetime = Field(default_factory=utc_now)
+
+
+class RemediationJob(SQLModel, table=True):
+    """One queued run of an action's execute or rollback step; claimed by app.services.executor."""
+
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    org_id: UUID = Field(index=True)
+    action_id: UUID = Field(index=True)
+    kind: str
+    target: str = Field(index=True)
+    status: str = Field(default="queued", index=True)
+    attempts: int = 0
+    max_attempts: int = 3
+    run_after: datetime = Field(default_factory=utc_now, index=True)
+    lease_expires_at: Optional[datetime] = Field(default=None)
+    worker_id: Optional[str] = Field(default=None)
+    error: Optional[str] = Field(default=None)
+    result: dict = Field(default_factory=dict, sa_column=Column(JSON))
     created_at: datetime = Field(default_factory=utc_now)
+    started_at: Optional[datetime] = Field(default=None)
+    finished_at: Optional[datetime] = Field(default=None)
 
 
 class Conversation(SQLModel, table=True):
@@ -139,6 +200,23 @@ class RCAReport(SQLModel, table=True):
     created_at: datetime = Field(default_factory=utc_now)
 
 
+class RCAJob(SQLModel, table=True):
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    org_id: UUID = Field(index=True)
+    incident_id: UUID = Field(index=True)
+    requested_by: Optional[UUID] = Field(default=None)
+    status: str = "queued"
+    report_id: Optional[UUID] = Field(default=None)
+    error: Optional[str] = Field(default=None)
+    attempts: int = 0
+    # Set while running: the process running the job and until when it holds it.
+    worker_id: Optional[str] = Field(default=None)
+    lease_expires_at: Optional[datetime] = Field(default=None, index=True)
+    created_at: datetime = Field(default_factory=utc_now)
+    started_at: Optional[datetime] = Field(default=None)
+    finished_at: Optional[datetime] = Field(default=None)
+
+
 class KBDocument(SQLModel, table=True):
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     org_id: UUID = Field(index=True)
@@ -173,3 +251,25 @@ class AuditEvent(SQLModel, table=True):
     event_type: str
     detail: dict = Field(default_factory=dict, sa_column=Column(JSON))
     created_at: datetime = Field(default_factory=utc_now)
+
+
+class IncidentLifecycle(SQLModel, table=True):
+    incident_id: UUID = Field(primary_key=True)
+    org_id: UUID = Field(index=True)
+    severity: str
+    opened_at: datetime
+    acknowledged_at: Optional[datetime] = Field(default=None)
+    resolved_at: Optional[datetime] = Field(default=None)
+
+
+class InsightRollup(SQLModel, table=True):
+    __table_args__ = (UniqueConstraint("org_id", "bucket", "metric", "dimension"),)
+
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    org_id: UUID = Field(index=True)
+    bucket: datetime
+    metric: str
+    dimension: str = ""
+    count: int = 0
+    total: float = 0.0
+    updated_at: datetime = Field(default_factory=utc_now)
@@ -1,8 +1,12 @@
 from sqlmodel import SQLModel, create_engine, Session
 from app.core.config import get_settings
+from app.services.metrics import instrument_engine
+from app.services.query_stats import instrument_queries
 
 settings = get_settings()
 engine = create_engine(settings.database_url, echo=False, pool_pre_ping=True)
+instrument_engine(engine)
+instrument_queries(engine)
 
 
 def init_db() -> None:
@@ -7,9 +7,13 @@ from pathlib import Path
 from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import get_settings
-from app.core.middleware import security_headers_middleware
+from app.core.middleware import MetricsMiddleware, QueryStatsMiddleware, security_headers_middleware
 from app.core.startup import init_application
 from app.routers import register_routers
+from app.routers.opsmind import chat as chat_router
+from app.services.executor import get_remediation_executor
+from app.services.metrics import start_snapshot_writer
+from app.services.rca import get_rca_runner
 
 # Make local opsmind packages importable for orchestrator wiring
 ROOT = Path(__file__).resolve().parents[3]
@@ -45,6 +49,10 @@ app.add_middleware(
 # Add security headers middleware
 app.middleware("http")(security_headers_middleware)
 
+# Count and time requests per route for /metrics
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(QueryStatsMiddleware)
+
 
 
 # Register all routers
@@ -92,7 +100,15 @@ if ChatSendRequest is not None:
     else:
         state_store = InMemoryStore()
 
-    service = OrchestratorService(state_store, state_store, state_store, ToolRegistry())
+    # One feedback writer and aggregator per process: the chat router's, started on startup.
+    service = OrchestratorService(
+        state_store,
+        state_store,
+        state_store,
+        ToolRegistry(),
+        feedback_writer=chat_router.feedback_writer,
+        usefulness=chat_router.usefulness,
+    )
 
     @app.post("/v1/chat/send", response_model=ChatSendResponse)
     def send_chat(
@@ -131,7 +147,8 @@ if ChatSendRequest is not None:
 
     @app.post("/v1/chat/feedback")
     def post_feedback(feedback: FeedbackRequest):
-        return {"status": "accepted", "conversation_id": feedback.conversation_id}
+        record = service.submit_feedback(feedback)
+        return {"status": "accepted", "conversation_id": feedback.conversation_id, "feedback_id": record.feedback_id}
 
 
 """OpsMind API main application."""
@@ -184,11 +201,26 @@ app.add_middleware(
 # Add security headers middleware
 app.middleware("http")(security_headers_middleware)
 
+# Count and time requests per route for /metrics
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(QueryStatsMiddleware)
+
 # Initialize application on startup
 @app.on_event("startup")
 def on_startup():
     """Initialize database and seed data on application startup."""
     init_application()
+    # Resume remediation jobs queued before this process started.
+    get_remediation_executor().start()
+    # Pick up RCA jobs left queued, or whose lease lapsed, and keep doing so.
+    get_rca_runner().start()
+    start_snapshot_writer()
+    chat_router.start_feedback_learning()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    chat_router.stop_feedback_learning()
 
 # Register all routers
 register_routers(app)
@@ -206,7 +238,15 @@ if ChatSendRequest is not None:
     else:
         state_store = InMemoryStore()
 
-    service = OrchestratorService(state_store, state_store, state_store, ToolRegistry())
+    # One feedback writer and aggregator per process: the chat router's, started on startup.
+    service = OrchestratorService(
+        state_store,
+        state_store,
+        state_store,
+        ToolRegistry(),
+        feedback_writer=chat_router.feedback_writer,
+        usefulness=chat_router.usefulness,
+    )
 
     @app.post("/v1/chat/send", response_model=ChatSendResponse)
     def send_chat(
@@ -245,5 +285,6 @@ if ChatSendRequest is not None:
 
     @app.post("/v1/chat/feedback")
     def post_feedback(feedback: FeedbackRequest):
-        return {"status": "accepted", "conversation_id": feedback.conversation_id}
+        record = service.submit_feedback(feedback)
+        return {"status": "accepted", "conversation_id": feedback.conversation_id, "feedback_id": record.feedback_id}
 
@@ -1,5 +1,7 @@
 """Router registry for all OpsMind API endpoints."""
 
+from app.services.metrics import register_routes
+
 from app.routers.opsmind import (
     actions,
     admin,
@@ -9,6 +11,7 @@ from app.routers.opsmind import (
     changeiq,
     correlate,
     detect,
+    events,
     governance,
     graph,
     identity,
@@ -17,6 +20,7 @@ from app.routers.opsmind import (
     insight,
     knowledge,
     learn,
+    metrics,
     rca,
     remedy,
     risk,
@@ -49,7 +53,11 @@ def register_routers(app) -> None:
         learn.router,
         insight.router,
         chat.router,
+        events.router,
+        metrics.router,
     ]
     
     for router in routers:
         app.include_router(router)
+    # Create per-route request metrics up front so requests only look them up.
+    register_routes(app.routes)
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, HTTPException
 from sqlmodel import Session, select
 from app.core.security import CurrentUser, require
 from app.db.session import get_session
-from app.db.models import RemediationAction
-from app.services.audit import record_audit_event
+from app.db.models import RemediationJob
+from app.services.executor import get_remediation_executor, job_view
+from app.services.remediation import BatchTransitionRequest, TransitionConflict, parse_action_id, parse_if_match, transition_batch_once, transition_once
 
 router = APIRouter(prefix="/opsmind/actions", tags=["actions"])
 
@@ -13,22 +14,61 @@ def execute_action(
     action_id: str,
     session: Session = Depends(get_session),
     current_user: CurrentUser = Depends(require("opsmind.actions.execute")),
+    idempotency_key: str | None = Header(default=None),
+    if_match: str | None = Header(default=None),
 ):
-    action = session.exec(
-        select(RemediationAction)
-        .where(RemediationAction.org_id == current_user.org_id)
-        .where(RemediationAction.id == action_id)
-    ).first()
-    if not action:
-        return {"status": "not_found"}
-    action.status = "executed"
-    session.add(action)
-    session.commit()
-    record_audit_event(
+    try:
+        expected_version = parse_if_match(if_match)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="If-Match must be an action version") from exc
+    try:
+        result = transition_once(
+            session,
+            current_user.org_id,
+            action_id,
+            "execute",
+            actor_user_id=current_user.id,
+            expected_version=expected_version,
+            idempotency_key=idempotency_key,
+        )
+    except TransitionConflict as exc:
+        raise HTTPException(status_code=409, detail=exc.as_dict()) from exc
+    get_remediation_executor().wake()
+    return result
+
+
+@router.post("/execute")
+def execute_actions(
+    payload: BatchTransitionRequest,
+    session: Session = Depends(get_session),
+    current_user: CurrentUser = Depends(require("opsmind.actions.execute")),
+    idempotency_key: str | None = Header(default=None),
+):
+    result = transition_batch_once(
         session,
-        "remedy.executed",
-        {"action_id": action_id},
-        org_id=current_user.org_id,
+        current_user.org_id,
+        payload.action_ids,
+        "execute",
         actor_user_id=current_user.id,
+        idempotency_key=idempotency_key,
     )
-    return {"status": "executed"}
+    get_remediation_executor().wake()
+    return result
+
+
+@router.get("/{action_id}/jobs")
+def list_action_jobs(
+    action_id: str,
+    session: Session = Depends(get_session),
+    current_user: CurrentUser = Depends(require("opsmind.actions.execute")),
+):
+    action_uuid = parse_action_id(action_id)
+    if action_uuid is None:
+        return {"status": "not_found"}
+    jobs = session.exec(
+        select(RemediationJob)
+        .where(RemediationJob.org_id == current_user.org_id)
+        .where(RemediationJob.action_id == action_uuid)
+        .order_by(RemediationJob.created_at)
+    ).all()
+    return [job_view(job) for job in jobs]
@@ -5,6 +5,7 @@ from app.core.security import CurrentUser, require
 from app.db.session import get_session
 from app.db.models import User, Role, UserRole
 from app.services.audit import record_audit_event
+from app.services.cache import get_cache
 
 router = APIRouter(prefix="/opsmind/admin", tags=["admin"])
 
@@ -28,8 +29,11 @@ def list_roles(
     session: Session = Depends(get_session),
     current_user: CurrentUser = Depends(require("opsmind.admin.roles.manage")),
 ):
-    roles = session.exec(select(Role).where(Role.org_id == current_user.org_id)).all()
-    return [{"id": str(role.id), "name": role.name} for role in roles]
+    def load():
+        roles = session.exec(select(Role).where(Role.org_id == current_user.org_id)).all()
+        return [{"id": str(role.id), "name": role.name} for role in roles]
+
+    return get_cache().get_or_load(current_user.org_id, "roles", load)
 
 
 @router.post("/roles/assign")
@@ -41,6 +45,7 @@ def assign_role(
     user_role = UserRole(org_id=current_user.org_id, user_id=payload.user_id, role_id=payload.role_id)
     session.add(user_role)
     session.commit()
+    get_cache().invalidate(current_user.org_id, "roles", "rbac.policies")
     record_audit_event(
         session,
         "admin.role.assign",
@@ -49,3 +54,8 @@ def assign_role(
         actor_user_id=current_user.id,
     )
     return {"status": "assigned"}
+
+
+@router.get("/cache")
+def cache_stats(current_user: CurrentUser = Depends(require("opsmind.admin.users.manage"))):
+    return get_cache().stats()
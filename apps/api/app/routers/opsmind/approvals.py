@@ -1,9 +1,8 @@
-from fastapi import APIRouter, Depends
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, Header, HTTPException
+from sqlmodel import Session
 from app.core.security import CurrentUser, require
 from app.db.session import get_session
-from app.db.models import RemediationAction
-from app.services.audit import record_audit_event
+from app.services.remediation import BatchTransitionRequest, TransitionConflict, parse_if_match, transition_batch_once, transition_once
 
 router = APIRouter(prefix="/opsmind/approvals", tags=["approvals"])
 
@@ -13,22 +12,39 @@ def approve_remediation(
     action_id: str,
     session: Session = Depends(get_session),
     current_user: CurrentUser = Depends(require("opsmind.approvals.approve")),
+    idempotency_key: str | None = Header(default=None),
+    if_match: str | None = Header(default=None),
 ):
-    action = session.exec(
-        select(RemediationAction)
-        .where(RemediationAction.org_id == current_user.org_id)
-        .where(RemediationAction.id == action_id)
-    ).first()
-    if not action:
-        return {"status": "not_found"}
-    action.status = "approved"
-    session.add(action)
-    session.commit()
-    record_audit_event(
+    try:
+        expected_version = parse_if_match(if_match)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="If-Match must be an action version") from exc
+    try:
+        return transition_once(
+            session,
+            current_user.org_id,
+            action_id,
+            "approve",
+            actor_user_id=current_user.id,
+            expected_version=expected_version,
+            idempotency_key=idempotency_key,
+        )
+    except TransitionConflict as exc:
+        raise HTTPException(status_code=409, detail=exc.as_dict()) from exc
+
+
+@router.post("/approve")
+def approve_remediations(
+    payload: BatchTransitionRequest,
+    session: Session = Depends(get_session),
+    current_user: CurrentUser = Depends(require("opsmind.approvals.approve")),
+    idempotency_key: str | None = Header(default=None),
+):
+    return transition_batch_once(
         session,
-        "remedy.approved",
-        {"action_id": action_id},
-        org_id=current_user.org_id,
+        current_user.org_id,
+        payload.action_ids,
+        "approve",
         actor_user_id=current_user.id,
+        idempotency_key=idempotency_key,
     )
-    return {"status": "approved"}
@@ -1,22 +1,64 @@
 import json
 import time
+from uuid import UUID
 from fastapi import APIRouter, Depends
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from app.core.security import CurrentUser, require, rate_limit_dependency
+from app.db.models import Incident
 from app.services.audit import record_audit_event
+from app.services.retrieval import get_vector_registry
 from app.services.sanitizer import sanitize_markdown
 from app.db.session import get_session
-from sqlmodel import Session
+from sqlmodel import Session, select
 
 router = APIRouter(prefix="/opsmind/assistant", tags=["assistant"])
 
 
+CONTEXT_PASSAGES = 5
+EXCERPT_CHARS = 240
+
+
 class AssistantRequest(BaseModel):
     prompt: str
     incident_id: str | None = None
 
 
+def _incident(session: Session, current_user: CurrentUser, incident_id: str) -> Incident | None:
+    try:
+        incident_uuid = UUID(incident_id)
+    except ValueError:
+        return None
+    return session.exec(
+        select(Incident)
+        .where(Incident.org_id == current_user.org_id)
+        .where(Incident.id == incident_uuid)
+    ).first()
+
+
+def _answer(session: Session, current_user: CurrentUser, payload: AssistantRequest) -> tuple[str, list[dict]]:
+    """A reply grounded in the knowledge-base and RCA passages most similar to the prompt."""
+    query = payload.prompt
+    incident = _incident(session, current_user, payload.incident_id) if payload.incident_id else None
+    if incident:
+        query = f"{incident.title}\n{query}"
+    passages = get_vector_registry().retrieve(session, current_user.org_id, query, limit=CONTEXT_PASSAGES)
+    if not passages:
+        return sanitize_markdown("No related knowledge base articles or past RCA reports were found for this question."), []
+    citations = [
+        {"source": passage["source"], "id": passage["id"], "title": passage["title"], "score": passage["score"]}
+        for passage in passages
+    ]
+    lines = [f"Based on {len(passages)} related passage(s) from the knowledge base and past RCA reports:"]
+    for passage in passages:
+        excerpt = " ".join(passage["text"].split())
+        if len(excerpt) > EXCERPT_CHARS:
+            excerpt = excerpt[:EXCERPT_CHARS].rsplit(" ", 1)[0] + " …"
+        lines.append(f"- {passage['title']}: {excerpt} [{passage['source']}:{passage['id']}]")
+    lines.append("Citations: " + ", ".join(f"[{citation['source']}:{citation['id']}]" for citation in citations))
+    return sanitize_markdown("\n".join(lines)), citations
+
+
 def _stream_response(content: str):
     for chunk in content.split(" "):
         payload = json.dumps({"token": chunk})
@@ -32,10 +74,7 @@ def chat(
     current_user: CurrentUser = Depends(require("opsmind.assistant.write")),
     _: None = Depends(rate_limit_dependency),
 ):
-    response = sanitize_markdown(
-        "Based on incident evidence and knowledge base, the likely root cause is database saturation. "
-        "Citations: [metrics:db_cpu], [change:deploy_2024.10.12]."
-    )
+    response, citations = _answer(session, current_user, payload)
     record_audit_event(
         session,
         "assistant.chat",
@@ -43,7 +82,7 @@ def chat(
         org_id=current_user.org_id,
         actor_user_id=current_user.id,
     )
-    return {"response": response}
+    return {"response": response, "citations": citations}
 
 
 @router.post("/chat/stream")
@@ -53,10 +92,7 @@ def chat_stream(
     current_user: CurrentUser = Depends(require("opsmind.assistant.write")),
     _: None = Depends(rate_limit_dependency),
 ):
-    response = sanitize_markdown(
-        "Based on incident evidence and knowledge base, the likely root cause is database saturation. "
-        "Citations: [metrics:db_cpu], [change:deploy_2024.10.12]."
-    )
+    response = _answer(session, current_user, payload)[0]
     record_audit_event(
         session,
         "assistant.chat.stream",
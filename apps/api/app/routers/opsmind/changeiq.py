@@ -1,9 +1,114 @@
-from fastapi import APIRouter, Depends
+from datetime import datetime, timedelta, timezone
+from pydantic import BaseModel, Field
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import tuple_
+from sqlmodel import Session, select
 from app.core.security import CurrentUser, require
+from app.db.session import get_session
+from app.db.models import ChangeRecord, utc_now
+from app.services.audit import record_audit_event
+from app.services.cache import get_cache
+from app.services.change_index import get_change_index_registry
+from app.services.events import publish_event
 
 router = APIRouter(prefix="/opsmind/changeiq", tags=["changeiq"])
 
+DEFAULT_WINDOW = timedelta(hours=24)
+
+
+class ChangeRecordCreate(BaseModel):
+    external_id: str = Field(min_length=1, max_length=200)
+    source: str = "changeiq"
+    kind: str = "deploy"
+    service: str | None = None
+    environment: str | None = None
+    summary: str = ""
+    started_at: datetime
+    ended_at: datetime | None = None
+    details: dict = Field(default_factory=dict)
+
+
+class ChangeRecordBatch(BaseModel):
+    records: list[ChangeRecordCreate] = Field(min_length=1, max_length=5000)
+
+
+def _naive_utc(moment: datetime) -> datetime:
+    if moment.tzinfo is not None:
+        return moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
 
 @router.get("/records")
-def list_changes(current_user: CurrentUser = Depends(require("opsmind.changeiq.read"))):
-    return [{"id": "chg-001", "summary": "Deploy payments-api 2024.10.12"}]
+def list_changes(
+    start: datetime | None = None,
+    end: datetime | None = None,
+    service: str | None = None,
+    environment: str | None = None,
+    padding_minutes: int = Query(default=0, ge=0, le=10080),
+    limit: int = Query(default=100, ge=1, le=1000),
+    session: Session = Depends(get_session),
+    current_user: CurrentUser = Depends(require("opsmind.changeiq.read")),
+):
+    end = _naive_utc(end) if end else utc_now()
+    start = _naive_utc(start) if start else end - DEFAULT_WINDOW
+    if start > end:
+        raise HTTPException(status_code=422, detail="start must not be after end")
+    padding = timedelta(minutes=padding_minutes)
+    index = get_change_index_registry().index(session, current_user.org_id)
+    changes = index.window(start - padding, end + padding, service=service, environment=environment, limit=limit)
+    return {
+        "window": {"start": (start - padding).isoformat(), "end": (end + padding).isoformat()},
+        "count": len(changes),
+        "changes": changes,
+    }
+
+
+@router.post("/records")
+def create_changes(
+    payload: ChangeRecordBatch,
+    session: Session = Depends(get_session),
+    current_user: CurrentUser = Depends(require("opsmind.changeiq.write")),
+):
+    # Feeds redeliver; (source, external_id) identifies a change, so repeats are skipped.
+    keys = {(record.source, record.external_id) for record in payload.records}
+    existing = set(
+        session.exec(
+            select(ChangeRecord.source, ChangeRecord.external_id)
+            .where(ChangeRecord.org_id == current_user.org_id)
+            .where(tuple_(ChangeRecord.source, ChangeRecord.external_id).in_(keys))
+        ).all()
+    )
+    created = []
+    for record in payload.records:
+        key = (record.source, record.external_id)
+        if key in existing:
+            continue
+        existing.add(key)
+        created.append(
+            ChangeRecord(
+                org_id=current_user.org_id,
+                external_id=record.external_id,
+                source=record.source,
+                kind=record.kind,
+                service=record.service,
+                environment=record.environment,
+                summary=record.summary,
+                started_at=_naive_utc(record.started_at),
+                ended_at=_naive_utc(record.ended_at) if record.ended_at else None,
+                details=record.details,
+            )
+        )
+    if created:
+        session.add_all(created)
+        session.commit()
+        get_cache().invalidate(current_user.org_id, "changes")
+        get_change_index_registry().add_records(current_user.org_id, created)
+        record_audit_event(
+            session,
+            "changeiq.records.created",
+            {"count": len(created), "external_ids": [record.external_id for record in created[:50]]},
+            org_id=current_user.org_id,
+            actor_user_id=current_user.id,
+        )
+        publish_event(current_user.org_id, "changeiq.records.created", {"count": len(created)})
+    return {"created": len(created), "skipped": len(payload.records) - len(created)}
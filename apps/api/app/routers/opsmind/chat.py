@@ -7,9 +7,11 @@ from pathlib import Path
 import sys
 import os
 import logging
+import time
 
 from fastapi import APIRouter, Header, HTTPException
 from pydantic import BaseModel, Field
+from app.services.metrics import ORCHESTRATOR_TURN, TOOL_CALL
 
 router = APIRouter(prefix="/v1/chat", tags=["chat"])
 
@@ -34,7 +36,7 @@ class ChatSendResponse(BaseModel):
 
 class FeedbackRequest(BaseModel):
     conversation_id: str
-    rating: int
+    rating: int = Field(ge=1, le=5)
     comment: str | None = None
 
 
@@ -62,6 +64,8 @@ logger = logging.getLogger("opsmind.chat")
 USE_ORCHESTRATOR = False
 service = None
 ops_models = None
+feedback_writer = None
+usefulness = None
 try:
     import importlib
 
@@ -113,10 +117,21 @@ try:
         sys.modules['redis'] = redis_mod
 
     from opsmind.contracts.v1.models import ChatSendResponse as OpsChatSendResponse  # type: ignore
+    from opsmind.contracts.v1.models import FeedbackRequest as OpsFeedbackRequest  # type: ignore
+    from opsmind.orchestrator.learning import UsefulnessAggregator  # type: ignore
     from opsmind.orchestrator.service import OrchestratorService  # type: ignore
+    from opsmind.storage.feedback import BatchedFeedbackWriter  # type: ignore
     from opsmind.storage.stores import InMemoryStore  # type: ignore
     from opsmind.tools.registry import ToolRegistry  # type: ignore
 
+    class TimedToolRegistry(ToolRegistry):
+        def execute(self, tool_name, tool_input, ctx):
+            start = time.perf_counter()
+            try:
+                return super().execute(tool_name, tool_input, ctx)
+            finally:
+                TOOL_CALL.labels(tool_name).observe(time.perf_counter() - start)
+
     # Prefer DATABASE_URL for Postgres-only deployments (no Redis required)
     database_url = os.getenv("DATABASE_URL") or os.getenv("POSTGRES_DSN")
     if database_url:
@@ -141,10 +156,18 @@ try:
         else:
             state_store = InMemoryStore()
 
-    service = OrchestratorService(state_store, state_store, state_store, ToolRegistry())
+    # Feedback is appended in batches off the request path and folded into tool
+    # usefulness scores periodically; the orchestrator reorders its tool plans by them.
+    # Their threads run between start_feedback_learning and stop_feedback_learning.
+    feedback_writer = BatchedFeedbackWriter(state_store)
+    usefulness = UsefulnessAggregator(state_store)
+    service = OrchestratorService(
+        state_store, state_store, state_store, TimedToolRegistry(), feedback_writer=feedback_writer, usefulness=usefulness
+    )
     USE_ORCHESTRATOR = True
     ops_models = {
         "ChatSendResponse": OpsChatSendResponse,
+        "FeedbackRequest": OpsFeedbackRequest,
     }
     logger.info("Wired chat router to opsmind orchestrator")
 except Exception as e:  # pragma: no cover - optional runtime wiring
@@ -152,6 +175,20 @@ except Exception as e:  # pragma: no cover - optional runtime wiring
     logger.debug("Orchestrator not available: %s", e)
 
 
+def start_feedback_learning() -> None:
+    if feedback_writer is not None:
+        feedback_writer.start()
+    if usefulness is not None:
+        usefulness.start(float(os.getenv("OPSMIND_FEEDBACK_AGGREGATE_SECONDS", "60")))
+
+
+def stop_feedback_learning() -> None:
+    if usefulness is not None:
+        usefulness.stop()
+    if feedback_writer is not None:
+        feedback_writer.close()
+
+
 @router.post("/send", response_model=ChatSendResponse)
 def send_chat(request: ChatSendRequest, x_org_id: str | None = Header(default=None), x_project_id: str | None = Header(default=None)):
     # If orchestrator available, delegate
@@ -162,7 +199,10 @@ def send_chat(request: ChatSendRequest, x_org_id: str | None = Header(default=No
         if request.context_overrides:
             service.apply_context_overrides(state, request.context_overrides)
 
+        start = time.perf_counter()
         response = service.handle_turn(state, request.message)
+        scenario = getattr(state.workflow.scenario, "value", "unknown")
+        ORCHESTRATOR_TURN.labels(scenario).observe(time.perf_counter() - start)
         return {"conversation_id": state.conversation_id, "response": response}
 
     # Fallback minimal behavior
@@ -170,7 +210,8 @@ def send_chat(request: ChatSendRequest, x_org_id: str | None = Header(default=No
     now = datetime.utcnow().isoformat()
     convo = _STORE.get(conv_id)
     if not convo:
-        convo = {"conversation_id": conv_id, "messages": [], "created_at": now, "updated_at": now}
+        org_id = x_org_id or request.org_id or "local-org"
+        convo = {"conversation_id": conv_id, "org_id": org_id, "messages": [], "created_at": now, "updated_at": now}
         _STORE[conv_id] = convo
 
     msg = {"role": "user", "text": request.message, "created_at": now}
@@ -194,7 +235,31 @@ def get_conversation(conversation_id: str):
     return convo
 
 
+def record_feedback(feedback: FeedbackRequest, org_id: str | None = None) -> dict:
+    """Queue feedback for the orchestrator's learning store, or keep it with the fallback conversation.
+
+    With ``org_id``, the conversation must belong to that org; otherwise it is
+    reported as not found, so ratings cannot skew another tenant's scores.
+    """
+    if USE_ORCHESTRATOR and service is not None:
+        if org_id is not None:
+            state = service.state_store.get(feedback.conversation_id)
+            if state is None or state.tenant.org_id != org_id:
+                raise HTTPException(status_code=404, detail="Conversation not found")
+        record = service.submit_feedback(ops_models["FeedbackRequest"](**feedback.model_dump()))
+        return {"status": "accepted", "conversation_id": feedback.conversation_id, "feedback_id": record.feedback_id}
+
+    feedback_id = str(uuid4())
+    convo = _STORE.get(feedback.conversation_id)
+    if org_id is not None and (convo is None or convo.get("org_id") != org_id):
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    if convo is not None:
+        convo.setdefault("feedback", []).append(
+            {"feedback_id": feedback_id, **feedback.model_dump(), "created_at": datetime.utcnow().isoformat()}
+        )
+    return {"status": "accepted", "conversation_id": feedback.conversation_id, "feedback_id": feedback_id}
+
+
 @router.post("/feedback")
 def post_feedback(feedback: FeedbackRequest):
-    # Accept feedback but do not store persistently in this minimal implementation
-    return {"status": "accepted", "conversation_id": feedback.conversation_id}
+    return record_feedback(feedback)
@@ -1,9 +1,41 @@
+from uuid import UUID
+from pydantic import BaseModel, Field
 from fastapi import APIRouter, Depends
+from sqlmodel import Session, select
 from app.core.security import CurrentUser, require
+from app.db.session import get_session
+from app.db.models import Incident
+from app.services.correlation import CorrelationParams, correlate_incident
 
 router = APIRouter(prefix="/opsmind/correlate", tags=["correlate"])
 
 
+class CorrelationRunRequest(BaseModel):
+    incident_id: str
+    lookback_minutes: int = Field(default=1440, ge=1, le=7 * 1440)
+    lookahead_minutes: int = Field(default=60, ge=0, le=1440)
+    bucket_seconds: int = Field(default=60, ge=10, le=3600)
+    max_lag_buckets: int = Field(default=15, ge=0, le=120)
+    top_k: int = Field(default=20, ge=1, le=200)
+    hops: int = Field(default=2, ge=0, le=6)
+
+
 @router.post("/run")
-def run_correlation(current_user: CurrentUser = Depends(require("opsmind.correlate.run"))):
-    return {"status": "correlation_started"}
+def run_correlation(
+    payload: CorrelationRunRequest,
+    session: Session = Depends(get_session),
+    current_user: CurrentUser = Depends(require("opsmind.correlate.run")),
+):
+    try:
+        incident_id = UUID(payload.incident_id)
+    except ValueError:
+        return {"status": "not_found"}
+    incident = session.exec(
+        select(Incident)
+        .where(Incident.org_id == current_user.org_id)
+        .where(Incident.id == incident_id)
+    ).first()
+    if not incident:
+        return {"status": "not_found"}
+    params = CorrelationParams(**payload.model_dump(exclude={"incident_id"}))
+    return correlate_incident(session, current_user.org_id, incident, params)
@@ -1,12 +1,37 @@
-from fastapi import APIRouter, Depends
+import json
+import time
+import zlib
+import numpy as np
+from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlmodel import Session, select
+from app.core.config import get_settings
 from app.core.security import CurrentUser, require
 from app.db.session import get_session
 from app.db.models import IncidentSignal
+from app.services.detection import anomaly_signal_events, get_detection_engine
+from app.services.ingestion import (
+    BackpressureError,
+    LineTooLongError,
+    get_ingestion_pipeline,
+    iter_ndjson_lines,
+    validate_event,
+)
 
 router = APIRouter(prefix="/opsmind/detect", tags=["detect"])
 
 
+class MetricPoint(BaseModel):
+    series: str
+    value: float
+    timestamp: float | None = None
+    service: str | None = None
+
+
+class MetricBatch(BaseModel):
+    points: list[MetricPoint]
+
+
 @router.get("/signals")
 def list_signals(
     session: Session = Depends(get_session),
@@ -19,6 +44,99 @@ def list_signals(
             "incident_id": str(signal.incident_id),
             "type": signal.type,
             "payload": signal.payload,
+            "occurrences": signal.occurrences,
+            "first_seen_at": signal.first_seen_at.isoformat() if signal.first_seen_at else None,
+            "last_seen_at": signal.last_seen_at.isoformat() if signal.last_seen_at else None,
         }
         for signal in signals
     ]
+
+
+@router.post("/ingest", status_code=202)
+async def ingest_signals(
+    request: Request,
+    current_user: CurrentUser = Depends(require("opsmind.detect.write")),
+):
+    settings = get_settings()
+    pipeline = get_ingestion_pipeline()
+    gzipped = "gzip" in request.headers.get("content-encoding", "").lower()
+    received_at = time.time()
+    # Checked while streaming, so an oversized (or decompression-bomb) body is
+    # refused before it is buffered rather than after.
+    room = pipeline.remaining(current_user.org_id)
+    events = []
+    errors = []
+    line_number = 0
+    try:
+        async for line in iter_ndjson_lines(request.stream(), gzipped, settings.ingest_max_line_bytes):
+            line_number += 1
+            if line_number > settings.ingest_max_events_per_request:
+                raise HTTPException(
+                    status_code=413, detail=f"More than {settings.ingest_max_events_per_request} events in one request"
+                )
+            try:
+                events.append(validate_event(json.loads(line), received_at))
+            except ValueError as exc:
+                if len(errors) < settings.ingest_max_errors_reported:
+                    errors.append({"line": line_number, "error": str(exc)})
+                continue
+            if len(events) > room:
+                pipeline.throttle(current_user.org_id, len(events))
+                raise HTTPException(
+                    status_code=429,
+                    detail=str(BackpressureError(pipeline.queue_capacity - room, pipeline.queue_capacity)),
+                    headers={"Retry-After": "1"},
+                )
+    except LineTooLongError as exc:
+        raise HTTPException(status_code=413, detail=str(exc)) from exc
+    except zlib.error as exc:
+        raise HTTPException(status_code=400, detail="Malformed gzip body") from exc
+    rejected = line_number - len(events)
+    try:
+        pipeline.submit(current_user.org_id, events, rejected=rejected)
+    except BackpressureError as exc:
+        raise HTTPException(status_code=429, detail=str(exc), headers={"Retry-After": "1"}) from exc
+    return {
+        "accepted": len(events),
+        "rejected": rejected,
+        "errors": errors,
+        "stats": pipeline.stats(current_user.org_id),
+    }
+
+
+@router.get("/ingest/stats")
+def ingest_stats(current_user: CurrentUser = Depends(require("opsmind.detect.read"))):
+    return get_ingestion_pipeline().stats(current_user.org_id)
+
+
+@router.post("/metrics")
+def ingest_metrics(
+    payload: MetricBatch,
+    current_user: CurrentUser = Depends(require("opsmind.detect.write")),
+):
+    settings = get_settings()
+    engine = get_detection_engine()
+    now = time.time()
+    names = [point.series for point in payload.points]
+    values = np.fromiter((point.value for point in payload.points), dtype=np.float64, count=len(names))
+    timestamps = np.fromiter((point.timestamp or now for point in payload.points), dtype=np.float64, count=len(names))
+    anomalies = engine.ingest(current_user.org_id, names, values, timestamps)
+    emitted = 0
+    if anomalies:
+        services = {point.series: point.service for point in payload.points}
+        events = anomaly_signal_events(anomalies, services, settings.detect_mad_threshold)
+        try:
+            get_ingestion_pipeline().submit(current_user.org_id, events)
+            emitted = len(events)
+        except BackpressureError:
+            emitted = 0
+    return {
+        "points": len(names),
+        "anomalies": [anomaly.as_dict() for anomaly in anomalies],
+        "signals_emitted": emitted,
+    }
+
+
+@router.get("/series/stats")
+def series_stats(current_user: CurrentUser = Depends(require("opsmind.detect.read"))):
+    return get_detection_engine().stats(current_user.org_id)
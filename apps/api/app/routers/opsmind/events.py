@@ -0,0 +1,50 @@
+import asyncio
+import json
+from fastapi import APIRouter, Depends, Header, Request
+from fastapi.responses import StreamingResponse
+from app.core.security import CurrentUser, require
+from app.services.events import Event, get_event_bus
+
+router = APIRouter(prefix="/opsmind/events", tags=["events"])
+
+KEEPALIVE_SECONDS = 15
+
+
+def _format_event(event: Event) -> str:
+    return f"id: {event.token}\nevent: {event.event_type}\ndata: {json.dumps(event.as_dict(), default=str)}\n\n"
+
+
+async def _stream_events(request: Request, org_id, since: str | None):
+    bus = get_event_bus()
+    subscription, missed, complete = bus.subscribe(org_id, since)
+    try:
+        if not complete:
+            yield "event: reset\ndata: {\"reason\": \"cursor_expired\"}\n\n"
+        for event in missed:
+            yield _format_event(event)
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout=KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event is None:
+                break
+            yield _format_event(event)
+    finally:
+        bus.unsubscribe(subscription)
+
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    cursor: str | None = None,
+    last_event_id: str | None = Header(default=None),
+    current_user: CurrentUser = Depends(require("opsmind.incidents.read")),
+):
+    since = cursor or last_event_id or None
+    return StreamingResponse(
+        _stream_events(request, current_user.org_id, since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,10 +1,17 @@
+from itertools import islice
+from uuid import UUID
+import numpy as np
 from pydantic import BaseModel
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlmodel import Session, select
+from app.core.config import get_settings
 from app.core.security import CurrentUser, require
 from app.db.session import get_session
 from app.db.models import KGNode, KGEdge
 from app.services.audit import record_audit_event
+from app.services.cache import get_cache
+from app.services.graph_import import GraphImportError, ImportEdge, ImportNode, apply_import, plan_import
+from app.services.graph_index import GraphSnapshot, get_graph_index
 
 router = APIRouter(prefix="/opsmind/graph", tags=["graph"])
 
@@ -15,21 +22,86 @@ class KGNodeCreate(BaseModel):
     properties: dict = {}
 
 
+class KGEdgeCreate(BaseModel):
+    source_id: str
+    target_id: str
+    relation: str
+    properties: dict = {}
+
+
+def _parse_cursor(cursor: str | None, version: int) -> int | None:
+    """Offset encoded in ``cursor``; None when it was issued for another graph version."""
+    if not cursor:
+        return 0
+    cursor_version, _, offset = cursor.partition(":")
+    if cursor_version != str(version) or not offset.isdigit():
+        return None
+    return int(offset)
+
+
+def _next_cursor(version: int, offset: int, limit: int, has_more: bool) -> str | None:
+    return f"{version}:{offset + limit}" if has_more else None
+
+
+def _node_position(graph: GraphSnapshot, node_id: str) -> int | None:
+    try:
+        return graph.position(UUID(node_id))
+    except ValueError:
+        return None
+
+
+def _edge_rows(graph: GraphSnapshot, sources: np.ndarray, targets: np.ndarray, relations: np.ndarray) -> list[dict]:
+    ids = graph.nodes.ids
+    names = graph.relations.names
+    return [
+        {"source_id": str(ids[source]), "target_id": str(ids[target]), "relation": names[relation]}
+        for source, target, relation in zip(sources.tolist(), targets.tolist(), relations.tolist())
+    ]
+
+
+class GraphImportNode(BaseModel):
+    label: str
+    node_type: str
+    properties: dict = {}
+
+
+class GraphImportNodeRef(BaseModel):
+    label: str
+    node_type: str
+
+
+class GraphImportEdge(BaseModel):
+    source: GraphImportNodeRef
+    target: GraphImportNodeRef
+    relation: str
+    properties: dict = {}
+
+
+class GraphImportRequest(BaseModel):
+    nodes: list[GraphImportNode] = []
+    edges: list[GraphImportEdge] = []
+    prune: bool = False
+    dry_run: bool = False
+
+
 @router.get("/nodes")
 def list_nodes(
     session: Session = Depends(get_session),
     current_user: CurrentUser = Depends(require("opsmind.graph.read")),
 ):
-    nodes = session.exec(select(KGNode).where(KGNode.org_id == current_user.org_id)).all()
-    return [
-        {
-            "id": str(node.id),
-            "label": node.label,
-            "node_type": node.node_type,
-            "properties": node.properties,
-        }
-        for node in nodes
-    ]
+    def load():
+        nodes = session.exec(select(KGNode).where(KGNode.org_id == current_user.org_id)).all()
+        return [
+            {
+                "id": str(node.id),
+                "label": node.label,
+                "node_type": node.node_type,
+                "properties": node.properties,
+            }
+            for node in nodes
+        ]
+
+    return get_cache().get_or_load(current_user.org_id, "graph.nodes", load)
 
 
 @router.get("/edges")
@@ -37,16 +109,19 @@ def list_edges(
     session: Session = Depends(get_session),
     current_user: CurrentUser = Depends(require("opsmind.graph.read")),
 ):
-    edges = session.exec(select(KGEdge).where(KGEdge.org_id == current_user.org_id)).all()
-    return [
-        {
-            "id": str(edge.id),
-            "source_id": str(edge.source_id),
-            "target_id": str(edge.target_id),
-            "relation": edge.relation,
-        }
-        for edge in edges
-    ]
+    def load():
+        edges = session.exec(select(KGEdge).where(KGEdge.org_id == current_user.org_id)).all()
+        return [
+            {
+                "id": str(edge.id),
+                "source_id": str(edge.source_id),
+                "target_id": str(edge.target_id),
+                "relation": edge.relation,
+            }
+            for edge in edges
+        ]
+
+    return get_cache().get_or_load(current_user.org_id, "graph.edges", load)
 
 
 @router.post("/nodes")
@@ -63,6 +138,8 @@ def create_node(
     )
     session.add(node)
     session.commit()
+    get_cache().invalidate(current_user.org_id, "graph.nodes")
+    get_graph_index().add_node(current_user.org_id, node)
     record_audit_event(
         session,
         "graph.node.created",
@@ -71,3 +148,207 @@ def create_node(
         actor_user_id=current_user.id,
     )
     return {"id": str(node.id)}
+
+
+@router.post("/edges")
+def create_edge(
+    payload: KGEdgeCreate,
+    session: Session = Depends(get_session),
+    current_user: CurrentUser = Depends(require("opsmind.graph.write")),
+):
+    try:
+        endpoint_ids = {UUID(payload.source_id), UUID(payload.target_id)}
+    except ValueError:
+        return {"status": "not_found"}
+    found = session.exec(
+        select(KGNode.id)
+        .where(KGNode.org_id == current_user.org_id)
+        .where(KGNode.id.in_(endpoint_ids))
+    ).all()
+    if len(found) != len(endpoint_ids):
+        return {"status": "not_found"}
+    edge = KGEdge(
+        org_id=current_user.org_id,
+        source_id=UUID(payload.source_id),
+        target_id=UUID(payload.target_id),
+        relation=payload.relation,
+        properties=payload.properties,
+    )
+    session.add(edge)
+    session.commit()
+    get_cache().invalidate(current_user.org_id, "graph.edges")
+    get_graph_index().add_edge(current_user.org_id, edge)
+    record_audit_event(
+        session,
+        "graph.edge.created",
+        {"edge_id": str(edge.id)},
+        org_id=current_user.org_id,
+        actor_user_id=current_user.id,
+    )
+    return {"id": str(edge.id)}
+
+
+@router.get("/nodes/{node_id}/neighborhood")
+def node_neighborhood(
+    node_id: str,
+    hops: int = Query(default=1, ge=1, le=6),
+    direction: str = Query(default="both", pattern="^(out|in|both)$"),
+    relation: str | None = None,
+    node_type: str | None = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+    cursor: str | None = None,
+    session: Session = Depends(get_session),
+    current_user: CurrentUser = Depends(require("opsmind.graph.read")),
+):
+    graph = get_graph_index().snapshot(session, current_user.org_id)
+    center = _node_position(graph, node_id)
+    if center is None:
+        return {"status": "not_found"}
+    offset = _parse_cursor(cursor, graph.version)
+    if offset is None:
+        return {"status": "stale_cursor", "graph_version": graph.version}
+    positions, depth = graph.k_hop([center], hops, direction, relation)
+    if node_type is not None:
+        type_id = graph.nodes.node_types.ids.get(node_type, -1)
+        node_types = graph.nodes.types
+        types = np.array([node_types[position] for position in positions.tolist()], dtype=np.int32)
+        keep = (types == type_id) | (positions == center)
+        positions, depth = positions[keep], depth[keep]
+    inside = np.zeros(graph.node_count, dtype=bool)
+    inside[positions] = True
+    page = positions[offset : offset + limit]
+    page_depth = depth[offset : offset + limit]
+    # Each edge is reported once, on the page that holds its source node.
+    sources, targets, relations = graph.edges_from(page, relation)
+    within = inside[targets]
+    return {
+        "graph_version": graph.version,
+        "center_id": node_id,
+        "nodes": [{**graph.node(position), "depth": hop} for position, hop in zip(page.tolist(), page_depth.tolist())],
+        "edges": _edge_rows(graph, sources[within], targets[within], relations[within]),
+        "total": len(positions),
+        "next_cursor": _next_cursor(graph.version, offset, limit, offset + limit < len(positions)),
+    }
+
+
+@router.get("/paths")
+def find_paths(
+    source_id: str,
+    target_id: str,
+    mode: str = Query(default="shortest", pattern="^(shortest|all)$"),
+    max_depth: int = Query(default=4, ge=1, le=8),
+    direction: str = Query(default="out", pattern="^(out|in|both)$"),
+    relation: str | None = None,
+    limit: int = Query(default=20, ge=1, le=200),
+    cursor: str | None = None,
+    session: Session = Depends(get_session),
+    current_user: CurrentUser = Depends(require("opsmind.graph.read")),
+):
+    graph = get_graph_index().snapshot(session, current_user.org_id)
+    source, target = _node_position(graph, source_id), _node_position(graph, target_id)
+    if source is None or target is None:
+        return {"status": "not_found"}
+    offset = _parse_cursor(cursor, graph.version)
+    if offset is None:
+        return {"status": "stale_cursor", "graph_version": graph.version}
+    if mode == "shortest":
+        path = graph.shortest_path(source, target, max_depth, direction, relation)
+        paths = [path] if path is not None and offset == 0 else []
+        has_more = False
+    elif source == target:
+        paths = [[source]] if offset == 0 else []
+        has_more = False
+    else:
+        found = list(islice(graph.simple_paths(source, target, max_depth, direction, relation), offset, offset + limit + 1))
+        paths, has_more = found[:limit], len(found) > limit
+    members = sorted({position for path in paths for position in path})
+    ids = graph.nodes.ids
+    return {
+        "graph_version": graph.version,
+        "mode": mode,
+        "nodes": {str(ids[position]): graph.node(position) for position in members},
+        "paths": [[str(ids[position]) for position in path] for path in paths],
+        "next_cursor": _next_cursor(graph.version, offset, limit, has_more),
+    }
+
+
+@router.get("/subgraph")
+def extract_subgraph(
+    node_type: list[str] | None = Query(default=None),
+    relation: str | None = None,
+    limit: int = Query(default=500, ge=1, le=5000),
+    cursor: str | None = None,
+    session: Session = Depends(get_session),
+    current_user: CurrentUser = Depends(require("opsmind.graph.read")),
+):
+    graph = get_graph_index().snapshot(session, current_user.org_id)
+    offset = _parse_cursor(cursor, graph.version)
+    if offset is None:
+        return {"status": "stale_cursor", "graph_version": graph.version}
+    types = np.asarray(graph.nodes.types[: graph.node_count], dtype=np.int32)
+    if node_type:
+        wanted = [graph.nodes.node_types.ids[name] for name in node_type if name in graph.nodes.node_types.ids]
+        matches = np.isin(types, wanted)
+    else:
+        matches = np.ones(graph.node_count, dtype=bool)
+    positions = np.flatnonzero(matches).astype(np.int32)
+    page = positions[offset : offset + limit]
+    sources, targets, relations = graph.edges_from(page, relation)
+    within = matches[targets]
+    return {
+        "graph_version": graph.version,
+        "nodes": [graph.node(position) for position in page.tolist()],
+        "edges": _edge_rows(graph, sources[within], targets[within], relations[within]),
+        "total": len(positions),
+        "next_cursor": _next_cursor(graph.version, offset, limit, offset + limit < len(positions)),
+    }
+
+
+@router.post("/import")
+def import_graph(
+    payload: GraphImportRequest,
+    session: Session = Depends(get_session),
+    current_user: CurrentUser = Depends(require("opsmind.graph.admin")),
+):
+    diff = plan_import(
+        session,
+        current_user.org_id,
+        [ImportNode(node.label, node.node_type, node.properties) for node in payload.nodes],
+        [
+            ImportEdge(
+                (edge.source.label, edge.source.node_type),
+                (edge.target.label, edge.target.node_type),
+                edge.relation,
+                edge.properties,
+            )
+            for edge in payload.edges
+        ],
+        prune=payload.prune,
+    )
+    counts = diff.counts()
+    if payload.dry_run or diff.empty:
+        return {**counts, "errors": diff.errors, "batches": 0, "applied": False}
+    failure = None
+    try:
+        batches = apply_import(session, diff, get_settings().graph_import_batch_size)
+    except GraphImportError as exc:
+        batches, failure = exc.batches, exc
+    # Batches commit on their own, so even a failed import may have changed the graph.
+    get_cache().invalidate(current_user.org_id, "graph.nodes", "graph.edges")
+    get_graph_index().invalidate(current_user.org_id)
+    detail = {**counts, "prune": payload.prune, "errors": len(diff.errors), "batches": batches}
+    if failure is not None:
+        detail.update(partial=True, failure=str(failure.__cause__))
+    record_audit_event(session, "graph.imported", detail, org_id=current_user.org_id, actor_user_id=current_user.id)
+    if failure is not None:
+        raise HTTPException(status_code=500, detail={"error": str(failure), "batches": batches, "applied": "partial"})
+    return {**counts, "errors": diff.errors, "batches": batches, "applied": True}
+
+
+@router.get("/index/stats")
+def index_stats(
+    session: Session = Depends(get_session),
+    current_user: CurrentUser = Depends(require("opsmind.graph.read")),
+):
+    get_graph_index().snapshot(session, current_user.org_id)
+    return get_graph_index().stats(current_user.org_id)
@@ -1,9 +1,36 @@
-from fastapi import APIRouter, Depends
+from uuid import UUID
+from fastapi import APIRouter, Depends, Query
+from sqlmodel import Session, select
 from app.core.security import CurrentUser, require
+from app.db.session import get_session
+from app.db.models import Incident
+from app.services.impact import analyze_impact, get_impact_memo
 
 router = APIRouter(prefix="/opsmind/impact", tags=["impact"])
 
 
 @router.get("/summary")
-def impact_summary(current_user: CurrentUser = Depends(require("opsmind.impact.read"))):
-    return {"impact": "No widespread impact detected."}
+def impact_summary(
+    incident_id: str,
+    max_hops: int = Query(default=4, ge=1, le=10),
+    limit: int = Query(default=50, ge=1, le=500),
+    session: Session = Depends(get_session),
+    current_user: CurrentUser = Depends(require("opsmind.impact.read")),
+):
+    try:
+        incident_uuid = UUID(incident_id)
+    except ValueError:
+        return {"status": "not_found"}
+    incident = session.exec(
+        select(Incident)
+        .where(Incident.org_id == current_user.org_id)
+        .where(Incident.id == incident_uuid)
+    ).first()
+    if not incident:
+        return {"status": "not_found"}
+    return analyze_impact(session, current_user.org_id, incident, max_hops=max_hops, limit=limit)
+
+
+@router.get("/memo/stats")
+def memo_stats(current_user: CurrentUser = Depends(require("opsmind.impact.read"))):
+    return get_impact_memo().stats()
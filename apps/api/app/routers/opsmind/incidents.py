@@ -1,10 +1,14 @@
+from uuid import UUID
 from pydantic import BaseModel
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlmodel import Session, select
 from app.core.security import CurrentUser, require
 from app.db.session import get_session
-from app.db.models import Incident
+from app.db.models import Incident, RCAReport
 from app.services.audit import record_audit_event
+from app.services.cache import get_cache
+from app.services.events import publish_event
+from app.services.similarity import DEFAULT_MIN_SIMILARITY, get_similarity_registry
 
 router = APIRouter(prefix="/opsmind/incidents", tags=["incidents"])
 
@@ -24,17 +28,20 @@ def list_incidents(
     session: Session = Depends(get_session),
     current_user: CurrentUser = Depends(require("opsmind.incidents.read")),
 ):
-    incidents = session.exec(select(Incident).where(Incident.org_id == current_user.org_id)).all()
-    return [
-        {
-            "id": str(incident.id),
-            "title": incident.title,
-            "status": incident.status,
-            "severity": incident.severity,
-            "description": incident.description,
-        }
-        for incident in incidents
-    ]
+    def load():
+        incidents = session.exec(select(Incident).where(Incident.org_id == current_user.org_id)).all()
+        return [
+            {
+                "id": str(incident.id),
+                "title": incident.title,
+                "status": incident.status,
+                "severity": incident.severity,
+                "description": incident.description,
+            }
+            for incident in incidents
+        ]
+
+    return get_cache().get_or_load(current_user.org_id, "incidents", load)
 
 
 @router.post("/")
@@ -52,6 +59,8 @@ def create_incident(
     )
     session.add(incident)
     session.commit()
+    get_cache().invalidate(current_user.org_id, "incidents")
+    get_similarity_registry().add_incident(current_user.org_id, incident)
     record_audit_event(
         session,
         "incident.created",
@@ -59,9 +68,73 @@ def create_incident(
         org_id=current_user.org_id,
         actor_user_id=current_user.id,
     )
+    publish_event(
+        current_user.org_id,
+        "incident.created",
+        {
+            "id": str(incident.id),
+            "title": incident.title,
+            "status": incident.status,
+            "severity": incident.severity,
+            "description": incident.description,
+        },
+    )
     return {"id": str(incident.id)}
 
 
+@router.get("/{incident_id}/similar")
+def similar_incidents(
+    incident_id: str,
+    limit: int = Query(default=10, ge=1, le=100),
+    min_similarity: float = Query(default=DEFAULT_MIN_SIMILARITY, ge=0.0, le=1.0),
+    session: Session = Depends(get_session),
+    current_user: CurrentUser = Depends(require("opsmind.incidents.read")),
+):
+    try:
+        incident_uuid = UUID(incident_id)
+    except ValueError:
+        return {"status": "not_found"}
+    incident = session.exec(
+        select(Incident)
+        .where(Incident.org_id == current_user.org_id)
+        .where(Incident.id == incident_uuid)
+    ).first()
+    if not incident:
+        return {"status": "not_found"}
+    matches = get_similarity_registry().similar(session, current_user.org_id, incident, limit, min_similarity)
+    if not matches:
+        return {"incident_id": str(incident.id), "similar": []}
+    ids = [match_id for match_id, _ in matches]
+    incidents = {
+        row.id: row
+        for row in session.exec(
+            select(Incident).where(Incident.org_id == current_user.org_id).where(Incident.id.in_(ids))
+        ).all()
+    }
+    reports: dict = {}
+    for report in session.exec(
+        select(RCAReport).where(RCAReport.org_id == current_user.org_id).where(RCAReport.incident_id.in_(ids))
+    ).all():
+        reports.setdefault(report.incident_id, []).append(
+            {"id": str(report.id), "summary": report.summary, "approved": report.approved}
+        )
+    return {
+        "incident_id": str(incident.id),
+        "similar": [
+            {
+                "id": str(match_id),
+                "title": incidents[match_id].title,
+                "status": incidents[match_id].status,
+                "severity": incidents[match_id].severity,
+                "similarity": similarity,
+                "rca_reports": reports.get(match_id, []),
+            }
+            for match_id, similarity in matches
+            if match_id in incidents
+        ],
+    }
+
+
 @router.patch("/{incident_id}")
 def update_incident(
     incident_id: str,
@@ -76,14 +149,17 @@ def update_incident(
     ).first()
     if not incident:
         return {"status": "not_found"}
+    previous_status = incident.status
     incident.status = payload.status
     session.add(incident)
     session.commit()
+    get_cache().invalidate(current_user.org_id, "incidents")
     record_audit_event(
         session,
         "incident.updated",
-        {"incident_id": str(incident.id), "status": payload.status},
+        {"incident_id": str(incident.id), "status": payload.status, "previous_status": previous_status},
         org_id=current_user.org_id,
         actor_user_id=current_user.id,
     )
+    publish_event(current_user.org_id, "incident.updated", {"id": str(incident.id), "status": incident.status})
     return {"status": "updated"}
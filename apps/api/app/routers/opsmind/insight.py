@@ -1,9 +1,16 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
+from sqlmodel import Session
 from app.core.security import CurrentUser, require
+from app.db.session import get_session
+from app.services.insight import insight_highlights as build_highlights
 
 router = APIRouter(prefix="/opsmind/insight", tags=["insight"])
 
 
 @router.get("/highlights")
-def insight_highlights(current_user: CurrentUser = Depends(require("opsmind.insight.read"))):
-    return {"highlights": ["RCA automation improved MTTR by 18%"]}
+def insight_highlights(
+    days: int = Query(default=7, ge=1, le=90),
+    session: Session = Depends(get_session),
+    current_user: CurrentUser = Depends(require("opsmind.insight.read")),
+):
+    return build_highlights(session, current_user.org_id, days)
@@ -1,10 +1,13 @@
 from pydantic import BaseModel
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlmodel import Session, select
 from app.core.security import CurrentUser, require
 from app.db.session import get_session
 from app.db.models import KBDocument
 from app.services.audit import record_audit_event
+from app.services.cache import get_cache
+from app.services.retrieval import get_vector_registry, kb_source
+from app.services.search import get_search_registry
 
 router = APIRouter(prefix="/opsmind/knowledge", tags=["knowledge"])
 
@@ -19,8 +22,11 @@ def list_documents(
     session: Session = Depends(get_session),
     current_user: CurrentUser = Depends(require("opsmind.knowledge.read")),
 ):
-    docs = session.exec(select(KBDocument).where(KBDocument.org_id == current_user.org_id)).all()
-    return [{"id": str(doc.id), "title": doc.title, "content": doc.content} for doc in docs]
+    def load():
+        docs = session.exec(select(KBDocument).where(KBDocument.org_id == current_user.org_id)).all()
+        return [{"id": str(doc.id), "title": doc.title, "content": doc.content} for doc in docs]
+
+    return get_cache().get_or_load(current_user.org_id, "documents", load)
 
 
 @router.post("/documents")
@@ -32,6 +38,9 @@ def create_document(
     doc = KBDocument(org_id=current_user.org_id, title=payload.title, content=payload.content)
     session.add(doc)
     session.commit()
+    get_cache().invalidate(current_user.org_id, "documents")
+    get_search_registry().add_document(current_user.org_id, doc)
+    get_vector_registry().add(current_user.org_id, kb_source(doc))
     record_audit_event(
         session,
         "knowledge.created",
@@ -40,3 +49,13 @@ def create_document(
         actor_user_id=current_user.id,
     )
     return {"id": str(doc.id)}
+
+
+@router.get("/search")
+def search_documents(
+    q: str = Query(min_length=1, max_length=500),
+    limit: int = Query(default=10, ge=1, le=100),
+    session: Session = Depends(get_session),
+    current_user: CurrentUser = Depends(require("opsmind.knowledge.read")),
+):
+    return get_search_registry().search(session, current_user.org_id, q, limit)
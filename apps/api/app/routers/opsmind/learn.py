@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends
 from app.core.security import CurrentUser, require
+from app.routers.opsmind.chat import FeedbackRequest, record_feedback
 
 router = APIRouter(prefix="/opsmind/learn", tags=["learn"])
 
 
 @router.post("/feedback")
-def submit_feedback(current_user: CurrentUser = Depends(require("opsmind.learn.write"))):
-    return {"status": "feedback_recorded"}
+def submit_feedback(feedback: FeedbackRequest, current_user: CurrentUser = Depends(require("opsmind.learn.write"))):
+    result = record_feedback(feedback, org_id=str(current_user.org_id))
+    return {**result, "status": "feedback_recorded"}
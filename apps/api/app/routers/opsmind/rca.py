@@ -1,10 +1,13 @@
+from uuid import UUID
 from pydantic import BaseModel
 from fastapi import APIRouter, Depends
 from sqlmodel import Session, select
 from app.core.security import CurrentUser, require
 from app.db.session import get_session
-from app.db.models import RCAReport
+from app.db.models import Incident, RCAJob, RCAReport
 from app.services.audit import record_audit_event
+from app.services.cache import get_cache
+from app.services.rca import get_rca_runner, job_view
 
 router = APIRouter(prefix="/opsmind/rca", tags=["rca"])
 
@@ -18,42 +21,71 @@ def list_reports(
     session: Session = Depends(get_session),
     current_user: CurrentUser = Depends(require("opsmind.rca.read")),
 ):
-    reports = session.exec(select(RCAReport).where(RCAReport.org_id == current_user.org_id)).all()
-    return [
-        {
-            "id": str(report.id),
-            "incident_id": str(report.incident_id),
-            "summary": report.summary,
-            "evidence": report.evidence,
-            "approved": report.approved,
-        }
-        for report in reports
-    ]
+    def load():
+        reports = session.exec(select(RCAReport).where(RCAReport.org_id == current_user.org_id)).all()
+        return [
+            {
+                "id": str(report.id),
+                "incident_id": str(report.incident_id),
+                "summary": report.summary,
+                "evidence": report.evidence,
+                "approved": report.approved,
+            }
+            for report in reports
+        ]
 
+    return get_cache().get_or_load(current_user.org_id, "rca.reports", load)
 
-@router.post("/generate")
+
+@router.post("/generate", status_code=202)
 def generate_report(
     payload: RCAGenerateRequest,
     session: Session = Depends(get_session),
     current_user: CurrentUser = Depends(require("opsmind.rca.generate")),
 ):
-    report = RCAReport(
-        org_id=current_user.org_id,
-        incident_id=payload.incident_id,
-        summary="Generated RCA with citations.",
-        evidence=[{"source": "incident", "detail": "Signal correlation"}],
-        approved=False,
-    )
-    session.add(report)
+    try:
+        incident_uuid = UUID(payload.incident_id)
+    except ValueError:
+        return {"status": "not_found"}
+    incident = session.exec(
+        select(Incident)
+        .where(Incident.org_id == current_user.org_id)
+        .where(Incident.id == incident_uuid)
+    ).first()
+    if not incident:
+        return {"status": "not_found"}
+    job = RCAJob(org_id=current_user.org_id, incident_id=incident.id, requested_by=current_user.id)
+    session.add(job)
     session.commit()
     record_audit_event(
         session,
-        "rca.generated",
-        {"report_id": str(report.id)},
+        "rca.requested",
+        {"job_id": str(job.id), "incident_id": str(incident.id)},
         org_id=current_user.org_id,
         actor_user_id=current_user.id,
     )
-    return {"id": str(report.id)}
+    get_rca_runner().submit(job.id)
+    return {"job_id": str(job.id), "status": job.status}
+
+
+@router.get("/jobs/{job_id}")
+def get_job(
+    job_id: str,
+    session: Session = Depends(get_session),
+    current_user: CurrentUser = Depends(require("opsmind.rca.read")),
+):
+    try:
+        job_uuid = UUID(job_id)
+    except ValueError:
+        return {"status": "not_found"}
+    job = session.exec(
+        select(RCAJob)
+        .where(RCAJob.org_id == current_user.org_id)
+        .where(RCAJob.id == job_uuid)
+    ).first()
+    if not job:
+        return {"status": "not_found"}
+    return job_view(job)
 
 
 @router.post("/{report_id}/approve")
@@ -72,6 +104,7 @@ def approve_report(
     report.approved = True
     session.add(report)
     session.commit()
+    get_cache().invalidate(current_user.org_id, "rca.reports")
     record_audit_event(
         session,
         "rca.approved",
@@ -5,6 +5,7 @@ from app.core.security import CurrentUser, require
 from app.db.session import get_session
 from app.db.models import RemediationAction
 from app.services.audit import record_audit_event
+from app.services.events import publish_event
 
 router = APIRouter(prefix="/opsmind/remedy", tags=["remedy"])
 
@@ -37,4 +38,9 @@ def propose_remediation(
         org_id=current_user.org_id,
         actor_user_id=current_user.id,
     )
-    return {"id": str(action.id), "status": action.status}
+    publish_event(
+        current_user.org_id,
+        "remediation.proposed",
+        {"id": str(action.id), "incident_id": str(action.incident_id), "title": action.title, "status": action.status},
+    )
+    return {"id": str(action.id), "status": action.status, "version": action.version}
@@ -1,9 +1,67 @@
+from datetime import datetime, timezone
+from pydantic import BaseModel, Field
 from fastapi import APIRouter, Depends
+from sqlmodel import Session
 from app.core.security import CurrentUser, require
+from app.db.session import get_session
+from app.services.risk import ChangeProposal, get_risk_engine, risk_level
 
 router = APIRouter(prefix="/opsmind/risk", tags=["risk"])
 
 
+class RiskRequest(BaseModel):
+    service: str = Field(min_length=1, max_length=200)
+    kind: str = "deploy"
+    environment: str | None = None
+    scheduled_at: datetime | None = None
+    external_id: str | None = None
+
+
+class RiskBatchRequest(BaseModel):
+    changes: list[RiskRequest] = Field(min_length=1, max_length=1000)
+
+
+def _proposal(payload: RiskRequest) -> ChangeProposal:
+    scheduled_at = payload.scheduled_at
+    if scheduled_at is not None and scheduled_at.tzinfo is not None:
+        scheduled_at = scheduled_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return ChangeProposal(
+        service=payload.service,
+        kind=payload.kind,
+        environment=payload.environment,
+        scheduled_at=scheduled_at,
+        external_id=payload.external_id,
+    )
+
+
 @router.post("/run")
-def run_risk(current_user: CurrentUser = Depends(require("opsmind.risk.run"))):
-    return {"risk": "moderate"}
+def run_risk(
+    payload: RiskRequest,
+    current_user: CurrentUser = Depends(require("opsmind.risk.run")),
+    session: Session = Depends(get_session),
+):
+    return get_risk_engine().score(session, current_user.org_id, [_proposal(payload)])[0]
+
+
+@router.post("/run/batch")
+def run_risk_batch(
+    payload: RiskBatchRequest,
+    current_user: CurrentUser = Depends(require("opsmind.risk.run")),
+    session: Session = Depends(get_session),
+):
+    results = get_risk_engine().score(session, current_user.org_id, [_proposal(change) for change in payload.changes])
+    riskiest = max(results, key=lambda result: result["score"])
+    return {
+        "risk": risk_level(riskiest["score"]),
+        "max_score": riskiest["score"],
+        "riskiest": riskiest["change"],
+        "changes": results,
+    }
+
+
+@router.get("/features")
+def risk_features(
+    current_user: CurrentUser = Depends(require("opsmind.risk.run")),
+    session: Session = Depends(get_session),
+):
+    return get_risk_engine().store(session, current_user.org_id).stats()
@@ -1,9 +1,9 @@
-from fastapi import APIRouter, Depends
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, Header, HTTPException
+from sqlmodel import Session
 from app.core.security import CurrentUser, require
 from app.db.session import get_session
-from app.db.models import RemediationAction
-from app.services.audit import record_audit_event
+from app.services.executor import get_remediation_executor
+from app.services.remediation import BatchTransitionRequest, TransitionConflict, parse_if_match, transition_batch_once, transition_once
 
 router = APIRouter(prefix="/opsmind/rollback", tags=["rollback"])
 
@@ -13,22 +13,43 @@ def execute_rollback(
     action_id: str,
     session: Session = Depends(get_session),
     current_user: CurrentUser = Depends(require("opsmind.rollback.execute")),
+    idempotency_key: str | None = Header(default=None),
+    if_match: str | None = Header(default=None),
 ):
-    action = session.exec(
-        select(RemediationAction)
-        .where(RemediationAction.org_id == current_user.org_id)
-        .where(RemediationAction.id == action_id)
-    ).first()
-    if not action:
-        return {"status": "not_found"}
-    action.status = "rolled_back"
-    session.add(action)
-    session.commit()
-    record_audit_event(
+    try:
+        expected_version = parse_if_match(if_match)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="If-Match must be an action version") from exc
+    try:
+        result = transition_once(
+            session,
+            current_user.org_id,
+            action_id,
+            "rollback",
+            actor_user_id=current_user.id,
+            expected_version=expected_version,
+            idempotency_key=idempotency_key,
+        )
+    except TransitionConflict as exc:
+        raise HTTPException(status_code=409, detail=exc.as_dict()) from exc
+    get_remediation_executor().wake()
+    return result
+
+
+@router.post("/execute")
+def execute_rollbacks(
+    payload: BatchTransitionRequest,
+    session: Session = Depends(get_session),
+    current_user: CurrentUser = Depends(require("opsmind.rollback.execute")),
+    idempotency_key: str | None = Header(default=None),
+):
+    result = transition_batch_once(
         session,
-        "remedy.rolled_back",
-        {"action_id": action_id},
-        org_id=current_user.org_id,
+        current_user.org_id,
+        payload.action_ids,
+        "rollback",
         actor_user_id=current_user.id,
+        idempotency_key=idempotency_key,
     )
-    return {"status": "rolled_back"}
+    get_remediation_executor().wake()
+    return result
@@ -1,9 +1,44 @@
+from uuid import UUID
+from pydantic import BaseModel, Field
 from fastapi import APIRouter, Depends
+from sqlmodel import Session
 from app.core.security import CurrentUser, require
+from app.db.session import get_session
+from app.services.graph_index import get_graph_index
+from app.services.simulation import SimulationParams, get_simulator
 
 router = APIRouter(prefix="/opsmind/simulate", tags=["simulate"])
 
 
+class SimulationRequest(BaseModel):
+    node_ids: list[str] = Field(default_factory=list, max_length=100)
+    labels: list[str] = Field(default_factory=list, max_length=100)
+    trials: int = Field(default=2000, ge=1, le=100_000)
+    steps: int = Field(default=10, ge=1, le=50)
+    propagation_probability: float = Field(default=0.5, ge=0, le=1)
+    recovery_probability: float = Field(default=0.2, ge=0, le=1)
+    injection_probability: float = Field(default=1.0, ge=0, le=1)
+    relation: str = "depends_on"
+    seed: int = Field(default=0, ge=0)
+    limit: int = Field(default=20, ge=1, le=500)
+
+
 @router.post("/run")
-def run_simulation(current_user: CurrentUser = Depends(require("opsmind.simulate.run"))):
-    return {"status": "simulation_complete"}
+def run_simulation(
+    payload: SimulationRequest,
+    current_user: CurrentUser = Depends(require("opsmind.simulate.run")),
+    session: Session = Depends(get_session),
+):
+    graph = get_graph_index().snapshot(session, current_user.org_id)
+    seeds = set(graph.positions_for_labels(payload.labels))
+    for node_id in payload.node_ids:
+        try:
+            position = graph.position(UUID(node_id))
+        except ValueError:
+            continue
+        if position is not None:
+            seeds.add(position)
+    if not seeds:
+        return {"status": "not_found"}
+    params = SimulationParams(**payload.model_dump(exclude={"node_ids", "labels"}))
+    return get_simulator().run(session, current_user.org_id, sorted(seeds), params)
@@ -2,6 +2,7 @@ from typing import Optional
 from uuid import UUID
 from sqlmodel import Session
 from app.db.models import AuditEvent
+from app.services.insight import apply_audit_event, apply_audit_events
 
 
 def record_audit_event(
@@ -11,6 +12,18 @@ def record_audit_event(
     org_id: Optional[UUID] = None,
     actor_user_id: Optional[UUID] = None,
 ) -> None:
+    add_audit_event(session, event_type, detail, org_id, actor_user_id)
+    session.commit()
+
+
+def add_audit_event(
+    session: Session,
+    event_type: str,
+    detail: dict,
+    org_id: Optional[UUID] = None,
+    actor_user_id: Optional[UUID] = None,
+) -> AuditEvent:
+    """Stage an audit event in the session's transaction without committing it."""
     event = AuditEvent(
         org_id=org_id,
         actor_user_id=actor_user_id,
@@ -18,4 +31,21 @@ def record_audit_event(
         detail=detail,
     )
     session.add(event)
+    apply_audit_event(session, event)
+    return event
+
+
+def record_audit_events(
+    session: Session,
+    events: list[tuple[str, dict]],
+    org_id: Optional[UUID] = None,
+    actor_user_id: Optional[UUID] = None,
+) -> None:
+    """Record several (event_type, detail) events in one commit."""
+    rows = [
+        AuditEvent(org_id=org_id, actor_user_id=actor_user_id, event_type=event_type, detail=detail)
+        for event_type, detail in events
+    ]
+    session.add_all(rows)
+    apply_audit_events(session, rows)
     session.commit()
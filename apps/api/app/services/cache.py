@@ -0,0 +1,219 @@
+"""Per-org read-through cache for hot list endpoints.
+
+Entries are keyed by (org, resource, version, query parameters). Writes never
+delete entries; they bump the resource version so every key built afterwards
+misses and the stale entries age out of the backend on their own.
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any
+from uuid import UUID
+
+from app.core.config import get_settings
+
+
+class CacheBackend(ABC):
+    # Whether entries and versions are visible to every API worker.
+    shared = False
+
+    @abstractmethod
+    def get(self, key: str) -> tuple[float, Any] | None: ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any, cached_at: float, ttl_seconds: int) -> None: ...
+
+    @abstractmethod
+    def version(self, key: str) -> int: ...
+
+    @abstractmethod
+    def bump(self, key: str) -> int: ...
+
+    def size(self) -> int:
+        return 0
+
+
+class LRUCacheBackend(CacheBackend):
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, float, Any]] = OrderedDict()
+        self._versions: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> tuple[float, Any] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, cached_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return cached_at, value
+
+    def set(self, key: str, value: Any, cached_at: float, ttl_seconds: int) -> None:
+        with self._lock:
+            self._entries[key] = (cached_at + ttl_seconds, cached_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def version(self, key: str) -> int:
+        return self._versions.get(key, 0)
+
+    def bump(self, key: str) -> int:
+        with self._lock:
+            version = self._versions.get(key, 0) + 1
+            self._versions[key] = version
+            return version
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class RedisCacheBackend(CacheBackend):
+    """Shares entries and versions across API workers through Redis."""
+
+    shared = True
+
+    def __init__(self, redis_url: str):
+        import redis
+
+        self.redis = redis.Redis.from_url(redis_url, decode_responses=True)
+
+    def get(self, key: str) -> tuple[float, Any] | None:
+        raw = self.redis.get(key)
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        return entry["cached_at"], entry["value"]
+
+    def set(self, key: str, value: Any, cached_at: float, ttl_seconds: int) -> None:
+        self.redis.set(key, json.dumps({"cached_at": cached_at, "value": value}, default=str), ex=ttl_seconds)
+
+    def version(self, key: str) -> int:
+        return int(self.redis.get(key) or 0)
+
+    def bump(self, key: str) -> int:
+        return int(self.redis.incr(key))
+
+
+@dataclass
+class ResourceStats:
+    hits: int = 0
+    misses: int = 0
+    invalidations: int = 0
+    served_age_total: float = 0.0
+    served_age_max: float = 0.0
+
+    def as_dict(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "avg_staleness_seconds": round(self.served_age_total / self.hits, 3) if self.hits else 0.0,
+            "max_staleness_seconds": round(self.served_age_max, 3),
+        }
+
+
+class ResourceCache:
+    def __init__(self, backend: CacheBackend, ttl_seconds: int):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self._stats: dict[str, ResourceStats] = {}
+
+    def _resource_stats(self, resource: str) -> ResourceStats:
+        stats = self._stats.get(resource)
+        if stats is None:
+            stats = self._stats.setdefault(resource, ResourceStats())
+        return stats
+
+    def _version_key(self, org_id: UUID, resource: str) -> str:
+        return f"opsmind:cache:version:{org_id}:{resource}"
+
+    def _entry_key(self, org_id: UUID, resource: str, params: dict) -> str:
+        version = self.backend.version(self._version_key(org_id, resource))
+        encoded = json.dumps(params, sort_keys=True, default=str)
+        return f"opsmind:cache:{org_id}:{resource}:{version}:{encoded}"
+
+    @property
+    def shared(self) -> bool:
+        return self.backend.shared
+
+    def get_or_load(
+        self, org_id: UUID, resource: str, loader: Callable[[], Any], ttl_seconds: int | None = None, **params
+    ) -> Any:
+        """Cached ``loader()``; ``ttl_seconds`` overrides the cache-wide TTL for this entry."""
+        key = self._entry_key(org_id, resource, params)
+        stats = self._resource_stats(resource)
+        now = time.time()
+        cached = self.backend.get(key)
+        if cached is not None:
+            cached_at, value = cached
+            age = now - cached_at
+            stats.hits += 1
+            stats.served_age_total += age
+            stats.served_age_max = max(stats.served_age_max, age)
+            return value
+        stats.misses += 1
+        value = loader()
+        self.backend.set(key, value, now, self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        return value
+
+    def invalidate(self, org_id: UUID, *resources: str) -> None:
+        for resource in resources:
+            self.bump(org_id, resource)
+
+    def version(self, org_id: UUID, resource: str) -> int:
+        return self.backend.version(self._version_key(org_id, resource))
+
+    def bump(self, org_id: UUID, resource: str) -> int:
+        """Invalidate ``resource`` and return its new version."""
+        self._resource_stats(resource).invalidations += 1
+        return self.backend.bump(self._version_key(org_id, resource))
+
+    def resource_stats(self) -> dict[str, ResourceStats]:
+        return dict(self._stats)
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": self.backend.size(),
+            "resources": {name: stats.as_dict() for name, stats in sorted(self._stats.items())},
+        }
+
+
+def check_cache_backend() -> None:
+    """Refuse to start several workers on a per-process cache.
+
+    Resource versions double as the invalidation signal for the in-process
+    indexes (graph, search, retrieval, similarity, change history). With the
+    memory backend a write bumps the version only in the worker that served
+    it, so the other workers would keep serving stale results indefinitely.
+    """
+    settings = get_settings()
+    if settings.web_concurrency > 1 and not get_cache().shared:
+        raise RuntimeError(
+            f"CACHE_BACKEND={settings.cache_backend} keeps versions per process; "
+            f"set CACHE_BACKEND=redis to run WEB_CONCURRENCY={settings.web_concurrency} workers"
+        )
+
+
+@lru_cache
+def get_cache() -> ResourceCache:
+    settings = get_settings()
+    if settings.cache_backend == "redis":
+        backend: CacheBackend = RedisCacheBackend(settings.redis_url)
+    else:
+        backend = LRUCacheBackend(settings.cache_max_entries)
+    return ResourceCache(backend, settings.cache_ttl_seconds)
@@ -0,0 +1,215 @@
+"""Per-org interval index over change records and suspected changes.
+
+Every change is an interval [started_at, ended_at] (a point when it has no
+end). Intervals are filed under four keys, (service, environment),
+(service, any), (any, environment) and (any, any), so every combination of
+filters is a single group lookup. A group keeps its intervals in
+start-sorted lists: a window query bisects to the starts that can still
+overlap the window, given the longest interval in the group, and checks
+only those ends. The rare changes longer than ``LONG_CHANGE_SECONDS`` sit in
+a separate list so one week-long maintenance window does not widen every
+query. New changes are inserted in place, so the index is maintained
+incrementally from the change feed.
+"""
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from uuid import UUID
+
+from sqlmodel import Session, select
+
+from app.db.models import ChangeRecord, IncidentSuspectedChange
+from app.services.cache import get_cache
+
+EPOCH = datetime(1970, 1, 1)
+LONG_CHANGE_SECONDS = 86_400.0
+SOURCE_RECORDS = "records"
+SOURCE_SUSPECTED = "suspected"
+
+
+def _seconds(moment: datetime) -> float:
+    return (moment - EPOCH).total_seconds()
+
+
+class IntervalGroup:
+    """Intervals sorted by start, with the few very long ones kept aside."""
+
+    def __init__(self):
+        self.starts: list[float] = []
+        self.ends: list[float] = []
+        self.positions: list[int] = []
+        self.longest = 0.0
+        self.long: list[tuple[float, float, int]] = []
+
+    def __len__(self) -> int:
+        return len(self.positions) + len(self.long)
+
+    def add(self, start: float, end: float, position: int) -> None:
+        if end - start > LONG_CHANGE_SECONDS:
+            self.long.append((start, end, position))
+            return
+        at = bisect_right(self.starts, start)
+        self.starts.insert(at, start)
+        self.ends.insert(at, end)
+        self.positions.insert(at, position)
+        self.longest = max(self.longest, end - start)
+
+    def overlapping(self, start: float, end: float) -> list[int]:
+        """Positions whose interval intersects [start, end]."""
+        low = bisect_left(self.starts, start - self.longest)
+        high = bisect_right(self.starts, end)
+        found = [self.positions[i] for i in range(low, high) if self.ends[i] >= start]
+        if self.long:
+            found.extend(position for first, last, position in self.long if first <= end and last >= start)
+        return found
+
+
+@dataclass
+class IndexedChange:
+    start: float
+    end: float
+    view: dict
+
+
+def record_view(record: ChangeRecord) -> dict:
+    return {
+        "id": str(record.id),
+        "external_id": record.external_id,
+        "source": record.source,
+        "kind": record.kind,
+        "service": record.service,
+        "environment": record.environment,
+        "summary": record.summary,
+        "started_at": record.started_at.isoformat(),
+        "ended_at": record.ended_at.isoformat() if record.ended_at else None,
+        "incident_id": None,
+    }
+
+
+def suspected_view(change: IncidentSuspectedChange) -> dict:
+    return {
+        "id": str(change.id),
+        "external_id": change.reference,
+        "source": change.source,
+        "kind": "suspected",
+        "service": None,
+        "environment": None,
+        "summary": change.reference,
+        "started_at": change.created_at.isoformat(),
+        "ended_at": None,
+        "incident_id": str(change.incident_id),
+    }
+
+
+class ChangeIndex:
+    def __init__(self):
+        self.changes: list[IndexedChange] = []
+        self.groups: dict[tuple[str | None, str | None], IntervalGroup] = {}
+        self.seen: set[tuple[str, UUID]] = set()
+        self.high_water: dict[str, datetime] = {}
+        self.source_version = -1
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.changes)
+
+    def add(self, source: str, change_id: UUID, created_at: datetime, view: dict, start: datetime, end: datetime | None) -> bool:
+        with self._lock:
+            current = self.high_water.get(source)
+            if current is None or created_at > current:
+                self.high_water[source] = created_at
+            if (source, change_id) in self.seen:
+                return False
+            self.seen.add((source, change_id))
+            first = _seconds(start)
+            last = max(_seconds(end), first) if end else first
+            position = len(self.changes)
+            self.changes.append(IndexedChange(first, last, view))
+            service, environment = view["service"], view["environment"]
+            for key in {(service, environment), (service, None), (None, environment), (None, None)}:
+                group = self.groups.get(key)
+                if group is None:
+                    group = self.groups[key] = IntervalGroup()
+                group.add(first, last, position)
+            return True
+
+    # Inserting in start order turns every sorted-list insert into an append.
+    def add_records(self, records: Iterable[ChangeRecord]) -> int:
+        return sum(
+            self.add(SOURCE_RECORDS, record.id, record.created_at, record_view(record), record.started_at, record.ended_at)
+            for record in sorted(records, key=lambda record: record.started_at)
+        )
+
+    def add_suspected(self, changes: Iterable[IncidentSuspectedChange]) -> int:
+        return sum(
+            self.add(SOURCE_SUSPECTED, change.id, change.created_at, suspected_view(change), change.created_at, None)
+            for change in sorted(changes, key=lambda change: change.created_at)
+        )
+
+    def window(
+        self,
+        start: datetime,
+        end: datetime,
+        service: str | None = None,
+        environment: str | None = None,
+        limit: int | None = None,
+    ) -> list[dict]:
+        """Changes overlapping [start, end], oldest first; with ``limit``, the latest ``limit`` of them."""
+        with self._lock:
+            group = self.groups.get((service, environment))
+            if group is None:
+                return []
+            positions = group.overlapping(_seconds(start), _seconds(end))
+            positions.sort(key=lambda position: self.changes[position].start)
+            if limit is not None:
+                positions = positions[-limit:] if limit else []
+            return [self.changes[position].view for position in positions]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "changes": len(self.changes),
+                "groups": len(self.groups),
+                "long_changes": len(self.groups[(None, None)].long) if (None, None) in self.groups else 0,
+            }
+
+
+class ChangeIndexRegistry:
+    def __init__(self):
+        self._indexes: dict[UUID, ChangeIndex] = {}
+        self._lock = threading.Lock()
+
+    def index(self, session: Session, org_id: UUID) -> ChangeIndex:
+        """The org's index, built on first use and caught up with changes stored since."""
+        version = get_cache().version(org_id, "changes")
+        index = self._indexes.get(org_id)
+        if index is not None and index.source_version == version:
+            return index
+        with self._lock:
+            index = self._indexes.get(org_id) or ChangeIndex()
+            records = select(ChangeRecord).where(ChangeRecord.org_id == org_id)
+            if SOURCE_RECORDS in index.high_water:
+                records = records.where(ChangeRecord.created_at >= index.high_water[SOURCE_RECORDS])
+            index.add_records(session.exec(records).all())
+            suspected = select(IncidentSuspectedChange).where(IncidentSuspectedChange.org_id == org_id)
+            if SOURCE_SUSPECTED in index.high_water:
+                suspected = suspected.where(IncidentSuspectedChange.created_at >= index.high_water[SOURCE_SUSPECTED])
+            index.add_suspected(session.exec(suspected).all())
+            index.source_version = version
+            self._indexes[org_id] = index
+        return index
+
+    def add_records(self, org_id: UUID, records: Iterable[ChangeRecord]) -> None:
+        index = self._indexes.get(org_id)
+        if index is not None:
+            index.add_records(records)
+
+
+@lru_cache
+def get_change_index_registry() -> ChangeIndexRegistry:
+    return ChangeIndexRegistry()
@@ -0,0 +1,354 @@
+"""Time-bucketed correlation of an incident against the org's other activity.
+
+Signals and change events inside the incident's window are binned into a
+(series x bucket) count matrix. Each candidate row is scored against the
+incident's own activity with lagged Pearson correlation, computed as one
+matmul against shifted copies of the reference, and a co-occurrence ratio.
+Services that the knowledge graph places more than ``hops`` away from the
+incident are pruned before any scoring happens.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from uuid import UUID
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from app.db.models import Incident, IncidentSignal
+from app.services.change_index import get_change_index_registry
+from app.services.dedup import error_signature
+from app.services.graph_index import get_graph_index
+from app.services.impact import incident_services
+
+CORRELATION_WEIGHT = 0.6
+# Each hop away from the incident's services scales a candidate's score by this factor.
+PROXIMITY_DECAY = 0.75
+# Candidates whose service is not in the graph can be neither pruned nor placed.
+UNMAPPED_PROXIMITY = 0.5
+
+
+@dataclass(frozen=True)
+class CorrelationParams:
+    lookback_minutes: int = 1440
+    lookahead_minutes: int = 60
+    bucket_seconds: int = 60
+    max_lag_buckets: int = 15
+    top_k: int = 20
+    hops: int = 2
+
+
+@dataclass(frozen=True)
+class BucketWindow:
+    start: datetime
+    bucket_seconds: int
+    buckets: int
+
+    @property
+    def end(self) -> datetime:
+        return self.start + timedelta(seconds=self.bucket_seconds * self.buckets)
+
+    def bucket_of(self, moments: list[datetime]) -> np.ndarray:
+        offsets = (np.array(moments, dtype="datetime64[s]") - np.datetime64(self.start, "s")).astype(np.int64)
+        return np.clip(offsets // self.bucket_seconds, 0, self.buckets - 1)
+
+
+@dataclass
+class LagScores:
+    score: np.ndarray
+    correlation: np.ndarray
+    lag: np.ndarray
+    co_occurrence: np.ndarray
+
+
+def bucketize(
+    series_index: np.ndarray,
+    first_bucket: np.ndarray,
+    last_bucket: np.ndarray,
+    weights: np.ndarray,
+    n_series: int,
+    buckets: int,
+) -> np.ndarray:
+    """Spread each row's weight evenly over its [first, last] bucket range.
+
+    Rows are written into a difference array with two bincounts and
+    integrated with one cumsum, so the cost is linear in rows plus cells.
+    """
+    width = buckets + 1
+    share = weights / (last_bucket - first_bucket + 1)
+    size = n_series * width
+    diff = np.bincount(series_index * width + first_bucket, share, minlength=size)
+    diff -= np.bincount(series_index * width + last_bucket + 1, share, minlength=size)
+    return np.cumsum(diff.reshape(n_series, width)[:, :buckets], axis=1).astype(np.float32)
+
+
+def lagged_scores(matrix: np.ndarray, reference: np.ndarray, max_lag: int, leads_only: np.ndarray) -> LagScores:
+    """Score every row of ``matrix`` against ``reference`` over lags in [-max_lag, max_lag].
+
+    A positive lag means the candidate moves that many buckets before the
+    reference. Rows flagged in ``leads_only`` (changes) only consider lags >= 0.
+    """
+    n_series, buckets = matrix.shape
+    lags = np.arange(-max_lag, max_lag + 1)
+    empty = np.zeros(n_series, dtype=np.float32)
+    ref_std = reference.std()
+    if n_series == 0 or ref_std == 0:
+        return LagScores(empty, empty, np.zeros(n_series, dtype=np.int64), empty)
+
+    standardized = ((reference - reference.mean()) / ref_std).astype(np.float32)
+    # shifted[j, t] == standardized[t + lags[j]], zero outside the window.
+    shifted = sliding_window_view(np.pad(standardized, max_lag), buckets)
+    row_mean = matrix.mean(axis=1, dtype=np.float64)
+    row_std = matrix.std(axis=1, dtype=np.float64)
+    cross = (matrix @ shifted.T).astype(np.float64)
+    cross -= row_mean[:, None] * shifted.sum(axis=1, dtype=np.float64)[None, :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        correlation = np.where(row_std[:, None] > 0, cross / (row_std[:, None] * buckets), 0.0)
+    correlation[np.ix_(leads_only, lags < 0)] = -np.inf
+    best = correlation.argmax(axis=1)
+    best_correlation = np.clip(correlation[np.arange(n_series), best], 0.0, 1.0)
+
+    # Co-occurrence: share of a candidate's active buckets within max_lag of reference activity.
+    near_reference = sliding_window_view(np.pad(reference > 0, max_lag), 2 * max_lag + 1).any(axis=1)
+    active = matrix > 0
+    active_count = active.sum(axis=1)
+    overlap = np.count_nonzero(active & near_reference, axis=1)
+    co_occurrence = np.where(active_count > 0, overlap / np.maximum(active_count, 1), 0.0)
+
+    score = CORRELATION_WEIGHT * best_correlation + (1 - CORRELATION_WEIGHT) * co_occurrence
+    return LagScores(
+        score=score.astype(np.float32),
+        correlation=best_correlation.astype(np.float32),
+        lag=lags[best],
+        co_occurrence=co_occurrence.astype(np.float32),
+    )
+
+
+def top_indices(score: np.ndarray, k: int) -> np.ndarray:
+    if score.size <= k:
+        return np.argsort(-score, kind="stable")
+    candidates = np.argpartition(-score, k)[:k]
+    return candidates[np.argsort(-score[candidates], kind="stable")]
+
+
+def service_distances(session: Session, org_id: UUID, services: set[str], hops: int) -> tuple[dict[str, int], set[str]] | None:
+    """Hop distance from the incident's services to every service label within ``hops``.
+
+    Edges are walked in both directions. Returns None when none of the
+    services appear in the graph, in which case nothing can be pruned.
+    """
+    graph = get_graph_index().snapshot(session, org_id)
+    seeds = graph.positions_for_labels(services)
+    if not seeds:
+        return None
+    positions, depth = graph.k_hop(seeds, hops, direction="both")
+    labels = graph.nodes.labels
+    by_label: dict[str, int] = {}
+    for position, hop in zip(positions.tolist(), depth.tolist()):
+        by_label.setdefault(labels[position], hop)
+    return by_label, set(labels[: graph.node_count])
+
+
+def _proximity(service: str | None, graph: tuple[dict[str, int], set[str]] | None) -> float | None:
+    """Score multiplier for a service; None means the graph rules it out."""
+    if graph is None or not service or service not in graph[1]:
+        return UNMAPPED_PROXIMITY
+    distances, _ = graph
+    if service not in distances:
+        return None
+    return PROXIMITY_DECAY ** distances[service]
+
+
+def _signal_rows(session: Session, org_id: UUID, window: BucketWindow):
+    first = func.coalesce(IncidentSignal.first_seen_at, IncidentSignal.observed_at, IncidentSignal.created_at)
+    last = func.coalesce(IncidentSignal.last_seen_at, IncidentSignal.observed_at, IncidentSignal.created_at)
+    return session.exec(
+        select(
+            IncidentSignal.id,
+            IncidentSignal.incident_id,
+            IncidentSignal.type,
+            IncidentSignal.service,
+            IncidentSignal.dedup_key,
+            IncidentSignal.occurrences,
+            first,
+            last,
+        )
+        .where(IncidentSignal.org_id == org_id)
+        .where(last >= window.start)
+        .where(first <= window.end)
+    ).all()
+
+
+def correlate_incident(session: Session, org_id: UUID, incident: Incident, params: CorrelationParams) -> dict:
+    """Rank the signal series and changes whose activity lines up with ``incident``."""
+    own_first = session.exec(
+        select(func.min(func.coalesce(IncidentSignal.first_seen_at, IncidentSignal.observed_at, IncidentSignal.created_at)))
+        .where(IncidentSignal.org_id == org_id)
+        .where(IncidentSignal.incident_id == incident.id)
+    ).one()
+    anchor = min(incident.created_at, own_first) if own_first else incident.created_at
+    window = BucketWindow(
+        start=anchor - timedelta(minutes=params.lookback_minutes),
+        bucket_seconds=params.bucket_seconds,
+        buckets=max((params.lookback_minutes + params.lookahead_minutes) * 60 // params.bucket_seconds, 1),
+    )
+
+    rows = _signal_rows(session, org_id, window)
+    own_rows = [row for row in rows if row[1] == incident.id]
+    services = incident_services(session, org_id, incident, get_graph_index().snapshot(session, org_id))
+    graph = service_distances(session, org_id, services, params.hops) if services else None
+
+    # Reference activity: the incident's own signals, or a single pulse at its start.
+    if own_rows:
+        reference = bucketize(
+            np.zeros(len(own_rows), dtype=np.int64),
+            window.bucket_of([row[6] for row in own_rows]),
+            window.bucket_of([row[7] for row in own_rows]),
+            np.array([row[5] for row in own_rows], dtype=np.float64),
+            1,
+            window.buckets,
+        )[0]
+    else:
+        reference = np.zeros(window.buckets, dtype=np.float32)
+        reference[window.bucket_of([anchor])[0]] = 1.0
+
+    series: dict[str, int] = {}
+    meta: list[dict] = []
+    row_series, row_first, row_last, row_weight = [], [], [], []
+    pruned = 0
+    for signal_id, incident_id, signal_type, service, key, occurrences, first_seen, last_seen in rows:
+        if incident_id == incident.id:
+            continue
+        series_key = key or f"{signal_type}|{service or ''}|{incident_id}"
+        index = series.get(series_key)
+        if index is None:
+            proximity = _proximity(service, graph)
+            if proximity is None:
+                series[series_key] = -1
+                pruned += 1
+                continue
+            index = series[series_key] = len(meta)
+            meta.append(
+                {
+                    "kind": "signal",
+                    "key": series_key,
+                    "signal_id": signal_id,
+                    "incident_id": incident_id,
+                    "type": signal_type,
+                    "service": service,
+                    "proximity": proximity,
+                    "occurrences": 0,
+                }
+            )
+        elif index < 0:
+            continue
+        meta[index]["occurrences"] += occurrences
+        row_series.append(index)
+        row_first.append(first_seen)
+        row_last.append(last_seen)
+        row_weight.append(occurrences)
+
+    for change in get_change_index_registry().index(session, org_id).window(window.start, window.end):
+        if change["kind"] == "suspected":
+            proximity = 1.0 if change["incident_id"] == str(incident.id) else UNMAPPED_PROXIMITY
+        else:
+            proximity = _proximity(change["service"], graph)
+            if proximity is None:
+                pruned += 1
+                continue
+        started = datetime.fromisoformat(change["started_at"])
+        row_series.append(len(meta))
+        row_first.append(started)
+        row_last.append(datetime.fromisoformat(change["ended_at"]) if change["ended_at"] else started)
+        row_weight.append(1)
+        meta.append(
+            {
+                "kind": "change",
+                "id": change["id"] if change["kind"] == "suspected" else change["external_id"],
+                "source": change["source"],
+                "reference": change["summary"],
+                "at": started,
+                "proximity": proximity,
+            }
+        )
+
+    matrix = bucketize(
+        np.array(row_series, dtype=np.int64),
+        window.bucket_of(row_first) if row_first else np.zeros(0, dtype=np.int64),
+        window.bucket_of(row_last) if row_last else np.zeros(0, dtype=np.int64),
+        np.array(row_weight, dtype=np.float64),
+        len(meta),
+        window.buckets,
+    )
+    is_change = np.array([item["kind"] == "change" for item in meta], dtype=bool)
+    scores = lagged_scores(matrix, reference, params.max_lag_buckets, is_change)
+    proximity = np.array([item["proximity"] for item in meta], dtype=np.float32)
+    ranked = scores.score * proximity
+
+    def describe(indices: np.ndarray) -> list[dict]:
+        return [
+            {
+                "score": round(float(ranked[i]), 4),
+                "correlation": round(float(scores.correlation[i]), 4),
+                "co_occurrence": round(float(scores.co_occurrence[i]), 4),
+                "lead_seconds": int(scores.lag[i]) * window.bucket_seconds,
+                "proximity": round(float(proximity[i]), 4),
+                "index": int(i),
+            }
+            for i in indices
+            if ranked[i] > 0
+        ]
+
+    signal_rows = np.flatnonzero(~is_change)
+    change_rows = np.flatnonzero(is_change)
+    top_signals = describe(signal_rows[top_indices(ranked[signal_rows], params.top_k)])
+    top_changes = describe(change_rows[top_indices(ranked[change_rows], params.top_k)])
+
+    payloads = {}
+    if top_signals:
+        wanted = [meta[item["index"]]["signal_id"] for item in top_signals]
+        payloads = dict(
+            session.exec(select(IncidentSignal.id, IncidentSignal.payload).where(IncidentSignal.id.in_(wanted))).all()
+        )
+    signals = []
+    for item in top_signals:
+        info = meta[item.pop("index")]
+        signals.append(
+            {
+                "series": info["key"],
+                "type": info["type"],
+                "service": info["service"],
+                "signature": error_signature(payloads.get(info["signal_id"]) or {}),
+                "incident_id": str(info["incident_id"]),
+                "occurrences": info["occurrences"],
+                **item,
+            }
+        )
+    changes = []
+    for item in top_changes:
+        info = meta[item.pop("index")]
+        changes.append(
+            {
+                "id": info["id"],
+                "source": info["source"],
+                "reference": info["reference"],
+                "at": info["at"].isoformat(),
+                **item,
+            }
+        )
+    return {
+        "incident_id": str(incident.id),
+        "window": {
+            "start": window.start.isoformat(),
+            "end": window.end.isoformat(),
+            "bucket_seconds": window.bucket_seconds,
+            "buckets": window.buckets,
+        },
+        "services": sorted(services),
+        "candidates": {"series": int((~is_change).sum()), "changes": int(is_change.sum()), "pruned": pruned},
+        "signals": signals,
+        "changes": changes,
+    }
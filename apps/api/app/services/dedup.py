@@ -0,0 +1,129 @@
+"""Fingerprint-based collapsing of repeated signals during alert storms.
+
+Signals with the same service, type and normalized error signature share a
+dedup key. While a key is live (seen within the dedup window) further
+occurrences only bump counters on the existing IncidentSignal row instead of
+inserting new rows or opening new incidents.
+
+The deduplicator only mirrors what has been committed: the ingestion writer
+updates it after a batch's transaction succeeds, so a failed batch that is
+retried is neither dropped as already seen nor counted twice.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from uuid import UUID
+
+from app.core.config import get_settings
+
+_VOLATILE_PATTERNS = [
+    (re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"), "<uuid>"),
+    (re.compile(r"\b0x[0-9a-f]+\b|\b[0-9a-f]{12,}\b"), "<hex>"),
+    (re.compile(r"\b\d+(\.\d+)?\b"), "<n>"),
+    (re.compile(r"'[^']*'|\"[^\"]*\""), "<str>"),
+    (re.compile(r"\s+"), " "),
+]
+SIGNATURE_FIELDS = ("error", "message", "msg", "metric", "name", "span")
+MAX_SIGNATURE_LENGTH = 200
+
+
+def error_signature(payload: dict) -> str:
+    """Collapse ids, numbers and quoted values so near-identical messages match."""
+    text = next((str(payload[key]) for key in SIGNATURE_FIELDS if payload.get(key)), "")
+    text = text.lower()
+    for pattern, replacement in _VOLATILE_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text.strip()[:MAX_SIGNATURE_LENGTH]
+
+
+def dedup_key(service: str | None, signal_type: str, signature: str) -> str:
+    return hashlib.sha1(f"{service or ''}|{signal_type}|{signature}".encode()).hexdigest()
+
+
+@dataclass
+class DedupEntry:
+    org_id: UUID
+    key: str
+    signal_id: UUID
+    incident_id: UUID
+    occurrences: int
+    first_seen: datetime
+    last_seen: datetime
+    touched_at: float
+
+
+class SignalDeduplicator:
+    def __init__(self, max_entries: int, window_seconds: float, max_fingerprints: int):
+        self.max_entries = max_entries
+        self.window_seconds = window_seconds
+        self.max_fingerprints = max_fingerprints
+        self._entries: OrderedDict[tuple[UUID, str], DedupEntry] = OrderedDict()
+        self._fingerprints: OrderedDict[tuple[UUID, str], None] = OrderedDict()
+        self._lock = threading.Lock()
+        self.collapsed = 0
+
+    def seen_fingerprint(self, org_id: UUID, fingerprint: str) -> bool:
+        """True if a committed batch already carried this event fingerprint."""
+        key = (org_id, fingerprint)
+        with self._lock:
+            if key in self._fingerprints:
+                self._fingerprints.move_to_end(key)
+                return True
+            return False
+
+    def remember_fingerprints(self, org_id: UUID, fingerprints: Iterable[str]) -> None:
+        with self._lock:
+            for fingerprint in fingerprints:
+                self._fingerprints[(org_id, fingerprint)] = None
+                self._fingerprints.move_to_end((org_id, fingerprint))
+            while len(self._fingerprints) > self.max_fingerprints:
+                self._fingerprints.popitem(last=False)
+
+    def lookup(self, org_id: UUID, key: str) -> DedupEntry | None:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get((org_id, key))
+            if entry is None:
+                return None
+            if now - entry.touched_at > self.window_seconds:
+                del self._entries[(org_id, key)]
+                return None
+            self._entries.move_to_end((org_id, key))
+            return entry
+
+    def collapse(self, entry: DedupEntry, count: int, last_seen: datetime) -> None:
+        """Fold ``count`` committed occurrences into a live entry."""
+        with self._lock:
+            entry.occurrences += count
+            entry.last_seen = max(entry.last_seen, last_seen)
+            entry.touched_at = time.time()
+            self.collapsed += count
+
+    def register(self, entry: DedupEntry) -> None:
+        with self._lock:
+            self._entries[(entry.org_id, entry.key)] = entry
+            self._entries.move_to_end((entry.org_id, entry.key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"live_keys": len(self._entries), "collapsed": self.collapsed}
+
+
+@lru_cache
+def get_deduplicator() -> SignalDeduplicator:
+    settings = get_settings()
+    return SignalDeduplicator(
+        max_entries=settings.dedup_max_entries,
+        window_seconds=settings.dedup_window_seconds,
+        max_fingerprints=settings.dedup_max_fingerprints,
+    )
@@ -0,0 +1,305 @@
+"""Vectorized streaming anomaly detection over metric series.
+
+Every org owns a SeriesStore: one row per series in fixed-size NumPy ring
+buffers, so memory is bounded by ``max_series * retention`` points. Each
+ingest call scores a batch of points for many series at once against the
+rolling mean/std, an EWMA, a MAD-based robust z-score and a per-slot
+seasonal baseline, then folds the points into the state.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from functools import lru_cache
+from uuid import UUID
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.services.ingestion import SignalEvent, event_fingerprint
+
+MAD_SCALE = 0.6745
+# Score reported when a flat baseline (zero spread) sees a different value.
+MAX_SCORE = 1e6
+
+
+@dataclass(frozen=True)
+class DetectionConfig:
+    retention: int = 240
+    max_series: int = 50_000
+    min_points: int = 30
+    z_threshold: float = 4.0
+    mad_threshold: float = 5.0
+    ewma_alpha: float = 0.1
+    season_slots: int = 24
+    season_slot_seconds: int = 3600
+    season_alpha: float = 0.05
+    robust_refresh_points: int = 8
+
+
+@dataclass
+class Anomaly:
+    series: str
+    value: float
+    timestamp: float
+    zscore: float
+    mad_zscore: float
+    ewma: float
+    seasonal_zscore: float | None
+
+    def as_dict(self) -> dict:
+        return {
+            "series": self.series,
+            "value": self.value,
+            "timestamp": self.timestamp,
+            "zscore": round(self.zscore, 3),
+            "mad_zscore": round(self.mad_zscore, 3),
+            "ewma": round(self.ewma, 6),
+            "seasonal_zscore": None if self.seasonal_zscore is None else round(self.seasonal_zscore, 3),
+        }
+
+
+ARRAY_FIELDS = ("values", "counts", "sums", "sumsq", "ewma", "median", "mad", "season_mean", "season_var", "season_seen")
+
+
+def _scaled(deviation: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    safe = np.where(scale > 0, scale, 1.0)
+    flat = np.where(np.abs(deviation) > 1e-9, np.sign(deviation) * MAX_SCORE, 0.0)
+    return np.clip(np.where(scale > 0, deviation / safe, flat), -MAX_SCORE, MAX_SCORE)
+
+
+class SeriesStore:
+    def __init__(self, config: DetectionConfig, initial_capacity: int = 1024):
+        self.config = config
+        self.index: dict[str, int] = {}
+        self.names: list[str] = []
+        self.dropped_series = 0
+        self._allocate(min(initial_capacity, config.max_series))
+
+    def _allocate(self, capacity: int) -> None:
+        cfg = self.config
+        self.capacity = capacity
+        self.values = np.full((capacity, cfg.retention), np.nan, dtype=np.float32)
+        self.counts = np.zeros(capacity, dtype=np.int64)
+        self.sums = np.zeros(capacity, dtype=np.float64)
+        self.sumsq = np.zeros(capacity, dtype=np.float64)
+        self.ewma = np.zeros(capacity, dtype=np.float64)
+        self.median = np.zeros(capacity, dtype=np.float32)
+        self.mad = np.zeros(capacity, dtype=np.float32)
+        self.season_mean = np.zeros((capacity, cfg.season_slots), dtype=np.float32)
+        self.season_var = np.zeros((capacity, cfg.season_slots), dtype=np.float32)
+        self.season_seen = np.zeros((capacity, cfg.season_slots), dtype=np.int32)
+
+    def _grow(self, needed: int) -> None:
+        old = {name: getattr(self, name) for name in ARRAY_FIELDS}
+        old_capacity = self.capacity
+        capacity = old_capacity
+        while capacity < needed:
+            capacity *= 2
+        self._allocate(min(capacity, self.config.max_series))
+        for name, array in old.items():
+            getattr(self, name)[:old_capacity] = array
+
+    def rows_for(self, names: list[str]) -> np.ndarray:
+        """Map series names to buffer rows; -1 marks series refused by the max_series bound."""
+        rows = np.empty(len(names), dtype=np.int64)
+        for i, name in enumerate(names):
+            row = self.index.get(name)
+            if row is None:
+                if len(self.names) >= self.config.max_series:
+                    self.dropped_series += 1
+                    rows[i] = -1
+                    continue
+                row = len(self.names)
+                if row >= self.capacity:
+                    self._grow(row + 1)
+                self.index[name] = row
+                self.names.append(name)
+            rows[i] = row
+        return rows
+
+    def memory_bytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in ARRAY_FIELDS)
+
+
+class DetectionEngine:
+    def __init__(self, config: DetectionConfig):
+        self.config = config
+        self._stores: dict[UUID, SeriesStore] = {}
+        self._lock = threading.Lock()
+        self.points_scored = 0
+
+    def store(self, org_id: UUID) -> SeriesStore:
+        store = self._stores.get(org_id)
+        if store is None:
+            store = self._stores.setdefault(org_id, SeriesStore(self.config))
+        return store
+
+    def ingest(
+        self,
+        org_id: UUID,
+        names: list[str],
+        values: np.ndarray,
+        timestamps: np.ndarray | None = None,
+    ) -> list[Anomaly]:
+        # Round through float32 first so running sums match what the ring buffer stores.
+        values = np.asarray(values, dtype=np.float32).astype(np.float64)
+        if timestamps is None:
+            timestamps = np.full(len(values), time.time())
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        with self._lock:
+            store = self.store(org_id)
+            rows = store.rows_for(names)
+            keep = rows >= 0
+            rows, values, timestamps = rows[keep], values[keep], timestamps[keep]
+            kept_names = [name for name, ok in zip(names, keep) if ok]
+            anomalies: list[Anomaly] = []
+            # A series may appear several times in one batch; process one point per series per round.
+            remaining = np.arange(len(rows))
+            while remaining.size:
+                _, first = np.unique(rows[remaining], return_index=True)
+                batch = remaining[first]
+                anomalies.extend(self._score_and_update(store, rows[batch], values[batch], timestamps[batch], [kept_names[i] for i in batch]))
+                remaining = np.delete(remaining, first)
+            self.points_scored += len(rows)
+            return anomalies
+
+    def _score_and_update(
+        self,
+        store: SeriesStore,
+        rows: np.ndarray,
+        values: np.ndarray,
+        timestamps: np.ndarray,
+        names: list[str],
+    ) -> list[Anomaly]:
+        cfg = self.config
+        counts = store.counts[rows]
+        filled = np.minimum(counts, cfg.retention).astype(np.float64)
+        safe_filled = np.maximum(filled, 1.0)
+
+        # Rolling mean/std from running sums over the ring buffer.
+        mean = store.sums[rows] / safe_filled
+        variance = np.maximum(store.sumsq[rows] / safe_filled - mean * mean, 0.0)
+        std = np.sqrt(variance)
+        zscore = _scaled(values - mean, std)
+
+        # Robust z-score against the median absolute deviation of the window. The
+        # median/MAD pair is the expensive part, so each series refreshes it every
+        # robust_refresh_points points, staggered by row so the work spreads out.
+        ready = counts >= cfg.min_points
+        refresh = ready & ((counts + rows) % cfg.robust_refresh_points == 0)
+        refresh |= ready & (store.mad[rows] == 0) & (counts < cfg.retention)
+        self._refresh_robust(store, rows[refresh], counts[refresh] >= cfg.retention)
+        median = store.median[rows].astype(np.float64)
+        mad = store.mad[rows].astype(np.float64)
+        mad_zscore = _scaled(values - median, mad / MAD_SCALE)
+
+        # Seasonal baseline: EWMA mean/variance per time-of-period slot.
+        slots = (timestamps // cfg.season_slot_seconds).astype(np.int64) % cfg.season_slots
+        season_mean = store.season_mean[rows, slots].astype(np.float64)
+        season_var = store.season_var[rows, slots].astype(np.float64)
+        season_ready = store.season_seen[rows, slots] >= 3
+        season_std = np.sqrt(season_var)
+        seasonal_z = np.where(season_ready, _scaled(values - season_mean, season_std), 0.0)
+
+        breach = (
+            ready
+            & (np.abs(zscore) >= cfg.z_threshold)
+            & (np.abs(mad_zscore) >= cfg.mad_threshold)
+            & (~season_ready | (np.abs(seasonal_z) >= cfg.z_threshold))
+        )
+
+        # Fold the new points into the state.
+        positions = counts % cfg.retention
+        evicted = store.values[rows, positions].astype(np.float64)
+        evicted = np.where(counts >= cfg.retention, evicted, 0.0)
+        store.sums[rows] += values - evicted
+        store.sumsq[rows] += values * values - evicted * evicted
+        store.values[rows, positions] = values
+        store.counts[rows] = counts + 1
+        ewma = np.where(counts == 0, values, cfg.ewma_alpha * values + (1 - cfg.ewma_alpha) * store.ewma[rows])
+        store.ewma[rows] = ewma
+        seen = store.season_seen[rows, slots]
+        delta = values - season_mean
+        new_mean = np.where(seen == 0, values, season_mean + cfg.season_alpha * delta)
+        new_var = np.where(seen == 0, 0.0, (1 - cfg.season_alpha) * (season_var + cfg.season_alpha * delta * delta))
+        store.season_mean[rows, slots] = new_mean
+        store.season_var[rows, slots] = new_var
+        store.season_seen[rows, slots] = seen + 1
+
+        return [
+            Anomaly(
+                series=names[i],
+                value=float(values[i]),
+                timestamp=float(timestamps[i]),
+                zscore=float(zscore[i]),
+                mad_zscore=float(mad_zscore[i]),
+                ewma=float(ewma[i]),
+                seasonal_zscore=float(seasonal_z[i]) if season_ready[i] else None,
+            )
+            for i in np.flatnonzero(breach)
+        ]
+
+    @staticmethod
+    def _refresh_robust(store: SeriesStore, rows: np.ndarray, full: np.ndarray) -> None:
+        if not rows.size:
+            return
+        full_rows, partial_rows = rows[full], rows[~full]
+        if full_rows.size:
+            # Full windows carry no NaN padding, so the much cheaper np.median applies.
+            window = store.values[full_rows]
+            median = np.median(window, axis=1)
+            store.median[full_rows] = median
+            store.mad[full_rows] = np.median(np.abs(window - median[:, None]), axis=1)
+        if partial_rows.size:
+            window = store.values[partial_rows]
+            median = np.nanmedian(window, axis=1)
+            store.median[partial_rows] = median
+            store.mad[partial_rows] = np.nanmedian(np.abs(window - median[:, None]), axis=1)
+
+    def stats(self, org_id: UUID) -> dict:
+        store = self.store(org_id)
+        return {
+            "series": len(store.names),
+            "capacity": store.capacity,
+            "retention": self.config.retention,
+            "dropped_series": store.dropped_series,
+            "memory_bytes": store.memory_bytes(),
+            "points_scored": self.points_scored,
+        }
+
+
+def anomaly_signal_events(anomalies: list[Anomaly], services: dict[str, str | None], mad_threshold: float) -> list[SignalEvent]:
+    """Turn breaches into metric signals for the ingestion pipeline, which dedups and opens incidents."""
+    received_at = time.time()
+    events = []
+    for anomaly in anomalies:
+        raw = {"type": "metric", "event_id": f"anomaly:{anomaly.series}:{anomaly.timestamp}"}
+        events.append(
+            SignalEvent(
+                incident_id=None,
+                type="metric",
+                payload={"metric": anomaly.series, "detector": "zscore_mad_seasonal", **anomaly.as_dict()},
+                fingerprint=event_fingerprint(raw),
+                observed_at=datetime.fromtimestamp(anomaly.timestamp, UTC).replace(tzinfo=None),
+                received_at=received_at,
+                service=services.get(anomaly.series),
+                severity="high" if abs(anomaly.mad_zscore) >= 2 * mad_threshold else "medium",
+            )
+        )
+    return events
+
+
+@lru_cache
+def get_detection_engine() -> DetectionEngine:
+    settings = get_settings()
+    return DetectionEngine(
+        DetectionConfig(
+            retention=settings.detect_retention_points,
+            max_series=settings.detect_max_series,
+            z_threshold=settings.detect_z_threshold,
+            mad_threshold=settings.detect_mad_threshold,
+        )
+    )
@@ -0,0 +1,208 @@
+"""Org-scoped event bus for pushing incident and remediation deltas to clients.
+
+Events are numbered with a process-local sequence and kept in a bounded
+per-org history so a reconnecting subscriber can resume from the last cursor
+it saw. A cursor is "<epoch>-<sequence>", where the epoch identifies this bus
+instance: a cursor from another worker or from before a restart cannot be
+resumed from, and the subscriber is told to reset instead. With
+EVENT_BUS_BACKEND=postgres, events are also fanned out to the other API
+workers through LISTEN/NOTIFY.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from uuid import UUID, uuid4
+
+from app.core.config import get_settings
+
+logger = logging.getLogger("opsmind.events")
+
+NOTIFY_CHANNEL = "opsmind_events"
+
+
+def parse_cursor(token: str) -> tuple[str, int] | None:
+    """(epoch, sequence) of a cursor token, or None when it is malformed."""
+    epoch, _, sequence = token.rpartition("-")
+    if not epoch or not sequence.isdigit():
+        return None
+    return epoch, int(sequence)
+
+
+@dataclass
+class Event:
+    epoch: str
+    cursor: int
+    org_id: str
+    event_type: str
+    data: dict
+    created_at: float
+
+    @property
+    def token(self) -> str:
+        return f"{self.epoch}-{self.cursor}"
+
+    def as_dict(self) -> dict:
+        return {
+            "cursor": self.token,
+            "type": self.event_type,
+            "data": self.data,
+            "created_at": self.created_at,
+        }
+
+
+@dataclass(eq=False)
+class Subscription:
+    org_id: str
+    loop: asyncio.AbstractEventLoop
+    queue: asyncio.Queue
+
+    def offer(self, event: Event | None) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A subscriber that cannot keep up is closed; it resumes from its cursor.
+            self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class EventBus:
+    def __init__(self, history_size: int, subscriber_queue_size: int):
+        self.history_size = history_size
+        self.subscriber_queue_size = subscriber_queue_size
+        self.origin = uuid4().hex
+        self._cursor = 0
+        self._history: dict[str, deque[Event]] = {}
+        self._evicted_through: dict[str, int] = {}
+        self._subscribers: dict[str, set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self.fanout: PostgresNotifyFanout | None = None
+
+    def publish(self, org_id: UUID | str, event_type: str, data: dict) -> Event:
+        event = self._dispatch(str(org_id), event_type, data, time.time())
+        if self.fanout is not None:
+            self.fanout.notify(self.origin, event)
+        return event
+
+    def _dispatch(self, org_id: str, event_type: str, data: dict, created_at: float) -> Event:
+        with self._lock:
+            self._cursor += 1
+            event = Event(self.origin, self._cursor, org_id, event_type, data, created_at)
+            history = self._history.get(org_id)
+            if history is None:
+                history = self._history[org_id] = deque(maxlen=self.history_size)
+            if len(history) == self.history_size:
+                self._evicted_through[org_id] = history[0].cursor
+            history.append(event)
+            subscribers = list(self._subscribers.get(org_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                self.unsubscribe(subscription)
+        return event
+
+    def subscribe(self, org_id: UUID | str, since: str | None = None) -> tuple[Subscription, list[Event], bool]:
+        """Register a subscriber and return the events it missed after cursor ``since``.
+
+        The flag is False when ``since`` cannot be resumed from here: it is
+        older than the retained history, was issued by another worker or
+        before a restart (different epoch), or is ahead of this bus. The
+        client then has to refetch full state before applying deltas.
+        """
+        org_key = str(org_id)
+        subscription = Subscription(
+            org_id=org_key,
+            loop=asyncio.get_running_loop(),
+            queue=asyncio.Queue(maxsize=self.subscriber_queue_size),
+        )
+        with self._lock:
+            self._subscribers.setdefault(org_key, set()).add(subscription)
+            history = list(self._history.get(org_key, ()))
+            evicted_through = self._evicted_through.get(org_key, 0)
+            current = self._cursor
+        if since is None:
+            return subscription, [], True
+        parsed = parse_cursor(since)
+        if parsed is None or parsed[0] != self.origin or parsed[1] > current:
+            return subscription, [], False
+        sequence = parsed[1]
+        missed = [event for event in history if event.cursor > sequence]
+        return subscription, missed, sequence >= evicted_through
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.org_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.org_id]
+
+    def receive_remote(self, payload: str) -> None:
+        message = json.loads(payload)
+        if message["origin"] == self.origin:
+            return
+        self._dispatch(message["org_id"], message["type"], message["data"], message["created_at"])
+
+
+class PostgresNotifyFanout:
+    """Relays events between API workers through Postgres LISTEN/NOTIFY."""
+
+    def __init__(self, bus: EventBus, dsn: str):
+        import psycopg
+
+        self.bus = bus
+        self.dsn = dsn.replace("postgresql+psycopg://", "postgresql://")
+        self._notify_conn = psycopg.connect(self.dsn, autocommit=True)
+        self._notify_lock = threading.Lock()
+        self._listener = threading.Thread(target=self._listen, name="opsmind-event-listener", daemon=True)
+        self._listener.start()
+
+    def notify(self, origin: str, event: Event) -> None:
+        payload = json.dumps(
+            {
+                "origin": origin,
+                "org_id": event.org_id,
+                "type": event.event_type,
+                "data": event.data,
+                "created_at": event.created_at,
+            },
+            default=str,
+        )
+        try:
+            with self._notify_lock:
+                self._notify_conn.execute("SELECT pg_notify(%s, %s)", (NOTIFY_CHANNEL, payload))
+        except Exception:  # pragma: no cover - fanout is best effort
+            logger.exception("event_fanout_failed")
+
+    def _listen(self) -> None:
+        import psycopg
+
+        while True:
+            try:
+                with psycopg.connect(self.dsn, autocommit=True) as conn:
+                    conn.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                    for notify in conn.notifies():
+                        self.bus.receive_remote(notify.payload)
+            except Exception:  # pragma: no cover - reconnect after connection loss
+                logger.exception("event_listener_disconnected")
+                time.sleep(1)
+
+
+@lru_cache
+def get_event_bus() -> EventBus:
+    settings = get_settings()
+    bus = EventBus(settings.event_history_size, settings.event_subscriber_queue_size)
+    if settings.event_bus_backend == "postgres":
+        bus.fanout = PostgresNotifyFanout(bus, settings.database_url)
+    return bus
+
+
+def publish_event(org_id: UUID | str, event_type: str, data: dict) -> Event:
+    return get_event_bus().publish(org_id, event_type, data)
@@ -0,0 +1,401 @@
+"""Remediation executor: runs queued execute and rollback jobs against their targets.
+
+Jobs are ``RemediationJob`` rows, queued by the ``execute`` and ``rollback``
+transitions. A dispatcher thread claims due jobs in a short transaction
+(``FOR UPDATE SKIP LOCKED`` on Postgres, so several API processes can share
+the queue) and hands them to a worker pool. A claim skips jobs whose target
+already has ``target_concurrency`` jobs running; on Postgres a
+transaction-scoped advisory lock serializes claims so the limit also holds
+across processes. A claimed job holds a lease covering its own timeout
+(``details["timeout_seconds"]``, capped at REMEDIATION_MAX_JOB_TIMEOUT_SECONDS),
+and a job whose worker died is claimed again once the lease lapses, so
+handlers must tolerate running twice.
+
+Handlers run on a pool of their own, so a worker can give up on one after
+the job timeout. A handler still waiting for a thread by then is cancelled,
+and one whose deadline has passed before it starts is skipped. Python cannot
+stop a running handler thread, so handlers should honour
+``ActionContext.deadline``. A failed attempt is retried with
+exponential backoff until the job's ``max_attempts``. When an execute job
+runs out of attempts the action fails and, unless its details set
+``auto_rollback`` to false, a rollback is queued at once, in the same
+transaction as the job's final status. A worker finalizes a job only while
+it still holds the job's lease. Each step is published as a
+``remediation.progress`` event next to the action's status events.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from datetime import timedelta
+from functools import lru_cache
+from uuid import UUID, uuid4
+
+from sqlalchemy import and_, func, or_, text
+from sqlmodel import Session, select
+
+from app.core.config import get_settings
+from app.db.models import RemediationAction, RemediationJob, utc_now
+from app.db.session import engine
+from app.services.events import publish_event
+from app.services.remediation import (
+    TransitionConflict,
+    apply_transition,
+    publish_transition,
+)
+
+logger = logging.getLogger("opsmind.executor")
+
+# Lets a job's worker record a timeout before anyone else may claim the job again.
+LEASE_GRACE_SECONDS = 30.0
+MAX_BACKOFF_SECONDS = 600.0
+# Candidates read per free worker, so busy targets do not starve a claim.
+CLAIM_SCAN_FACTOR = 4
+CLAIM_LOCK_KEY = 0x0B5_E7EC
+COMPLETIONS = {"execute": ("complete_execution", "fail_execution"), "rollback": ("complete_rollback", "fail_rollback")}
+
+
+@dataclass(frozen=True)
+class ActionContext:
+    org_id: UUID
+    action_id: UUID
+    job_id: UUID
+    kind: str
+    action_type: str
+    target: str
+    title: str
+    details: dict
+    attempt: int
+    # time.monotonic() by which the handler should have returned.
+    deadline: float
+
+
+Handler = Callable[[ActionContext], dict]
+
+
+class PermanentActionError(Exception):
+    """A handler failure that retrying cannot fix."""
+
+
+def mock_handler(context: ActionContext) -> dict:
+    """Stands in for infrastructure integrations, like the adapters in app.services.integrations.
+
+    ``details["mock"]`` can hold ``duration_seconds`` and ``execute_failures`` /
+    ``rollback_failures`` (how many first attempts fail).
+    """
+    mock = context.details.get("mock") or {}
+    duration = float(mock.get("duration_seconds", 0))
+    remaining = context.deadline - time.monotonic()
+    if duration > remaining:
+        time.sleep(max(0.0, remaining))
+        raise TimeoutError(f"Mock {context.kind} did not finish before its deadline")
+    time.sleep(duration)
+    if context.attempt <= int(mock.get(f"{context.kind}_failures", 0)):
+        raise RuntimeError(f"Mock {context.kind} failed on attempt {context.attempt}")
+    return {"message": f"Mock {context.kind} of {context.action_type} on {context.target}"}
+
+
+HANDLERS: dict[str, Handler] = dict.fromkeys(("restart", "scale", "rollback", "config", "mock"), mock_handler)
+
+
+def register_handler(action_type: str, handler: Handler) -> None:
+    HANDLERS[action_type] = handler
+
+
+def job_timeout(details: dict, default: float, limit: float) -> float:
+    """Seconds an attempt may run: the action's ``timeout_seconds``, at most ``limit``."""
+    try:
+        timeout = float(details.get("timeout_seconds", default))
+    except (TypeError, ValueError):
+        timeout = default
+    return min(timeout, limit) if timeout > 0 else default
+
+
+def claim_jobs(
+    session: Session, worker_id: str, limit: int, target_concurrency: int, timeout_seconds: float, max_timeout_seconds: float
+) -> list[UUID]:
+    """Mark up to ``limit`` due jobs running for ``worker_id``, within per-target limits.
+
+    Each lease lasts the job's own timeout plus LEASE_GRACE_SECONDS.
+    """
+    now = utc_now()
+    if session.get_bind().dialect.name == "postgresql":
+        session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": CLAIM_LOCK_KEY})
+    running = dict(
+        session.exec(
+            select(RemediationJob.target, func.count())
+            .where(RemediationJob.status == "running")
+            .where(RemediationJob.lease_expires_at > now)
+            .group_by(RemediationJob.target)
+        ).all()
+    )
+    candidates = session.exec(
+        select(RemediationJob)
+        .where(
+            or_(
+                and_(RemediationJob.status == "queued", RemediationJob.run_after <= now),
+                and_(RemediationJob.status == "running", RemediationJob.lease_expires_at <= now),
+            )
+        )
+        .order_by(RemediationJob.run_after)
+        .limit(limit * CLAIM_SCAN_FACTOR)
+        .with_for_update(skip_locked=True)
+    ).all()
+    chosen = []
+    for job in candidates:
+        if len(chosen) == limit:
+            break
+        if running.get(job.target, 0) >= target_concurrency:
+            continue
+        running[job.target] = running.get(job.target, 0) + 1
+        chosen.append(job)
+    details = {}
+    if chosen:
+        action_ids = [job.action_id for job in chosen]
+        details = dict(
+            session.exec(select(RemediationAction.id, RemediationAction.details).where(RemediationAction.id.in_(action_ids))).all()
+        )
+    claimed = []
+    for job in chosen:
+        lease_seconds = job_timeout(details.get(job.action_id) or {}, timeout_seconds, max_timeout_seconds) + LEASE_GRACE_SECONDS
+        job.status = "running"
+        job.worker_id = worker_id
+        job.attempts += 1
+        job.lease_expires_at = now + timedelta(seconds=lease_seconds)
+        job.started_at = job.started_at or now
+        session.add(job)
+        claimed.append(job.id)
+    session.commit()
+    return claimed
+
+
+def job_view(job: RemediationJob) -> dict:
+    return {
+        "job_id": str(job.id),
+        "action_id": str(job.action_id),
+        "kind": job.kind,
+        "target": job.target,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "run_after": job.run_after.isoformat(),
+        "error": job.error,
+        "result": job.result,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+class RemediationExecutor:
+    def __init__(
+        self,
+        workers: int,
+        target_concurrency: int,
+        timeout_seconds: float,
+        backoff_seconds: float,
+        poll_seconds: float,
+        max_timeout_seconds: float | None = None,
+    ):
+        self.workers = workers
+        self.target_concurrency = target_concurrency
+        self.timeout_seconds = timeout_seconds
+        self.max_timeout_seconds = max(timeout_seconds, max_timeout_seconds or timeout_seconds)
+        self.backoff_seconds = backoff_seconds
+        self.poll_seconds = poll_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self._jobs = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="opsmind-remediation")
+        # Timed-out handlers keep their thread, so leave room for them beside the running ones.
+        self._handlers = ThreadPoolExecutor(max_workers=workers * 2, thread_name_prefix="opsmind-remediation-handler")
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._dispatcher: threading.Thread | None = None
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def start(self) -> None:
+        """Start dispatching; jobs queued before a restart resume from the table."""
+        if self._dispatcher is not None and self._dispatcher.is_alive():
+            return
+        with self._lock:
+            if self._dispatcher is None or not self._dispatcher.is_alive():
+                self._dispatcher = threading.Thread(target=self._run, name="opsmind-remediation-dispatcher", daemon=True)
+                self._dispatcher.start()
+
+    def wake(self) -> None:
+        """Claim newly queued jobs now rather than at the next poll."""
+        self.start()
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.poll_seconds)
+            self._wakeup.clear()
+            try:
+                while self.dispatch_once():
+                    pass
+            except Exception:  # pragma: no cover - keep the dispatcher alive across DB errors
+                logger.exception("remediation_dispatch_failed")
+                time.sleep(self.poll_seconds)
+
+    def dispatch_once(self) -> int:
+        with self._lock:
+            free = self.workers - self._in_flight
+        if free <= 0:
+            return 0
+        with Session(engine) as session:
+            claimed = claim_jobs(
+                session, self.worker_id, free, self.target_concurrency, self.timeout_seconds, self.max_timeout_seconds
+            )
+        with self._lock:
+            self._in_flight += len(claimed)
+        for job_id in claimed:
+            self._jobs.submit(self._execute, job_id)
+        return len(claimed)
+
+    def _progress(self, job: RemediationJob, state: str, **extra) -> None:
+        publish_event(
+            job.org_id,
+            "remediation.progress",
+            {"id": str(job.action_id), "job_id": str(job.id), "kind": job.kind, "attempt": job.attempts, "state": state, **extra},
+        )
+
+    def _execute(self, job_id: UUID) -> None:
+        try:
+            with Session(engine) as session:
+                job = session.get(RemediationJob, job_id)
+                action = session.get(RemediationAction, job.action_id)
+                details = (action.details if action else None) or {}
+                timeout = job_timeout(details, self.timeout_seconds, self.max_timeout_seconds)
+                context = ActionContext(
+                    org_id=job.org_id,
+                    action_id=job.action_id,
+                    job_id=job.id,
+                    kind=job.kind,
+                    action_type=str(details.get("type", "mock")),
+                    target=job.target,
+                    title=action.title if action else "",
+                    details=details,
+                    attempt=job.attempts,
+                    deadline=time.monotonic() + timeout,
+                )
+                self._progress(job, "started")
+                future = None
+                try:
+                    handler = HANDLERS.get(context.action_type)
+                    if handler is None:
+                        raise PermanentActionError(f"No handler for action type '{context.action_type}'")
+                    future = self._handlers.submit(_run_handler, handler, context)
+                    result = future.result(timeout=timeout)
+                except FutureTimeoutError:
+                    # A handler still queued behind hung ones must not start after the job moved on.
+                    future.cancel()
+                    self._failed(session, job, f"Timed out after {timeout:g}s", retryable=True, details=details)
+                except Exception as exc:
+                    logger.exception("remediation_attempt_failed", extra={"job_id": str(job_id)})
+                    self._failed(session, job, str(exc) or type(exc).__name__, not isinstance(exc, PermanentActionError), details)
+                else:
+                    self._succeeded(session, job, result if isinstance(result, dict) else {"result": result})
+        except Exception:  # pragma: no cover - a crashed job is retried when its lease lapses
+            logger.exception("remediation_job_crashed", extra={"job_id": str(job_id)})
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._wakeup.set()
+
+    def _owns(self, session: Session, job: RemediationJob) -> bool:
+        """Lock the job row and check this attempt still holds its lease."""
+        current = session.exec(
+            select(RemediationJob.worker_id, RemediationJob.status, RemediationJob.attempts)
+            .where(RemediationJob.id == job.id)
+            .with_for_update()
+        ).first()
+        if current is not None and tuple(current) == (self.worker_id, "running", job.attempts):
+            return True
+        session.rollback()
+        logger.warning("remediation_lease_lost", extra={"job_id": str(job.id), "attempt": job.attempts})
+        return False
+
+    def _complete(self, session: Session, job: RemediationJob, transition: str) -> dict | None:
+        """Stage ``transition`` in the job's transaction; None if the action cannot take it."""
+        try:
+            return apply_transition(session, job.org_id, job.action_id, transition, commit=False)
+        except TransitionConflict as exc:
+            logger.warning("remediation_transition_skipped", extra={"job_id": str(job.id), "reason": str(exc)})
+            return None
+
+    def _publish(self, job: RemediationJob, transitions: list[dict | None]) -> None:
+        for result in transitions:
+            if result is not None:
+                publish_transition(job.org_id, job.action_id, result)
+
+    # The job's final status, the action's transition and any rollback it queues
+    # commit together, so a crash can never leave the action behind its job.
+    def _succeeded(self, session: Session, job: RemediationJob, result: dict) -> None:
+        if not self._owns(session, job):
+            return
+        job.status = "succeeded"
+        job.result = result
+        job.error = None
+        job.finished_at = utc_now()
+        session.add(job)
+        moved = self._complete(session, job, COMPLETIONS[job.kind][0])
+        session.commit()
+        self._progress(job, "succeeded", result=result)
+        self._publish(job, [moved])
+
+    def _failed(self, session: Session, job: RemediationJob, error: str, retryable: bool, details: dict) -> None:
+        if not self._owns(session, job):
+            return
+        job.error = error[:500]
+        if retryable and job.attempts < job.max_attempts:
+            delay = min(self.backoff_seconds * 2 ** (job.attempts - 1), MAX_BACKOFF_SECONDS)
+            job.status = "queued"
+            job.run_after = utc_now() + timedelta(seconds=delay)
+            job.lease_expires_at = None
+            job.worker_id = None
+            session.add(job)
+            session.commit()
+            self._progress(job, "retrying", error=job.error, retry_in_seconds=delay)
+            return
+        job.status = "failed"
+        job.finished_at = utc_now()
+        session.add(job)
+        moved = self._complete(session, job, COMPLETIONS[job.kind][1])
+        rolled_back = None
+        if moved is not None and job.kind == "execute" and details.get("auto_rollback", True):
+            rolled_back = self._complete(session, job, "rollback")
+        session.commit()
+        self._progress(job, "failed", error=job.error)
+        self._publish(job, [moved, rolled_back])
+        if rolled_back is not None:
+            self._wakeup.set()
+
+
+def _run_handler(handler: Handler, context: ActionContext) -> dict:
+    if time.monotonic() >= context.deadline:
+        raise TimeoutError(f"Deadline passed before the {context.kind} handler started")
+    return handler(context)
+
+
+@lru_cache
+def get_remediation_executor() -> RemediationExecutor:
+    settings = get_settings()
+    return RemediationExecutor(
+        settings.remediation_workers,
+        settings.remediation_target_concurrency,
+        settings.remediation_job_timeout_seconds,
+        settings.remediation_retry_backoff_seconds,
+        settings.remediation_poll_seconds,
+        settings.remediation_max_job_timeout_seconds,
+    )
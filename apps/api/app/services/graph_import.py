@@ -0,0 +1,207 @@
+"""Bulk upsert of knowledge-graph topology keyed by (label, node_type).
+
+An import is planned as a diff against the org's current graph and only the
+differences are written, in fixed-size batches that each commit on their
+own, so a failure part-way leaves the earlier batches applied; it surfaces as
+GraphImportError carrying how many batches committed. With ``prune`` the payload is treated as the complete topology and
+nodes and edges missing from it are deleted; edges of deleted nodes go too.
+"""
+from __future__ import annotations
+
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, field
+from uuid import UUID, uuid4
+
+from sqlalchemy import bindparam, delete, insert, update
+from sqlmodel import Session, select
+
+from app.db.models import KGEdge, KGNode, utc_now
+
+NodeKey = tuple[str, str]
+EdgeKey = tuple[UUID, UUID, str]
+
+
+class GraphImportError(Exception):
+    def __init__(self, batches: int, cause: Exception):
+        super().__init__(f"graph import failed after {batches} committed batch(es): {cause}")
+        self.batches = batches
+
+
+@dataclass
+class ImportNode:
+    label: str
+    node_type: str
+    properties: dict
+
+
+@dataclass
+class ImportEdge:
+    source: NodeKey
+    target: NodeKey
+    relation: str
+    properties: dict
+
+
+@dataclass
+class GraphDiff:
+    node_inserts: list[dict] = field(default_factory=list)
+    node_updates: list[dict] = field(default_factory=list)
+    node_deletes: list[UUID] = field(default_factory=list)
+    edge_inserts: list[dict] = field(default_factory=list)
+    edge_updates: list[dict] = field(default_factory=list)
+    edge_deletes: list[UUID] = field(default_factory=list)
+    unchanged_nodes: int = 0
+    unchanged_edges: int = 0
+    errors: list[dict] = field(default_factory=list)
+
+    @property
+    def empty(self) -> bool:
+        return not any(
+            (self.node_inserts, self.node_updates, self.node_deletes, self.edge_inserts, self.edge_updates, self.edge_deletes)
+        )
+
+    def counts(self) -> dict:
+        return {
+            "nodes": {
+                "inserted": len(self.node_inserts),
+                "updated": len(self.node_updates),
+                "deleted": len(self.node_deletes),
+                "unchanged": self.unchanged_nodes,
+            },
+            "edges": {
+                "inserted": len(self.edge_inserts),
+                "updated": len(self.edge_updates),
+                "deleted": len(self.edge_deletes),
+                "unchanged": self.unchanged_edges,
+            },
+        }
+
+
+def plan_import(
+    session: Session,
+    org_id: UUID,
+    nodes: Sequence[ImportNode],
+    edges: Sequence[ImportEdge],
+    prune: bool = False,
+    max_errors: int = 50,
+) -> GraphDiff:
+    diff = GraphDiff()
+    now = utc_now()
+
+    existing_nodes: dict[NodeKey, tuple[UUID, dict]] = {}
+    for node_id, label, node_type, properties in session.exec(
+        select(KGNode.id, KGNode.label, KGNode.node_type, KGNode.properties).where(KGNode.org_id == org_id)
+    ).all():
+        existing_nodes.setdefault((label, node_type), (node_id, properties or {}))
+
+    # Later entries for the same key win, matching a sequential upsert.
+    wanted_nodes = {(node.label, node.node_type): node for node in nodes}
+    node_ids: dict[NodeKey, UUID] = {}
+    for key, node in wanted_nodes.items():
+        current = existing_nodes.get(key)
+        if current is None:
+            node_id = uuid4()
+            diff.node_inserts.append(
+                {
+                    "id": node_id,
+                    "org_id": org_id,
+                    "label": node.label,
+                    "node_type": node.node_type,
+                    "properties": node.properties,
+                    "created_at": now,
+                }
+            )
+            node_ids[key] = node_id
+            continue
+        node_id, properties = current
+        node_ids[key] = node_id
+        if properties != node.properties:
+            diff.node_updates.append({"node_id": node_id, "properties": node.properties})
+        else:
+            diff.unchanged_nodes += 1
+    if prune:
+        diff.node_deletes = [node_id for key, (node_id, _) in existing_nodes.items() if key not in wanted_nodes]
+    else:
+        for key, (node_id, _) in existing_nodes.items():
+            node_ids.setdefault(key, node_id)
+
+    existing_edges: dict[EdgeKey, tuple[UUID, dict]] = {}
+    for edge_id, source_id, target_id, relation, properties in session.exec(
+        select(KGEdge.id, KGEdge.source_id, KGEdge.target_id, KGEdge.relation, KGEdge.properties).where(
+            KGEdge.org_id == org_id
+        )
+    ).all():
+        existing_edges.setdefault((source_id, target_id, relation), (edge_id, properties or {}))
+
+    wanted_edges: dict[EdgeKey, ImportEdge] = {}
+    for position, edge in enumerate(edges):
+        source_id, target_id = node_ids.get(edge.source), node_ids.get(edge.target)
+        if source_id is None or target_id is None:
+            if len(diff.errors) < max_errors:
+                missing = edge.source if source_id is None else edge.target
+                diff.errors.append({"edge": position, "error": f"unknown node {missing[0]!r} ({missing[1]})"})
+            continue
+        wanted_edges[(source_id, target_id, edge.relation)] = edge
+    for key, edge in wanted_edges.items():
+        current = existing_edges.get(key)
+        if current is None:
+            source_id, target_id, relation = key
+            diff.edge_inserts.append(
+                {
+                    "id": uuid4(),
+                    "org_id": org_id,
+                    "source_id": source_id,
+                    "target_id": target_id,
+                    "relation": relation,
+                    "properties": edge.properties,
+                    "created_at": now,
+                }
+            )
+        elif current[1] != edge.properties:
+            diff.edge_updates.append({"edge_id": current[0], "properties": edge.properties})
+        else:
+            diff.unchanged_edges += 1
+    if prune:
+        removed = set(diff.node_deletes)
+        diff.edge_deletes = [
+            edge_id
+            for key, (edge_id, _) in existing_edges.items()
+            if key not in wanted_edges or key[0] in removed or key[1] in removed
+        ]
+    return diff
+
+
+def _batches(rows: list, size: int) -> Iterable[list]:
+    for start in range(0, len(rows), size):
+        yield rows[start : start + size]
+
+
+def apply_import(session: Session, diff: GraphDiff, batch_size: int) -> int:
+    """Write ``diff`` in batches, committing each one; returns the number of batches.
+
+    Raises GraphImportError, after rolling back the failed batch, if any batch fails.
+    """
+    nodes, edges = KGNode.__table__, KGEdge.__table__
+    statements = [
+        (insert(nodes), diff.node_inserts),
+        (update(nodes).where(nodes.c.id == bindparam("node_id")).values(properties=bindparam("properties")), diff.node_updates),
+        (insert(edges), diff.edge_inserts),
+        (update(edges).where(edges.c.id == bindparam("edge_id")).values(properties=bindparam("properties")), diff.edge_updates),
+    ]
+    batches = 0
+    try:
+        for statement, rows in statements:
+            for batch in _batches(rows, batch_size):
+                session.connection().execute(statement, batch)
+                session.commit()
+                batches += 1
+        # Edges go first so no batch leaves an edge pointing at a deleted node.
+        for table, ids in ((edges, diff.edge_deletes), (nodes, diff.node_deletes)):
+            for batch in _batches(ids, batch_size):
+                session.connection().execute(delete(table).where(table.c.id.in_(batch)))
+                session.commit()
+                batches += 1
+    except Exception as exc:
+        session.rollback()
+        raise GraphImportError(batches, exc) from exc
+    return batches
@@ -0,0 +1,532 @@
+"""In-memory compressed-sparse-row index over each org's knowledge graph.
+
+Nodes get dense integer positions and edges live in forward and reverse CSR
+arrays with interned relation ids, so neighbor lookups are array slices and
+k-hop expansion is a handful of vectorized gathers per hop. The index is
+built lazily on first use and kept current by the graph write routes: new
+nodes append to shared columns, new edges go to a small overlay that is
+compacted into fresh CSR arrays once it grows.
+
+Readers work on an immutable GraphSnapshot. Writers publish a new snapshot
+with a higher version instead of mutating the current one, so a reader never
+observes half-applied state. Other API workers signal changes through the
+"graph.index" resource version in the shared cache, which forces a rebuild.
+"""
+from __future__ import annotations
+
+import itertools
+import threading
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from uuid import UUID
+
+import numpy as np
+from sqlmodel import Session, select
+
+from app.db.models import KGEdge, KGNode
+from app.services.cache import get_cache
+
+INDEX_RESOURCE = "graph.index"
+# Overlay edges are folded back into the CSR arrays once there are this many.
+COMPACT_THRESHOLD = 4096
+
+_EMPTY = np.zeros(0, dtype=np.int32)
+
+
+class Interner:
+    """Append-only string <-> small int mapping shared by successive snapshots."""
+
+    def __init__(self):
+        self.names: list[str] = []
+        self.ids: dict[str, int] = {}
+
+    def intern(self, name: str) -> int:
+        value = self.ids.get(name)
+        if value is None:
+            value = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return value
+
+
+class NodeTable:
+    """Append-only node columns; a snapshot only reads rows below its node_count."""
+
+    def __init__(self):
+        self.ids: list[UUID] = []
+        self.labels: list[str] = []
+        self.types: list[int] = []
+        self.properties: list[dict] = []
+        self.positions: dict[UUID, int] = {}
+        self.by_label: dict[str, list[int]] = {}
+        self.node_types = Interner()
+
+    def append(self, node_id: UUID, label: str, node_type: str, properties: dict) -> int:
+        position = self.positions.get(node_id)
+        if position is not None:
+            return position
+        position = len(self.ids)
+        self.ids.append(node_id)
+        self.labels.append(label)
+        self.types.append(self.node_types.intern(node_type))
+        self.properties.append(properties or {})
+        self.positions[node_id] = position
+        self.by_label.setdefault(label, []).append(position)
+        return position
+
+
+@dataclass(frozen=True)
+class CSR:
+    offsets: np.ndarray
+    neighbors: np.ndarray
+    relations: np.ndarray
+
+    @classmethod
+    def build(cls, node_count: int, sources: np.ndarray, targets: np.ndarray, relations: np.ndarray) -> CSR:
+        order = np.argsort(sources, kind="stable")
+        counts = np.bincount(sources, minlength=node_count)
+        offsets = np.zeros(node_count + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return cls(offsets, targets[order].astype(np.int32), relations[order].astype(np.int32))
+
+    @property
+    def node_count(self) -> int:
+        return len(self.offsets) - 1
+
+    def gather(self, frontier: np.ndarray, relation: int | None) -> tuple[np.ndarray, np.ndarray]:
+        """Neighbors of every frontier node as (neighbor, origin) arrays."""
+        frontier = frontier[frontier < self.node_count]
+        starts = self.offsets[frontier]
+        lengths = self.offsets[frontier + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return _EMPTY, _EMPTY
+        # Concatenated aranges over [start, start + length) for each frontier node.
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+        neighbors = self.neighbors[positions]
+        origins = np.repeat(frontier.astype(np.int32), lengths)
+        if relation is not None:
+            keep = self.relations[positions] == relation
+            neighbors, origins = neighbors[keep], origins[keep]
+        return neighbors, origins
+
+    @property
+    def nbytes(self) -> int:
+        return self.offsets.nbytes + self.neighbors.nbytes + self.relations.nbytes
+
+
+@dataclass(frozen=True)
+class GraphSnapshot:
+    version: int
+    node_count: int
+    edge_count: int
+    nodes: NodeTable
+    relations: Interner
+    forward: CSR
+    reverse: CSR
+    # Edges added since the last compaction: node -> ((neighbor, relation), ...).
+    extra_out: dict[int, tuple[tuple[int, int], ...]]
+    extra_in: dict[int, tuple[tuple[int, int], ...]]
+
+    @property
+    def overlay_edges(self) -> int:
+        return sum(len(edges) for edges in self.extra_out.values())
+
+    def position(self, node_id: UUID) -> int | None:
+        position = self.nodes.positions.get(node_id)
+        return position if position is not None and position < self.node_count else None
+
+    def positions_for_labels(self, labels: Iterable[str]) -> list[int]:
+        by_label = self.nodes.by_label
+        return sorted(
+            position for label in labels for position in by_label.get(label, ()) if position < self.node_count
+        )
+
+    def node_id(self, position: int) -> UUID:
+        return self.nodes.ids[position]
+
+    def node(self, position: int) -> dict:
+        return {
+            "id": str(self.nodes.ids[position]),
+            "label": self.nodes.labels[position],
+            "node_type": self.nodes.node_types.names[self.nodes.types[position]],
+            "properties": self.nodes.properties[position],
+        }
+
+    def relation_id(self, relation: str | None) -> int | None:
+        """Interned id for ``relation``; -1 when the graph has no such relation."""
+        if relation is None:
+            return None
+        return self.relations.ids.get(relation, -1)
+
+    def _overlay(self, extra: dict, frontier: np.ndarray, relation: int | None) -> tuple[list[int], list[int]]:
+        neighbors: list[int] = []
+        origins: list[int] = []
+        if not extra:
+            return neighbors, origins
+        touched = frontier[np.isin(frontier, np.fromiter(extra, dtype=np.int32, count=len(extra)))]
+        for node in touched.tolist():
+            for neighbor, edge_relation in extra.get(node, ()):
+                if relation is None or edge_relation == relation:
+                    neighbors.append(neighbor)
+                    origins.append(node)
+        return neighbors, origins
+
+    def expand(self, frontier: np.ndarray, direction: str = "out", relation: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """One hop from ``frontier``; returns (neighbor, origin) arrays, possibly with repeats."""
+        parts = []
+        if direction in ("out", "both"):
+            parts.append(self.forward.gather(frontier, relation))
+            parts.append(self._overlay(self.extra_out, frontier, relation))
+        if direction in ("in", "both"):
+            parts.append(self.reverse.gather(frontier, relation))
+            parts.append(self._overlay(self.extra_in, frontier, relation))
+        neighbors = np.concatenate([np.asarray(part[0], dtype=np.int32) for part in parts])
+        origins = np.concatenate([np.asarray(part[1], dtype=np.int32) for part in parts])
+        return neighbors, origins
+
+    def neighbors(self, position: int, direction: str = "out", relation: str | None = None) -> np.ndarray:
+        relation_id = self.relation_id(relation)
+        parts = []
+        for csr, extra, wanted in ((self.forward, self.extra_out, "out"), (self.reverse, self.extra_in, "in")):
+            if direction not in (wanted, "both"):
+                continue
+            if position < csr.node_count:
+                start, end = csr.offsets[position], csr.offsets[position + 1]
+                found = csr.neighbors[start:end]
+                if relation_id is not None:
+                    found = found[csr.relations[start:end] == relation_id]
+                parts.append(found)
+            if position in extra:
+                parts.append(
+                    np.array(
+                        [neighbor for neighbor, edge_relation in extra[position] if relation_id in (None, edge_relation)],
+                        dtype=np.int32,
+                    )
+                )
+        return parts[0] if len(parts) == 1 else np.concatenate(parts) if parts else _EMPTY
+
+    def k_hop(
+        self,
+        seeds: Iterable[int],
+        hops: int,
+        direction: str = "out",
+        relation: str | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Breadth-first expansion up to ``hops``; returns (positions, depth) in visit order."""
+        relation_id = self.relation_id(relation)
+        frontier = np.unique(np.fromiter(seeds, dtype=np.int32))
+        visited = np.zeros(self.node_count, dtype=bool)
+        visited[frontier] = True
+        found = [frontier]
+        depths = [np.zeros(len(frontier), dtype=np.int32)]
+        for depth in range(1, hops + 1):
+            if not frontier.size:
+                break
+            neighbors, _ = self.expand(frontier, direction, relation_id)
+            frontier = np.unique(neighbors[~visited[neighbors]])
+            visited[frontier] = True
+            found.append(frontier)
+            depths.append(np.full(len(frontier), depth, dtype=np.int32))
+        return np.concatenate(found), np.concatenate(depths)
+
+    def reverse_dependencies(self, position: int, hops: int, relation: str = "depends_on") -> tuple[np.ndarray, np.ndarray]:
+        """Nodes that transitively depend on ``position`` through ``relation`` edges."""
+        positions, depth = self.k_hop([position], hops, direction="in", relation=relation)
+        return positions[1:], depth[1:]
+
+    def edges_from(self, positions: np.ndarray, relation: str | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Outgoing edges of ``positions`` as (source, target, relation id) arrays."""
+        relation_id = self.relation_id(relation)
+        sources, targets, relations = [], [], []
+        csr = self.forward
+        inside = positions[positions < csr.node_count]
+        starts = csr.offsets[inside]
+        lengths = csr.offsets[inside + 1] - starts
+        total = int(lengths.sum())
+        if total:
+            offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+            sources.append(np.repeat(inside, lengths))
+            targets.append(csr.neighbors[offsets])
+            relations.append(csr.relations[offsets])
+        if self.extra_out:
+            overlay = [
+                (position, target, edge_relation)
+                for position in positions.tolist()
+                for target, edge_relation in self.extra_out.get(position, ())
+            ]
+            if overlay:
+                extra = np.array(overlay, dtype=np.int32)
+                sources.append(extra[:, 0])
+                targets.append(extra[:, 1])
+                relations.append(extra[:, 2])
+        if not sources:
+            return _EMPTY, _EMPTY, _EMPTY
+        source, target, relation_ids = (np.concatenate(part).astype(np.int32) for part in (sources, targets, relations))
+        if relation_id is not None:
+            keep = relation_ids == relation_id
+            source, target, relation_ids = source[keep], target[keep], relation_ids[keep]
+        return source, target, relation_ids
+
+    def shortest_path(
+        self,
+        source: int,
+        target: int,
+        max_depth: int,
+        direction: str = "out",
+        relation: str | None = None,
+    ) -> list[int] | None:
+        if source == target:
+            return [source]
+        relation_id = self.relation_id(relation)
+        reverse = {"out": "in", "in": "out", "both": "both"}[direction]
+        # Bidirectional BFS: always grow the smaller frontier by one full level.
+        forward = _Search.start(self.node_count, source, direction)
+        backward = _Search.start(self.node_count, target, reverse)
+        while forward.frontier.size and backward.frontier.size and forward.depth + backward.depth < max_depth:
+            side, other = (forward, backward) if forward.frontier.size <= backward.frontier.size else (backward, forward)
+            neighbors, origins = self.expand(side.frontier, side.walk, relation_id)
+            fresh = side.distance[neighbors] < 0
+            side.frontier, first = np.unique(neighbors[fresh], return_index=True)
+            side.parent[side.frontier] = origins[fresh][first]
+            side.depth += 1
+            side.distance[side.frontier] = side.depth
+            met = side.frontier[other.distance[side.frontier] >= 0]
+            if met.size:
+                meet = int(met[np.argmin(other.distance[met])])
+                return forward.trace(meet)[::-1] + backward.trace(meet)[1:]
+        return None
+
+    def simple_paths(
+        self,
+        source: int,
+        target: int,
+        max_depth: int,
+        direction: str = "out",
+        relation: str | None = None,
+    ) -> Iterator[list[int]]:
+        """Yield simple paths of at most ``max_depth`` edges in depth-first order.
+
+        A reverse BFS from ``target`` gives every node's remaining distance, so
+        branches that cannot reach the target within the depth cap are skipped.
+        """
+        reverse = {"out": "in", "in": "out", "both": "both"}[direction]
+        positions, depth = self.k_hop([target], max_depth, reverse, relation)
+        remaining = np.full(self.node_count, max_depth + 1, dtype=np.int32)
+        remaining[positions] = depth
+        if remaining[source] > max_depth:
+            return
+        path = [source]
+        on_path = {source}
+        stack = [iter(np.unique(self.neighbors(source, direction, relation)).tolist())]
+        while stack:
+            for position in stack[-1]:
+                if position in on_path or len(path) + remaining[position] > max_depth:
+                    continue
+                if position == target:
+                    yield [*path, position]
+                    continue
+                path.append(position)
+                on_path.add(position)
+                stack.append(iter(np.unique(self.neighbors(position, direction, relation)).tolist()))
+                break
+            else:
+                stack.pop()
+                on_path.discard(path.pop())
+
+    def memory_bytes(self) -> int:
+        return self.forward.nbytes + self.reverse.nbytes
+
+
+@dataclass
+class _Search:
+    """One side of a bidirectional breadth-first search."""
+
+    walk: str
+    parent: np.ndarray
+    distance: np.ndarray
+    frontier: np.ndarray
+    depth: int = 0
+
+    @classmethod
+    def start(cls, node_count: int, origin: int, walk: str) -> _Search:
+        distance = np.full(node_count, -1, dtype=np.int32)
+        distance[origin] = 0
+        return cls(walk, np.full(node_count, -1, dtype=np.int32), distance, np.array([origin], dtype=np.int32))
+
+    def trace(self, position: int) -> list[int]:
+        """Positions from ``position`` back to this side's origin."""
+        path = [position]
+        while self.distance[path[-1]] > 0:
+            path.append(int(self.parent[path[-1]]))
+        return path
+
+
+def build_snapshot(
+    version: int,
+    node_count: int,
+    nodes: NodeTable,
+    relations: Interner,
+    sources: np.ndarray,
+    targets: np.ndarray,
+    relation_ids: np.ndarray,
+) -> GraphSnapshot:
+    return GraphSnapshot(
+        version=version,
+        node_count=node_count,
+        edge_count=len(sources),
+        nodes=nodes,
+        relations=relations,
+        forward=CSR.build(node_count, sources, targets, relation_ids),
+        reverse=CSR.build(node_count, targets, sources, relation_ids),
+        extra_out={},
+        extra_in={},
+    )
+
+
+@dataclass
+class IndexEntry:
+    snapshot: GraphSnapshot
+    source_version: int
+
+
+class GraphIndex:
+    def __init__(self, compact_threshold: int = COMPACT_THRESHOLD):
+        self.compact_threshold = compact_threshold
+        self._entries: dict[UUID, IndexEntry] = {}
+        self._versions = itertools.count(1)
+        self._lock = threading.RLock()
+        self.builds = 0
+        self.compactions = 0
+
+    def snapshot(self, session: Session, org_id: UUID) -> GraphSnapshot:
+        source_version = get_cache().version(org_id, INDEX_RESOURCE)
+        entry = self._entries.get(org_id)
+        if entry is not None and entry.source_version == source_version:
+            return entry.snapshot
+        with self._lock:
+            entry = self._entries.get(org_id)
+            if entry is None or entry.source_version != source_version:
+                entry = IndexEntry(self._load(session, org_id), source_version)
+                self._entries[org_id] = entry
+            return entry.snapshot
+
+    def _load(self, session: Session, org_id: UUID) -> GraphSnapshot:
+        nodes = NodeTable()
+        for node_id, label, node_type, properties in session.exec(
+            select(KGNode.id, KGNode.label, KGNode.node_type, KGNode.properties).where(KGNode.org_id == org_id)
+        ).all():
+            nodes.append(node_id, label, node_type, properties)
+        relations = Interner()
+        sources, targets, relation_ids = [], [], []
+        positions = nodes.positions
+        for source_id, target_id, relation in session.exec(
+            select(KGEdge.source_id, KGEdge.target_id, KGEdge.relation).where(KGEdge.org_id == org_id)
+        ).all():
+            source, target = positions.get(source_id), positions.get(target_id)
+            if source is None or target is None:
+                continue
+            sources.append(source)
+            targets.append(target)
+            relation_ids.append(relations.intern(relation))
+        self.builds += 1
+        return build_snapshot(
+            next(self._versions),
+            len(nodes.ids),
+            nodes,
+            relations,
+            np.array(sources, dtype=np.int32),
+            np.array(targets, dtype=np.int32),
+            np.array(relation_ids, dtype=np.int32),
+        )
+
+    def _publish(self, org_id: UUID, entry: IndexEntry, snapshot: GraphSnapshot) -> None:
+        """Swap in ``snapshot`` and adopt the new shared version if nobody else wrote meanwhile."""
+        version = get_cache().bump(org_id, INDEX_RESOURCE)
+        if version == entry.source_version + 1:
+            self._entries[org_id] = IndexEntry(snapshot, version)
+        else:
+            self._entries.pop(org_id, None)
+
+    def add_node(self, org_id: UUID, node: KGNode) -> None:
+        with self._lock:
+            entry = self._entries.get(org_id)
+            if entry is None:
+                get_cache().bump(org_id, INDEX_RESOURCE)
+                return
+            current = entry.snapshot
+            position = current.nodes.append(node.id, node.label, node.node_type, node.properties)
+            self._publish(
+                org_id,
+                entry,
+                replace(current, version=next(self._versions), node_count=max(current.node_count, position + 1)),
+            )
+
+    def add_edge(self, org_id: UUID, edge: KGEdge) -> None:
+        with self._lock:
+            entry = self._entries.get(org_id)
+            if entry is None:
+                get_cache().bump(org_id, INDEX_RESOURCE)
+                return
+            current = entry.snapshot
+            source, target = current.position(edge.source_id), current.position(edge.target_id)
+            if source is None or target is None:
+                self.invalidate(org_id)
+                return
+            relation = current.relations.intern(edge.relation)
+            extra_out = dict(current.extra_out)
+            extra_out[source] = extra_out.get(source, ()) + ((target, relation),)
+            extra_in = dict(current.extra_in)
+            extra_in[target] = extra_in.get(target, ()) + ((source, relation),)
+            updated = replace(
+                current,
+                version=next(self._versions),
+                edge_count=current.edge_count + 1,
+                extra_out=extra_out,
+                extra_in=extra_in,
+            )
+            if updated.overlay_edges >= self.compact_threshold:
+                updated = self._compact(updated)
+            self._publish(org_id, entry, updated)
+
+    def _compact(self, snapshot: GraphSnapshot) -> GraphSnapshot:
+        forward = snapshot.forward
+        base_sources = np.repeat(np.arange(forward.node_count, dtype=np.int32), np.diff(forward.offsets))
+        overlay = [(source, target, relation) for source, edges in snapshot.extra_out.items() for target, relation in edges]
+        extra = np.array(overlay, dtype=np.int32).reshape(-1, 3)
+        self.compactions += 1
+        return build_snapshot(
+            next(self._versions),
+            snapshot.node_count,
+            snapshot.nodes,
+            snapshot.relations,
+            np.concatenate([base_sources, extra[:, 0]]),
+            np.concatenate([forward.neighbors, extra[:, 1]]),
+            np.concatenate([forward.relations, extra[:, 2]]),
+        )
+
+    def invalidate(self, org_id: UUID) -> None:
+        """Drop the org's index (e.g. after deletes); the next reader rebuilds it."""
+        with self._lock:
+            self._entries.pop(org_id, None)
+            get_cache().bump(org_id, INDEX_RESOURCE)
+
+    def stats(self, org_id: UUID) -> dict:
+        entry = self._entries.get(org_id)
+        snapshot = entry.snapshot if entry is not None else None
+        return {
+            "loaded": snapshot is not None,
+            "version": snapshot.version if snapshot else None,
+            "nodes": snapshot.node_count if snapshot else 0,
+            "edges": snapshot.edge_count if snapshot else 0,
+            "overlay_edges": snapshot.overlay_edges if snapshot else 0,
+            "relations": len(snapshot.relations.names) if snapshot else 0,
+            "memory_bytes": snapshot.memory_bytes() if snapshot else 0,
+            "builds": self.builds,
+            "compactions": self.compactions,
+        }
+
+
+@lru_cache
+def get_graph_index() -> GraphIndex:
+    return GraphIndex()
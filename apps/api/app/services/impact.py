@@ -0,0 +1,248 @@
+"""Blast-radius analysis over the knowledge graph.
+
+The services an incident touches seed a bounded breadth-first walk over
+reverse ``depends_on`` edges: everything that depends on an affected node,
+directly or transitively, is impacted. Each impacted node is scored by the
+incident's severity, the node's ``tier`` property and a per-hop decay.
+The incident's services are memoized per graph version and signal version,
+and traversals per (graph version, seed set, depth), so repeated views of
+the same incident cost dictionary lookups until the graph or its signals
+change. Matching a title against graph labels uses a word index built once
+per graph version rather than a scan of every label.
+"""
+from __future__ import annotations
+
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from uuid import UUID
+
+import numpy as np
+from sqlmodel import Session, select
+
+from app.db.models import Incident, IncidentSignal
+from app.services.cache import get_cache
+from app.services.graph_index import GraphSnapshot, get_graph_index
+
+IMPACT_RELATION = "depends_on"
+# Bumped by ingestion when new signal rows land, so resolved incident services are re-read.
+SERVICES_RESOURCE = "incident.services"
+HOP_DECAY = 0.7
+SEVERITY_WEIGHTS = {"critical": 1.0, "sev1": 1.0, "high": 0.8, "sev2": 0.8, "medium": 0.5, "sev3": 0.5, "low": 0.25}
+DEFAULT_SEVERITY_WEIGHT = 0.5
+TIER_WEIGHTS = {
+    "0": 1.0,
+    "1": 1.0,
+    "critical": 1.0,
+    "edge": 0.9,
+    "frontend": 0.9,
+    "2": 0.7,
+    "backend": 0.8,
+    "data": 0.8,
+    "3": 0.4,
+    "internal": 0.5,
+}
+DEFAULT_TIER_WEIGHT = 0.6
+CRITICAL_TIER_WEIGHT = 0.9
+# Suffixes ignored when matching a node label against an incident title ("payments-api" ~ "Payments").
+GENERIC_LABEL_TOKENS = {"api", "app", "service", "svc", "web", "server"}
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def incident_services(
+    session: Session, org_id: UUID, incident: Incident, graph: GraphSnapshot, memo: ImpactMemo | None = None
+) -> frozenset[str]:
+    """Services named by the incident's signals, else graph labels mentioned in its title.
+
+    Memoized per incident title, graph version and the org's SERVICES_RESOURCE
+    version, which ingestion bumps whenever it writes new signal rows.
+    """
+    memo = memo or get_impact_memo()
+    key = ("services", org_id, incident.id, incident.title, graph.version, get_cache().version(org_id, SERVICES_RESOURCE))
+    return memo.get_or_compute(key, lambda: _resolve_services(session, org_id, incident, graph, memo))
+
+
+def _resolve_services(session: Session, org_id: UUID, incident: Incident, graph: GraphSnapshot, memo: ImpactMemo) -> frozenset[str]:
+    services = frozenset(
+        session.exec(
+            select(IncidentSignal.service)
+            .where(IncidentSignal.org_id == org_id)
+            .where(IncidentSignal.incident_id == incident.id)
+            .where(IncidentSignal.service.is_not(None))
+            .distinct()
+        ).all()
+    )
+    return services or labels_in_title(graph, incident.title, memo)
+
+
+def labels_in_title(graph: GraphSnapshot, title: str, memo: ImpactMemo) -> frozenset[str]:
+    title = title.lower()
+    words = set(_WORD.findall(title))
+    index = memo.get_or_compute(("labels", graph.version), lambda: _label_index(graph))
+    matched = set()
+    for word in words:
+        for label, lower, tokens in index.get(word, ()):
+            if lower in title or (tokens and tokens <= words):
+                matched.add(label)
+    return frozenset(matched)
+
+
+def _label_index(graph: GraphSnapshot) -> dict[str, list[tuple[str, str, frozenset[str]]]]:
+    """Labels by word, so a title is matched against the labels sharing one of its words.
+
+    Labels are filed under their non-generic words ("payments-api" under
+    "payments"), or under all of them when every word is generic.
+    """
+    index: dict[str, list[tuple[str, str, frozenset[str]]]] = {}
+    for label in graph.nodes.by_label:
+        lower = label.lower()
+        words = set(_WORD.findall(lower))
+        tokens = frozenset(words - GENERIC_LABEL_TOKENS)
+        for word in tokens or words:
+            index.setdefault(word, []).append((label, lower, tokens))
+    return index
+
+
+@dataclass(frozen=True)
+class Traversal:
+    seeds: np.ndarray
+    positions: np.ndarray
+    depth: np.ndarray
+
+
+class ImpactMemo:
+    """LRU of traversals and per-snapshot tier weights keyed by graph version."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, object] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key: tuple, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        value = compute()
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def tier_weight(properties: dict) -> float:
+    tier = properties.get("tier")
+    if tier is None:
+        return DEFAULT_TIER_WEIGHT
+    return TIER_WEIGHTS.get(str(tier).lower(), DEFAULT_TIER_WEIGHT)
+
+
+def _tier_weights(graph: GraphSnapshot) -> np.ndarray:
+    properties = graph.nodes.properties
+    return np.fromiter((tier_weight(properties[i]) for i in range(graph.node_count)), dtype=np.float32, count=graph.node_count)
+
+
+def snapshot_tier_weights(graph: GraphSnapshot, memo: ImpactMemo) -> np.ndarray:
+    """Tier weight of every node in ``graph``, computed once per graph version."""
+    return memo.get_or_compute(("tiers", graph.version), lambda: _tier_weights(graph))
+
+
+def blast_radius(graph: GraphSnapshot, seeds: list[int], max_hops: int, memo: ImpactMemo) -> Traversal:
+    seed_array = np.unique(np.array(seeds, dtype=np.int32))
+    key = ("bfs", graph.version, seed_array.tobytes(), max_hops)
+
+    def compute() -> Traversal:
+        positions, depth = graph.k_hop(seed_array.tolist(), max_hops, direction="in", relation=IMPACT_RELATION)
+        impacted = depth > 0
+        return Traversal(seed_array, positions[impacted], depth[impacted])
+
+    return memo.get_or_compute(key, compute)
+
+
+def analyze_impact(
+    session: Session,
+    org_id: UUID,
+    incident: Incident,
+    max_hops: int = 4,
+    limit: int = 50,
+    memo: ImpactMemo | None = None,
+) -> dict:
+    memo = memo or get_impact_memo()
+    graph = get_graph_index().snapshot(session, org_id)
+    services = incident_services(session, org_id, incident, graph, memo)
+    seeds = graph.positions_for_labels(services)
+    severity_weight = SEVERITY_WEIGHTS.get(incident.severity.lower(), DEFAULT_SEVERITY_WEIGHT)
+    result = {
+        "incident_id": str(incident.id),
+        "severity": incident.severity,
+        "graph_version": graph.version,
+        "seeds": [graph.node(position) for position in seeds],
+        "impacted": [],
+        "total_impacted": 0,
+        "critical_impacted": 0,
+        "max_depth": 0,
+    }
+    if not seeds:
+        result["impact"] = "No affected services found in the knowledge graph."
+        return result
+
+    result.update(summarize_impact(graph, seeds, max_hops, limit, severity_weight, memo))
+    return result
+
+
+def summarize_impact(graph: GraphSnapshot, seeds: list[int], max_hops: int, limit: int, severity_weight: float, memo: ImpactMemo) -> dict:
+    seed_key = np.unique(np.array(seeds, dtype=np.int32)).tobytes()
+    return memo.get_or_compute(
+        ("summary", graph.version, seed_key, max_hops, limit, severity_weight),
+        lambda: _summarize(graph, seeds, max_hops, limit, severity_weight, memo),
+    )
+
+
+def _summarize(graph: GraphSnapshot, seeds: list[int], max_hops: int, limit: int, severity_weight: float, memo: ImpactMemo) -> dict:
+    traversal = blast_radius(graph, seeds, max_hops, memo)
+    weights = snapshot_tier_weights(graph, memo)
+    node_weights = weights[traversal.positions]
+    scores = severity_weight * node_weights * HOP_DECAY ** traversal.depth.astype(np.float32)
+    if len(scores) > limit:
+        top = np.argpartition(-scores, limit)[:limit]
+        order = top[np.argsort(-scores[top], kind="stable")]
+    else:
+        order = np.argsort(-scores, kind="stable")
+    total = len(traversal.positions)
+    critical = int(np.count_nonzero(node_weights >= CRITICAL_TIER_WEIGHT))
+    max_depth = int(traversal.depth.max()) if total else 0
+    seed_labels = ", ".join(sorted({graph.nodes.labels[position] for position in seeds}))
+    if total:
+        impact = f"{total} dependent node(s) impacted within {max_depth} hop(s) of {seed_labels} ({critical} critical tier)."
+    else:
+        impact = f"No dependents of {seed_labels} found; impact is contained."
+    return {
+        "impacted": [
+            {
+                **graph.node(int(traversal.positions[i])),
+                "depth": int(traversal.depth[i]),
+                "score": round(float(scores[i]), 4),
+            }
+            for i in order
+        ],
+        "total_impacted": total,
+        "critical_impacted": critical,
+        "max_depth": max_depth,
+        "impact": impact,
+    }
+
+
+@lru_cache
+def get_impact_memo() -> ImpactMemo:
+    return ImpactMemo()
@@ -0,0 +1,523 @@
+"""Streaming ingestion of log, metric and trace events into IncidentSignal rows.
+
+Batches arrive as NDJSON (optionally gzip-compressed), are validated and
+queued per tenant, and a single writer thread drains the queues. Each batch
+passes the dedup stage first: repeats of a live signal only bump its
+occurrence counters, and the remaining rows go out as one multi-row
+``INSERT ... ON CONFLICT DO NOTHING`` keyed by the event fingerprint, so
+retried batches never create duplicate rows. Every event's fingerprint is
+kept in SignalFingerprint for DEDUP_FINGERPRINT_RETENTION_SECONDS.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import time
+import zlib
+from collections import deque
+from collections.abc import AsyncIterator, Iterable
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from functools import lru_cache
+from uuid import UUID, uuid4
+
+from sqlalchemy import bindparam, delete, insert, update
+from sqlmodel import Session, select
+
+from app.core.config import get_settings
+from app.db.models import Incident, IncidentSignal, SignalFingerprint, utc_now
+from app.db.session import engine
+from app.services.cache import get_cache
+from app.services.dedup import DedupEntry, SignalDeduplicator, dedup_key, error_signature, get_deduplicator
+from app.services.events import publish_event
+from app.services.impact import SERVICES_RESOURCE
+from app.services.insight import record_incidents_opened
+
+logger = logging.getLogger("opsmind.ingestion")
+
+SIGNAL_TYPES = {"log", "metric", "trace"}
+THROUGHPUT_WINDOW_SECONDS = 60.0
+FINGERPRINT_PRUNE_INTERVAL_SECONDS = 300.0
+
+
+class BackpressureError(Exception):
+    def __init__(self, queued: int, capacity: int):
+        super().__init__(f"Ingest queue full ({queued}/{capacity})")
+        self.queued = queued
+        self.capacity = capacity
+
+
+@dataclass
+class SignalEvent:
+    incident_id: UUID | None
+    type: str
+    payload: dict
+    fingerprint: str
+    observed_at: datetime | None
+    received_at: float
+    service: str | None = None
+    severity: str | None = None
+
+    @property
+    def dedup_key(self) -> str:
+        incident = str(self.incident_id) if self.incident_id else ""
+        return dedup_key(self.service, self.type, f"{incident}|{error_signature(self.payload)}")
+
+
+def event_fingerprint(raw: dict) -> str:
+    """Stable identity of an event; an explicit ``event_id`` wins over content hashing."""
+    if raw.get("event_id"):
+        basis = f"id:{raw['event_id']}"
+    else:
+        basis = json.dumps(
+            [raw.get("incident_id"), raw.get("type"), raw.get("timestamp"), raw.get("payload")],
+            sort_keys=True,
+            default=str,
+        )
+    return hashlib.sha256(basis.encode()).hexdigest()[:32]
+
+
+def validate_event(raw: object, received_at: float) -> SignalEvent:
+    if not isinstance(raw, dict):
+        raise ValueError("event must be a JSON object")
+    event_type = raw.get("type")
+    if event_type not in SIGNAL_TYPES:
+        raise ValueError(f"type must be one of {sorted(SIGNAL_TYPES)}")
+    incident_id = None
+    if raw.get("incident_id") is not None:
+        try:
+            incident_id = UUID(str(raw["incident_id"]))
+        except ValueError as exc:
+            raise ValueError("incident_id must be a UUID") from exc
+    payload = raw.get("payload", {})
+    if not isinstance(payload, dict):
+        raise ValueError("payload must be a JSON object")
+    service = raw.get("service") or payload.get("service")
+    observed_at = None
+    if raw.get("timestamp") is not None:
+        try:
+            observed_at = datetime.fromisoformat(str(raw["timestamp"]).replace("Z", "+00:00")).replace(tzinfo=None)
+        except ValueError as exc:
+            raise ValueError("timestamp must be ISO-8601") from exc
+    return SignalEvent(
+        incident_id=incident_id,
+        type=event_type,
+        payload=payload,
+        fingerprint=event_fingerprint(raw),
+        observed_at=observed_at,
+        received_at=received_at,
+        service=str(service) if service else None,
+        severity=raw.get("severity"),
+    )
+
+
+class LineTooLongError(ValueError):
+    pass
+
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes], gzipped: bool, max_line_bytes: int | None = None) -> AsyncIterator[bytes]:
+    """Split a (possibly gzip-compressed) byte stream into lines without buffering the whole body.
+
+    Raises LineTooLongError once an unterminated line grows past ``max_line_bytes``.
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+    pending = b""
+    async for chunk in chunks:
+        if decompressor is not None:
+            chunk = decompressor.decompress(chunk)
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+        if max_line_bytes is not None and len(pending) > max_line_bytes:
+            raise LineTooLongError(f"NDJSON line longer than {max_line_bytes} bytes")
+    if decompressor is not None:
+        pending += decompressor.flush()
+    if pending.strip():
+        yield pending
+
+
+@dataclass
+class TenantIngestState:
+    queue: deque[SignalEvent] = field(default_factory=deque)
+    accepted: int = 0
+    rejected: int = 0
+    throttled: int = 0
+    written: int = 0
+    duplicates: int = 0
+    failed_flushes: int = 0
+    last_flush_error: str | None = None
+    last_flush_at: float | None = None
+    last_event_lag_seconds: float = 0.0
+    flushes: deque[tuple[float, int]] = field(default_factory=deque)
+
+
+class IngestionPipeline:
+    def __init__(self, queue_capacity: int, batch_size: int, flush_interval_seconds: float):
+        self.queue_capacity = queue_capacity
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self._tenants: dict[UUID, TenantIngestState] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._writer: threading.Thread | None = None
+        self._pruned_at = 0.0
+
+    def _tenant(self, org_id: UUID) -> TenantIngestState:
+        state = self._tenants.get(org_id)
+        if state is None:
+            state = self._tenants.setdefault(org_id, TenantIngestState())
+        return state
+
+    def submit(self, org_id: UUID, events: list[SignalEvent], rejected: int = 0) -> None:
+        """Queue a validated batch, all or nothing, so a throttled client can retry it whole."""
+        with self._lock:
+            state = self._tenant(org_id)
+            state.rejected += rejected
+            if len(state.queue) + len(events) > self.queue_capacity:
+                state.throttled += len(events)
+                raise BackpressureError(len(state.queue), self.queue_capacity)
+            state.queue.extend(events)
+            state.accepted += len(events)
+        self._ensure_writer()
+        if len(state.queue) >= self.batch_size:
+            self._wakeup.set()
+
+    def _ensure_writer(self) -> None:
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._run, name="opsmind-ingest-writer", daemon=True)
+                self._writer.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.flush_interval_seconds)
+            self._wakeup.clear()
+            try:
+                while self.flush_once():
+                    pass
+                self._prune_fingerprints()
+            except Exception:  # pragma: no cover - keep the writer alive across DB errors
+                logger.exception("ingest_flush_failed")
+                time.sleep(self.flush_interval_seconds)
+
+    def _prune_fingerprints(self) -> None:
+        if time.time() - self._pruned_at < FINGERPRINT_PRUNE_INTERVAL_SECONDS:
+            return
+        self._pruned_at = time.time()
+        retention = timedelta(seconds=get_settings().dedup_fingerprint_retention_seconds)
+        with Session(engine) as session:
+            prune_fingerprints(session, utc_now() - retention)
+
+    def _drain(self) -> list[tuple[UUID, list[SignalEvent]]]:
+        batches = []
+        with self._lock:
+            for org_id, state in self._tenants.items():
+                if not state.queue:
+                    continue
+                count = min(self.batch_size, len(state.queue))
+                batches.append((org_id, [state.queue.popleft() for _ in range(count)]))
+        return batches
+
+    def flush_once(self) -> bool:
+        """Write one batch per tenant; returns True while any queue still has work.
+
+        A batch whose write fails goes back to the front of its tenant's queue
+        and is retried on the next flush; False is returned so the writer
+        waits a flush interval instead of retrying in a tight loop.
+        """
+        batches = self._drain()
+        failed = False
+        for org_id, events in batches:
+            try:
+                with Session(engine) as session:
+                    written = write_signals(session, org_id, events)
+            except Exception as exc:
+                logger.exception("ingest_batch_failed", extra={"org_id": str(org_id), "events": len(events)})
+                self._requeue(org_id, events, exc)
+                failed = True
+                continue
+            self._record_flush(org_id, events, written)
+        with self._lock:
+            return not failed and any(state.queue for state in self._tenants.values())
+
+    def _requeue(self, org_id: UUID, events: list[SignalEvent], exc: Exception) -> None:
+        with self._lock:
+            state = self._tenant(org_id)
+            state.queue.extendleft(reversed(events))
+            state.failed_flushes += 1
+            state.last_flush_error = f"{type(exc).__name__}: {exc}"[:200]
+
+    def _record_flush(self, org_id: UUID, events: list[SignalEvent], written: int) -> None:
+        now = time.time()
+        with self._lock:
+            state = self._tenant(org_id)
+            state.written += written
+            state.duplicates += len(events) - written
+            state.last_flush_at = now
+            state.last_event_lag_seconds = now - min(event.received_at for event in events)
+            state.flushes.append((now, len(events)))
+            while state.flushes and state.flushes[0][0] < now - THROUGHPUT_WINDOW_SECONDS:
+                state.flushes.popleft()
+        if written:
+            incident_ids = sorted({str(event.incident_id) for event in events if event.incident_id})
+            publish_event(org_id, "signals.ingested", {"count": written, "incident_ids": incident_ids[:100]})
+
+    def queued(self) -> int:
+        """Events waiting to be written, across tenants."""
+        with self._lock:
+            return sum(len(state.queue) for state in self._tenants.values())
+
+    def remaining(self, org_id: UUID) -> int:
+        """Events ``org_id`` can still queue before submits are throttled."""
+        with self._lock:
+            return self.queue_capacity - len(self._tenant(org_id).queue)
+
+    def throttle(self, org_id: UUID, count: int) -> None:
+        """Count events refused before they reached ``submit``."""
+        with self._lock:
+            self._tenant(org_id).throttled += count
+
+    def stats(self, org_id: UUID) -> dict:
+        now = time.time()
+        with self._lock:
+            state = self._tenant(org_id)
+            recent = [count for at, count in state.flushes if at >= now - THROUGHPUT_WINDOW_SECONDS]
+            return {
+                "queued": len(state.queue),
+                "queue_capacity": self.queue_capacity,
+                "queue_lag_seconds": round(now - state.queue[0].received_at, 3) if state.queue else 0.0,
+                "last_flush_lag_seconds": round(state.last_event_lag_seconds, 3),
+                "throughput_events_per_second": round(sum(recent) / THROUGHPUT_WINDOW_SECONDS, 2),
+                "accepted": state.accepted,
+                "rejected": state.rejected,
+                "throttled": state.throttled,
+                "written": state.written,
+                "duplicates": state.duplicates,
+                "failed_flushes": state.failed_flushes,
+                "last_flush_error": state.last_flush_error,
+                "last_flush_at": state.last_flush_at,
+                "dedup": get_deduplicator().stats(),
+            }
+
+
+def _insert_ignoring_duplicates(dialect_name: str):
+    table = IncidentSignal.__table__
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:  # pragma: no cover - other backends fall back to a plain insert
+        return insert(table).returning(table.c.id, table.c.dedup_key)
+    return (
+        dialect_insert(table)
+        .on_conflict_do_nothing(index_elements=["org_id", "fingerprint"])
+        .returning(table.c.id, table.c.dedup_key)
+    )
+
+
+def _claim_fingerprints(session: Session, org_id: UUID, fingerprints: list[str], now: datetime) -> set[str]:
+    """Record event fingerprints and return those no earlier batch had recorded."""
+    table = SignalFingerprint.__table__
+    dialect_name = session.get_bind().dialect.name
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:  # pragma: no cover - other backends fall back to a plain insert
+        dialect_insert = None
+    statement = insert(table) if dialect_insert is None else dialect_insert(table).on_conflict_do_nothing()
+    rows = [{"org_id": org_id, "fingerprint": fingerprint, "created_at": now} for fingerprint in fingerprints]
+    claimed = session.execute(statement.returning(table.c.fingerprint), rows).scalars().all()
+    return set(claimed)
+
+
+def prune_fingerprints(session: Session, older_than: datetime) -> int:
+    table = SignalFingerprint.__table__
+    result = session.execute(delete(table).where(table.c.created_at < older_than))
+    session.commit()
+    return result.rowcount or 0
+
+
+def _drop_foreign_incidents(session: Session, org_id: UUID, events: Iterable[SignalEvent]) -> None:
+    """Clear incident ids that are not ``org_id``'s, so those events open an incident of their own."""
+    events = [event for event in events if event.incident_id is not None]
+    if not events:
+        return
+    requested = {event.incident_id for event in events}
+    owned = set(session.exec(select(Incident.id).where(Incident.org_id == org_id, Incident.id.in_(requested))).all())
+    foreign = requested - owned
+    if not foreign:
+        return
+    logger.warning(
+        "ingest_foreign_incident_ids", extra={"org_id": str(org_id), "incident_ids": sorted(str(incident_id) for incident_id in foreign)[:20]}
+    )
+    for event in events:
+        if event.incident_id in foreign:
+            event.incident_id = None
+
+
+def _open_incidents_for(session: Session, org_id: UUID, rows: list[dict], groups: dict[str, list[SignalEvent]]) -> list[Incident]:
+    """Open the incident each inserted row was assigned, one per new storm key."""
+    incidents = []
+    for row in rows:
+        group = groups[row["dedup_key"]]
+        first = group[0]
+        signature = error_signature(first.payload) or first.type
+        incidents.append(
+            Incident(
+                id=row["incident_id"],
+                org_id=org_id,
+                title=f"{first.service or 'unknown service'}: {signature}"[:200],
+                status="open",
+                severity=first.severity or "medium",
+                description=f"Opened from {len(group)} {first.type} signal(s).",
+            )
+        )
+    session.add_all(incidents)
+    return incidents
+
+
+def _flush_counters(session: Session, collapsed: list[tuple[DedupEntry, int, datetime]]) -> None:
+    if not collapsed:
+        return
+    table = IncidentSignal.__table__
+    statement = (
+        update(table)
+        .where(table.c.id == bindparam("signal_id"))
+        .values(occurrences=table.c.occurrences + bindparam("increment"), last_seen_at=bindparam("seen"))
+    )
+    session.connection().execute(
+        statement,
+        [
+            {"signal_id": entry.signal_id, "increment": count, "seen": max(entry.last_seen, last_seen)}
+            for entry, count, last_seen in collapsed
+        ],
+    )
+
+
+def write_signals(
+    session: Session,
+    org_id: UUID,
+    events: Iterable[SignalEvent],
+    deduplicator: SignalDeduplicator | None = None,
+) -> int:
+    """Persist a batch through the dedup stage and return how many rows were new.
+
+    Every event fingerprint is claimed in SignalFingerprint first, so an event
+    that an earlier batch (from any worker) already carried is dropped. The
+    rest are grouped by dedup key; a group whose key is still live only
+    increments the existing row's counters, every other group becomes a single
+    row carrying its occurrence count and first/last-seen timestamps. Incidents
+    are opened only for rows the insert actually returned, and all of it
+    commits together. The deduplicator is updated only after that commit.
+    An ``incident_id`` that is not one of ``org_id``'s incidents is dropped,
+    and the event opens an incident as if it had named none.
+    """
+    deduplicator = deduplicator or get_deduplicator()
+    now = utc_now()
+    candidates: dict[str, SignalEvent] = {}
+    for event in events:
+        if event.fingerprint not in candidates and not deduplicator.seen_fingerprint(org_id, event.fingerprint):
+            candidates[event.fingerprint] = event
+    if not candidates:
+        return 0
+
+    _drop_foreign_incidents(session, org_id, candidates.values())
+    claimed = _claim_fingerprints(session, org_id, list(candidates), now)
+    groups: dict[str, list[SignalEvent]] = {}
+    for fingerprint, event in candidates.items():
+        if fingerprint in claimed:
+            groups.setdefault(event.dedup_key, []).append(event)
+
+    fresh: dict[str, list[SignalEvent]] = {}
+    collapsed: list[tuple[DedupEntry, int, datetime]] = []
+    for key, group in groups.items():
+        entry = deduplicator.lookup(org_id, key)
+        if entry is None:
+            fresh[key] = group
+        else:
+            collapsed.append((entry, len(group), max(event.observed_at or now for event in group)))
+
+    rows = []
+    new_incident_keys = set()
+    for key, group in fresh.items():
+        first = group[0]
+        seen = [event.observed_at or now for event in group]
+        if first.incident_id is None:
+            new_incident_keys.add(key)
+        rows.append(
+            {
+                "id": uuid4(),
+                "org_id": org_id,
+                "incident_id": first.incident_id or uuid4(),
+                "type": first.type,
+                "service": first.service,
+                "payload": first.payload,
+                "fingerprint": first.fingerprint,
+                "dedup_key": key,
+                "occurrences": len(group),
+                "observed_at": first.observed_at,
+                "first_seen_at": min(seen),
+                "last_seen_at": max(seen),
+                "created_at": now,
+            }
+        )
+    inserted = []
+    if rows:
+        statement = _insert_ignoring_duplicates(session.get_bind().dialect.name)
+        inserted = session.execute(statement, rows).all()
+    by_key = {row["dedup_key"]: row for row in rows}
+    inserted_rows = [(signal_id, by_key[key]) for signal_id, key in inserted]
+    incidents = _open_incidents_for(
+        session, org_id, [row for _, row in inserted_rows if row["dedup_key"] in new_incident_keys], fresh
+    )
+    _flush_counters(session, collapsed)
+    session.flush()
+    record_incidents_opened(session, incidents)
+    opened = [
+        {"id": str(incident.id), "title": incident.title, "status": incident.status, "severity": incident.severity}
+        for incident in incidents
+    ]
+    session.commit()
+
+    deduplicator.remember_fingerprints(org_id, candidates)
+    for entry, count, last_seen in collapsed:
+        deduplicator.collapse(entry, count, last_seen)
+    for signal_id, row in inserted_rows:
+        for event in fresh[row["dedup_key"]]:
+            event.incident_id = row["incident_id"]
+        deduplicator.register(
+            DedupEntry(
+                org_id=org_id,
+                key=row["dedup_key"],
+                signal_id=signal_id,
+                incident_id=row["incident_id"],
+                occurrences=row["occurrences"],
+                first_seen=row["first_seen_at"],
+                last_seen=row["last_seen_at"],
+                touched_at=time.time(),
+            )
+        )
+    if inserted:
+        get_cache().invalidate(org_id, SERVICES_RESOURCE)
+    if opened:
+        get_cache().invalidate(org_id, "incidents")
+        for delta in opened:
+            publish_event(org_id, "incident.created", delta)
+    return len(inserted)
+
+
+@lru_cache
+def get_ingestion_pipeline() -> IngestionPipeline:
+    settings = get_settings()
+    return IngestionPipeline(
+        queue_capacity=settings.ingest_queue_capacity,
+        batch_size=settings.ingest_batch_size,
+        flush_interval_seconds=settings.ingest_flush_interval_ms / 1000,
+    )
@@ -0,0 +1,334 @@
+"""Incrementally maintained insight rollups.
+
+Every state change the highlights care about already writes an audit
+event, so ``apply_audit_event`` runs inside ``record_audit_event`` and folds
+the event into per-org, per-day ``InsightRollup`` counters in the same
+transaction. A counter row holds a count and a running total, so means
+(MTTA, MTTR, RCA approval latency) and rates (remediation success and
+rollback) come from a bounded number of rows, never from a scan of the
+history. Counters are bumped with ``INSERT ... ON CONFLICT DO UPDATE``, so
+concurrent writers add to the same row instead of racing on a read.
+
+MTTA and MTTR need to know when an incident opened and whether it was
+already acknowledged or resolved. That lives in one ``IncidentLifecycle``
+row per incident, created lazily for incidents that predate the rollups.
+"""
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from collections.abc import Callable, Iterable
+from datetime import datetime, timedelta
+from uuid import UUID, uuid4
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from app.db.models import (
+    AuditEvent,
+    Incident,
+    IncidentLifecycle,
+    InsightRollup,
+    RCAReport,
+    RemediationJob,
+    utc_now,
+)
+
+OPEN_STATUS = "open"
+RESOLVED_STATUSES = {"resolved", "closed"}
+REMEDIATION_EVENTS = {
+    "remedy.proposed": "remediation.proposed",
+    "remedy.approved": "remediation.approved",
+    "remedy.executed": "remediation.executed",
+    "remedy.failed": "remediation.failed",
+    "remedy.rolled_back": "remediation.rolled_back",
+}
+# Rollbacks are counted under the outcome they undid: only rolling back an
+# executed action counts against the success rate, a failed one already did.
+ROLLBACK_OF_EXECUTED = "executed"
+ROLLBACK_OF_FAILED = "failed"
+# Relative changes smaller than this are not worth a highlight.
+HIGHLIGHT_MIN_CHANGE = 0.05
+
+
+def bucket_of(moment: datetime) -> datetime:
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _upsert(dialect_name: str, values: dict):
+    table = InsightRollup.__table__
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:  # pragma: no cover - other backends go through bump()'s read-modify-write
+        return None
+    return (
+        dialect_insert(table)
+        .values(**values)
+        .on_conflict_do_update(
+            index_elements=["org_id", "bucket", "metric", "dimension"],
+            set_={
+                "count": table.c.count + values["count"],
+                "total": table.c.total + values["total"],
+                "updated_at": values["updated_at"],
+            },
+        )
+    )
+
+
+def bump(session: Session, org_id: UUID, at: datetime, metric: str, dimension: str = "", count: int = 1, total: float = 0.0) -> None:
+    values = {
+        "id": uuid4(),
+        "org_id": org_id,
+        "bucket": bucket_of(at),
+        "metric": metric,
+        "dimension": dimension,
+        "count": count,
+        "total": total,
+        "updated_at": utc_now(),
+    }
+    statement = _upsert(session.get_bind().dialect.name, values)
+    if statement is not None:
+        session.execute(statement)
+        return
+    row = session.exec(
+        select(InsightRollup)
+        .where(InsightRollup.org_id == org_id)
+        .where(InsightRollup.bucket == values["bucket"])
+        .where(InsightRollup.metric == metric)
+        .where(InsightRollup.dimension == dimension)
+    ).first()
+    if row is None:
+        session.add(InsightRollup(**values))
+        return
+    row.count += count
+    row.total += total
+    row.updated_at = values["updated_at"]
+    session.add(row)
+
+
+def _lifecycle(session: Session, incident: Incident) -> IncidentLifecycle:
+    lifecycle = session.get(IncidentLifecycle, incident.id)
+    if lifecycle is None:
+        lifecycle = IncidentLifecycle(
+            incident_id=incident.id, org_id=incident.org_id, severity=incident.severity, opened_at=incident.created_at
+        )
+    return lifecycle
+
+
+def record_incidents_opened(session: Session, incidents: Iterable[Incident]) -> None:
+    for incident in incidents:
+        session.add(_lifecycle(session, incident))
+        bump(session, incident.org_id, incident.created_at, "incident.opened", incident.severity)
+
+
+def _incident(session: Session, event: AuditEvent) -> Incident | None:
+    try:
+        incident = session.get(Incident, UUID(str(event.detail.get("incident_id"))))
+    except ValueError:
+        return None
+    return incident if incident is not None and incident.org_id == event.org_id else None
+
+
+def _incident_created(session: Session, event: AuditEvent) -> None:
+    incident = _incident(session, event)
+    if incident is not None:
+        record_incidents_opened(session, [incident])
+
+
+def _incident_updated(session: Session, event: AuditEvent) -> None:
+    incident = _incident(session, event)
+    status = event.detail.get("status")
+    if incident is None or not status or status == event.detail.get("previous_status"):
+        return
+    bump(session, event.org_id, event.created_at, "incident.status", status)
+    lifecycle = _lifecycle(session, incident)
+    elapsed = max(0.0, (event.created_at - lifecycle.opened_at).total_seconds())
+    if status != OPEN_STATUS and lifecycle.acknowledged_at is None:
+        lifecycle.acknowledged_at = event.created_at
+        bump(session, event.org_id, event.created_at, "incident.mtta", lifecycle.severity, total=elapsed)
+    if status in RESOLVED_STATUSES and lifecycle.resolved_at is None:
+        lifecycle.resolved_at = event.created_at
+        bump(session, event.org_id, event.created_at, "incident.mttr", lifecycle.severity, total=elapsed)
+    session.add(lifecycle)
+
+
+def _remediation(session: Session, event: AuditEvent) -> None:
+    bump(session, event.org_id, event.created_at, REMEDIATION_EVENTS[event.event_type])
+
+
+def _remediation_rolled_back(session: Session, event: AuditEvent) -> None:
+    try:
+        action_id = UUID(str(event.detail.get("action_id")))
+    except ValueError:
+        return
+    executed = session.exec(
+        select(RemediationJob.id)
+        .where(RemediationJob.action_id == action_id)
+        .where(RemediationJob.kind == "execute")
+        .where(RemediationJob.status == "succeeded")
+        .limit(1)
+    ).first()
+    dimension = ROLLBACK_OF_EXECUTED if executed is not None else ROLLBACK_OF_FAILED
+    bump(session, event.org_id, event.created_at, "remediation.rolled_back", dimension)
+
+
+def _rca_generated(session: Session, event: AuditEvent) -> None:
+    bump(session, event.org_id, event.created_at, "rca.generated")
+
+
+def _rca_approved(session: Session, event: AuditEvent) -> None:
+    try:
+        report = session.get(RCAReport, UUID(str(event.detail.get("report_id"))))
+    except ValueError:
+        return
+    if report is None or report.org_id != event.org_id:
+        return
+    latency = max(0.0, (event.created_at - report.created_at).total_seconds())
+    bump(session, event.org_id, event.created_at, "rca.approved", total=latency)
+
+
+HANDLERS: dict[str, Callable[[Session, AuditEvent], None]] = {
+    "incident.created": _incident_created,
+    "incident.updated": _incident_updated,
+    "rca.generated": _rca_generated,
+    "rca.approved": _rca_approved,
+    **dict.fromkeys(REMEDIATION_EVENTS, _remediation),
+    "remedy.rolled_back": _remediation_rolled_back,
+}
+
+
+def apply_audit_event(session: Session, event: AuditEvent) -> None:
+    """Fold ``event`` into the rollups; the caller commits both together."""
+    handler = HANDLERS.get(event.event_type)
+    if handler is not None and event.org_id is not None:
+        handler(session, event)
+
+
+def apply_audit_events(session: Session, events: Iterable[AuditEvent]) -> None:
+    """Fold a batch of events; remediation counters are bumped once per org, day and metric."""
+    remediation: Counter = Counter()
+    for event in events:
+        if HANDLERS.get(event.event_type) is _remediation and event.org_id is not None:
+            remediation[(event.org_id, bucket_of(event.created_at), REMEDIATION_EVENTS[event.event_type])] += 1
+        else:
+            apply_audit_event(session, event)
+    for (org_id, bucket, metric), count in remediation.items():
+        bump(session, org_id, bucket, metric, count=count)
+
+
+def _mean(counter: list) -> float | None:
+    count, total = counter
+    return round(total / count, 1) if count else None
+
+
+def _window(rows: Iterable[tuple[str, str, int, float]]) -> dict:
+    counters: dict[tuple[str, str], list] = defaultdict(lambda: [0, 0.0])
+    for metric, dimension, count, total in rows:
+        counter = counters[(metric, dimension)]
+        counter[0] += count
+        counter[1] += total
+
+    def by_dimension(metric: str) -> dict[str, int]:
+        return {dimension: counter[0] for (name, dimension), counter in sorted(counters.items()) if name == metric}
+
+    def combined(metric: str) -> list:
+        total = [0, 0.0]
+        for (name, _), counter in counters.items():
+            if name == metric:
+                total[0] += counter[0]
+                total[1] += counter[1]
+        return total
+
+    executed = combined("remediation.executed")[0]
+    failed = combined("remediation.failed")[0]
+    attempted = executed + failed
+    # Rows from before rollbacks carried their outcome have no dimension; they count as executed.
+    rolled_back = sum(
+        count for dimension, count in by_dimension("remediation.rolled_back").items() if dimension != ROLLBACK_OF_FAILED
+    )
+    return {
+        "incidents_opened": combined("incident.opened")[0],
+        "incidents_by_severity": by_dimension("incident.opened"),
+        "status_transitions": by_dimension("incident.status"),
+        "mtta_seconds": _mean(combined("incident.mtta")),
+        "mttr_seconds": _mean(combined("incident.mttr")),
+        "mttr_seconds_by_severity": {
+            dimension: _mean(counter) for (name, dimension), counter in sorted(counters.items()) if name == "incident.mttr"
+        },
+        "remediation": {
+            "proposed": combined("remediation.proposed")[0],
+            "approved": combined("remediation.approved")[0],
+            "executed": executed,
+            "failed": failed,
+            "rolled_back": rolled_back,
+            "success_rate": round(max(0, executed - rolled_back) / attempted, 4) if attempted else None,
+            "rollback_rate": round(min(rolled_back, executed) / attempted, 4) if attempted else None,
+        },
+        "rca": {
+            "generated": combined("rca.generated")[0],
+            "approved": combined("rca.approved")[0],
+            "approval_latency_seconds": _mean(combined("rca.approved")),
+        },
+    }
+
+
+def _duration(seconds: float) -> str:
+    if seconds >= 3600:
+        return f"{seconds / 3600:.1f}h"
+    if seconds >= 60:
+        return f"{seconds / 60:.0f}m"
+    return f"{seconds:.0f}s"
+
+
+def _highlights(current: dict, previous: dict, days: int) -> list[str]:
+    lines = []
+    for key, name in (("mttr_seconds", "MTTR"), ("mtta_seconds", "MTTA")):
+        now, before = current[key], previous[key]
+        if now is None:
+            continue
+        if before:
+            change = (now - before) / before
+            if abs(change) >= HIGHLIGHT_MIN_CHANGE:
+                direction = "improved" if change < 0 else "worsened"
+                lines.append(f"{name} {direction} {abs(change):.0%} to {_duration(now)} (from {_duration(before)})")
+                continue
+        lines.append(f"{name} was {_duration(now)} over the last {days} day(s)")
+    opened, opened_before = current["incidents_opened"], previous["incidents_opened"]
+    if opened or opened_before:
+        lines.append(f"{opened} incident(s) opened in the last {days} day(s), {opened_before} in the {days} before")
+    remediation = current["remediation"]
+    attempted = remediation["executed"] + remediation["failed"]
+    if attempted:
+        lines.append(
+            f"{remediation['success_rate']:.0%} of {attempted} attempted remediation(s) held; "
+            f"{remediation['failed']} failed, {remediation['rolled_back']} rolled back"
+        )
+    latency = current["rca"]["approval_latency_seconds"]
+    if latency is not None:
+        lines.append(f"RCA reports were approved {_duration(latency)} after generation on average")
+    return lines
+
+
+def insight_highlights(session: Session, org_id: UUID, days: int) -> dict:
+    """Highlights for the last ``days`` days against the ``days`` before, summed per metric in SQL."""
+    today = bucket_of(utc_now())
+    since = today - timedelta(days=days - 1)
+    current = InsightRollup.bucket >= since
+    rows = session.exec(
+        select(current, InsightRollup.metric, InsightRollup.dimension, func.sum(InsightRollup.count), func.sum(InsightRollup.total))
+        .where(InsightRollup.org_id == org_id)
+        .where(InsightRollup.bucket >= since - timedelta(days=days))
+        .group_by(current, InsightRollup.metric, InsightRollup.dimension)
+    ).all()
+    windows = {
+        key: _window((metric, dimension, count, total) for in_current, metric, dimension, count, total in rows if bool(in_current) == key)
+        for key in (True, False)
+    }
+    return {
+        "window_days": days,
+        "since": since.isoformat(),
+        "highlights": _highlights(windows[True], windows[False], days),
+        "current": windows[True],
+        "previous": windows[False],
+    }
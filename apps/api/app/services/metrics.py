@@ -0,0 +1,389 @@
+"""Process metrics in the Prometheus text exposition format.
+
+A series is created once and then updated in place: an observation is a
+bisect over fixed bucket bounds and two increments under the series' own
+lock, with no allocation. Series for every HTTP route are created when the
+routers are registered, so the request middleware only looks its series up
+by the matched route. Values owned by other components (the DB pool, work
+queues, caches) are read by collectors when metrics are scraped.
+
+With several uvicorn workers, set METRICS_MULTIPROC_DIR to a directory
+shared by the workers and emptied before they start. Each worker writes a
+snapshot there every METRICS_FLUSH_SECONDS and a scrape of any worker
+merges them: counters and histograms are summed over every snapshot,
+including those of exited workers, and gauges over live workers only.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Callable
+from pathlib import Path
+
+from app.core.config import get_settings
+
+logger = logging.getLogger("opsmind.metrics")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+STATUS_CLASSES = ("1xx", "2xx", "3xx", "4xx", "5xx")
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class Value:
+    """A counter or gauge."""
+
+    __slots__ = ("_lock", "value")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def state(self) -> float:
+        return self.value
+
+
+class HistogramValue:
+    __slots__ = ("_lock", "bounds", "counts", "total")
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self.bounds = bounds
+        # counts[i] holds observations in (bounds[i-1], bounds[i]]; the last slot is +Inf.
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += value
+
+    def state(self) -> list:
+        with self._lock:
+            return [list(self.counts), self.total]
+
+
+class Family:
+    def __init__(self, name: str, help_text: str, kind: str, labels: tuple[str, ...], buckets: tuple[float, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.label_names = labels
+        self.buckets = buckets
+        self._series: dict[tuple[str, ...], Value | HistogramValue] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str) -> Value | HistogramValue:
+        series = self._series.get(values)
+        if series is None:
+            with self._lock:
+                series = self._series.get(values)
+                if series is None:
+                    series = self._series[values] = HistogramValue(self.buckets) if self.kind == "histogram" else Value()
+        return series
+
+    def state(self) -> list:
+        return [[list(values), series.state()] for values, series in list(self._series.items())]
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self.families: dict[str, Family] = {}
+        self.collectors: list[Callable[[], None]] = []
+
+    def register(
+        self, name: str, help_text: str, kind: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS
+    ) -> Family:
+        family = self.families[name] = Family(name, help_text, kind, labels, buckets)
+        return family
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Run ``collector`` before every snapshot, to set values read from elsewhere."""
+        self.collectors.append(collector)
+
+    def snapshot(self) -> dict:
+        for collector in self.collectors:
+            try:
+                collector()
+            except Exception:
+                logger.exception("metrics_collector_failed")
+        return {"pid": os.getpid(), "families": {name: family.state() for name, family in self.families.items()}}
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = REGISTRY.register(
+    "opsmind_http_requests_total", "HTTP requests by route and status class.", "counter", ("method", "route", "status")
+)
+HTTP_LATENCY = REGISTRY.register(
+    "opsmind_http_request_duration_seconds", "HTTP request duration by route.", "histogram", ("method", "route")
+)
+DB_POOL_CHECKOUT = REGISTRY.register(
+    "opsmind_db_pool_checkout_seconds",
+    "Time to check a connection out of the pool, including waiting for a free one.",
+    "histogram",
+    buckets=WAIT_BUCKETS,
+)
+DB_POOL_CHECKED_OUT = REGISTRY.register("opsmind_db_pool_checked_out", "Pool connections in use.", "gauge")
+DB_POOL_CAPACITY = REGISTRY.register("opsmind_db_pool_capacity", "Pool size plus allowed overflow.", "gauge")
+DB_POOL_SATURATION = REGISTRY.register("opsmind_db_pool_saturation", "Pool connections in use over capacity.", "gauge")
+DB_QUERIES_PER_REQUEST = REGISTRY.register(
+    "opsmind_db_queries_per_request", "SQL statements run while serving a request.", "histogram", buckets=QUERY_COUNT_BUCKETS
+)
+DB_TIME_PER_REQUEST = REGISTRY.register(
+    "opsmind_db_time_per_request_seconds", "Time spent in SQL statements while serving a request.", "histogram"
+)
+DB_SLOW_QUERIES = REGISTRY.register("opsmind_db_slow_queries_total", "SQL statements slower than DB_SLOW_QUERY_MS.", "counter")
+DB_REPEATED_QUERY_REQUESTS = REGISTRY.register(
+    "opsmind_db_repeated_query_requests_total",
+    "Requests that ran one statement more than DB_REPEATED_QUERY_THRESHOLD times, by route.",
+    "counter",
+    ("route",),
+)
+ORCHESTRATOR_TURN = REGISTRY.register(
+    "opsmind_orchestrator_turn_seconds", "Chat orchestrator turn duration by scenario.", "histogram", ("scenario",)
+)
+TOOL_CALL = REGISTRY.register("opsmind_tool_call_seconds", "Orchestrator tool call duration by tool.", "histogram", ("tool",))
+INGEST_QUEUE_DEPTH = REGISTRY.register("opsmind_ingest_queue_depth", "Signal events waiting for the ingest writer.", "gauge")
+REMEDIATION_IN_FLIGHT = REGISTRY.register(
+    "opsmind_remediation_jobs_in_flight", "Remediation jobs claimed by this process and not yet finished.", "gauge"
+)
+CACHE_LOOKUPS = REGISTRY.register(
+    "opsmind_cache_lookups_total", "Read-through cache lookups by resource and result.", "counter", ("resource", "result")
+)
+
+
+class RouteMetrics:
+    __slots__ = ("latency", "method", "route", "statuses")
+
+    def __init__(self, method: str, route: str) -> None:
+        self.method = method
+        self.route = route
+        self.statuses: list[Value | None] = [None] * len(STATUS_CLASSES)
+        self.latency = HTTP_LATENCY.labels(method, route)
+
+    def observe(self, status_code: int, seconds: float) -> None:
+        index = min(max(status_code // 100, 1), len(STATUS_CLASSES)) - 1
+        counter = self.statuses[index]
+        if counter is None:
+            counter = self.statuses[index] = HTTP_REQUESTS.labels(self.method, self.route, STATUS_CLASSES[index])
+        counter.inc()
+        self.latency.observe(seconds)
+
+
+# Keyed by id(): Starlette routes compare by value and are unhashable, and they live as long as the app.
+_ROUTES: dict[int, RouteMetrics] = {}
+UNMATCHED = RouteMetrics("ANY", UNMATCHED_ROUTE)
+
+
+def register_route(route) -> RouteMetrics:
+    metrics = _ROUTES.get(id(route))
+    if metrics is None:
+        methods = ",".join(sorted(getattr(route, "methods", None) or ())) or "ANY"
+        metrics = _ROUTES.setdefault(id(route), RouteMetrics(methods, route.path))
+    return metrics
+
+
+def register_routes(routes) -> None:
+    for route in routes:
+        if hasattr(route, "path"):
+            register_route(route)
+
+
+def route_metrics(route) -> RouteMetrics:
+    """Series for a request's matched route (``scope["route"]``)."""
+    if route is None:
+        return UNMATCHED
+    return _ROUTES.get(id(route)) or register_route(route)
+
+
+def instrument_engine(engine) -> None:
+    """Time pool checkouts and report pool usage for ``engine``."""
+    pool = engine.pool
+    connect = pool.connect
+    checkout = DB_POOL_CHECKOUT.labels()
+
+    def timed_connect():
+        start = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            checkout.observe(time.perf_counter() - start)
+
+    pool.connect = timed_connect
+
+    def collect_pool() -> None:
+        # Only QueuePool tracks usage; SQLite's single-thread and static pools have no capacity.
+        if hasattr(pool, "checkedout") and hasattr(pool, "_max_overflow"):
+            DB_POOL_CHECKED_OUT.labels().set(pool.checkedout())
+            DB_POOL_CAPACITY.labels().set(pool.size() + max(pool._max_overflow, 0))
+
+    REGISTRY.add_collector(collect_pool)
+
+
+def _collect_components() -> None:
+    from app.services.cache import get_cache
+    from app.services.executor import get_remediation_executor
+    from app.services.ingestion import get_ingestion_pipeline
+
+    INGEST_QUEUE_DEPTH.labels().set(get_ingestion_pipeline().queued())
+    REMEDIATION_IN_FLIGHT.labels().set(get_remediation_executor().in_flight)
+    for resource, stats in get_cache().resource_stats().items():
+        CACHE_LOOKUPS.labels(resource, "hit").set(stats.hits)
+        CACHE_LOOKUPS.labels(resource, "miss").set(stats.misses)
+
+
+REGISTRY.add_collector(_collect_components)
+
+
+def _snapshot_path(directory: str, pid: int) -> Path:
+    return Path(directory) / f"metrics-{pid}.json"
+
+
+def write_snapshot(directory: str, snapshot: dict) -> None:
+    path = _snapshot_path(directory, snapshot["pid"])
+    temporary = path.with_suffix(".tmp")
+    temporary.write_text(json.dumps(snapshot))
+    os.replace(temporary, path)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read_snapshots(directory: str, exclude_pid: int) -> list[tuple[bool, dict]]:
+    """Other workers' snapshots, each with whether its process is still running."""
+    snapshots = []
+    for path in Path(directory).glob("metrics-*.json"):
+        try:
+            snapshot = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        if snapshot.get("pid") != exclude_pid:
+            snapshots.append((_alive(snapshot["pid"]), snapshot))
+    return snapshots
+
+
+class SnapshotWriter:
+    def __init__(self, directory: str, interval_seconds: float):
+        self.directory = directory
+        self.interval_seconds = interval_seconds
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            Path(self.directory).mkdir(parents=True, exist_ok=True)
+            self._thread = threading.Thread(target=self._run, name="opsmind-metrics-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                write_snapshot(self.directory, REGISTRY.snapshot())
+            except Exception:
+                logger.exception("metrics_snapshot_failed")
+            time.sleep(self.interval_seconds)
+
+
+_writer: SnapshotWriter | None = None
+
+
+def start_snapshot_writer() -> None:
+    """Share this worker's metrics through METRICS_MULTIPROC_DIR, if configured."""
+    global _writer
+    settings = get_settings()
+    if settings.metrics_multiproc_dir and _writer is None:
+        _writer = SnapshotWriter(settings.metrics_multiproc_dir, settings.metrics_flush_seconds)
+        _writer.start()
+
+
+def merge_snapshots(snapshots: list[tuple[bool, dict]]) -> dict[str, dict[tuple[str, ...], object]]:
+    merged: dict[str, dict[tuple[str, ...], object]] = {}
+    for alive, snapshot in snapshots:
+        for name, series_list in snapshot["families"].items():
+            family = REGISTRY.families.get(name)
+            if family is None or (family.kind == "gauge" and not alive):
+                continue
+            series = merged.setdefault(name, {})
+            for values, state in series_list:
+                key = tuple(values)
+                if family.kind != "histogram":
+                    series[key] = series.get(key, 0.0) + state
+                    continue
+                counts, total = state
+                current = series.get(key)
+                if current is None:
+                    series[key] = [list(counts), total]
+                else:
+                    current[0] = [a + b for a, b in zip(current[0], counts)]
+                    current[1] += total
+    checked_out = merged.get(DB_POOL_CHECKED_OUT.name, {}).get(())
+    capacity = merged.get(DB_POOL_CAPACITY.name, {}).get(())
+    if checked_out is not None and capacity:
+        merged[DB_POOL_SATURATION.name] = {(): checked_out / capacity}
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_metrics() -> str:
+    """Merged metrics of this worker (and its siblings, when shared) in the Prometheus text format."""
+    settings = get_settings()
+    own = REGISTRY.snapshot()
+    snapshots = [(True, own)]
+    if settings.metrics_multiproc_dir:
+        snapshots.extend(read_snapshots(settings.metrics_multiproc_dir, own["pid"]))
+    merged = merge_snapshots(snapshots)
+    lines = []
+    for name, family in REGISTRY.families.items():
+        series = merged.get(name)
+        if not series:
+            continue
+        lines.append(f"# HELP {name} {family.help_text}")
+        lines.append(f"# TYPE {name} {family.kind}")
+        for values, state in sorted(series.items()):
+            if family.kind != "histogram":
+                lines.append(f"{name}{_labels(family.label_names, values)} {_number(state)}")
+                continue
+            counts, total = state
+            cumulative = 0
+            for bound, count in zip([*family.buckets, "+Inf"], counts):
+                cumulative += count
+                le = bound if isinstance(bound, str) else _number(bound)
+                bucket_labels = _labels(family.label_names, values, f'le="{le}"')
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{name}_sum{_labels(family.label_names, values)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(family.label_names, values)} {cumulative}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,184 @@
+"""Per-request query accounting, slow-query log and repeated-query (N+1) detection.
+
+SQLAlchemy ``before/after_cursor_execute`` hooks on the engine time every
+statement. While a request is being served (``QueryStatsMiddleware`` sets
+the context), each statement is also added to that request's count, DB
+time and fingerprints. A fingerprint is the statement with literals and
+bound parameters replaced by ``?`` and IN lists collapsed, so the same
+query issued in a loop counts under one fingerprint however its values
+differ.
+
+A statement slower than DB_SLOW_QUERY_MS is logged with its plan (EXPLAIN
+under a savepoint, or EXPLAIN QUERY PLAN on SQLite), at most once per
+fingerprint every EXPLAIN_INTERVAL_SECONDS. A request that runs one
+fingerprint more than DB_REPEATED_QUERY_THRESHOLD times is logged as a
+likely N+1. Totals go to /metrics; with DB_QUERY_STATS_HEADERS (for
+development) each response also carries them as headers.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+
+from app.core.config import get_settings
+from app.services.metrics import (
+    DB_QUERIES_PER_REQUEST,
+    DB_REPEATED_QUERY_REQUESTS,
+    DB_SLOW_QUERIES,
+    DB_TIME_PER_REQUEST,
+)
+
+logger = logging.getLogger("opsmind.db")
+
+EXPLAIN_INTERVAL_SECONDS = 300.0
+MAX_FINGERPRINTS = 4096
+MAX_LOGGED_STATEMENT = 2000
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<!:):\w+|\?")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass
+class RequestQueries:
+    count: int = 0
+    seconds: float = 0.0
+    fingerprints: Counter[str] = field(default_factory=Counter)
+    statements: dict[str, str] = field(default_factory=dict)
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """Fingerprints run more than ``threshold`` times, most frequent first."""
+        return [(fingerprint, count) for fingerprint, count in self.fingerprints.most_common() if count > threshold]
+
+
+_current: ContextVar[RequestQueries | None] = ContextVar("opsmind_request_queries", default=None)
+_fingerprints: dict[str, tuple[str, str]] = {}
+_explained: dict[str, float] = {}
+
+
+def normalize_statement(statement: str) -> str:
+    normalized = _STRING_LITERAL.sub("?", statement)
+    normalized = _PLACEHOLDER.sub("?", normalized)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _VALUE_LIST.sub("(...)", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+def fingerprint_statement(statement: str) -> tuple[str, str]:
+    """(fingerprint id, normalized statement), cached per distinct statement text."""
+    cached = _fingerprints.get(statement)
+    if cached is None:
+        normalized = normalize_statement(statement)
+        cached = (hashlib.sha1(normalized.encode()).hexdigest()[:12], normalized)
+        if len(_fingerprints) >= MAX_FINGERPRINTS:
+            _fingerprints.clear()
+        _fingerprints[statement] = cached
+    return cached
+
+
+def begin_request() -> tuple[RequestQueries, object]:
+    queries = RequestQueries()
+    return queries, _current.set(queries)
+
+
+def end_request(queries: RequestQueries, token, route: str) -> list[tuple[str, int]]:
+    """Record the request's totals; returns its repeated fingerprints."""
+    _current.reset(token)
+    DB_QUERIES_PER_REQUEST.labels().observe(queries.count)
+    DB_TIME_PER_REQUEST.labels().observe(queries.seconds)
+    repeated = queries.repeated(get_settings().db_repeated_query_threshold)
+    if repeated:
+        DB_REPEATED_QUERY_REQUESTS.labels(route).inc()
+        logger.warning(
+            "repeated_queries",
+            extra={
+                "route": route,
+                "query_count": queries.count,
+                "repeated": [
+                    {"fingerprint": fingerprint, "count": count, "statement": queries.statements[fingerprint][:MAX_LOGGED_STATEMENT]}
+                    for fingerprint, count in repeated
+                ],
+            },
+        )
+    return repeated
+
+
+def _explain(conn, statement: str, parameters) -> list[str] | None:
+    # A DBAPI cursor of its own, so the plan query is not itself timed and counted.
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        if conn.dialect.name == "sqlite":
+            cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters or ())
+            return _plan_rows(cursor)
+        # EXPLAIN shares the request's transaction: under a savepoint, so that on
+        # PostgreSQL a failed plan does not abort the transaction it runs in.
+        cursor.execute("SAVEPOINT opsmind_explain")
+        try:
+            cursor.execute("EXPLAIN " + statement, parameters or ())
+            return _plan_rows(cursor)
+        except Exception:
+            cursor.execute("ROLLBACK TO SAVEPOINT opsmind_explain")
+            raise
+        finally:
+            cursor.execute("RELEASE SAVEPOINT opsmind_explain")
+    finally:
+        cursor.close()
+
+
+def _plan_rows(cursor) -> list[str]:
+    return [" ".join(str(column) for column in row) for row in cursor.fetchall()]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    context._opsmind_query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    elapsed = time.perf_counter() - context._opsmind_query_started
+    queries = _current.get()
+    if queries is not None:
+        fingerprint, normalized = fingerprint_statement(statement)
+        queries.count += 1
+        queries.seconds += elapsed
+        queries.fingerprints[fingerprint] += 1
+        queries.statements.setdefault(fingerprint, normalized)
+    settings = get_settings()
+    if elapsed * 1000 < settings.db_slow_query_ms:
+        return
+    DB_SLOW_QUERIES.labels().inc()
+    fingerprint, normalized = fingerprint_statement(statement)
+    plan = None
+    now = time.monotonic()
+    is_read = normalized.lstrip("( ").split(" ", 1)[0].upper() in ("SELECT", "WITH")
+    explain_due = now - _explained.get(fingerprint, -EXPLAIN_INTERVAL_SECONDS) >= EXPLAIN_INTERVAL_SECONDS
+    if settings.db_slow_query_explain and is_read and not executemany and explain_due:
+        if len(_explained) >= MAX_FINGERPRINTS:
+            _explained.clear()
+        _explained[fingerprint] = now
+        try:
+            plan = _explain(conn, statement, parameters)
+        except Exception:
+            logger.debug("slow_query_explain_failed", exc_info=True)
+    logger.warning(
+        "slow_query",
+        extra={
+            "duration_ms": round(elapsed * 1000, 2),
+            "fingerprint": fingerprint,
+            "statement": normalized[:MAX_LOGGED_STATEMENT],
+            "plan": plan,
+        },
+    )
+
+
+def instrument_queries(engine) -> None:
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
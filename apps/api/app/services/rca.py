@@ -0,0 +1,442 @@
+"""Root-cause analysis reports built from gathered, ranked evidence.
+
+A generation request becomes an ``RCAJob`` row and runs on a small worker
+pool, so the API call returns at once and the job row carries its status.
+A job gathers evidence from four independent sources concurrently, each
+with its own database session:
+
+* the incident's own signals, grouped by type, service and error signature;
+* signals of other incidents and changes whose activity lines up with it
+  (the correlation engine);
+* upstream ``depends_on`` neighbors of its services in the knowledge graph;
+* similar past incidents and their RCA reports.
+
+Evidence is deduplicated by key, keeping the best score, and the top
+``top_k`` items are selected with a bounded min-heap before the report is
+persisted.
+
+The pool lives in the API process. A job is claimed with a conditional
+update that also takes a lease of RCA_JOB_LEASE_SECONDS, which a sweeper
+thread renews while the job runs. The same sweeper, every third of a lease,
+requeues jobs whose lease lapsed (their process stopped) until
+RCA_JOB_MAX_ATTEMPTS, then fails them, and submits queued jobs this process
+has not taken yet. The report and the job's final status commit together,
+and only while the job's lease is still held, so a reclaimed job never
+leaves a second report behind.
+"""
+from __future__ import annotations
+
+import heapq
+import logging
+import math
+import os
+import socket
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+from functools import lru_cache
+from uuid import UUID, uuid4
+
+from sqlalchemy import func, update
+from sqlmodel import Session, select
+
+from app.core.config import get_settings
+from app.db.models import Incident, IncidentSignal, RCAJob, RCAReport, utc_now
+from app.db.session import engine
+from app.services.audit import record_audit_event
+from app.services.cache import get_cache
+from app.services.correlation import CorrelationParams, correlate_incident
+from app.services.dedup import error_signature
+from app.services.events import publish_event
+from app.services.graph_index import get_graph_index
+from app.services.impact import (
+    HOP_DECAY,
+    IMPACT_RELATION,
+    incident_services,
+    tier_weight,
+)
+from app.services.retrieval import get_vector_registry, rca_source
+from app.services.similarity import get_similarity_registry
+
+logger = logging.getLogger("opsmind.rca")
+
+OWN_SIGNAL_BASE_SCORE = 0.5
+DEPENDENCY_HOPS = 2
+DEPENDENCY_WEIGHT = 0.6
+SIMILAR_INCIDENTS = 5
+SIMILAR_MIN_SIMILARITY = 0.3
+SUMMARY_ITEMS = 3
+
+
+@dataclass
+class Evidence:
+    key: str
+    source: str
+    detail: str
+    score: float
+    reference: dict
+
+    def as_dict(self) -> dict:
+        return {
+            "source": self.source,
+            "detail": self.detail,
+            "score": round(self.score, 4),
+            "reference": self.reference,
+        }
+
+
+Gatherer = Callable[[Session, UUID, Incident], list[Evidence]]
+
+
+def own_signals(session: Session, org_id: UUID, incident: Incident) -> list[Evidence]:
+    groups: dict[tuple, list] = {}
+    for signal_type, service, payload, occurrences in session.exec(
+        select(IncidentSignal.type, IncidentSignal.service, IncidentSignal.payload, IncidentSignal.occurrences)
+        .where(IncidentSignal.org_id == org_id)
+        .where(IncidentSignal.incident_id == incident.id)
+    ).all():
+        signature = error_signature(payload or {})
+        group = groups.setdefault((signal_type, service, signature), [0, payload or {}])
+        group[0] += occurrences
+    if not groups:
+        return []
+    most = max(count for count, _ in groups.values())
+    evidence = []
+    for (signal_type, service, signature), (count, payload) in groups.items():
+        where = f" on {service}" if service else ""
+        evidence.append(
+            Evidence(
+                key=f"signal:{signal_type}|{service or ''}|{signature}",
+                source="signal",
+                detail=f"{count}x {signal_type}{where}: {payload.get('message') or signature}",
+                score=OWN_SIGNAL_BASE_SCORE + (1 - OWN_SIGNAL_BASE_SCORE) * math.log1p(count) / math.log1p(most),
+                reference={"type": signal_type, "service": service, "signature": signature, "occurrences": count},
+            )
+        )
+    return evidence
+
+
+def correlated_activity(session: Session, org_id: UUID, incident: Incident) -> list[Evidence]:
+    result = correlate_incident(session, org_id, incident, CorrelationParams())
+    evidence = [
+        Evidence(
+            key=f"signal:{item['series']}",
+            source="correlated_signal",
+            detail=f"{item['type']} on {item['service'] or 'unknown service'} leads by {item['lead_seconds']}s: {item['signature']}",
+            score=item["score"],
+            reference={"incident_id": item["incident_id"], "series": item["series"], "lead_seconds": item["lead_seconds"]},
+        )
+        for item in result["signals"]
+    ]
+    evidence.extend(
+        Evidence(
+            key=f"change:{item['source']}:{item['id'] or item['reference']}",
+            source="change",
+            detail=f"{item['source']} change {item['id']} at {item['at']}: {item['reference']}",
+            score=item["score"],
+            reference={"id": item["id"], "source": item["source"], "at": item["at"], "lead_seconds": item["lead_seconds"]},
+        )
+        for item in result["changes"]
+    )
+    return evidence
+
+
+def graph_dependencies(session: Session, org_id: UUID, incident: Incident) -> list[Evidence]:
+    graph = get_graph_index().snapshot(session, org_id)
+    seeds = graph.positions_for_labels(incident_services(session, org_id, incident, graph))
+    if not seeds:
+        return []
+    positions, depth = graph.k_hop(seeds, DEPENDENCY_HOPS, direction="out", relation=IMPACT_RELATION)
+    evidence = []
+    for position, hops in zip(positions.tolist(), depth.tolist()):
+        if hops == 0:
+            continue
+        node = graph.node(position)
+        evidence.append(
+            Evidence(
+                key=f"node:{node['id']}",
+                source="dependency",
+                detail=f"Affected services depend on {node['label']} ({node['node_type']}, {hops} hop(s) upstream)",
+                score=DEPENDENCY_WEIGHT * HOP_DECAY ** (hops - 1) * tier_weight(node["properties"]),
+                reference={"node_id": node["id"], "label": node["label"], "hops": hops},
+            )
+        )
+    return evidence
+
+
+def similar_incidents(session: Session, org_id: UUID, incident: Incident) -> list[Evidence]:
+    matches = get_similarity_registry().similar(session, org_id, incident, SIMILAR_INCIDENTS, SIMILAR_MIN_SIMILARITY)
+    if not matches:
+        return []
+    ids = [match_id for match_id, _ in matches]
+    titles = dict(session.exec(select(Incident.id, Incident.title).where(Incident.id.in_(ids))).all())
+    reports: dict[UUID, RCAReport] = {}
+    for report in session.exec(
+        select(RCAReport).where(RCAReport.org_id == org_id).where(RCAReport.incident_id.in_(ids)).order_by(RCAReport.created_at)
+    ).all():
+        current = reports.get(report.incident_id)
+        # Prefer an approved report, then the newest one.
+        if current is None or report.approved or not current.approved:
+            reports[report.incident_id] = report
+    evidence = []
+    for match_id, similarity in matches:
+        report = reports.get(match_id)
+        finding = f"; prior RCA: {report.summary}" if report else ""
+        evidence.append(
+            Evidence(
+                key=f"incident:{match_id}",
+                source="similar_incident",
+                detail=f"Similar past incident '{titles.get(match_id, match_id)}' ({similarity:.0%} similar){finding}",
+                score=similarity * (1.0 if report and report.approved else 0.8),
+                reference={"incident_id": str(match_id), "report_id": str(report.id) if report else None, "similarity": similarity},
+            )
+        )
+    return evidence
+
+
+GATHERERS: dict[str, Gatherer] = {
+    "signals": own_signals,
+    "correlation": correlated_activity,
+    "graph": graph_dependencies,
+    "similar_incidents": similar_incidents,
+}
+
+
+def rank_evidence(evidence: Iterable[Evidence], top_k: int) -> list[Evidence]:
+    """Deduplicate by key keeping the best score, then the ``top_k`` best, highest first."""
+    best: dict[str, Evidence] = {}
+    for item in evidence:
+        current = best.get(item.key)
+        if current is None or item.score > current.score:
+            best[item.key] = item
+    heap: list[tuple[float, int, Evidence]] = []
+    for sequence, item in enumerate(best.values()):
+        entry = (item.score, -sequence, item)
+        if len(heap) < top_k:
+            heapq.heappush(heap, entry)
+        elif entry[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, entry)
+    return [item for _, _, item in sorted(heap, key=lambda entry: entry[:2], reverse=True)]
+
+
+def summarize(incident: Incident, ranked: list[Evidence], failed: list[str]) -> str:
+    if not ranked:
+        summary = f"No evidence found for '{incident.title}'."
+    else:
+        lines = "; ".join(item.detail for item in ranked[:SUMMARY_ITEMS])
+        summary = f"Top evidence for '{incident.title}' ({len(ranked)} item(s) ranked): {lines}."
+    if failed:
+        summary += f" Evidence sources unavailable: {', '.join(failed)}."
+    return summary
+
+
+class RCAJobRunner:
+    def __init__(self, job_workers: int, evidence_workers: int, top_k: int, lease_seconds: float = 60.0, max_attempts: int = 3):
+        self.top_k = top_k
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self._jobs = ThreadPoolExecutor(max_workers=job_workers, thread_name_prefix="opsmind-rca-job")
+        # A separate pool, so jobs waiting on their gatherers can never starve them of threads.
+        self._gatherers = ThreadPoolExecutor(max_workers=evidence_workers, thread_name_prefix="opsmind-rca-evidence")
+        # Jobs handed to this process's pool and not finished yet; the sweeper leaves them alone.
+        self._submitted: set[UUID] = set()
+        self._running: set[UUID] = set()
+        self._lock = threading.Lock()
+        self._sweeper: threading.Thread | None = None
+
+    def submit(self, job_id: UUID) -> None:
+        with self._lock:
+            if job_id in self._submitted:
+                return
+            self._submitted.add(job_id)
+        self._jobs.submit(self._run, job_id)
+
+    def start(self) -> None:
+        """Recover jobs now, then keep renewing leases and reclaiming jobs in the background."""
+        self.recover()
+        with self._lock:
+            if self._sweeper is None or not self._sweeper.is_alive():
+                self._sweeper = threading.Thread(target=self._sweep, name="opsmind-rca-sweeper", daemon=True)
+                self._sweeper.start()
+
+    def _sweep(self) -> None:
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            try:
+                self.renew_leases()
+                self.recover()
+            except Exception:  # pragma: no cover - keep the sweeper alive across DB errors
+                logger.exception("rca_sweep_failed")
+
+    def renew_leases(self) -> int:
+        with self._lock:
+            running = list(self._running)
+        if not running:
+            return 0
+        with Session(engine) as session:
+            renewed = session.execute(
+                update(RCAJob)
+                .where(RCAJob.id.in_(running), RCAJob.worker_id == self.worker_id, RCAJob.status == "running")
+                .values(lease_expires_at=utc_now() + timedelta(seconds=self.lease_seconds))
+            ).rowcount
+            session.commit()
+        return renewed
+
+    def recover(self) -> tuple[int, int]:
+        """Requeue or fail jobs whose lease lapsed and submit queued ones; returns (submitted, failed)."""
+        now = utc_now()
+        expired = (RCAJob.status == "running", RCAJob.lease_expires_at < now)
+        with Session(engine) as session:
+            session.execute(
+                update(RCAJob)
+                .where(*expired, RCAJob.attempts < self.max_attempts)
+                .values(status="queued", worker_id=None, lease_expires_at=None)
+            )
+            abandoned = session.execute(
+                update(RCAJob)
+                .where(*expired)
+                .values(status="failed", error="abandoned: the workers running it stopped", finished_at=now, worker_id=None)
+                .returning(RCAJob.id, RCAJob.org_id, RCAJob.incident_id)
+            ).all()
+            session.commit()
+            queued = session.exec(select(RCAJob.id).where(RCAJob.status == "queued").order_by(RCAJob.created_at)).all()
+        for job_id, org_id, incident_id in abandoned:
+            publish_event(org_id, "rca.failed", {"job_id": str(job_id), "incident_id": str(incident_id)})
+        with self._lock:
+            queued = [job_id for job_id in queued if job_id not in self._submitted]
+        for job_id in queued:
+            self.submit(job_id)
+        if abandoned or queued:
+            logger.info("rca_jobs_recovered", extra={"submitted": len(queued), "failed": len(abandoned)})
+        return len(queued), len(abandoned)
+
+    def _gather(self, org_id: UUID, incident_id: UUID, gatherer: Gatherer) -> list[Evidence]:
+        with Session(engine) as session:
+            incident = session.get(Incident, incident_id)
+            return gatherer(session, org_id, incident)
+
+    def _finish(self, session: Session, job: RCAJob, **values) -> bool:
+        """Stage the job's final status while this attempt still holds its lease; False if it does not."""
+        finished = session.execute(
+            update(RCAJob)
+            .where(RCAJob.id == job.id, RCAJob.worker_id == self.worker_id, RCAJob.status == "running")
+            .values(finished_at=utc_now(), lease_expires_at=None, **values)
+        ).rowcount
+        if not finished:
+            session.rollback()
+            logger.warning("rca_lease_lost", extra={"job_id": str(job.id)})
+        return bool(finished)
+
+    def _run(self, job_id: UUID) -> None:
+        try:
+            with Session(engine) as session:
+                claimed = session.execute(
+                    update(RCAJob)
+                    .where(RCAJob.id == job_id, RCAJob.status == "queued")
+                    .values(
+                        status="running",
+                        worker_id=self.worker_id,
+                        attempts=RCAJob.attempts + 1,
+                        lease_expires_at=utc_now() + timedelta(seconds=self.lease_seconds),
+                        started_at=func.coalesce(RCAJob.started_at, utc_now()),
+                    )
+                ).rowcount
+                session.commit()
+                if not claimed:
+                    # Already taken by another worker.
+                    return
+                with self._lock:
+                    self._running.add(job_id)
+                self._run_claimed(session, session.get(RCAJob, job_id))
+        finally:
+            with self._lock:
+                self._submitted.discard(job_id)
+                self._running.discard(job_id)
+
+    def _run_claimed(self, session: Session, job: RCAJob) -> None:
+        try:
+            report = self._generate(session, job)
+        except Exception as exc:
+            logger.exception("rca_job_failed", extra={"job_id": str(job.id)})
+            session.rollback()
+            if self._finish(session, job, status="failed", error=str(exc)[:500]):
+                session.commit()
+                publish_event(job.org_id, "rca.failed", {"job_id": str(job.id), "incident_id": str(job.incident_id)})
+            return
+        # The report and the job's status commit together: a crash in between
+        # cannot leave an orphan report that a retry would duplicate.
+        if not self._finish(session, job, status="succeeded", report_id=report.id):
+            return
+        session.commit()
+        get_cache().invalidate(job.org_id, "rca.reports")
+        get_vector_registry().add(job.org_id, rca_source(report))
+        record_audit_event(
+            session,
+            "rca.generated",
+            {"report_id": str(report.id), "job_id": str(job.id)},
+            org_id=job.org_id,
+            actor_user_id=job.requested_by,
+        )
+        publish_event(
+            job.org_id,
+            "rca.generated",
+            {"job_id": str(job.id), "report_id": str(report.id), "incident_id": str(job.incident_id)},
+        )
+
+    def _generate(self, session: Session, job: RCAJob) -> RCAReport:
+        """Build the job's report and stage it in ``session``, uncommitted."""
+        incident = session.get(Incident, job.incident_id)
+        if incident is None or incident.org_id != job.org_id:
+            raise LookupError(f"incident {job.incident_id} not found")
+        futures = {
+            name: self._gatherers.submit(self._gather, job.org_id, job.incident_id, gatherer)
+            for name, gatherer in GATHERERS.items()
+        }
+        gathered, failed = [], []
+        for name, future in futures.items():
+            try:
+                gathered.extend(future.result())
+            except Exception:
+                # One broken source should thin the report, not fail it.
+                logger.exception("rca_evidence_failed", extra={"job_id": str(job.id), "gatherer": name})
+                failed.append(name)
+        ranked = rank_evidence(gathered, self.top_k)
+        report = RCAReport(
+            org_id=job.org_id,
+            incident_id=job.incident_id,
+            summary=summarize(incident, ranked, failed),
+            evidence=[item.as_dict() for item in ranked],
+            approved=False,
+        )
+        session.add(report)
+        session.flush()
+        return report
+
+
+def job_view(job: RCAJob) -> dict:
+    return {
+        "id": str(job.id),
+        "incident_id": str(job.incident_id),
+        "status": job.status,
+        "report_id": str(job.report_id) if job.report_id else None,
+        "error": job.error,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+@lru_cache
+def get_rca_runner() -> RCAJobRunner:
+    settings = get_settings()
+    return RCAJobRunner(
+        settings.rca_job_workers,
+        settings.rca_evidence_workers,
+        settings.rca_top_evidence,
+        settings.rca_job_lease_seconds,
+        settings.rca_job_max_attempts,
+    )
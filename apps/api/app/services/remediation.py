@@ -0,0 +1,350 @@
+"""Remediation action lifecycle.
+
+An action moves through a fixed state graph::
+
+    proposed --approve--> approved --execute--> executing --> executed
+                                                    |             |
+                                                    v          rollback
+                                                 failed --rollback--> rolling_back --> rolled_back
+                                                                           |
+                                                                           v
+                                                                    rollback_failed
+
+``execute`` and ``rollback`` only queue a ``RemediationJob``; the executor
+(app.services.executor) runs it against the target and applies the
+completing transition.
+
+Each transition is a single conditional ``UPDATE ... WHERE status IN
+(sources) [AND version = expected] RETURNING version``, so two concurrent
+requests cannot both win and no SELECT precedes the write. Only a request
+that matched no row reads the action back, to tell a missing action from a
+conflicting one. The version column lets clients pin a transition to the
+state they last saw with ``If-Match``. A queued job commits with the
+transition that queued it and its audit event.
+
+``apply_transitions`` does the same for a list of actions: one UPDATE for
+the whole set, one SELECT for the ones it did not move, one audit commit.
+
+Client retries carry an ``Idempotency-Key``; the response of a successful
+transition is kept in a bounded, expiring cache and replayed for the same
+key, so a retried execute returns the first result instead of running twice.
+"""
+from __future__ import annotations
+
+import hashlib
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from app.core.config import get_settings
+from app.db.models import RemediationAction, RemediationJob, utc_now
+from app.services.audit import add_audit_event, record_audit_events
+from app.services.cache import CacheBackend, LRUCacheBackend, RedisCacheBackend
+from app.services.events import publish_event
+
+
+@dataclass(frozen=True)
+class Transition:
+    name: str
+    sources: frozenset[str]
+    target: str
+    audit_event: str
+    # The kind of RemediationJob this transition queues, if any.
+    job: str | None = None
+
+
+TRANSITIONS = {
+    transition.name: transition
+    for transition in (
+        Transition("approve", frozenset({"proposed"}), "approved", "remedy.approved"),
+        Transition("execute", frozenset({"approved"}), "executing", "remedy.execution_queued", job="execute"),
+        Transition("complete_execution", frozenset({"executing"}), "executed", "remedy.executed"),
+        Transition("fail_execution", frozenset({"executing"}), "failed", "remedy.failed"),
+        Transition("rollback", frozenset({"executed", "failed"}), "rolling_back", "remedy.rollback_queued", job="rollback"),
+        Transition("complete_rollback", frozenset({"rolling_back"}), "rolled_back", "remedy.rolled_back"),
+        Transition("fail_rollback", frozenset({"rolling_back"}), "rollback_failed", "remedy.rollback_failed"),
+    )
+}
+
+
+class TransitionConflict(Exception):
+    """The action is not in a state the transition starts from, or not at the expected version."""
+
+    def __init__(self, transition: Transition, status: str, version: int):
+        if status in transition.sources:
+            message = f"action changed since the expected version; it is now at version {version}"
+        else:
+            message = f"cannot {transition.name} an action that is {status}"
+        super().__init__(message)
+        self.transition = transition
+        self.status = status
+        self.version = version
+
+    def as_dict(self) -> dict:
+        return {
+            "message": str(self),
+            "status": self.status,
+            "version": self.version,
+            "allowed_from": sorted(self.transition.sources),
+        }
+
+
+def parse_action_id(action_id: str) -> UUID | None:
+    try:
+        return UUID(action_id)
+    except ValueError:
+        return None
+
+
+def parse_if_match(value: str | None) -> int | None:
+    """The action version in an ``If-Match`` header (``3``, ``"3"`` or ``W/"3"``)."""
+    if value is None:
+        return None
+    return int(value.removeprefix("W/").strip().strip('"'))
+
+
+def job_target(action_id: UUID, details: dict) -> str:
+    """What a job acts on, for per-target concurrency limits; the action itself when unnamed."""
+    return str(details.get("target") or details.get("service") or f"action:{action_id}")
+
+
+def queue_job(session: Session, org_id: UUID, action_id: UUID, kind: str, details: dict) -> RemediationJob:
+    settings = get_settings()
+    job = RemediationJob(
+        org_id=org_id,
+        action_id=action_id,
+        kind=kind,
+        target=job_target(action_id, details or {}),
+        max_attempts=int((details or {}).get("max_attempts", settings.remediation_max_attempts)),
+    )
+    session.add(job)
+    return job
+
+
+def apply_transition(
+    session: Session,
+    org_id: UUID,
+    action_id: UUID,
+    name: str,
+    actor_user_id: UUID | None = None,
+    expected_version: int | None = None,
+    commit: bool = True,
+) -> dict | None:
+    """Run transition ``name`` on the action; None if the org has no such action.
+
+    The status change, any job it queues and its audit event commit together.
+    With ``commit=False`` they are only staged in the caller's transaction, a
+    conflict leaves that transaction untouched, and the caller publishes the
+    result with ``publish_transition`` once it has committed.
+    """
+    transition = TRANSITIONS[name]
+    statement = (
+        update(RemediationAction)
+        .where(RemediationAction.id == action_id)
+        .where(RemediationAction.org_id == org_id)
+        .where(RemediationAction.status.in_(transition.sources))
+        .values(status=transition.target, version=RemediationAction.version + 1, updated_at=utc_now())
+        .returning(RemediationAction.version, RemediationAction.details)
+    )
+    if expected_version is not None:
+        statement = statement.where(RemediationAction.version == expected_version)
+    row = session.execute(statement).first()
+    if row is None:
+        if commit:
+            session.rollback()
+        current = session.exec(
+            select(RemediationAction.status, RemediationAction.version)
+            .where(RemediationAction.id == action_id)
+            .where(RemediationAction.org_id == org_id)
+        ).first()
+        if current is None:
+            return None
+        raise TransitionConflict(transition, *current)
+    version, details = row
+    result = {"status": transition.target, "version": version}
+    if transition.job:
+        result["job_id"] = str(queue_job(session, org_id, action_id, transition.job, details).id)
+    add_audit_event(
+        session,
+        transition.audit_event,
+        {"action_id": str(action_id), **result},
+        org_id=org_id,
+        actor_user_id=actor_user_id,
+    )
+    if commit:
+        session.commit()
+        publish_transition(org_id, action_id, result)
+    return result
+
+
+def publish_transition(org_id: UUID, action_id: UUID, result: dict) -> None:
+    publish_event(
+        org_id,
+        f"remediation.{result['status']}",
+        {"id": str(action_id), "status": result["status"], "version": result["version"]},
+    )
+
+
+def apply_transitions(
+    session: Session,
+    org_id: UUID,
+    action_ids: list[UUID],
+    name: str,
+    actor_user_id: UUID | None = None,
+) -> list[dict]:
+    """Run transition ``name`` on every action that allows it; one result per distinct id, in order."""
+    transition = TRANSITIONS[name]
+    action_ids = list(dict.fromkeys(action_ids))
+    moved = {
+        action_id: (version, details)
+        for action_id, version, details in session.execute(
+            update(RemediationAction)
+            .where(RemediationAction.id.in_(action_ids))
+            .where(RemediationAction.org_id == org_id)
+            .where(RemediationAction.status.in_(transition.sources))
+            .values(status=transition.target, version=RemediationAction.version + 1, updated_at=utc_now())
+            .returning(RemediationAction.id, RemediationAction.version, RemediationAction.details)
+        ).all()
+    }
+    current = {}
+    if len(moved) < len(action_ids):
+        current = {
+            action_id: (status, version)
+            for action_id, status, version in session.exec(
+                select(RemediationAction.id, RemediationAction.status, RemediationAction.version)
+                .where(RemediationAction.id.in_([action_id for action_id in action_ids if action_id not in moved]))
+                .where(RemediationAction.org_id == org_id)
+            ).all()
+        }
+    applied: dict[UUID, dict] = {}
+    events = []
+    for action_id, (version, details) in moved.items():
+        result = {"status": transition.target, "version": version}
+        if transition.job:
+            result["job_id"] = str(queue_job(session, org_id, action_id, transition.job, details).id)
+        applied[action_id] = {"id": str(action_id), **result}
+        events.append((transition.audit_event, {"action_id": str(action_id), **result}))
+    if events:
+        record_audit_events(session, events, org_id=org_id, actor_user_id=actor_user_id)
+    else:
+        session.rollback()
+    results = []
+    for action_id in action_ids:
+        if action_id in applied:
+            result = applied[action_id]
+            results.append(result)
+            publish_event(org_id, f"remediation.{transition.target}", {key: result[key] for key in ("id", "status", "version")})
+        elif action_id in current:
+            conflict = TransitionConflict(transition, *current[action_id])
+            results.append({"id": str(action_id), "status": "conflict", "conflict": conflict.as_dict()})
+        else:
+            results.append({"id": str(action_id), "status": "not_found"})
+    return results
+
+
+class IdempotencyCache:
+    """Responses of completed requests by (org, scope, client key), bounded and expiring."""
+
+    def __init__(self, backend: CacheBackend, ttl_seconds: int):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+
+    def _key(self, org_id: UUID, scope: str, key: str) -> str:
+        return f"opsmind:idempotency:{org_id}:{scope}:{key}"
+
+    def get(self, org_id: UUID, scope: str, key: str) -> Any | None:
+        cached = self.backend.get(self._key(org_id, scope, key))
+        return None if cached is None else cached[1]
+
+    def put(self, org_id: UUID, scope: str, key: str, response: Any) -> None:
+        self.backend.set(self._key(org_id, scope, key), response, time.time(), self.ttl_seconds)
+
+
+@lru_cache
+def get_idempotency_cache() -> IdempotencyCache:
+    settings = get_settings()
+    if settings.cache_backend == "redis":
+        backend: CacheBackend = RedisCacheBackend(settings.redis_url)
+    else:
+        backend = LRUCacheBackend(settings.idempotency_max_entries)
+    return IdempotencyCache(backend, settings.idempotency_ttl_seconds)
+
+
+def transition_once(
+    session: Session,
+    org_id: UUID,
+    action_id: str,
+    name: str,
+    actor_user_id: UUID | None = None,
+    expected_version: int | None = None,
+    idempotency_key: str | None = None,
+) -> dict:
+    """``apply_transition`` for a request, replaying the stored response for a repeated ``idempotency_key``."""
+    parsed = parse_action_id(action_id)
+    if parsed is None:
+        return {"status": "not_found"}
+    scope = f"{name}:{parsed}"
+    cache = get_idempotency_cache()
+    if idempotency_key:
+        replay = cache.get(org_id, scope, idempotency_key)
+        if replay is not None:
+            return {**replay, "idempotent_replay": True}
+    try:
+        result = apply_transition(session, org_id, parsed, name, actor_user_id, expected_version)
+    except TransitionConflict:
+        # A concurrent request with the same key may have won the transition.
+        replay = cache.get(org_id, scope, idempotency_key) if idempotency_key else None
+        if replay is None:
+            raise
+        return {**replay, "idempotent_replay": True}
+    if result is None:
+        return {"status": "not_found"}
+    if idempotency_key:
+        cache.put(org_id, scope, idempotency_key, result)
+    return result
+
+
+class BatchTransitionRequest(BaseModel):
+    """Body of the batch approve, execute and rollback endpoints."""
+
+    action_ids: list[str] = Field(min_length=1, max_length=500)
+
+
+def transition_batch_once(
+    session: Session,
+    org_id: UUID,
+    action_ids: list[str],
+    name: str,
+    actor_user_id: UUID | None = None,
+    idempotency_key: str | None = None,
+) -> dict:
+    """``apply_transitions`` for a request, with per-item results and ``transition_once``'s replay."""
+    parsed = {action_id: parse_action_id(action_id) for action_id in action_ids}
+    valid = [action_id for action_id in parsed.values() if action_id is not None]
+    digest = hashlib.sha1(",".join(sorted(map(str, valid))).encode()).hexdigest()[:16]
+    scope = f"{name}:batch:{digest}"
+    cache = get_idempotency_cache()
+    if idempotency_key:
+        replay = cache.get(org_id, scope, idempotency_key)
+        if replay is not None:
+            return {**replay, "idempotent_replay": True}
+    applied = {result["id"]: result for result in (apply_transitions(session, org_id, valid, name, actor_user_id) if valid else [])}
+    results = [
+        applied[str(value)] if value is not None else {"id": action_id, "status": "not_found"}
+        for action_id, value in parsed.items()
+    ]
+    target = TRANSITIONS[name].target
+    response = {
+        "status": target,
+        "applied": sum(result["status"] == target for result in results),
+        "results": results,
+    }
+    if idempotency_key:
+        cache.put(org_id, scope, idempotency_key, response)
+    return response
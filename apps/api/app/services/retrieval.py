@@ -0,0 +1,565 @@
+"""Vector retrieval over knowledge-base documents and past RCA reports.
+
+Documents and reports are split into overlapping word windows and embedded
+by a local :class:`Embedder`. The default hashes unigrams and bigrams into
+signed buckets, so it needs no model files or corpus statistics and a
+chunk's vector never changes as the corpus grows; that is what lets
+indexing be purely incremental.
+
+Each org's vectors live in a memory-mapped float32 matrix under
+INDEX_DATA_DIR/vectors/<org>/ next to an append-only JSON-lines chunk log.
+Queries score the matrix block by block with one matrix-vector product per
+block. Once an org holds ``ivf_threshold`` vectors they are also partitioned
+by spherical k-means (IVF) and queries score only the ``probes`` partitions
+whose centroids are closest to the query.
+"""
+from __future__ import annotations
+
+import fcntl
+import json
+import math
+import os
+import re
+import threading
+import zlib
+from array import array
+from collections import Counter
+from collections.abc import Iterable, Iterator, Sequence
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from itertools import pairwise
+from pathlib import Path
+from typing import Protocol
+from uuid import UUID
+
+import numpy as np
+from sqlmodel import Session, select
+
+from app.core.config import get_settings
+from app.db.models import KBDocument, RCAReport
+from app.services.cache import get_cache
+from app.services.search import tokenize
+
+SOURCE_KB = "kb"
+SOURCE_RCA = "rca"
+CHUNK_WORDS = 160
+CHUNK_OVERLAP = 40
+SCAN_BLOCK_ROWS = 65536
+CATCH_UP_BATCH = 256
+IVF_MIN_LISTS = 16
+IVF_MAX_LISTS = 4096
+IVF_SAMPLE_PER_LIST = 256
+IVF_TRAIN_ITERATIONS = 10
+# Extra hits fetched per requested result so several chunks of one source collapse to its best.
+SOURCE_OVERFETCH = 4
+_WORD_SPAN = re.compile(r"\S+")
+
+
+def chunk_text(text: str, words: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP) -> list[str]:
+    """Windows of ``words`` words, consecutive windows sharing ``overlap`` words."""
+    spans = [match.span() for match in _WORD_SPAN.finditer(text)]
+    if not spans:
+        return []
+    chunks = []
+    for start in range(0, max(len(spans) - overlap, 1), words - overlap):
+        window = spans[start : start + words]
+        chunks.append(text[window[0][0] : window[-1][1]])
+    return chunks
+
+
+class Embedder(Protocol):
+    name: str
+    dimensions: int
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Unit-length float32 rows, one per text; all-zero for texts without terms."""
+        ...
+
+
+@lru_cache(maxsize=1 << 18)
+def _feature_hash(feature: str) -> int:
+    return zlib.crc32(feature.encode())
+
+
+class HashingEmbedder:
+    """Signed feature hashing of unigrams and bigrams with sublinear term frequency."""
+
+    name = "hashing"
+
+    def __init__(self, dimensions: int = 384):
+        self.dimensions = dimensions
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            features = Counter(tokens)
+            features.update(f"{left} {right}" for left, right in pairwise(tokens))
+            if not features:
+                continue
+            hashes = np.fromiter((_feature_hash(feature) for feature in features), dtype=np.uint32, count=len(features))
+            weights = 1 + np.log(np.fromiter(features.values(), dtype=np.float32, count=len(features)))
+            signs = np.where(hashes & 0x80000000, np.float32(1), np.float32(-1))
+            np.add.at(matrix[row], hashes % self.dimensions, signs * weights)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.maximum(norms, 1e-12)
+        return matrix
+
+
+EMBEDDERS = {HashingEmbedder.name: HashingEmbedder}
+
+
+def make_embedder(name: str, dimensions: int) -> Embedder:
+    factory = EMBEDDERS.get(name)
+    if factory is None:
+        raise ValueError(f"unknown retrieval embedder {name!r}")
+    return factory(dimensions)
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    nearest = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), SCAN_BLOCK_ROWS):
+        block = np.asarray(vectors[start : start + SCAN_BLOCK_ROWS])
+        nearest[start : start + len(block)] = (block @ centroids.T).argmax(axis=1)
+    return nearest
+
+
+class IVFPartition:
+    """Inverted lists of row positions keyed by their nearest k-means centroid."""
+
+    def __init__(self, centroids: np.ndarray, assignments: np.ndarray):
+        self.centroids = centroids
+        self.trained_on = len(assignments)
+        self.lists = [array("I") for _ in range(len(centroids))]
+        self._append(0, assignments)
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, seed: int = 0) -> IVFPartition:
+        rng = np.random.default_rng(seed)
+        count = len(vectors)
+        lists = int(min(max(math.isqrt(count), IVF_MIN_LISTS), IVF_MAX_LISTS, count))
+        sample_rows = np.sort(rng.choice(count, size=min(count, lists * IVF_SAMPLE_PER_LIST), replace=False))
+        sample = np.asarray(vectors[sample_rows])
+        centroids = sample[rng.choice(len(sample), size=lists, replace=False)].copy()
+        for _ in range(IVF_TRAIN_ITERATIONS):
+            nearest = _nearest(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, nearest, sample)
+            filled = np.bincount(nearest, minlength=lists) > 0
+            norms = np.linalg.norm(sums[filled], axis=1, keepdims=True)
+            # Empty lists keep their previous centroid rather than collapsing to zero.
+            centroids[filled] = sums[filled] / np.maximum(norms, 1e-12)
+        return cls(centroids, _nearest(vectors, centroids))
+
+    def _append(self, first: int, assignments: np.ndarray) -> None:
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(len(self.centroids) + 1))
+        for list_id in np.flatnonzero(np.diff(bounds)):
+            self.lists[list_id].extend((order[bounds[list_id] : bounds[list_id + 1]] + first).astype(np.uint32).tolist())
+
+    def extend(self, first: int, vectors: np.ndarray) -> None:
+        self._append(first, _nearest(vectors, self.centroids))
+
+    def candidates(self, vector: np.ndarray, probes: int) -> np.ndarray:
+        affinity = self.centroids @ vector
+        probes = min(probes, len(affinity))
+        probed = np.argpartition(-affinity, probes - 1)[:probes]
+        return np.sort(np.concatenate([np.array(self.lists[list_id], dtype=np.int64) for list_id in probed]))
+
+    def assignments(self, count: int) -> np.ndarray:
+        assignments = np.zeros(count, dtype=np.int32)
+        for list_id, positions in enumerate(self.lists):
+            rows = np.array(positions, dtype=np.int64)
+            assignments[rows[rows < count]] = list_id
+        return assignments
+
+
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    if len(scores) > k:
+        top = np.argpartition(-scores, k)[:k]
+        return top[np.argsort(-scores[top], kind="stable")]
+    return np.argsort(-scores, kind="stable")
+
+
+@dataclass
+class RetrievalSource:
+    kind: str
+    id: UUID
+    title: str
+    text: str
+    created_at: datetime | None
+
+
+class VectorStore:
+    """One org's chunk vectors: a growable memmap, its chunk log and an optional IVF partition.
+
+    Several API workers may open the same directory. Every change to the
+    files happens under an exclusive ``flock`` on a lock file next to the
+    directory, after catching up with whatever other processes appended, so
+    each process's ``count`` only ever trails the files and never overwrites
+    another's rows.
+    """
+
+    def __init__(self, directory: Path, embedder: Embedder, ivf_threshold: int = 0, probes: int = 16):
+        self.directory = directory
+        self.embedder = embedder
+        self.dimensions = embedder.dimensions
+        self.ivf_threshold = ivf_threshold
+        self.probes = probes
+        self.count = 0
+        self.capacity = 0
+        self.offsets = array("Q")
+        self.sources: set[tuple[str, str]] = set()
+        self.high_water: dict[str, datetime] = {}
+        self.ivf: IVFPartition | None = None
+        self.source_versions: tuple[int, ...] = ()
+        self._matrix: np.memmap | None = None
+        self._log_size = 0
+        self._lock = threading.Lock()
+        self._open()
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.directory / "vectors.f32"
+
+    @property
+    def _chunks_path(self) -> Path:
+        return self.directory / "chunks.jsonl"
+
+    @property
+    def _ivf_path(self) -> Path:
+        return self.directory / "ivf.npz"
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        # Beside the directory rather than in it, so resetting the store keeps the lock.
+        with self.directory.with_name(f"{self.directory.name}.lock").open("a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _log_bytes(self) -> int:
+        return self._chunks_path.stat().st_size if self._chunks_path.exists() else 0
+
+    def _state_matches(self) -> bool:
+        state_path = self.directory / "state.json"
+        return state_path.exists() and json.loads(state_path.read_text()) == self._state
+
+    @property
+    def _state(self) -> dict:
+        return {"embedder": self.embedder.name, "dimensions": self.dimensions}
+
+    def _open(self) -> None:
+        self.directory.parent.mkdir(parents=True, exist_ok=True)
+        with self._file_lock():
+            if not self._state_matches():
+                # A different embedder makes every stored vector meaningless; start over. Files are
+                # replaced rather than the directory removed: other workers may have them open.
+                self.directory.mkdir(parents=True, exist_ok=True)
+                for path in (self._ivf_path, self._chunks_path, self._vectors_path):
+                    path.unlink(missing_ok=True)
+                (self.directory / "state.json").write_text(json.dumps(self._state))
+                return
+            self._load()
+
+    def _load(self) -> None:
+        """(Re)build the in-memory view from the files; the caller holds the file lock."""
+        if not self._state_matches():
+            raise RuntimeError(f"vector store in {self.directory} was reset for a different embedder")
+        self.count = self.capacity = self._log_size = 0
+        self.offsets = array("Q")
+        self.sources = set()
+        self.high_water = {}
+        self.ivf = None
+        self._matrix = None
+        self._read_log(truncate_torn=True)
+        self._map_file()
+        if self.capacity < self.count:
+            raise RuntimeError(f"vector file in {self.directory} is shorter than its chunk log")
+        if self._ivf_path.exists():
+            with np.load(self._ivf_path) as data:
+                centroids, assignments = data["centroids"], data["assignments"][: self.count]
+            self.ivf = IVFPartition(centroids, assignments)
+            if len(assignments) < self.count:
+                self.ivf.extend(len(assignments), self._matrix[len(assignments) : self.count])
+
+    def _read_log(self, truncate_torn: bool) -> None:
+        """Index chunk records appended after ``_log_size``."""
+        if not self._chunks_path.exists():
+            return
+        with self._chunks_path.open("rb+") as handle:
+            handle.seek(self._log_size)
+            position = self._log_size
+            for line in handle:
+                if not line.endswith(b"\n"):
+                    # Torn write from a crash: drop the partial record. Without the file lock it
+                    # may instead be a record still being written, which is left for the next read.
+                    if truncate_torn:
+                        handle.truncate(position)
+                    break
+                record = json.loads(line)
+                self.offsets.append(position)
+                self.sources.add((record["source"], record["id"]))
+                if record["created_at"]:
+                    self._advance(record["source"], datetime.fromisoformat(record["created_at"]))
+                position += len(line)
+        self._log_size = position
+        self.count = len(self.offsets)
+
+    def _map_file(self) -> None:
+        if not self._vectors_path.exists():
+            return
+        capacity = self._vectors_path.stat().st_size // (4 * self.dimensions)
+        if capacity and (capacity != self.capacity or self._matrix is None):
+            self.capacity = capacity
+            self._map()
+
+    def _sync(self) -> None:
+        """Catch up with rows other processes appended; the caller holds both locks."""
+        size = self._log_bytes()
+        if size == self._log_size:
+            return
+        if size < self._log_size:
+            # Another process reset the store.
+            self._load()
+            return
+        first = self.count
+        self._read_log(truncate_torn=False)
+        self._map_file()
+        if self.ivf is not None and self.count > first:
+            self.ivf.extend(first, self._matrix[first : self.count])
+
+    def _advance(self, kind: str, created_at: datetime) -> None:
+        current = self.high_water.get(kind)
+        if current is None or created_at > current:
+            self.high_water[kind] = created_at
+
+    def _map(self) -> None:
+        self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dimensions))
+
+    def _reserve(self, rows: int) -> None:
+        if rows <= self.capacity:
+            return
+        self.capacity = max(rows, self.capacity * 2, 1024)
+        if self._matrix is not None:
+            self._matrix.flush()
+        # Readers holding the old map keep a valid view of the rows they were given.
+        with self._vectors_path.open("ab") as handle:
+            handle.truncate(self.capacity * 4 * self.dimensions)
+        self._map()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, sources: Iterable[RetrievalSource]) -> int:
+        """Chunk, embed and append sources not indexed yet; returns the number of new chunks."""
+        records, texts = [], []
+        with self._lock:
+            fresh = [source for source in sources if (source.kind, str(source.id)) not in self.sources]
+        for source in fresh:
+            for number, chunk in enumerate(chunk_text(source.text)):
+                records.append(
+                    {
+                        "source": source.kind,
+                        "id": str(source.id),
+                        "chunk": number,
+                        "title": source.title,
+                        "created_at": source.created_at.isoformat() if source.created_at else None,
+                        "text": chunk,
+                    }
+                )
+                texts.append(f"{source.title}\n{chunk}")
+        vectors = self.embedder.embed(texts) if texts else None
+        with self._lock, self._file_lock():
+            self._sync()
+            seen = {(record["source"], record["id"]) for record in records if (record["source"], record["id"]) in self.sources}
+            if seen:
+                keep = [i for i, record in enumerate(records) if (record["source"], record["id"]) not in seen]
+                records = [records[i] for i in keep]
+                vectors = vectors[keep]
+            for source in fresh:
+                self.sources.add((source.kind, str(source.id)))
+            if not records:
+                return 0
+            first = self.count
+            self._reserve(first + len(records))
+            self._matrix[first : first + len(records)] = vectors
+            self._matrix.flush()
+            # Vectors are durable before their chunk records, so a logged chunk always has its row.
+            with self._chunks_path.open("ab") as handle:
+                position = handle.tell()
+                for record in records:
+                    line = (json.dumps(record) + "\n").encode()
+                    handle.write(line)
+                    self.offsets.append(position)
+                    position += len(line)
+            self._log_size = position
+            self.count = first + len(records)
+            for source in fresh:
+                if source.created_at is not None:
+                    self._advance(source.kind, source.created_at)
+            if self.ivf is not None:
+                self.ivf.extend(first, vectors)
+            self._maybe_train()
+            return len(records)
+
+    def _maybe_train(self) -> None:
+        if not self.ivf_threshold or self.count < self.ivf_threshold:
+            return
+        if self.ivf is not None and self.count < 2 * self.ivf.trained_on:
+            return
+        self.ivf = IVFPartition.train(self._matrix[: self.count])
+        temporary = self._ivf_path.with_suffix(".tmp.npz")
+        np.savez(temporary, centroids=self.ivf.centroids, assignments=self.ivf.assignments(self.count))
+        os.replace(temporary, self._ivf_path)
+
+    def search(self, query: str, limit: int, exact: bool = False) -> list[dict]:
+        """Best chunk of each of the ``limit`` most similar sources, most similar first."""
+        vector = self.embedder.embed([query])[0]
+        if not vector.any():
+            return []
+        with self._lock:
+            if self._log_bytes() != self._log_size:
+                with self._file_lock():
+                    self._sync()
+            matrix, count, offsets = self._matrix, self.count, self.offsets
+            candidates = self.ivf.candidates(vector, self.probes) if self.ivf is not None and not exact else None
+        if not count:
+            return []
+        wanted = limit * SOURCE_OVERFETCH
+        if candidates is not None:
+            scores = np.asarray(matrix[candidates]) @ vector
+            top = _top(scores, wanted)
+            positions, scores = candidates[top], scores[top]
+        else:
+            positions, scores = self._scan(matrix, count, vector, wanted)
+        results, seen = [], set()
+        with self._chunks_path.open("rb") as handle:
+            for position, score in zip(positions.tolist(), scores.tolist()):
+                if score <= 0:
+                    break
+                handle.seek(offsets[position])
+                record = json.loads(handle.readline())
+                key = (record["source"], record["id"])
+                if key in seen:
+                    continue
+                seen.add(key)
+                record["score"] = round(score, 4)
+                results.append(record)
+                if len(results) == limit:
+                    break
+        return results
+
+    @staticmethod
+    def _scan(matrix: np.ndarray, count: int, vector: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        best_positions, best_scores = [], []
+        for start in range(0, count, SCAN_BLOCK_ROWS):
+            scores = np.asarray(matrix[start : min(count, start + SCAN_BLOCK_ROWS)]) @ vector
+            top = _top(scores, k)
+            best_positions.append(top + start)
+            best_scores.append(scores[top])
+        positions, scores = np.concatenate(best_positions), np.concatenate(best_scores)
+        top = _top(scores, k)
+        return positions[top], scores[top]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "chunks": self.count,
+                "sources": len(self.sources),
+                "dimensions": self.dimensions,
+                "embedder": self.embedder.name,
+                "ivf_lists": len(self.ivf.centroids) if self.ivf is not None else 0,
+                "ivf_trained_on": self.ivf.trained_on if self.ivf is not None else 0,
+                "capacity_bytes": self.capacity * 4 * self.dimensions,
+            }
+
+
+def _report_text(summary: str, evidence: list) -> str:
+    lines = [summary]
+    for item in evidence or []:
+        if isinstance(item, dict):
+            lines.append(f"{item.get('source', 'evidence')}: {item.get('detail', '')}")
+        else:
+            lines.append(str(item))
+    return "\n".join(lines)
+
+
+def kb_source(document: KBDocument) -> RetrievalSource:
+    return RetrievalSource(SOURCE_KB, document.id, document.title, document.content, document.created_at)
+
+
+def rca_source(report: RCAReport) -> RetrievalSource:
+    return RetrievalSource(
+        SOURCE_RCA,
+        report.id,
+        f"RCA for incident {report.incident_id}",
+        _report_text(report.summary, report.evidence),
+        report.created_at,
+    )
+
+
+def _batches(rows: Sequence, size: int) -> Iterable[Sequence]:
+    for start in range(0, len(rows), size):
+        yield rows[start : start + size]
+
+
+class VectorIndexRegistry:
+    def __init__(self, data_dir: Path, embedder: Embedder, ivf_threshold: int, probes: int):
+        self.data_dir = data_dir
+        self.embedder = embedder
+        self.ivf_threshold = ivf_threshold
+        self.probes = probes
+        self._stores: dict[UUID, VectorStore] = {}
+        self._lock = threading.Lock()
+
+    def store(self, session: Session, org_id: UUID) -> VectorStore:
+        """The org's store, opened from disk and caught up with documents and reports."""
+        cache = get_cache()
+        versions = (cache.version(org_id, "documents"), cache.version(org_id, "rca.reports"))
+        store = self._stores.get(org_id)
+        if store is not None and store.source_versions == versions:
+            return store
+        with self._lock:
+            store = self._stores.get(org_id)
+            if store is None:
+                store = VectorStore(self.data_dir / "vectors" / str(org_id), self.embedder, self.ivf_threshold, self.probes)
+            self._catch_up(session, org_id, store)
+            store.source_versions = versions
+            self._stores[org_id] = store
+        return store
+
+    def _catch_up(self, session: Session, org_id: UUID, store: VectorStore) -> None:
+        documents = select(KBDocument).where(KBDocument.org_id == org_id)
+        if SOURCE_KB in store.high_water:
+            documents = documents.where(KBDocument.created_at >= store.high_water[SOURCE_KB])
+        for batch in _batches(session.exec(documents).all(), CATCH_UP_BATCH):
+            store.add([kb_source(document) for document in batch])
+        reports = select(RCAReport).where(RCAReport.org_id == org_id)
+        if SOURCE_RCA in store.high_water:
+            reports = reports.where(RCAReport.created_at >= store.high_water[SOURCE_RCA])
+        for batch in _batches(session.exec(reports).all(), CATCH_UP_BATCH):
+            store.add([rca_source(report) for report in batch])
+
+    def add(self, org_id: UUID, source: RetrievalSource) -> None:
+        store = self._stores.get(org_id)
+        if store is not None:
+            store.add([source])
+
+    def retrieve(self, session: Session, org_id: UUID, query: str, limit: int = 5) -> list[dict]:
+        return self.store(session, org_id).search(query, limit)
+
+
+@lru_cache
+def get_vector_registry() -> VectorIndexRegistry:
+    settings = get_settings()
+    return VectorIndexRegistry(
+        Path(settings.index_data_dir),
+        make_embedder(settings.retrieval_embedder, settings.retrieval_dimensions),
+        settings.retrieval_ivf_threshold,
+        settings.retrieval_ivf_probes,
+    )
@@ -0,0 +1,298 @@
+"""Risk scoring for proposed changes from a per-org feature store.
+
+A proposed change is rated from four features, each scaled to [0, 1]:
+
+* blast radius: tier-weighted, hop-decayed count of the nodes that depend
+  on the changed service in the knowledge graph;
+* history: how often earlier changes of the same kind to the same service
+  were later linked to an incident through ``IncidentSuspectedChange``,
+  backing off to the service, the kind and then the whole org when the
+  narrower history is too thin, and smoothed towards the org-wide rate;
+* tier: the service's ``tier`` property;
+* time of day: the smoothed failure rate of changes started in the same hour.
+
+The history aggregates are counters in a per-org feature store. It is
+loaded once, then refreshed incrementally from change and suspected-change
+rows created after its high-water marks, so a score never scans history.
+A suspected change counts against the ``ChangeRecord`` whose ``source`` and
+``external_id`` equal its ``source`` and ``reference``. A link that arrives
+before its change is held for at most ``PENDING_LINK_MAX_AGE`` (and
+``MAX_PENDING_LINKS`` links per org) in case the change is ingested late.
+Blast radius is memoized per graph version by the impact memo.
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from functools import lru_cache
+from uuid import UUID
+
+import numpy as np
+from sqlmodel import Session, select
+
+from app.core.config import get_settings
+from app.db.models import ChangeRecord, IncidentSuspectedChange, utc_now
+from app.services.cache import get_cache
+from app.services.graph_index import GraphSnapshot, get_graph_index
+from app.services.impact import (
+    DEFAULT_TIER_WEIGHT,
+    HOP_DECAY,
+    blast_radius,
+    get_impact_memo,
+    snapshot_tier_weights,
+    tier_weight,
+)
+
+FEATURE_WEIGHTS = {"blast_radius": 0.3, "history": 0.35, "tier": 0.2, "time_of_day": 0.15}
+RISK_LEVELS = ((0.8, "critical"), (0.6, "high"), (0.3, "moderate"), (0.0, "low"))
+BLAST_HOPS = 4
+# Weighted dependents at which the blast-radius feature reaches 1 - 1/e.
+BLAST_SCALE = 5.0
+BASE_FAILURE_RATE = 0.05
+ORG_PRIOR_STRENGTH = 20.0
+BACKOFF_STRENGTH = 5.0
+# Fewer changes than this at a level backs off to the next broader one.
+MIN_HISTORY = 5
+# A smoothed failure rate of 1 / HISTORY_SCALE or more saturates the history features.
+HISTORY_SCALE = 3.0
+PENDING_LINK_MAX_AGE = timedelta(days=7)
+MAX_PENDING_LINKS = 10_000
+
+
+@dataclass
+class Tally:
+    changes: int = 0
+    failures: int = 0
+
+    def rate(self, prior: float, strength: float) -> float:
+        return (self.failures + prior * strength) / (self.changes + strength)
+
+
+@dataclass
+class ChangeFeatures:
+    service: str | None
+    kind: str
+    hour: int
+    failed: bool = False
+
+
+@dataclass
+class ChangeProposal:
+    service: str
+    kind: str = "deploy"
+    environment: str | None = None
+    scheduled_at: datetime | None = None
+    external_id: str | None = None
+
+
+@dataclass
+class RiskFeatureStore:
+    total: Tally = field(default_factory=Tally)
+    by_kind: dict[str, Tally] = field(default_factory=lambda: defaultdict(Tally))
+    by_service: dict[str, Tally] = field(default_factory=lambda: defaultdict(Tally))
+    by_service_kind: dict[tuple[str, str], Tally] = field(default_factory=lambda: defaultdict(Tally))
+    by_hour: list[Tally] = field(default_factory=lambda: [Tally() for _ in range(24)])
+    changes: dict[tuple[str, str], ChangeFeatures] = field(default_factory=dict)
+    # Incident links that arrived before the change they point at, oldest first, by link time.
+    pending_links: dict[tuple[str, str], datetime] = field(default_factory=dict)
+    # Links created exactly at the links high-water mark, which the next refresh reads again.
+    boundary_links: set[UUID] = field(default_factory=set)
+    high_water: dict[str, datetime] = field(default_factory=dict)
+    source_version: int = -1
+    refreshed_at: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def _tallies(self, features: ChangeFeatures) -> list[Tally]:
+        tallies = [self.total, self.by_hour[features.hour], self.by_kind[features.kind]]
+        if features.service:
+            tallies += [self.by_service[features.service], self.by_service_kind[(features.service, features.kind)]]
+        return tallies
+
+    def add_change(self, source: str, external_id: str, service: str | None, kind: str, started_at: datetime) -> None:
+        key = (source, external_id)
+        if key in self.changes:
+            return
+        failed = self.pending_links.pop(key, None) is not None
+        features = self.changes[key] = ChangeFeatures(service, kind, started_at.hour, failed)
+        for tally in self._tallies(features):
+            tally.changes += 1
+            tally.failures += features.failed
+
+    def add_link(self, link_id: UUID, source: str, reference: str, created_at: datetime) -> None:
+        high_water = self.high_water.get("links")
+        if high_water is not None and (created_at < high_water or (created_at == high_water and link_id in self.boundary_links)):
+            return
+        if high_water is None or created_at > high_water:
+            self.high_water["links"] = created_at
+            self.boundary_links = {link_id}
+        else:
+            self.boundary_links.add(link_id)
+        features = self.changes.get((source, reference))
+        if features is None:
+            self.pending_links.setdefault((source, reference), created_at)
+            return
+        if features.failed:
+            return
+        features.failed = True
+        for tally in self._tallies(features):
+            tally.failures += 1
+
+    def _advance(self, name: str, created_at: datetime) -> None:
+        current = self.high_water.get(name)
+        if current is None or created_at > current:
+            self.high_water[name] = created_at
+
+    def refresh(self, session: Session, org_id: UUID) -> None:
+        changes = select(
+            ChangeRecord.source, ChangeRecord.external_id, ChangeRecord.service, ChangeRecord.kind, ChangeRecord.started_at, ChangeRecord.created_at
+        ).where(ChangeRecord.org_id == org_id)
+        if "changes" in self.high_water:
+            changes = changes.where(ChangeRecord.created_at >= self.high_water["changes"])
+        for source, external_id, service, kind, started_at, created_at in session.exec(changes).all():
+            self.add_change(source, external_id, service, kind, started_at)
+            self._advance("changes", created_at)
+        links = select(
+            IncidentSuspectedChange.id, IncidentSuspectedChange.source, IncidentSuspectedChange.reference, IncidentSuspectedChange.created_at
+        ).where(IncidentSuspectedChange.org_id == org_id)
+        if "links" in self.high_water:
+            links = links.where(IncidentSuspectedChange.created_at >= self.high_water["links"])
+        for link_id, source, reference, created_at in session.exec(links.order_by(IncidentSuspectedChange.created_at)).all():
+            self.add_link(link_id, source, reference, created_at)
+        self._expire_pending_links()
+
+    def _expire_pending_links(self) -> None:
+        high_water = self.high_water.get("links")
+        if high_water is None:
+            return
+        cutoff = high_water - PENDING_LINK_MAX_AGE
+        for key, linked_at in list(self.pending_links.items()):
+            if linked_at >= cutoff and len(self.pending_links) <= MAX_PENDING_LINKS:
+                break
+            del self.pending_links[key]
+
+    def history_rate(self, service: str | None, kind: str) -> tuple[float, Tally]:
+        """Smoothed failure rate of the most specific history with enough changes, and that history."""
+        org_rate = self.total.rate(BASE_FAILURE_RATE, ORG_PRIOR_STRENGTH)
+        levels = [self.by_kind.get(kind)]
+        if service:
+            levels = [self.by_service_kind.get((service, kind)), self.by_service.get(service), *levels]
+        for tally in levels:
+            if tally is not None and tally.changes >= MIN_HISTORY:
+                return tally.rate(org_rate, BACKOFF_STRENGTH), tally
+        return org_rate, self.total
+
+    def hour_rate(self, hour: int) -> float:
+        return self.by_hour[hour].rate(self.total.rate(BASE_FAILURE_RATE, ORG_PRIOR_STRENGTH), BACKOFF_STRENGTH)
+
+    def stats(self) -> dict:
+        return {
+            "changes": self.total.changes,
+            "failed_changes": self.total.failures,
+            "services": len(self.by_service),
+            "pending_links": len(self.pending_links),
+            "high_water": {name: moment.isoformat() for name, moment in self.high_water.items()},
+        }
+
+
+def risk_level(score: float) -> str:
+    for floor, level in RISK_LEVELS:
+        if score >= floor:
+            return level
+    return "low"
+
+
+def _service_exposure(graph: GraphSnapshot, service: str) -> tuple[float, int, float]:
+    """(blast-radius feature, dependent count, tier weight) of ``service``."""
+    seeds = graph.positions_for_labels({service})
+    if not seeds:
+        return 0.0, 0, DEFAULT_TIER_WEIGHT
+    memo = get_impact_memo()
+    traversal = blast_radius(graph, seeds, BLAST_HOPS, memo)
+    weights = snapshot_tier_weights(graph, memo)
+    weighted = float((weights[traversal.positions] * HOP_DECAY ** traversal.depth.astype(np.float32)).sum())
+    tier = max(tier_weight(graph.nodes.properties[position]) for position in seeds)
+    return 1 - math.exp(-weighted / BLAST_SCALE), len(traversal.positions), tier
+
+
+def score_change(
+    store: RiskFeatureStore,
+    graph: GraphSnapshot,
+    proposal: ChangeProposal,
+    exposure: dict[str, tuple[float, int, float]],
+    now: datetime,
+) -> dict:
+    """Score one proposal; ``exposure`` caches graph features per service across a batch."""
+    if proposal.service not in exposure:
+        exposure[proposal.service] = _service_exposure(graph, proposal.service)
+    blast, dependents, tier = exposure[proposal.service]
+    scheduled_at = proposal.scheduled_at or now
+    with store.lock:
+        history, similar = store.history_rate(proposal.service, proposal.kind)
+        hourly = store.hour_rate(scheduled_at.hour)
+    features = {
+        "blast_radius": blast,
+        "history": min(1.0, history * HISTORY_SCALE),
+        "tier": tier,
+        "time_of_day": min(1.0, hourly * HISTORY_SCALE),
+    }
+    contributions = {name: FEATURE_WEIGHTS[name] * value for name, value in features.items()}
+    score = sum(contributions.values())
+    return {
+        "change": {
+            "external_id": proposal.external_id,
+            "service": proposal.service,
+            "environment": proposal.environment,
+            "kind": proposal.kind,
+            "scheduled_at": scheduled_at.isoformat(),
+        },
+        "score": round(score, 4),
+        "risk": risk_level(score),
+        "features": {name: round(value, 4) for name, value in features.items()},
+        "drivers": sorted(contributions, key=contributions.get, reverse=True)[:2],
+        "evidence": {
+            "service_in_graph": bool(graph.positions_for_labels({proposal.service})),
+            "dependents": dependents,
+            "similar_changes": similar.changes,
+            "similar_failures": similar.failures,
+            "failure_rate": round(history, 4),
+            "hour_failure_rate": round(hourly, 4),
+            "graph_version": graph.version,
+        },
+    }
+
+
+class RiskEngine:
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._stores: dict[UUID, RiskFeatureStore] = {}
+        self._lock = threading.Lock()
+
+    def store(self, session: Session, org_id: UUID) -> RiskFeatureStore:
+        """The org's feature store, refreshed when changes were written or it has gone stale."""
+        version = get_cache().version(org_id, "changes")
+        with self._lock:
+            store = self._stores.setdefault(org_id, RiskFeatureStore())
+        if store.source_version == version and time.monotonic() - store.refreshed_at < self.refresh_seconds:
+            return store
+        with store.lock:
+            if store.source_version != version or time.monotonic() - store.refreshed_at >= self.refresh_seconds:
+                store.refresh(session, org_id)
+                store.source_version = version
+                store.refreshed_at = time.monotonic()
+        return store
+
+    def score(self, session: Session, org_id: UUID, proposals: list[ChangeProposal]) -> list[dict]:
+        store = self.store(session, org_id)
+        graph = get_graph_index().snapshot(session, org_id)
+        exposure: dict[str, tuple[float, int, float]] = {}
+        now = utc_now()
+        return [score_change(store, graph, proposal, exposure, now) for proposal in proposals]
+
+
+@lru_cache
+def get_risk_engine() -> RiskEngine:
+    return RiskEngine(get_settings().risk_refresh_seconds)
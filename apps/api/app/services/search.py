@@ -0,0 +1,282 @@
+"""BM25 full-text search over each org's knowledge base.
+
+Every org has an in-memory inverted index: postings map a term to the
+documents containing it and the term frequency there, stored in compact
+``array`` columns that grow as documents are added. Queries score only the
+postings of their own terms with vectorized BM25 and select the top hits
+with a heap, then cut highlighted snippets from just those documents.
+
+Indexes are snapshotted to INDEX_DATA_DIR/search/<org>.npz after every
+``persist_every`` additions, written under a temporary name of their own and
+renamed into place while holding an flock on search.lock, so workers sharing
+the directory never write over each other's snapshot mid-save. On startup a snapshot is loaded and documents
+created after its high-water mark are indexed from the database, so the
+full corpus is only re-tokenized when no snapshot exists.
+"""
+from __future__ import annotations
+
+import fcntl
+import heapq
+import html
+import json
+import math
+import os
+import re
+import threading
+from array import array
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from uuid import UUID, uuid4
+
+import numpy as np
+from sqlmodel import Session, select
+
+from app.core.config import get_settings
+from app.db.models import KBDocument
+from app.services.cache import get_cache
+
+K1 = 1.2
+B = 0.75
+TITLE_BOOST = 2
+# Below this many candidates a heap over (score, doc) pairs beats a full partition.
+HEAP_CANDIDATES = 4096
+SNIPPET_WORDS = 30
+STOPWORDS = frozenset(
+    {"a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in", "is",
+     "it", "its", "of", "on", "or", "that", "the", "this", "to", "was", "were", "will", "with"}
+)
+_TOKEN = re.compile(r"[a-z0-9]+")
+_WORD_SPAN = re.compile(r"\S+")
+
+
+def tokenize(text: str) -> list[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if (len(token) > 1 or token.isdigit()) and token not in STOPWORDS]
+
+
+class InvertedIndex:
+    def __init__(self):
+        self.doc_ids: list[UUID] = []
+        self.titles: list[str] = []
+        self.lengths = array("I")
+        self.positions: dict[UUID, int] = {}
+        self.postings: dict[str, tuple[array, array]] = {}
+        self.high_water: datetime | None = None
+        self.unsaved = 0
+        self.source_version = -1
+        self._norm: np.ndarray | None = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def add(self, doc_id: UUID, title: str, content: str, created_at: datetime | None) -> bool:
+        terms = Counter(tokenize(content))
+        for term in tokenize(title):
+            terms[term] += TITLE_BOOST
+        with self._lock:
+            if doc_id in self.positions:
+                return False
+            position = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+            self.titles.append(title)
+            self.positions[doc_id] = position
+            length = sum(terms.values())
+            self.lengths.append(length)
+            for term, count in terms.items():
+                postings = self.postings.get(term)
+                if postings is None:
+                    postings = self.postings[term] = (array("I"), array("H"))
+                postings[0].append(position)
+                postings[1].append(min(count, 65535))
+            if created_at is not None and (self.high_water is None or created_at > self.high_water):
+                self.high_water = created_at
+            self.unsaved += 1
+        return True
+
+    def search(self, query: str, limit: int) -> tuple[list[tuple[float, int]], int]:
+        """Top ``limit`` (score, position) pairs and the number of matching documents."""
+        terms = set(tokenize(query))
+        doc_count = len(self.doc_ids)
+        if not terms or not doc_count:
+            return [], 0
+        norm = self._length_norm(doc_count)
+        scores = np.zeros(doc_count, dtype=np.float32)
+        matched = False
+        for term in terms:
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            # np.array copies, so a concurrent append never meets an exported buffer.
+            docs = np.array(postings[0], dtype=np.int64)
+            docs = docs[docs < doc_count]
+            tf = np.array(postings[1], dtype=np.float32)[: len(docs)]
+            idf = math.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tf * (K1 + 1) / (tf + norm[docs])
+            matched = True
+        if not matched:
+            return [], 0
+        # Every BM25 term contribution is positive, so matching documents are exactly the non-zero scores.
+        candidates = np.flatnonzero(scores)
+        if len(candidates) <= HEAP_CANDIDATES:
+            top = heapq.nlargest(limit, zip(scores[candidates].tolist(), candidates.tolist()))
+        else:
+            best = candidates[np.argpartition(-scores[candidates], min(limit, len(candidates) - 1))[:limit]]
+            top = sorted(zip(scores[best].tolist(), best.tolist()), reverse=True)
+        return top, len(candidates)
+
+    def _length_norm(self, doc_count: int) -> np.ndarray:
+        """Per-document BM25 length normalization, recomputed only when documents were added."""
+        cached = self._norm
+        if cached is None or len(cached) != doc_count:
+            lengths = np.array(self.lengths, dtype=np.float32)[:doc_count]
+            cached = self._norm = K1 * (1 - B + B * lengths / (lengths.sum() / doc_count))
+        return cached
+
+    def save(self, path: Path) -> None:
+        with self._lock:
+            terms = list(self.postings)
+            offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+            np.cumsum([len(self.postings[term][0]) for term in terms], out=offsets[1:])
+            docs = np.concatenate([np.array(self.postings[term][0], dtype=np.uint32) for term in terms] or [np.zeros(0, np.uint32)])
+            tfs = np.concatenate([np.array(self.postings[term][1], dtype=np.uint16) for term in terms] or [np.zeros(0, np.uint16)])
+            meta = {
+                "terms": terms,
+                "doc_ids": [str(doc_id) for doc_id in self.doc_ids],
+                "titles": self.titles,
+                "high_water": self.high_water.isoformat() if self.high_water else None,
+            }
+            lengths = np.array(self.lengths, dtype=np.uint32)
+            self.unsaved = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(f"{path.stem}.{os.getpid()}.{uuid4().hex[:8]}.tmp.npz")
+        try:
+            with _file_lock(path.parent):
+                np.savez(temporary, meta=np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8), offsets=offsets, docs=docs, tfs=tfs, lengths=lengths)
+                os.replace(temporary, path)
+        finally:
+            temporary.unlink(missing_ok=True)
+
+    @classmethod
+    def load(cls, path: Path) -> InvertedIndex:
+        index = cls()
+        with np.load(path) as data:
+            meta = json.loads(data["meta"].tobytes())
+            offsets, docs, tfs = data["offsets"], data["docs"], data["tfs"]
+            index.lengths = array("I", data["lengths"].astype(np.uint32).tobytes())
+        index.doc_ids = [UUID(value) for value in meta["doc_ids"]]
+        index.titles = meta["titles"]
+        index.positions = {doc_id: position for position, doc_id in enumerate(index.doc_ids)}
+        index.high_water = datetime.fromisoformat(meta["high_water"]) if meta["high_water"] else None
+        for position, term in enumerate(meta["terms"]):
+            start, end = offsets[position], offsets[position + 1]
+            index.postings[term] = (array("I", docs[start:end].tobytes()), array("H", tfs[start:end].tobytes()))
+        return index
+
+
+@contextmanager
+def _file_lock(directory: Path) -> Iterator[None]:
+    # Beside the directory rather than in it, as the retrieval store does.
+    with directory.with_name(f"{directory.name}.lock").open("a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def snippet(content: str, terms: set[str], words: int = SNIPPET_WORDS) -> str:
+    """The ``words``-word window with the most query-term hits, hits wrapped in <mark>."""
+    spans = [(match.start(), match.end()) for match in _WORD_SPAN.finditer(content)]
+    if not spans:
+        return ""
+    hits = np.array([any(token in terms for token in _TOKEN.findall(content[start:end].lower())) for start, end in spans], dtype=np.int32)
+    window = min(words, len(spans))
+    totals = np.convolve(hits, np.ones(window, dtype=np.int32), mode="valid")
+    first = int(totals.argmax())
+    parts = []
+    for (start, end), hit in zip(spans[first : first + window], hits[first : first + window]):
+        word = html.escape(content[start:end])
+        parts.append(f"<mark>{word}</mark>" if hit else word)
+    prefix = "… " if first > 0 else ""
+    suffix = " …" if first + window < len(spans) else ""
+    return prefix + " ".join(parts) + suffix
+
+
+class SearchIndexRegistry:
+    def __init__(self, data_dir: Path, persist_every: int):
+        self.data_dir = data_dir
+        self.persist_every = persist_every
+        self._indexes: dict[UUID, InvertedIndex] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, org_id: UUID) -> Path:
+        return self.data_dir / "search" / f"{org_id}.npz"
+
+    def index(self, session: Session, org_id: UUID) -> InvertedIndex:
+        """The org's index, loaded from its snapshot and caught up with the database."""
+        version = get_cache().version(org_id, "documents")
+        index = self._indexes.get(org_id)
+        if index is not None and index.source_version == version:
+            return index
+        with self._lock:
+            index = self._indexes.get(org_id)
+            if index is None:
+                path = self._path(org_id)
+                index = InvertedIndex.load(path) if path.exists() else InvertedIndex()
+            self._catch_up(session, org_id, index)
+            index.source_version = version
+            self._indexes[org_id] = index
+        self._maybe_persist(org_id, index)
+        return index
+
+    def _catch_up(self, session: Session, org_id: UUID, index: InvertedIndex) -> None:
+        statement = select(KBDocument.id, KBDocument.title, KBDocument.content, KBDocument.created_at).where(
+            KBDocument.org_id == org_id
+        )
+        if index.high_water is not None:
+            statement = statement.where(KBDocument.created_at >= index.high_water)
+        for doc_id, title, content, created_at in session.exec(statement).all():
+            index.add(doc_id, title, content, created_at)
+
+    def add_document(self, org_id: UUID, document: KBDocument) -> None:
+        index = self._indexes.get(org_id)
+        if index is None:
+            return
+        index.add(document.id, document.title, document.content, document.created_at)
+        self._maybe_persist(org_id, index)
+
+    def _maybe_persist(self, org_id: UUID, index: InvertedIndex) -> None:
+        if index.unsaved >= self.persist_every:
+            index.save(self._path(org_id))
+
+    def search(self, session: Session, org_id: UUID, query: str, limit: int) -> dict:
+        index = self.index(session, org_id)
+        top, total = index.search(query, limit)
+        contents = {}
+        if top:
+            wanted = [index.doc_ids[position] for _, position in top]
+            contents = dict(session.exec(select(KBDocument.id, KBDocument.content).where(KBDocument.id.in_(wanted))).all())
+        terms = set(tokenize(query))
+        return {
+            "query": query,
+            "total_hits": total,
+            "results": [
+                {
+                    "id": str(index.doc_ids[position]),
+                    "title": index.titles[position],
+                    "score": round(score, 4),
+                    "snippet": snippet(contents.get(index.doc_ids[position], ""), terms),
+                }
+                for score, position in top
+            ],
+        }
+
+
+@lru_cache
+def get_search_registry() -> SearchIndexRegistry:
+    settings = get_settings()
+    return SearchIndexRegistry(Path(settings.index_data_dir), settings.search_persist_every)
@@ -0,0 +1,265 @@
+"""Similar-incident lookup with MinHash signatures and LSH banding.
+
+An incident is reduced to a set of shingles: the words and word pairs of
+its title and description plus the signal types and services it has seen.
+A MinHash signature of ``NUM_PERMUTATIONS`` values estimates the Jaccard
+similarity of two such sets, and splitting the signature into ``BANDS``
+bands of ``ROWS`` values turns "probably similar" into "shares at least one
+band key", so a lookup only touches incidents in the query's buckets.
+
+Band keys are kept per band as a sorted array with the matching positions,
+plus a small dict tail for recent additions that is merged in once it
+reaches ``SEAL_EVERY`` entries. Lookups are a binary search per band, and
+an incident costs under 400 bytes (signature plus keys) rather than a dict
+entry per band.
+
+Stored signatures reflect the signals known when an incident was indexed;
+lookups always sign the query incident from its current signals.
+"""
+from __future__ import annotations
+
+import threading
+import zlib
+from collections import defaultdict
+from collections.abc import Iterable
+from datetime import datetime
+from functools import lru_cache
+from itertools import pairwise
+from uuid import UUID
+
+import numpy as np
+from sqlmodel import Session, select
+
+from app.db.models import Incident, IncidentSignal
+from app.services.cache import get_cache
+from app.services.search import tokenize
+
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS = NUM_PERMUTATIONS // BANDS
+MERSENNE_PRIME = (1 << 31) - 1
+SEAL_EVERY = 4096
+# Buckets of boilerplate incidents can hold thousands of members; only the newest are candidates.
+MAX_BUCKET_CANDIDATES = 512
+DEFAULT_MIN_SIMILARITY = 0.2
+
+_rng = np.random.default_rng(0x5EED)
+_A = _rng.integers(1, MERSENNE_PRIME, size=NUM_PERMUTATIONS, dtype=np.uint64)[:, None]
+_B = _rng.integers(0, MERSENNE_PRIME, size=NUM_PERMUTATIONS, dtype=np.uint64)[:, None]
+_BAND_MIX = _rng.integers(1, 1 << 32, size=ROWS, dtype=np.uint64) | np.uint64(1)
+
+
+def incident_shingles(title: str, description: str, signal_types: Iterable[str] = (), services: Iterable[str] = ()) -> set[str]:
+    shingles: set[str] = set()
+    for text in (title, description):
+        tokens = tokenize(text)
+        shingles.update(tokens)
+        shingles.update(f"{left} {right}" for left, right in pairwise(tokens))
+    shingles.update(f"signal:{signal_type}" for signal_type in signal_types)
+    shingles.update(f"service:{service}" for service in services)
+    return shingles
+
+
+def minhash(shingles: set[str]) -> np.ndarray | None:
+    """``NUM_PERMUTATIONS`` min-hashes of ``shingles``; None for an empty set."""
+    if not shingles:
+        return None
+    values = np.fromiter((zlib.crc32(shingle.encode()) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+    # a, b and x are all below 2**31, so a * x + b cannot overflow 64 bits.
+    hashed = (_A * (values % np.uint64(MERSENNE_PRIME)) + _B) % np.uint64(MERSENNE_PRIME)
+    return hashed.min(axis=1).astype(np.uint32)
+
+
+def band_keys(signatures: np.ndarray) -> np.ndarray:
+    """One uint32 key per band: (n, NUM_PERMUTATIONS) signatures to (n, BANDS) keys."""
+    bands = signatures.reshape(len(signatures), BANDS, ROWS).astype(np.uint64)
+    mixed = (bands * _BAND_MIX).sum(axis=2, dtype=np.uint64)
+    return (mixed ^ (mixed >> np.uint64(32))).astype(np.uint32)
+
+
+class LSHIndex:
+    """Append-only MinHash signatures with per-band sorted bucket keys."""
+
+    def __init__(self):
+        self.ids: list[UUID] = []
+        self.positions: dict[UUID, int] = {}
+        self.signatures = np.zeros((0, NUM_PERMUTATIONS), dtype=np.uint32)
+        self.high_water: datetime | None = None
+        self.source_version = -1
+        self._sealed_keys = [np.zeros(0, dtype=np.uint32) for _ in range(BANDS)]
+        self._sealed_positions = [np.zeros(0, dtype=np.int32) for _ in range(BANDS)]
+        self._tail: list[dict[int, list[int]]] = [defaultdict(list) for _ in range(BANDS)]
+        self._tail_keys: list[np.ndarray] = []
+        self._tail_positions: list[int] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add_many(self, entries: list[tuple[UUID, np.ndarray, datetime | None]]) -> int:
+        """Index (id, signature, created_at) entries not indexed yet; returns how many were new."""
+        with self._lock:
+            fresh, seen = [], set()
+            for incident_id, signature, created_at in entries:
+                if created_at is not None and (self.high_water is None or created_at > self.high_water):
+                    self.high_water = created_at
+                if incident_id in self.positions or incident_id in seen:
+                    continue
+                seen.add(incident_id)
+                fresh.append((incident_id, signature))
+            if not fresh:
+                return 0
+            first = len(self.ids)
+            signatures = np.stack([signature for _, signature in fresh])
+            self._reserve(first + len(fresh))
+            self.signatures[first : first + len(fresh)] = signatures
+            for offset, (incident_id, _) in enumerate(fresh):
+                self.ids.append(incident_id)
+                self.positions[incident_id] = first + offset
+            keys = band_keys(signatures)
+            if len(fresh) >= SEAL_EVERY:
+                self._merge(keys, np.arange(first, first + len(fresh), dtype=np.int32))
+            else:
+                for offset, row in enumerate(keys):
+                    for band, key in enumerate(row.tolist()):
+                        self._tail[band][key].append(first + offset)
+                    self._tail_keys.append(row)
+                    self._tail_positions.append(first + offset)
+                if len(self._tail_positions) >= SEAL_EVERY:
+                    self._merge(np.stack(self._tail_keys), np.array(self._tail_positions, dtype=np.int32))
+                    self._tail = [defaultdict(list) for _ in range(BANDS)]
+                    self._tail_keys, self._tail_positions = [], []
+            return len(fresh)
+
+    def _reserve(self, rows: int) -> None:
+        if rows > len(self.signatures):
+            grown = np.zeros((max(rows, 2 * len(self.signatures), 1024), NUM_PERMUTATIONS), dtype=np.uint32)
+            grown[: len(self.ids)] = self.signatures[: len(self.ids)]
+            self.signatures = grown
+
+    def _merge(self, keys: np.ndarray, positions: np.ndarray) -> None:
+        for band in range(BANDS):
+            order = np.lexsort((positions, keys[:, band]))
+            new_keys, new_positions = keys[order, band], positions[order]
+            # side="right" keeps existing (older) positions ahead of new ones within a bucket.
+            at = np.searchsorted(self._sealed_keys[band], new_keys, side="right")
+            self._sealed_keys[band] = np.insert(self._sealed_keys[band], at, new_keys)
+            self._sealed_positions[band] = np.insert(self._sealed_positions[band], at, new_positions)
+
+    def candidates(self, signature: np.ndarray) -> np.ndarray:
+        keys = band_keys(signature[None, :])[0]
+        found = []
+        with self._lock:
+            for band, key in enumerate(keys):
+                # A numpy uint32 needle; a Python int would promote the whole band array per search.
+                sealed = self._sealed_keys[band]
+                low, high = np.searchsorted(sealed, key, side="left"), np.searchsorted(sealed, key, side="right")
+                if high > low:
+                    found.append(self._sealed_positions[band][max(low, high - MAX_BUCKET_CANDIDATES) : high])
+                tail = self._tail[band].get(int(key))
+                if tail:
+                    found.append(np.array(tail[-MAX_BUCKET_CANDIDATES:], dtype=np.int32))
+        if not found:
+            return np.zeros(0, dtype=np.int32)
+        return np.unique(np.concatenate(found))
+
+    def similar(self, signature: np.ndarray, limit: int, min_similarity: float, exclude: UUID | None = None) -> list[tuple[UUID, float]]:
+        candidates = self.candidates(signature)
+        if exclude is not None and exclude in self.positions:
+            candidates = candidates[candidates != self.positions[exclude]]
+        if not len(candidates):
+            return []
+        similarity = (self.signatures[candidates] == signature).mean(axis=1)
+        keep = similarity >= min_similarity
+        candidates, similarity = candidates[keep], similarity[keep]
+        order = np.lexsort((-candidates, -similarity))[:limit]
+        return [(self.ids[candidates[i]], round(float(similarity[i]), 4)) for i in order]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "incidents": len(self.ids),
+                "bands": BANDS,
+                "rows_per_band": ROWS,
+                "tail": len(self._tail_positions),
+                "memory_bytes": int(
+                    self.signatures.nbytes
+                    + sum(keys.nbytes for keys in self._sealed_keys)
+                    + sum(positions.nbytes for positions in self._sealed_positions)
+                ),
+            }
+
+
+def _signal_features(session: Session, org_id: UUID, incident_ids: list[UUID] | None = None) -> dict[UUID, tuple[set[str], set[str]]]:
+    statement = (
+        select(IncidentSignal.incident_id, IncidentSignal.type, IncidentSignal.service)
+        .where(IncidentSignal.org_id == org_id)
+        .distinct()
+    )
+    if incident_ids is not None:
+        statement = statement.where(IncidentSignal.incident_id.in_(incident_ids))
+    features: dict[UUID, tuple[set[str], set[str]]] = defaultdict(lambda: (set(), set()))
+    for incident_id, signal_type, service in session.exec(statement).all():
+        types, services = features[incident_id]
+        types.add(signal_type)
+        if service:
+            services.add(service)
+    return features
+
+
+def incident_signature(session: Session, org_id: UUID, incident: Incident) -> np.ndarray | None:
+    types, services = _signal_features(session, org_id, [incident.id]).get(incident.id, ((), ()))
+    return minhash(incident_shingles(incident.title, incident.description, types, services))
+
+
+class SimilarityRegistry:
+    def __init__(self):
+        self._indexes: dict[UUID, LSHIndex] = {}
+        self._lock = threading.Lock()
+
+    def index(self, session: Session, org_id: UUID) -> LSHIndex:
+        """The org's index, built on first use and caught up with incidents created since."""
+        version = get_cache().version(org_id, "incidents")
+        index = self._indexes.get(org_id)
+        if index is not None and index.source_version == version:
+            return index
+        with self._lock:
+            index = self._indexes.get(org_id) or LSHIndex()
+            statement = select(Incident.id, Incident.title, Incident.description, Incident.created_at).where(
+                Incident.org_id == org_id
+            )
+            if index.high_water is not None:
+                statement = statement.where(Incident.created_at >= index.high_water)
+            rows = session.exec(statement).all()
+            if rows:
+                features = _signal_features(session, org_id, None if index.high_water is None else [row[0] for row in rows])
+                entries = []
+                for incident_id, title, description, created_at in rows:
+                    types, services = features.get(incident_id, ((), ()))
+                    signature = minhash(incident_shingles(title, description, types, services))
+                    if signature is not None:
+                        entries.append((incident_id, signature, created_at))
+                index.add_many(entries)
+            index.source_version = version
+            self._indexes[org_id] = index
+        return index
+
+    def add_incident(self, org_id: UUID, incident: Incident) -> None:
+        index = self._indexes.get(org_id)
+        if index is None:
+            return
+        signature = minhash(incident_shingles(incident.title, incident.description))
+        if signature is not None:
+            index.add_many([(incident.id, signature, incident.created_at)])
+
+    def similar(self, session: Session, org_id: UUID, incident: Incident, limit: int, min_similarity: float) -> list[tuple[UUID, float]]:
+        index = self.index(session, org_id)
+        signature = incident_signature(session, org_id, incident)
+        if signature is None:
+            return []
+        return index.similar(signature, limit, min_similarity, exclude=incident.id)
+
+
+@lru_cache
+def get_similarity_registry() -> SimilarityRegistry:
+    return SimilarityRegistry()
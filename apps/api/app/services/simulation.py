@@ -0,0 +1,248 @@
+"""Monte Carlo failure simulation over the knowledge graph.
+
+A what-if run injects failures into a set of nodes and propagates them to
+their dependents along ``depends_on`` edges, one hop per step:
+
+* a healthy node with ``k`` failed dependencies fails with probability
+  ``1 - (1 - p) ** k``, where ``p`` is its ``failure_probability`` property
+  or the run's propagation probability;
+* a failed node recovers with its ``recovery_probability`` (or the run's)
+  once none of its dependencies is down; injected nodes recover on their
+  own schedule. Recovered nodes stay up for the rest of the trial.
+
+Only the nodes that can be reached within ``steps`` hops are simulated.
+Trials run as boolean (trials x nodes) matrices, in fixed-size chunks whose
+random streams are spawned from the run's seed, so a run is reproducible
+whether its chunks execute inline or on the process pool used for large
+graphs. Results are cached under the shared graph version plus the run
+parameters, so repeating a run is a cache lookup.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from uuid import UUID
+
+import numpy as np
+from sqlmodel import Session
+
+from app.core.config import get_settings
+from app.services.cache import get_cache
+from app.services.graph_index import INDEX_RESOURCE, GraphSnapshot, get_graph_index
+from app.services.impact import IMPACT_RELATION, get_impact_memo, snapshot_tier_weights
+
+SIMULATION_RESOURCE = "simulations"
+CHUNK_TRIALS = 256
+HISTOGRAM_BINS = 20
+
+
+@dataclass(frozen=True)
+class SimulationParams:
+    trials: int = 2000
+    steps: int = 10
+    propagation_probability: float = 0.5
+    recovery_probability: float = 0.2
+    injection_probability: float = 1.0
+    relation: str = IMPACT_RELATION
+    seed: int = 0
+    limit: int = 20
+
+
+@dataclass(frozen=True)
+class PropagationModel:
+    """The reachable subgraph in local positions, ready to ship to a worker process."""
+
+    seeds: np.ndarray
+    # Edges grouped by dependent: dependencies[starts[i]:starts[i + 1]] are what dependents[i] depends on.
+    dependents: np.ndarray
+    starts: np.ndarray
+    dependencies: np.ndarray
+    failure_probability: np.ndarray
+    recovery_probability: np.ndarray
+    weights: np.ndarray
+    injection_probability: float
+    steps: int
+
+    @property
+    def node_count(self) -> int:
+        return len(self.weights)
+
+
+@dataclass
+class ChunkResult:
+    failures: np.ndarray
+    affected: np.ndarray
+    weighted: np.ndarray
+    peak: np.ndarray
+    recovered_at: np.ndarray
+
+
+def _node_probabilities(graph: GraphSnapshot, positions: np.ndarray, name: str, default: float) -> np.ndarray:
+    properties = graph.nodes.properties
+    values = []
+    for position in positions.tolist():
+        value = properties[position].get(name)
+        try:
+            values.append(min(1.0, max(0.0, float(value))) if value is not None else default)
+        except (TypeError, ValueError):
+            values.append(default)
+    return np.array(values, dtype=np.float32)
+
+
+def build_model(graph: GraphSnapshot, seeds: list[int], params: SimulationParams) -> tuple[PropagationModel, np.ndarray]:
+    """The propagation model around ``seeds`` and the graph positions of its local nodes."""
+    positions, _ = graph.k_hop(seeds, params.steps, direction="in", relation=params.relation)
+    local = np.full(graph.node_count, -1, dtype=np.int32)
+    local[positions] = np.arange(len(positions), dtype=np.int32)
+    sources, targets, _ = graph.edges_from(positions, params.relation)
+    inside = local[targets] >= 0
+    dependents, dependencies = local[sources[inside]], local[targets[inside]]
+    order = np.argsort(dependents, kind="stable")
+    dependents, dependencies = dependents[order], dependencies[order]
+    unique, starts = np.unique(dependents, return_index=True)
+    model = PropagationModel(
+        seeds=local[np.unique(np.array(seeds, dtype=np.int32))],
+        dependents=unique.astype(np.int32),
+        starts=starts.astype(np.int64),
+        dependencies=dependencies.astype(np.int32),
+        failure_probability=_node_probabilities(graph, positions, "failure_probability", params.propagation_probability),
+        recovery_probability=_node_probabilities(graph, positions, "recovery_probability", params.recovery_probability),
+        weights=snapshot_tier_weights(graph, get_impact_memo())[positions],
+        injection_probability=params.injection_probability,
+        steps=params.steps,
+    )
+    return model, positions
+
+
+def run_chunk(model: PropagationModel, trials: int, seed: np.random.SeedSequence) -> ChunkResult:
+    """Simulate ``trials`` independent trials; module-level so worker processes can run it."""
+    rng = np.random.default_rng(seed)
+    nodes = model.node_count
+    failed = np.zeros((trials, nodes), dtype=bool)
+    failed[:, model.seeds] = rng.random((trials, len(model.seeds))) < model.injection_probability
+    ever = failed.copy()
+    recovered = np.zeros_like(failed)
+    injected = np.zeros(nodes, dtype=bool)
+    injected[model.seeds] = True
+    survive = (1 - model.failure_probability)[model.dependents]
+    peak = failed.sum(axis=1)
+    recovered_at = np.where(peak == 0, 0, model.steps + 1).astype(np.int32)
+    down = np.zeros((trials, nodes), dtype=np.int32)
+    for step in range(1, model.steps + 1):
+        down[:] = 0
+        if len(model.dependents):
+            down[:, model.dependents] = np.add.reduceat(failed[:, model.dependencies], model.starts, axis=1, dtype=np.int32)
+        draws = rng.random((trials, nodes), dtype=np.float32)
+        exposed = down[:, model.dependents]
+        newly = np.zeros_like(failed)
+        newly[:, model.dependents] = (exposed > 0) & (draws[:, model.dependents] >= survive**exposed)
+        newly &= ~(failed | recovered)
+        recovering = failed & (draws < model.recovery_probability) & ((down == 0) | injected)
+        failed = (failed & ~recovering) | newly
+        recovered |= recovering
+        ever |= newly
+        concurrent = failed.sum(axis=1)
+        np.maximum(peak, concurrent, out=peak)
+        recovered_at[(concurrent == 0) & (recovered_at > model.steps)] = step
+    impacted = ever.copy()
+    impacted[:, model.seeds] = False
+    return ChunkResult(
+        failures=ever.sum(axis=0),
+        affected=impacted.sum(axis=1).astype(np.int32),
+        weighted=impacted.astype(np.float32) @ model.weights,
+        peak=peak.astype(np.int32),
+        recovered_at=recovered_at,
+    )
+
+
+def distribution(values: np.ndarray) -> dict:
+    values = values.astype(np.float64)
+    counts, edges = np.histogram(values, bins=min(HISTOGRAM_BINS, max(1, len(np.unique(values)))))
+    return {
+        "mean": round(float(values.mean()), 4),
+        "std": round(float(values.std()), 4),
+        "min": float(values.min()),
+        "p50": float(np.percentile(values, 50)),
+        "p90": float(np.percentile(values, 90)),
+        "p99": float(np.percentile(values, 99)),
+        "max": float(values.max()),
+        "histogram": {"edges": [round(float(edge), 4) for edge in edges], "counts": counts.tolist()},
+    }
+
+
+def cache_key(graph_version: int, seeds: list[UUID], params: SimulationParams) -> str:
+    encoded = json.dumps({"seeds": sorted(map(str, seeds)), **asdict(params)}, sort_keys=True)
+    return f"{graph_version}:{hashlib.sha1(encoded.encode()).hexdigest()[:16]}"
+
+
+class Simulator:
+    def __init__(self, workers: int, parallel_cells: int):
+        self.workers = workers
+        self.parallel_cells = parallel_cells
+        self._pool: ProcessPoolExecutor | None = None
+
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Spawned, not forked: the API process runs threads that must not be copied mid-flight.
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def simulate(self, model: PropagationModel, trials: int, seed: int) -> ChunkResult:
+        sizes = [min(CHUNK_TRIALS, trials - start) for start in range(0, trials, CHUNK_TRIALS)]
+        streams = np.random.SeedSequence(seed).spawn(len(sizes))
+        if self.workers > 1 and len(sizes) > 1 and trials * model.node_count >= self.parallel_cells:
+            futures = [self.pool().submit(run_chunk, model, size, stream) for size, stream in zip(sizes, streams)]
+            chunks = [future.result() for future in futures]
+        else:
+            chunks = [run_chunk(model, size, stream) for size, stream in zip(sizes, streams)]
+        return ChunkResult(
+            failures=np.sum([chunk.failures for chunk in chunks], axis=0),
+            affected=np.concatenate([chunk.affected for chunk in chunks]),
+            weighted=np.concatenate([chunk.weighted for chunk in chunks]),
+            peak=np.concatenate([chunk.peak for chunk in chunks]),
+            recovered_at=np.concatenate([chunk.recovered_at for chunk in chunks]),
+        )
+
+    def run(self, session: Session, org_id: UUID, seeds: list[int], params: SimulationParams) -> dict:
+        graph_version = get_cache().version(org_id, INDEX_RESOURCE)
+        graph = get_graph_index().snapshot(session, org_id)
+        key = cache_key(graph_version, [graph.node_id(position) for position in seeds], params)
+        result = get_cache().get_or_load(
+            org_id, SIMULATION_RESOURCE, lambda: self._summarize(graph, seeds, params), cache_key=key
+        )
+        return {**result, "cache_key": key}
+
+    def _summarize(self, graph: GraphSnapshot, seeds: list[int], params: SimulationParams) -> dict:
+        model, positions = build_model(graph, seeds, params)
+        outcome = self.simulate(model, params.trials, params.seed)
+        probability = outcome.failures / params.trials
+        probability[model.seeds] = 0
+        recovered = outcome.recovered_at[outcome.recovered_at <= params.steps]
+        top = [i for i in np.argsort(-probability, kind="stable")[: params.limit].tolist() if probability[i] > 0]
+        return {
+            "status": "simulation_complete",
+            "seed": params.seed,
+            "params": asdict(params),
+            "injected": [graph.node(int(positions[i])) for i in model.seeds.tolist()],
+            "simulated_nodes": model.node_count,
+            "affected": distribution(outcome.affected),
+            "weighted_impact": distribution(outcome.weighted),
+            "peak_concurrent_failures": distribution(outcome.peak),
+            "recovery_steps": distribution(recovered) if len(recovered) else None,
+            "unrecovered_fraction": round(1 - len(recovered) / params.trials, 4),
+            "nodes": [
+                {**graph.node(int(positions[i])), "failure_probability": round(float(probability[i]), 4)} for i in top
+            ],
+        }
+
+
+@lru_cache
+def get_simulator() -> Simulator:
+    settings = get_settings()
+    # More workers than cores only adds process overhead to CPU-bound trials.
+    return Simulator(min(settings.simulation_workers, os.cpu_count() or 1), settings.simulation_parallel_cells)
@@ -0,0 +1,53 @@
+"""Window-query latency of the change interval index.
+
+Changes arrive roughly in time order (a feed with some jitter) across many
+services and environments, a few of them week-long maintenance windows.
+
+Run from apps/api:  python benchmarks/bench_change_index.py [changes]
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from uuid import uuid4
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.change_index import ChangeIndex
+
+
+def main(changes: int = 1_000_000, services: int = 500, queries: int = 1000) -> None:
+    rng = np.random.default_rng(3)
+    origin = datetime(2026, 1, 1)
+    # One change every ~30s on average, delivered with up to 10 minutes of jitter.
+    offsets = np.sort(rng.exponential(30.0, size=changes).cumsum() + rng.uniform(-600, 600, size=changes))
+    durations = np.where(rng.random(changes) < 0.0005, 7 * 86_400, rng.exponential(900.0, size=changes))
+    environments = ("prod", "staging", "dev")
+    index = ChangeIndex()
+    started = time.perf_counter()
+    for offset, duration in zip(offsets.tolist(), durations.tolist()):
+        start = origin + timedelta(seconds=offset)
+        view = {"service": f"svc-{rng.integers(services)}", "environment": environments[rng.integers(3)]}
+        index.add("records", uuid4(), start, view, start, start + timedelta(seconds=duration))
+    built = time.perf_counter() - started
+
+    span = offsets[-1] - offsets[0]
+    for label, service, environment in (("all", None, None), ("service", "svc-7", None), ("service+env", "svc-7", "prod")):
+        latencies, found = [], 0
+        for _ in range(queries):
+            start = origin + timedelta(seconds=float(offsets[0] + rng.uniform(0, span)))
+            began = time.perf_counter()
+            found += len(index.window(start, start + timedelta(hours=1), service, environment))
+            latencies.append((time.perf_counter() - began) * 1e6)
+        latencies.sort()
+        print(
+            f"{label:12s} 1h window p50={latencies[len(latencies) // 2]:.0f}us "
+            f"p95={latencies[int(len(latencies) * 0.95)]:.0f}us avg_hits={found / queries:.1f}"
+        )
+    print(f"changes={changes} build={built:.1f}s stats={index.stats()}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
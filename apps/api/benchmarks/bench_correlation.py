@@ -0,0 +1,45 @@
+"""Single-core latency of the correlation scoring core.
+
+Run from apps/api:  python benchmarks/bench_correlation.py [series] [buckets]
+"""
+import os
+
+for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(var, "1")
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.correlation import bucketize, lagged_scores, top_indices
+
+
+def main(series: int = 10_000, buckets: int = 1440, rows_per_series: int = 20) -> None:
+    rng = np.random.default_rng(11)
+    n_rows = series * rows_per_series
+    series_index = np.repeat(np.arange(series), rows_per_series)
+    first = rng.integers(0, buckets, size=n_rows)
+    last = np.minimum(first + rng.integers(0, 30, size=n_rows), buckets - 1)
+    weights = rng.integers(1, 50, size=n_rows).astype(np.float64)
+    reference = np.zeros(buckets, dtype=np.float32)
+    reference[1200:1260] = rng.uniform(5, 20, size=60)
+    leads_only = np.zeros(series, dtype=bool)
+    leads_only[-100:] = True
+
+    started = time.perf_counter()
+    matrix = bucketize(series_index, first, last, weights, series, buckets)
+    binned = time.perf_counter()
+    scores = lagged_scores(matrix, reference, 15, leads_only)
+    top = top_indices(scores.score, 20)
+    elapsed = time.perf_counter() - started
+    print(f"series={series} buckets={buckets} rows={n_rows}")
+    print(f"bucketize={binned - started:.3f}s score+rank={elapsed - (binned - started):.3f}s total={elapsed:.3f}s")
+    print(f"top={top[:5].tolist()} matrix={matrix.nbytes / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
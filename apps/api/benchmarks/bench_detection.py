@@ -0,0 +1,46 @@
+"""Single-core throughput of the anomaly detection engine.
+
+Run from apps/api:  python benchmarks/bench_detection.py [series] [ticks]
+"""
+import os
+
+for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(var, "1")
+
+import sys
+import time
+from pathlib import Path
+from uuid import uuid4
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.detection import DetectionConfig, DetectionEngine
+
+
+def main(series: int = 10_000, ticks: int = 300) -> None:
+    engine = DetectionEngine(DetectionConfig(retention=240, max_series=series))
+    org_id = uuid4()
+    names = [f"svc-{i % 500}:metric-{i}" for i in range(series)]
+    rng = np.random.default_rng(7)
+    base = rng.uniform(10, 100, size=series)
+    start_ts = 1_700_000_000.0
+    anomalies = 0
+    started = time.perf_counter()
+    for tick in range(ticks):
+        values = base + rng.normal(0, 1, size=series)
+        if tick == ticks - 1:
+            values[:10] += 50
+        result = engine.ingest(org_id, names, values, np.full(series, start_ts + tick * 60))
+        anomalies += len(result)
+    elapsed = time.perf_counter() - started
+    points = series * ticks
+    print(f"series={series} ticks={ticks} points={points} elapsed={elapsed:.3f}s")
+    print(f"throughput={points / elapsed:,.0f} series-points/s anomalies={anomalies}")
+    print(f"memory={engine.stats(org_id)['memory_bytes'] / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,59 @@
+"""Build time and lookup latency of the CSR graph index.
+
+Run from apps/api:  python benchmarks/bench_graph_index.py [nodes] [edges]
+"""
+import sys
+import time
+from pathlib import Path
+from uuid import uuid4
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.graph_index import Interner, NodeTable, build_snapshot
+
+
+def main(node_count: int = 100_000, edge_count: int = 1_000_000) -> None:
+    rng = np.random.default_rng(3)
+    nodes = NodeTable()
+    for i in range(node_count):
+        nodes.append(uuid4(), f"svc-{i}", "service", {"tier": int(i % 3)})
+    relations = Interner()
+    relation_ids = np.array([relations.intern(name) for name in ("depends_on", "calls", "runs_on")], dtype=np.int32)
+    sources = rng.integers(0, node_count, size=edge_count, dtype=np.int32)
+    targets = rng.integers(0, node_count, size=edge_count, dtype=np.int32)
+    edge_relations = relation_ids[rng.integers(0, 3, size=edge_count)]
+
+    started = time.perf_counter()
+    graph = build_snapshot(1, node_count, nodes, relations, sources, targets, edge_relations)
+    built = time.perf_counter() - started
+
+    probes = rng.integers(0, node_count, size=10_000)
+    started = time.perf_counter()
+    for position in probes.tolist():
+        graph.neighbors(position)
+    neighbor_us = (time.perf_counter() - started) / len(probes) * 1e6
+
+    started = time.perf_counter()
+    for position in probes[:1000].tolist():
+        graph.reverse_dependencies(position, 2)
+    reverse_us = (time.perf_counter() - started) / 1000 * 1e6
+
+    started = time.perf_counter()
+    for position in probes[:200].tolist():
+        graph.k_hop([position], 3, direction="both")
+    khop_ms = (time.perf_counter() - started) / 200 * 1e3
+
+    started = time.perf_counter()
+    for source, target in zip(probes[:200].tolist(), probes[200:400].tolist()):
+        graph.shortest_path(source, target, 8)
+    path_ms = (time.perf_counter() - started) / 200 * 1e3
+
+    print(f"nodes={node_count} edges={edge_count} build={built:.3f}s memory={graph.memory_bytes() / 1e6:.1f} MB")
+    print(f"neighbors={neighbor_us:.1f}us reverse_deps(2 hops)={reverse_us:.1f}us k_hop(3, both)={khop_ms:.2f}ms")
+    print(f"shortest_path(depth 8)={path_ms:.2f}ms")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
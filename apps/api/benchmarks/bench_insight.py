@@ -0,0 +1,68 @@
+"""Rollup write cost and highlights latency as incident history grows.
+
+Fills the rollups of one org per history length with a steady daily
+stream of incidents, remediations and RCA approvals ending today, and
+times the highlights read for each. The read touches at most two windows of daily buckets, so
+its latency should not grow with history.
+
+Run from apps/api with DATABASE_URL pointing at a scratch database:
+    python benchmarks/bench_insight.py [events_per_day]
+"""
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+from uuid import UUID, uuid4
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlmodel import Session, SQLModel
+
+from app.db.models import utc_now
+from app.db.session import engine
+from app.services.insight import bump, insight_highlights
+
+METRICS = (
+    ("incident.opened", ("critical", "high", "medium", "low")),
+    ("incident.status", ("investigating", "mitigated", "resolved")),
+    ("incident.mtta", ("high", "low")),
+    ("incident.mttr", ("high", "low")),
+    ("remediation.executed", ("",)),
+    ("remediation.rolled_back", ("",)),
+    ("rca.approved", ("",)),
+)
+
+
+def fill(session: Session, org_id: UUID, days: int, events_per_day: int) -> float:
+    """Write ``days`` days of history ending today; returns seconds per event."""
+    today = utc_now()
+    started = time.perf_counter()
+    for day in range(days):
+        at = today - timedelta(days=days - 1 - day)
+        for i in range(events_per_day):
+            metric, dimensions = METRICS[i % len(METRICS)]
+            bump(session, org_id, at, metric, dimensions[i % len(dimensions)], total=float(i))
+        session.commit()
+    return (time.perf_counter() - started) / (days * events_per_day)
+
+
+def main(events_per_day: int = 100) -> None:
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        for days in (30, 365, 1095):
+            org_id = uuid4()
+            write = fill(session, org_id, days, events_per_day)
+            latencies = []
+            for _ in range(50):
+                started = time.perf_counter()
+                insight_highlights(session, org_id, 7)
+                latencies.append((time.perf_counter() - started) * 1e3)
+            latencies.sort()
+            print(
+                f"history={days}d events={days * events_per_day} write={write * 1e6:.0f}us/event "
+                f"highlights p50={latencies[25]:.2f}ms p95={latencies[47]:.2f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
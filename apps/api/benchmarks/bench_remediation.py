@@ -0,0 +1,55 @@
+"""Approving N remediation actions one at a time versus as one batch.
+
+Each single transition is a conditional UPDATE plus an audit commit; the
+batch is one UPDATE over the whole set, one audit commit and per-day
+rollup bumps, so its cost per action should fall as the batch grows.
+
+Run from apps/api with DATABASE_URL pointing at a scratch database:
+    python benchmarks/bench_remediation.py [max_batch]
+"""
+import sys
+import time
+from pathlib import Path
+from uuid import UUID, uuid4
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlmodel import Session, SQLModel
+
+from app.db.models import RemediationAction
+from app.db.session import engine
+from app.services.remediation import apply_transition, apply_transitions
+
+
+def propose(session: Session, org_id: UUID, count: int) -> list[UUID]:
+    actions = [RemediationAction(org_id=org_id, incident_id=uuid4(), title=f"action {i}", status="proposed") for i in range(count)]
+    session.add_all(actions)
+    session.commit()
+    return [action.id for action in actions]
+
+
+def main(max_batch: int = 500) -> None:
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        for size in sorted({size for size in (10, 50, 100) if size < max_batch} | {max_batch}):
+            org_id = uuid4()
+            ids = propose(session, org_id, size)
+            started = time.perf_counter()
+            for action_id in ids:
+                apply_transition(session, org_id, action_id, "approve")
+            single = (time.perf_counter() - started) * 1e3
+
+            org_id = uuid4()
+            ids = propose(session, org_id, size)
+            started = time.perf_counter()
+            results = apply_transitions(session, org_id, ids, "approve")
+            batch = (time.perf_counter() - started) * 1e3
+            assert all(result["status"] == "approved" for result in results)
+            print(
+                f"actions={size:>4}  one-by-one={single:8.1f}ms ({single / size:.2f}ms each)  "
+                f"batch={batch:7.1f}ms ({batch / size:.3f}ms each)  speedup={single / batch:5.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,66 @@
+"""Latency and IVF recall of the vector retrieval index on a synthetic corpus.
+
+Documents are drawn from a few hundred topics, each with its own vocabulary,
+mixed with shared filler words; queries use topic words only. Recall@k is the
+share of exact top-k sources that the IVF search also returns.
+
+Run from apps/api:  python benchmarks/bench_retrieval.py [documents] [probes]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+from uuid import uuid4
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.retrieval import SOURCE_KB, HashingEmbedder, RetrievalSource, VectorStore
+
+
+def main(documents: int = 100_000, probes: int = 16, topics: int = 400, k: int = 10) -> None:
+    rng = np.random.default_rng(11)
+    topic_words = np.array([[f"topic{t}word{w}" for w in range(40)] for t in range(topics)])
+    filler = np.array([f"filler{i}" for i in range(5_000)])
+
+    def text(topic: int, words: int, own_share: float = 0.5) -> str:
+        own = topic_words[topic][rng.integers(0, 40, size=round(words * own_share))]
+        shared = filler[rng.integers(0, len(filler), size=words - len(own))]
+        return " ".join(rng.permutation(np.concatenate([own, shared])))
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = VectorStore(Path(directory), HashingEmbedder(), ivf_threshold=documents, probes=probes)
+        started = time.perf_counter()
+        for start in range(0, documents, 1000):
+            batch = [
+                RetrievalSource(SOURCE_KB, uuid4(), f"doc {i}", text(int(rng.integers(topics)), 80), None)
+                for i in range(start, min(documents, start + 1000))
+            ]
+            store.add(batch)
+        built = time.perf_counter() - started
+
+        queries = [text(int(rng.integers(topics)), 6, own_share=1.0) for _ in range(200)]
+        timings = {"exact": [], "ivf": []}
+        recalls = []
+        for query in queries:
+            started = time.perf_counter()
+            exact = store.search(query, k, exact=True)
+            timings["exact"].append((time.perf_counter() - started) * 1e3)
+            started = time.perf_counter()
+            approximate = store.search(query, k)
+            timings["ivf"].append((time.perf_counter() - started) * 1e3)
+            expected = {hit["id"] for hit in exact}
+            if expected:
+                recalls.append(len(expected & {hit["id"] for hit in approximate}) / len(expected))
+
+        stats = store.stats()
+        print(f"chunks={stats['chunks']} ivf_lists={stats['ivf_lists']} probes={probes} build={built:.1f}s")
+        for name, latencies in timings.items():
+            latencies.sort()
+            print(f"{name:5s} p50={latencies[len(latencies) // 2]:.2f}ms p95={latencies[int(len(latencies) * 0.95)]:.2f}ms")
+        print(f"ivf recall@{k}={np.mean(recalls):.3f}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
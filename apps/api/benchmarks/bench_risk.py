@@ -0,0 +1,86 @@
+"""Feature-store build, incremental refresh and scoring latency of the risk engine.
+
+Change history is synthetic: a few thousand services with their own failure
+rates, and an incident link for every change that failed. The graph is a
+random ``depends_on`` graph over the same services.
+
+Run from apps/api:  python benchmarks/bench_risk.py [changes] [services]
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from uuid import uuid4
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.graph_index import Interner, NodeTable, build_snapshot
+from app.services.risk import ChangeProposal, RiskFeatureStore, score_change
+
+
+def main(change_count: int = 500_000, service_count: int = 5_000, queries: int = 2_000) -> None:
+    rng = np.random.default_rng(5)
+    kinds = ("deploy", "config", "migration", "flag")
+    failure_rates = rng.beta(1, 20, size=service_count)
+    services = rng.integers(0, service_count, size=change_count)
+    kind_ids = rng.integers(0, len(kinds), size=change_count)
+    failed = rng.random(change_count) < failure_rates[services]
+    origin = datetime(2024, 1, 1)
+    offsets = rng.integers(0, 365 * 86_400, size=change_count)
+
+    store = RiskFeatureStore()
+    started = time.perf_counter()
+    for i in range(change_count):
+        store.add_change("changeiq", f"CRQ-{i}", f"svc-{services[i]}", kinds[kind_ids[i]], origin + timedelta(seconds=int(offsets[i])))
+    for i in np.flatnonzero(failed).tolist():
+        store.add_link(uuid4(), "changeiq", f"CRQ-{i}", origin)
+    built = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i in range(change_count, change_count + 1_000):
+        store.add_change("changeiq", f"CRQ-{i}", f"svc-{i % service_count}", "deploy", origin)
+        store.add_link(uuid4(), "changeiq", f"CRQ-{i}", origin)
+    refreshed = (time.perf_counter() - started) * 1e3
+
+    nodes = NodeTable()
+    tiers = ("frontend", "backend", "data", "internal")
+    for i in range(service_count):
+        nodes.append(uuid4(), f"svc-{i}", "service", {"tier": tiers[i % 4]})
+    relations = Interner()
+    relation = relations.intern("depends_on")
+    edges = service_count * 3
+    sources = rng.integers(0, service_count, size=edges, dtype=np.int32)
+    targets = rng.integers(0, service_count, size=edges, dtype=np.int32)
+    graph = build_snapshot(1, service_count, nodes, relations, sources, targets, np.full(edges, relation, dtype=np.int32))
+
+    cold, warm = [], []
+    for _ in range(queries):
+        proposal = ChangeProposal(f"svc-{rng.integers(service_count)}", kinds[rng.integers(len(kinds))], scheduled_at=origin)
+        started = time.perf_counter()
+        score_change(store, graph, proposal, {}, origin)
+        cold.append((time.perf_counter() - started) * 1e3)
+        started = time.perf_counter()
+        score_change(store, graph, proposal, {}, origin)
+        warm.append((time.perf_counter() - started) * 1e3)
+    cold.sort()
+    warm.sort()
+
+    train = [ChangeProposal(f"svc-{rng.integers(service_count)}", "deploy", scheduled_at=origin) for _ in range(500)]
+    started = time.perf_counter()
+    exposure: dict = {}
+    scores = [score_change(store, graph, proposal, exposure, origin)["score"] for proposal in train]
+    batch = (time.perf_counter() - started) * 1e3
+
+    stats = store.stats()
+    print(f"changes={stats['changes']} failed={stats['failed_changes']} build={built:.1f}s refresh=1000 changes+links in {refreshed:.1f}ms")
+    print(
+        f"score cold p50={cold[len(cold) // 2]:.3f}ms p95={cold[int(len(cold) * 0.95)]:.3f}ms "
+        f"memoized p50={warm[len(warm) // 2]:.3f}ms p95={warm[int(len(warm) * 0.95)]:.3f}ms"
+    )
+    print(f"train of {len(train)} changes in {batch:.1f}ms, max score={max(scores):.3f}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,53 @@
+"""Query latency of the BM25 knowledge-base index on a synthetic corpus.
+
+Run from apps/api:  python benchmarks/bench_search.py [documents]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+from uuid import uuid4
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.search import InvertedIndex
+
+
+def main(documents: int = 100_000, words_per_doc: int = 150) -> None:
+    rng = np.random.default_rng(17)
+    vocabulary = np.array([f"term{i}" for i in range(50_000)])
+    # Zipf-like word frequencies, as in natural text.
+    weights = 1.0 / np.arange(1, len(vocabulary) + 1)
+    weights /= weights.sum()
+    index = InvertedIndex()
+    started = time.perf_counter()
+    corpus = vocabulary[rng.choice(len(vocabulary), size=(documents, words_per_doc), p=weights)]
+    for words in corpus:
+        index.add(uuid4(), " ".join(words[:6]), " ".join(words), None)
+    built = time.perf_counter() - started
+
+    queries = [" ".join(vocabulary[rng.choice(len(vocabulary), size=3, p=weights)]) for _ in range(200)]
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query, 10)
+        latencies.append((time.perf_counter() - started) * 1e3)
+    latencies.sort()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "index.npz"
+        started = time.perf_counter()
+        index.save(path)
+        saved = time.perf_counter() - started
+        started = time.perf_counter()
+        InvertedIndex.load(path)
+        loaded = time.perf_counter() - started
+
+    print(f"documents={documents} terms={len(index.postings)} build={built:.1f}s save={saved:.2f}s load={loaded:.2f}s")
+    print(f"query p50={latencies[len(latencies) // 2]:.2f}ms p95={latencies[int(len(latencies) * 0.95)]:.2f}ms max={latencies[-1]:.2f}ms")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,73 @@
+"""Build and lookup cost of the MinHash/LSH similar-incident index.
+
+Incidents are variants of a few thousand "families": a shared title and
+description with a few words swapped and a family-specific signal type.
+A lookup is a hit when its best match belongs to the query's family.
+
+Run from apps/api:  python benchmarks/bench_similarity.py [incidents]
+"""
+import sys
+import time
+from pathlib import Path
+from uuid import uuid4
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.similarity import LSHIndex, incident_shingles, minhash
+
+
+def main(incidents: int = 1_000_000, families: int = 20_000, queries: int = 500) -> None:
+    rng = np.random.default_rng(5)
+    vocabulary = np.array([f"word{i}" for i in range(30_000)])
+    bases = rng.integers(0, len(vocabulary), size=(families, 14))
+
+    def variant(family: int) -> np.ndarray:
+        words = bases[family].copy()
+        swapped = rng.integers(0, len(words), size=2)
+        words[swapped] = rng.integers(0, len(vocabulary), size=2)
+        title, description = " ".join(vocabulary[words[:5]]), " ".join(vocabulary[words[5:]])
+        return minhash(incident_shingles(title, description, [f"type{family % 500}"]))
+
+    index = LSHIndex()
+    labels = rng.integers(0, families, size=incidents)
+    started = time.perf_counter()
+    signatures = np.stack([variant(family) for family in labels])
+    signed = time.perf_counter() - started
+    ids = [uuid4() for _ in range(incidents)]
+    started = time.perf_counter()
+    for start in range(0, incidents, 50_000):
+        index.add_many([(ids[i], signatures[i], None) for i in range(start, min(incidents, start + 50_000))])
+    built = time.perf_counter() - started
+    family_of = dict(zip(ids, labels.tolist()))
+
+    started = time.perf_counter()
+    for _ in range(5_000):
+        family = int(rng.integers(families))
+        incident_id = uuid4()
+        family_of[incident_id] = family
+        index.add_many([(incident_id, variant(family), None)])
+    appended = (time.perf_counter() - started) / 5_000 * 1e6
+
+    latencies, candidates, hits = [], [], 0
+    for _ in range(queries):
+        family = int(rng.integers(families))
+        signature = variant(family)
+        started = time.perf_counter()
+        candidates.append(len(index.candidates(signature)))
+        matches = index.similar(signature, 10, 0.2)
+        latencies.append((time.perf_counter() - started) * 1e3)
+        hits += bool(matches) and family_of[matches[0][0]] == family
+    latencies.sort()
+
+    stats = index.stats()
+    print(f"incidents={stats['incidents']} memory={stats['memory_bytes'] / 2**20:.0f}MiB sign={signed:.1f}s index={built:.1f}s append={appended:.0f}us/incident")
+    print(
+        f"lookup p50={latencies[len(latencies) // 2]:.2f}ms p95={latencies[int(len(latencies) * 0.95)]:.2f}ms "
+        f"candidates p50={int(np.median(candidates))} top1 family hit rate={hits / queries:.3f}"
+    )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
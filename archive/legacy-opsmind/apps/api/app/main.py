@@ -8,6 +8,7 @@ from pathlib import Path
 
 from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 
 ROOT = Path(__file__).resolve().parents[3]
@@ -21,9 +22,11 @@ sys.path.extend(
     ]
 )
 
-from opsmind.common.observability import configure_logging, trace_span
+from opsmind.common.observability import TRACER, configure_logging, trace_span
 from opsmind.contracts.v1.models import ChatSendRequest, ChatSendResponse, FeedbackRequest
+from opsmind.orchestrator.learning import UsefulnessAggregator
 from opsmind.orchestrator.service import OrchestratorService
+from opsmind.storage.feedback import BatchedFeedbackWriter
 from opsmind.storage.stores import InMemoryStore, RedisPostgresStore
 from opsmind.tools.registry import ToolRegistry
 
@@ -43,7 +46,27 @@ if store_mode == "redis_postgres":
 else:
     state_store = InMemoryStore()
 
-service = OrchestratorService(state_store, state_store, state_store, ToolRegistry())
+feedback_writer = BatchedFeedbackWriter(
+    state_store,
+    max_batch=int(os.getenv("OPSMIND_FEEDBACK_BATCH", "100")),
+    flush_interval=float(os.getenv("OPSMIND_FEEDBACK_FLUSH_SECONDS", "1.0")),
+)
+usefulness = UsefulnessAggregator(state_store)
+service = OrchestratorService(
+    state_store, state_store, state_store, ToolRegistry(), feedback_writer=feedback_writer, usefulness=usefulness
+)
+
+
+@app.on_event("startup")
+def start_feedback_learning():
+    feedback_writer.start()
+    usefulness.start(float(os.getenv("OPSMIND_FEEDBACK_AGGREGATE_SECONDS", "60")))
+
+
+@app.on_event("shutdown")
+def stop_feedback_learning():
+    usefulness.stop()
+    feedback_writer.close()
 
 
 @app.post("/v1/chat/send", response_model=ChatSendResponse)
@@ -76,6 +99,11 @@ def send_chat(
     return ChatSendResponse(conversation_id=state.conversation_id, response=response)
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return TRACER.render_prometheus()
+
+
 @app.get("/v1/chat/conversations/{conversation_id}")
 def get_conversation(conversation_id: str):
     state = state_store.get(conversation_id)
@@ -86,7 +114,8 @@ def get_conversation(conversation_id: str):
 
 @app.post("/v1/chat/feedback")
 def post_feedback(feedback: FeedbackRequest):
-    return {"status": "accepted", "conversation_id": feedback.conversation_id}
+    record = service.submit_feedback(feedback)
+    return {"status": "accepted", "conversation_id": feedback.conversation_id, "feedback_id": record.feedback_id}
 
 
 web_dir = ROOT / "apps" / "web"
@@ -0,0 +1,88 @@
+"""Per-span cost of ``trace_span`` and ``traced`` against untraced code.
+
+The tracing budget is under 1 µs of overhead per span: the time a traced
+``with`` block adds over the same block around a context manager that does
+nothing, and the time ``@traced`` adds to a call of an empty function. The
+variants run in interleaved rounds of ``spans`` iterations and the fastest
+round of each is kept, so a stretch of scheduler noise slows every variant
+alike instead of one of them. The cost of the two clock reads every span
+takes is printed alongside, as the floor the rest of the overhead sits on.
+
+Run from archive/legacy-opsmind:  python benchmarks/bench_tracing.py [spans] [rounds]
+"""
+import sys
+import time
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "packages" / "common"))
+
+from opsmind.common.observability import TRACER, Tracer, trace_span, traced
+
+BUDGET_NS = 1000
+
+
+class Noop:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+def main(spans: int = 50_000, rounds: int = 30) -> None:
+    tracer = Tracer()
+    now_ns = time.perf_counter_ns
+
+    def empty():
+        with Noop():
+            pass
+
+    def clock():
+        now_ns() - now_ns()
+
+    def span():
+        with trace_span("bench", tracer):
+            pass
+
+    def nested():
+        with trace_span("bench.outer", tracer), trace_span("bench.inner", tracer):
+            pass
+
+    def plain():
+        pass
+
+    decorated = traced("bench.decorated")(plain)
+
+    variants = {"empty": empty, "clock": clock, "span": span, "nested": nested, "plain": plain, "decorated": decorated}
+    results = dict.fromkeys(variants, float("inf"))
+    for _ in range(rounds):
+        for name, body in variants.items():
+            results[name] = min(results[name], timeit.timeit(body, number=spans) / spans * 1e9)
+    overheads = {
+        "span": results["span"] - results["empty"],
+        "nested": (results["nested"] - results["empty"]) / 2,
+        "traced": results["decorated"] - results["plain"],
+    }
+    histogram = tracer.snapshot()["bench"]
+    decorated_count = TRACER.snapshot()["bench.decorated"].count
+    print(
+        f"empty context manager {results['empty']:.0f}ns, span {results['span']:.0f}ns, "
+        f"two nested spans {results['nested']:.0f}ns, empty call {results['plain']:.0f}ns, traced call {results['decorated']:.0f}ns"
+    )
+    print(
+        f"overhead per span {overheads['span']:.0f}ns ({overheads['nested']:.0f}ns nested, {overheads['traced']:.0f}ns traced), "
+        f"of which two clock reads {results['clock']:.0f}ns; budget {BUDGET_NS}ns"
+    )
+    print(
+        f"recorded {histogram.count} spans ({decorated_count} traced calls), "
+        f"p50={histogram.quantile(0.5) * 1e9:.0f}ns p99={histogram.quantile(0.99) * 1e9:.0f}ns"
+    )
+    if max(overheads.values()) >= BUDGET_NS:
+        sys.exit("span overhead is over budget")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -1,9 +1,27 @@
 from __future__ import annotations
 
+import functools
 import json
 import logging
+import threading
 import time
-from contextlib import contextmanager
+from typing import Callable, TypeVar
+
+F = TypeVar("F", bound=Callable)
+
+# Log-linear buckets: durations below 2**SUB_BITS ns are exact, above that each
+# power of two is split into 2**SUB_BITS buckets (at most ~6% relative error).
+SUB_BITS = 4
+SUB_BUCKETS = 1 << SUB_BITS
+# Durations of 2**MAX_EXPONENT ns (~18 minutes) or longer share the last bucket.
+MAX_EXPONENT = 40
+BUCKETS = (MAX_EXPONENT - SUB_BITS + 2) * SUB_BUCKETS
+QUANTILES = (0.5, 0.95, 0.99)
+# A span's exit only appends its duration; the owner thread buckets them this many at a time.
+FOLD_EVERY = 256
+
+_now_ns = time.perf_counter_ns
+_new_span = object.__new__
 
 
 def configure_logging() -> None:
@@ -30,8 +48,218 @@ def configure_logging() -> None:
     root.setLevel(logging.INFO)
 
 
-@contextmanager
-def trace_span(name: str):
-    start = time.time()
-    yield {"span": name}
-    _ = (time.time() - start) * 1000
+# Per bit length of a duration: the index of its first bucket and the shift
+# that picks its sub-bucket, so bucketing a sample is two lookups and an add.
+# Bit lengths past the last bucket shift the duration to 0 and land on it.
+_BUCKET_BASE: list[int] = []
+_BUCKET_SHIFT: list[int] = []
+for _bits in range(65):
+    _shift = max(_bits - SUB_BITS - 1, 0)
+    if (_shift + 2) * SUB_BUCKETS - 1 < BUCKETS:
+        _BUCKET_BASE.append(_shift * SUB_BUCKETS)
+        _BUCKET_SHIFT.append(_shift)
+    else:
+        _BUCKET_BASE.append(BUCKETS - 1)
+        _BUCKET_SHIFT.append(64)
+del _bits, _shift
+
+
+def bucket_index(ns: int) -> int:
+    if ns < SUB_BUCKETS:
+        return max(ns, 0)
+    shift = ns.bit_length() - SUB_BITS - 1
+    return min((shift + 1) * SUB_BUCKETS + (ns >> shift) - SUB_BUCKETS, BUCKETS - 1)
+
+
+def bucket_bounds(index: int) -> tuple[int, int]:
+    """[low, high) in nanoseconds of bucket ``index``."""
+    if index < SUB_BUCKETS:
+        return index, index + 1
+    shift = index // SUB_BUCKETS - 1
+    low = (SUB_BUCKETS + index % SUB_BUCKETS) << shift
+    return low, low + (1 << shift)
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "total_ns", "pending")
+
+    def __init__(self) -> None:
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total_ns = 0
+        # Durations not bucketed yet; only the owner thread appends to or swaps this list.
+        self.pending: list[int] = []
+
+    def add(self, samples: list[int]) -> None:
+        self.count += len(samples)
+        self.total_ns += sum(samples)
+        counts, base, shift = self.counts, _BUCKET_BASE, _BUCKET_SHIFT
+        for ns in samples:
+            # bucket_index by table lookup: this loop is where most of the per-span cost goes.
+            bits = ns.bit_length()
+            counts[base[bits] + (ns >> shift[bits])] += 1
+
+    def fold(self) -> None:
+        """Bucket the pending durations; called by the owner thread only."""
+        # Swapped out before counting, so a concurrent reader may miss them but never counts them twice.
+        samples, self.pending = self.pending, []
+        self.add(samples)
+
+    def merge(self, other: Histogram) -> None:
+        self.count += other.count
+        self.total_ns += other.total_ns
+        counts = self.counts
+        for index, value in enumerate(other.counts):
+            if value:
+                counts[index] += value
+        self.add(list(other.pending))
+
+    def quantile(self, q: float) -> float:
+        """Approximate ``q`` quantile in seconds: the midpoint of the bucket holding it."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, value in enumerate(self.counts):
+            seen += value
+            if value and seen >= rank:
+                low, high = bucket_bounds(index)
+                return (low + high) / 2 / 1e9
+        return 0.0
+
+
+class _Shard:
+    """One thread's histograms and open-span stack; only its owner thread writes to it."""
+
+    __slots__ = ("histograms", "current")
+
+    def __init__(self) -> None:
+        self.histograms: dict[str, Histogram] = {}
+        self.current: Span | None = None
+
+
+class Tracer:
+    """Collects span durations in per-thread shards, merged only when read.
+
+    Recording never takes a lock: each thread updates its own shard, and a
+    reader sums the shards, accepting counts that are a few spans behind.
+    """
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._shards: list[_Shard] = []
+        self._lock = threading.Lock()
+
+    def shard(self) -> _Shard:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def current_span(self) -> Span | None:
+        return self.shard().current
+
+    def snapshot(self) -> dict[str, Histogram]:
+        with self._lock:
+            shards = list(self._shards)
+        merged: dict[str, Histogram] = {}
+        for shard in shards:
+            for name, histogram in list(shard.histograms.items()):
+                merged.setdefault(name, Histogram()).merge(histogram)
+        return merged
+
+    def reset(self) -> None:
+        with self._lock:
+            for shard in self._shards:
+                shard.histograms = {}
+
+    def render_prometheus(self, metric: str = "opsmind_span_duration_seconds") -> str:
+        """Per-span quantiles, sums and counts in the Prometheus text exposition format."""
+        lines = [f"# HELP {metric} Duration of traced spans.", f"# TYPE {metric} summary"]
+        for name, histogram in sorted(self.snapshot().items()):
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            for q in QUANTILES:
+                lines.append(f'{metric}{{span="{label}",quantile="{q}"}} {histogram.quantile(q):.9f}')
+            lines.append(f'{metric}_sum{{span="{label}"}} {histogram.total_ns / 1e9:.9f}')
+            lines.append(f'{metric}_count{{span="{label}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+TRACER = Tracer()
+
+
+class Span:
+    """A timed section; nested spans see the enclosing one as ``parent``.
+
+    Everything but taking the two timestamps happens at construction, so the
+    exit path is restoring the parent and appending one duration.
+    """
+
+    __slots__ = ("name", "parent", "start_ns", "_shard", "_histogram")
+
+    def __init__(self, name: str, tracer: Tracer = TRACER) -> None:
+        self.name = name
+        try:
+            shard = tracer._local.shard
+        except AttributeError:
+            shard = tracer.shard()
+        self._shard = shard
+        histogram = shard.histograms.get(name)
+        if histogram is None:
+            histogram = shard.histograms[name] = Histogram()
+        self._histogram = histogram
+
+    def __enter__(self) -> Span:
+        shard = self._shard
+        self.parent = shard.current
+        shard.current = self
+        self.start_ns = _now_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        pending = self._histogram.pending
+        pending.append(_now_ns() - self.start_ns)
+        self._shard.current = self.parent
+        if len(pending) >= FOLD_EVERY:
+            self._histogram.fold()
+        return False
+
+
+trace_span = Span
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """Decorator form of ``trace_span``."""
+
+    def decorate(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # Span's construction, __enter__ and __exit__ inlined: a traced call
+            # then costs one extra frame instead of four.
+            try:
+                shard = TRACER._local.shard
+            except AttributeError:
+                shard = TRACER.shard()
+            histogram = shard.histograms.get(name)
+            if histogram is None:
+                histogram = shard.histograms[name] = Histogram()
+            span = _new_span(Span)
+            span.name = name
+            span.parent = shard.current
+            shard.current = span
+            span.start_ns = start_ns = _now_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                pending = histogram.pending
+                pending.append(_now_ns() - start_ns)
+                shard.current = span.parent
+                if len(pending) >= FOLD_EVERY:
+                    histogram.fold()
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
@@ -158,3 +158,17 @@ class FeedbackRequest(StrictBaseModel):
     conversation_id: str
     rating: int = Field(ge=1, le=5)
     comment: str | None = None
+
+
+class FeedbackRecord(StrictBaseModel):
+    feedback_id: str = Field(default_factory=lambda: str(uuid4()))
+    conversation_id: str
+    org_id: str | None = None
+    project_id: str | None = None
+    scenario: Scenario | None = None
+    tool_plan: list[str] = Field(default_factory=list)
+    cited_tools: list[str] = Field(default_factory=list)
+    hypotheses: list[str] = Field(default_factory=list)
+    rating: int = Field(ge=1, le=5)
+    comment: str | None = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
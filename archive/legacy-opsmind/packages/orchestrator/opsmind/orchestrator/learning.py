@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import itertools
+import logging
+import threading
+from dataclasses import dataclass
+
+from opsmind.contracts.v1.models import FeedbackRecord, Scenario
+from opsmind.storage.stores import FeedbackStore
+
+logger = logging.getLogger("opsmind.orchestrator.learning")
+
+
+@dataclass
+class UsefulnessTally:
+    samples: int = 0
+    usefulness: float = 0.0
+    cited: int = 0
+
+
+@dataclass(frozen=True)
+class ToolScore:
+    samples: int
+    usefulness: float
+    contribution: float
+
+    @property
+    def score(self) -> float:
+        return (self.usefulness + self.contribution) / 2
+
+
+def usefulness(rating: int) -> float:
+    """Map a 1-5 rating onto [0, 1]."""
+    return (rating - 1) / 4
+
+
+class UsefulnessAggregator:
+    """Folds the feedback log into per-scenario and per-tool usefulness scores.
+
+    Each ``run_once`` reads the records appended since the previous run and adds
+    them to running tallies, then publishes a fresh score snapshot that the
+    orchestrator reads without locking. Sequence numbers are not committed in
+    order (a lower id can commit after a higher one has been read), so each run
+    re-reads the last ``rescan_window`` sequence numbers below the high-water
+    mark and skips the records it has already folded in. Scores are smoothed towards a neutral
+    prior (the scenario's own usefulness for tools), so a handful of ratings
+    cannot swing a plan. Every ``explore_every``-th plan keeps pruned tools, so
+    they keep collecting feedback and can earn their place back.
+    """
+
+    def __init__(
+        self,
+        store: FeedbackStore,
+        prior_strength: float = 5.0,
+        min_samples: int = 20,
+        prune_below: float = 0.25,
+        page_size: int = 1000,
+        explore_every: int = 20,
+        rescan_window: int = 1000,
+    ) -> None:
+        self.store = store
+        self.prior_strength = prior_strength
+        self.min_samples = min_samples
+        self.prune_below = prune_below
+        self.page_size = page_size
+        self.explore_every = explore_every
+        self.rescan_window = rescan_window
+        self._plans = itertools.count(1)
+        self.high_water = 0
+        # Sequence numbers already folded in within the rescan window.
+        self._recent: set[int] = set()
+        self.scenarios: dict[Scenario, UsefulnessTally] = {}
+        self.tools: dict[tuple[Scenario, str], UsefulnessTally] = {}
+        self.snapshot: dict[tuple[Scenario, str], ToolScore] = {}
+        self.scenario_snapshot: dict[Scenario, ToolScore] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def add(self, record: FeedbackRecord) -> None:
+        if record.scenario is None:
+            return
+        value = usefulness(record.rating)
+        scenario = self.scenarios.setdefault(record.scenario, UsefulnessTally())
+        scenario.samples += 1
+        scenario.usefulness += value
+        cited = set(record.cited_tools)
+        for tool_name in dict.fromkeys(record.tool_plan):
+            tally = self.tools.setdefault((record.scenario, tool_name), UsefulnessTally())
+            tally.samples += 1
+            tally.usefulness += value
+            tally.cited += tool_name in cited
+
+    def _smoothed(self, tally: UsefulnessTally, prior: float) -> float:
+        return (tally.usefulness + prior * self.prior_strength) / (tally.samples + self.prior_strength)
+
+    def run_once(self) -> int:
+        """Fold in feedback appended since the last run; returns how many records were read."""
+        with self._lock:
+            read = 0
+            after = max(0, self.high_water - self.rescan_window)
+            while True:
+                page = self.store.list_feedback(after, self.page_size)
+                for sequence, record in page:
+                    after = sequence
+                    if sequence in self._recent:
+                        continue
+                    self._recent.add(sequence)
+                    self.add(record)
+                    self.high_water = max(self.high_water, sequence)
+                    read += 1
+                if len(page) < self.page_size:
+                    break
+            floor = self.high_water - self.rescan_window
+            self._recent = {sequence for sequence in self._recent if sequence > floor}
+            if read:
+                scenario_scores = {
+                    scenario: ToolScore(tally.samples, self._smoothed(tally, 0.5), 1.0)
+                    for scenario, tally in self.scenarios.items()
+                }
+                self.scenario_snapshot = scenario_scores
+                self.snapshot = {
+                    key: ToolScore(
+                        tally.samples,
+                        self._smoothed(tally, scenario_scores[key[0]].usefulness),
+                        (tally.cited + 0.5 * self.prior_strength) / (tally.samples + self.prior_strength),
+                    )
+                    for key, tally in self.tools.items()
+                }
+            return read
+
+    def plan(self, scenario: Scenario, tool_plan: list[str]) -> list[str]:
+        """``tool_plan`` reordered by score, without well-sampled tools that rarely help.
+
+        Tools without feedback keep their place relative to each other and rank as
+        neutral; at least one tool is always kept.
+        """
+        snapshot = self.snapshot
+        scores = {name: snapshot.get((scenario, name)) for name in tool_plan}
+        ranked = sorted(tool_plan, key=lambda name: -(scores[name].score if scores[name] else 0.5))
+        if self.explore_every and next(self._plans) % self.explore_every == 0:
+            return ranked
+        kept = [
+            name
+            for name in ranked
+            if scores[name] is None or scores[name].samples < self.min_samples or scores[name].score >= self.prune_below
+        ]
+        return kept or ranked[:1]
+
+    def start(self, interval: float) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(interval,), name="opsmind-feedback-aggregator", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, interval: float) -> None:
+        while not self._stopped.wait(interval):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("feedback_aggregation_failed")
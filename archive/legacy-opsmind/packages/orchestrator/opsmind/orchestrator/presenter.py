@@ -13,7 +13,38 @@ def present_needs_info(questions: list[str]) -> ResponseModel:
     )
 
 
-def present_complete(tool_results: list[ToolResult]) -> ResponseModel:
+# Hypothesis statement, base confidence and the words in a tool summary that support it.
+HYPOTHESES = (
+    ("Recent deployment or config drift is likely contributing.", 0.73, ("deploy", "config", "rollout", "canary", "change")),
+    ("Dependency saturation is amplifying errors.", 0.62, ("dependency", "timeout", "retry", "retries", "saturat")),
+    ("The failure is isolated to part of the fleet.", 0.55, ("region", "canary", "limited to", "only")),
+)
+
+
+def rank_hypotheses(tool_results: list[ToolResult]) -> list[Hypothesis]:
+    """Hypotheses backed by at least one result, best supported first.
+
+    Each hypothesis cites only the results whose summary supports it; results
+    without artifacts (empty or failed queries) support nothing.
+    """
+    ranked: list[Hypothesis] = []
+    for statement, confidence, keywords in HYPOTHESES:
+        refs: list[EvidenceRef] = []
+        for result in tool_results:
+            summary = result.summary.lower()
+            if result.artifacts and any(keyword in summary for keyword in keywords):
+                refs.append(EvidenceRef(ref_type="tool_call", ref_id=result.tool_call_id, description=result.summary))
+                refs.extend(EvidenceRef(ref_type="artifact", ref_id=a.artifact_id, description=a.uri) for a in result.artifacts)
+        if refs:
+            support = sum(ref.ref_type == "tool_call" for ref in refs)
+            ranked.append(
+                Hypothesis(statement=statement, confidence=min(0.95, confidence + 0.05 * (support - 1)), evidence_refs=refs)
+            )
+    ranked.sort(key=lambda hypothesis: -hypothesis.confidence)
+    return ranked
+
+
+def present_complete(tool_results: list[ToolResult], hypotheses: list[Hypothesis] | None = None) -> ResponseModel:
     evidence: list[EvidenceRef] = []
     for result in tool_results:
         evidence.append(EvidenceRef(ref_type="tool_call", ref_id=result.tool_call_id, description=result.summary))
@@ -21,11 +52,11 @@ def present_complete(tool_results: list[ToolResult]) -> ResponseModel:
             [EvidenceRef(ref_type="artifact", ref_id=a.artifact_id, description=a.uri) for a in result.artifacts]
         )
 
-    top = evidence[0:1] or [EvidenceRef(ref_type="tool_call", ref_id="none", description="No evidence")]
-    hypotheses = [
-        Hypothesis(statement="Recent deployment or config drift is likely contributing.", confidence=0.73, evidence_refs=top),
-        Hypothesis(statement="Dependency saturation is amplifying errors.", confidence=0.62, evidence_refs=top),
-    ]
+    if hypotheses is None:
+        hypotheses = rank_hypotheses(tool_results)
+    if not hypotheses:
+        top = evidence[0:1] or [EvidenceRef(ref_type="tool_call", ref_id="none", description="No evidence")]
+        hypotheses = [Hypothesis(statement="No single cause stands out in the evidence gathered so far.", confidence=0.3, evidence_refs=top)]
     return ResponseModel(
         status=ResponseStatus.complete,
         primary_text="I ran the deterministic workflow and compiled evidence-backed hypotheses.",
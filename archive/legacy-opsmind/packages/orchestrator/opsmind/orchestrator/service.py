@@ -2,16 +2,21 @@ from __future__ import annotations
 
 from datetime import datetime
 
+from opsmind.common.observability import traced
 from opsmind.contracts.v1.models import (
     ChannelContext,
     ConversationState,
+    FeedbackRecord,
+    FeedbackRequest,
     Message,
     MessageRole,
     Scenario,
     TenantContext,
 )
-from opsmind.orchestrator.presenter import present_complete, present_needs_info
+from opsmind.orchestrator.learning import UsefulnessAggregator
+from opsmind.orchestrator.presenter import present_complete, present_needs_info, rank_hypotheses
 from opsmind.orchestrator.workflows import WORKFLOWS
+from opsmind.storage.feedback import BatchedFeedbackWriter
 from opsmind.storage.stores import ConversationStateStore, TranscriptStore, ToolResultStore
 from opsmind.tools.registry import ToolExecutionContext, ToolRegistry
 
@@ -24,12 +29,16 @@ class OrchestratorService:
         tool_result_store: ToolResultStore,
         tool_registry: ToolRegistry,
         max_tool_calls_per_turn: int = 4,
+        feedback_writer: BatchedFeedbackWriter | None = None,
+        usefulness: UsefulnessAggregator | None = None,
     ) -> None:
         self.state_store = state_store
         self.transcript_store = transcript_store
         self.tool_result_store = tool_result_store
         self.tool_registry = tool_registry
         self.max_tool_calls_per_turn = max_tool_calls_per_turn
+        self.feedback_writer = feedback_writer
+        self.usefulness = usefulness
 
     def classify_scenario(self, text: str) -> Scenario:
         lower = text.lower()
@@ -58,6 +67,12 @@ class OrchestratorService:
             "time_window": "What time window should we investigate?",
         }.get(slot, f"Please provide {slot}.")
 
+    def plan_tools(self, scenario: Scenario) -> list[str]:
+        tool_plan = WORKFLOWS[scenario].tool_plan
+        if self.usefulness is None:
+            return list(tool_plan)
+        return self.usefulness.plan(scenario, tool_plan)
+
     def load_or_create(self, conversation_id: str | None, org_id: str, project_id: str) -> ConversationState:
         if conversation_id:
             existing = self.state_store.get(conversation_id)
@@ -79,6 +94,7 @@ class OrchestratorService:
             from opsmind.contracts.v1.models import TimeWindow
             state.slots.time_window = TimeWindow(**tw)
 
+    @traced("orchestrator.handle_turn")
     def handle_turn(self, state: ConversationState, user_message: str):
         safe_message = user_message.strip()[:2000]
         state.messages.append(Message(role=MessageRole.user, text=safe_message))
@@ -95,13 +111,13 @@ class OrchestratorService:
             self.state_store.save(state)
             return response
 
-        spec = WORKFLOWS[state.workflow.scenario]
+        tool_plan = self.plan_tools(state.workflow.scenario)[: self.max_tool_calls_per_turn]
         ctx = ToolExecutionContext(
             conversation_id=state.conversation_id,
             org_id=state.tenant.org_id,
             project_id=state.tenant.project_id,
         )
-        for tool_name in spec.tool_plan[: self.max_tool_calls_per_turn]:
+        for tool_name in tool_plan:
             tool_input = {"service": state.slots.service, "environment": state.slots.environment}
             if state.slots.time_window:
                 tool_input["time_window"] = state.slots.time_window.model_dump(mode="json")
@@ -110,10 +126,38 @@ class OrchestratorService:
             state.execution.tool_results.append(result)
             self.tool_result_store.store_tool_result(state.conversation_id, result)
 
-        response = present_complete(state.execution.tool_results[-self.max_tool_calls_per_turn :])
+        turn_results = state.execution.tool_results[-len(tool_plan) :] if tool_plan else []
+        hypotheses = rank_hypotheses(turn_results)
+        response = present_complete(turn_results, hypotheses)
+        # A tool contributed when a ranked hypothesis cites its result. Every result
+        # is listed in the response's evidence, and the fallback hypothesis of an
+        # inconclusive turn cites the first result, so neither tells tools apart.
+        cited = {ref.ref_id for hypothesis in hypotheses for ref in hypothesis.evidence_refs}
+        contributed = [result.tool_name for result in turn_results if result.tool_call_id in cited]
+        state.workflow.engine_state["last_turn"] = {
+            "tool_plan": tool_plan,
+            "cited_tools": contributed,
+            "hypotheses": [hypothesis.statement for hypothesis in response.hypotheses],
+        }
         state.summary.text = response.primary_text
         state.summary.updated_at = datetime.utcnow()
         state.messages.append(Message(role=MessageRole.assistant, text=response.primary_text))
         self.transcript_store.append_message(state.conversation_id, state.messages[-1])
         self.state_store.save(state)
         return response
+
+    def submit_feedback(self, feedback: FeedbackRequest) -> FeedbackRecord:
+        """Join ``feedback`` to the turn it rates and queue it for the feedback log."""
+        joined: dict = {}
+        state = self.state_store.get(feedback.conversation_id)
+        if state is not None:
+            last_turn = state.workflow.engine_state.get("last_turn")
+            joined = {"org_id": state.tenant.org_id, "project_id": state.tenant.project_id}
+            if last_turn:
+                joined.update(scenario=state.workflow.scenario, **last_turn)
+        record = FeedbackRecord(
+            conversation_id=feedback.conversation_id, rating=feedback.rating, comment=feedback.comment, **joined
+        )
+        if self.feedback_writer is not None:
+            self.feedback_writer.submit(record)
+        return record
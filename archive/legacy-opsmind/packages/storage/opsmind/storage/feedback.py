@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import logging
+import threading
+from collections import deque
+
+from opsmind.contracts.v1.models import FeedbackRecord
+from opsmind.storage.stores import FeedbackStore
+
+logger = logging.getLogger("opsmind.storage.feedback")
+
+
+class BatchedFeedbackWriter:
+    """Buffers feedback and appends it to a FeedbackStore in batches from one background thread.
+
+    ``submit`` never touches the store, so a feedback request costs a queue append.
+    A batch is written once ``max_batch`` records are waiting or ``flush_interval``
+    seconds have passed. A failed write keeps the batch queued for the next attempt;
+    beyond ``max_pending`` records the oldest are dropped so a dead store cannot
+    exhaust memory.
+    """
+
+    def __init__(
+        self,
+        store: FeedbackStore,
+        max_batch: int = 100,
+        flush_interval: float = 1.0,
+        max_pending: int = 10_000,
+    ) -> None:
+        self.store = store
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.pending: deque[FeedbackRecord] = deque()
+        self.max_pending = max_pending
+        self.written = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="opsmind-feedback-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, record: FeedbackRecord) -> None:
+        with self._lock:
+            self.pending.append(record)
+            while len(self.pending) > self.max_pending:
+                self.pending.popleft()
+                self.dropped += 1
+            full = len(self.pending) >= self.max_batch
+        if full:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Write everything queued now; returns how many records were written."""
+        written = 0
+        while True:
+            with self._lock:
+                batch = [self.pending.popleft() for _ in range(min(self.max_batch, len(self.pending)))]
+            if not batch:
+                return written
+            try:
+                self.store.append_feedback(batch)
+            except Exception:
+                logger.exception("feedback_write_failed", extra={"batch_size": len(batch)})
+                with self._lock:
+                    self.pending.extendleft(reversed(batch))
+                return written
+            written += len(batch)
+            self.written += len(batch)
+
+    def close(self) -> None:
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
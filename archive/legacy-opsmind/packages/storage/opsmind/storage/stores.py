@@ -7,7 +7,8 @@ from datetime import datetime
 import psycopg
 import redis
 
-from opsmind.contracts.v1.models import ConversationState, Message, ToolResult
+from opsmind.common.observability import trace_span, traced
+from opsmind.contracts.v1.models import ConversationState, FeedbackRecord, Message, ToolResult
 
 
 class ConversationStateStore(ABC):
@@ -37,11 +38,87 @@ class ToolResultStore(ABC):
     def get_tool_result(self, ref: str) -> ToolResult | None: ...
 
 
-class InMemoryStore(ConversationStateStore, TranscriptStore, ToolResultStore):
+class FeedbackStore(ABC):
+    """Append-only feedback log; ``list_feedback`` pages by the sequence number it returns."""
+
+    @abstractmethod
+    def append_feedback(self, records: list[FeedbackRecord]) -> None: ...
+
+    @abstractmethod
+    def list_feedback(self, after: int, limit: int) -> list[tuple[int, FeedbackRecord]]: ...
+
+
+FEEDBACK_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS feedback (
+  id BIGSERIAL PRIMARY KEY,
+  conversation_id TEXT NOT NULL,
+  record_json JSONB NOT NULL,
+  created_at TIMESTAMPTZ DEFAULT NOW()
+);
+"""
+
+
+STORE_METHODS = (
+    "get",
+    "create",
+    "save",
+    "append_message",
+    "list_messages",
+    "store_tool_result",
+    "get_tool_result",
+    "append_feedback",
+    "list_feedback",
+)
+
+
+def traced_store(cls):
+    """Record a ``store.<method>`` span around each store port method of ``cls``."""
+    for name in STORE_METHODS:
+        setattr(cls, name, traced(f"store.{name}")(getattr(cls, name)))
+    return cls
+
+
+class TracedCursor(psycopg.Cursor):
+    """Records a ``db.query`` span per statement."""
+
+    def execute(self, query, params=None, **kwargs):
+        with trace_span("db.query"):
+            return super().execute(query, params, **kwargs)
+
+    def executemany(self, query, params_seq, **kwargs):
+        with trace_span("db.query"):
+            return super().executemany(query, params_seq, **kwargs)
+
+
+def _connect(pg_dsn: str) -> psycopg.Connection:
+    return psycopg.connect(pg_dsn, cursor_factory=TracedCursor)
+
+
+def _append_feedback(pg_dsn: str, records: list[FeedbackRecord]) -> None:
+    with _connect(pg_dsn) as conn:
+        with conn.cursor() as cur:
+            cur.executemany(
+                "INSERT INTO feedback (conversation_id, record_json) VALUES (%s, %s)",
+                [(r.conversation_id, json.dumps(r.model_dump(mode="json"))) for r in records],
+            )
+        conn.commit()
+
+
+def _list_feedback(pg_dsn: str, after: int, limit: int) -> list[tuple[int, FeedbackRecord]]:
+    with _connect(pg_dsn) as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id, record_json FROM feedback WHERE id > %s ORDER BY id LIMIT %s", (after, limit))
+            rows = cur.fetchall()
+    return [(r[0], FeedbackRecord.model_validate(r[1])) for r in rows]
+
+
+@traced_store
+class InMemoryStore(ConversationStateStore, TranscriptStore, ToolResultStore, FeedbackStore):
     def __init__(self) -> None:
         self.states: dict[str, ConversationState] = {}
         self.transcripts: dict[str, list[Message]] = {}
         self.tool_results: dict[str, ToolResult] = {}
+        self.feedback: list[FeedbackRecord] = []
 
     def get(self, conversation_id: str) -> ConversationState | None:
         return self.states.get(conversation_id)
@@ -69,15 +146,22 @@ class InMemoryStore(ConversationStateStore, TranscriptStore, ToolResultStore):
     def get_tool_result(self, ref: str) -> ToolResult | None:
         return self.tool_results.get(ref)
 
+    def append_feedback(self, records: list[FeedbackRecord]) -> None:
+        self.feedback.extend(records)
+
+    def list_feedback(self, after: int, limit: int) -> list[tuple[int, FeedbackRecord]]:
+        return list(enumerate(self.feedback[after : after + limit], start=after + 1))
 
-class RedisPostgresStore(ConversationStateStore, TranscriptStore, ToolResultStore):
+
+@traced_store
+class RedisPostgresStore(ConversationStateStore, TranscriptStore, ToolResultStore, FeedbackStore):
     def __init__(self, redis_url: str, postgres_dsn: str) -> None:
         self.redis = redis.Redis.from_url(redis_url, decode_responses=True)
         self.pg_dsn = postgres_dsn
         self._init_tables()
 
     def _init_tables(self) -> None:
-        with psycopg.connect(self.pg_dsn) as conn:
+        with _connect(self.pg_dsn) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -95,6 +179,7 @@ class RedisPostgresStore(ConversationStateStore, TranscriptStore, ToolResultStor
                     );
                     """
                 )
+                cur.execute(FEEDBACK_TABLE_SQL)
             conn.commit()
 
     def get(self, conversation_id: str) -> ConversationState | None:
@@ -112,7 +197,7 @@ class RedisPostgresStore(ConversationStateStore, TranscriptStore, ToolResultStor
         self.redis.set(f"state:{state.conversation_id}", state.model_dump_json())
 
     def append_message(self, conversation_id: str, message: Message) -> None:
-        with psycopg.connect(self.pg_dsn) as conn:
+        with _connect(self.pg_dsn) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "INSERT INTO transcripts (conversation_id, message_json) VALUES (%s, %s)",
@@ -121,7 +206,7 @@ class RedisPostgresStore(ConversationStateStore, TranscriptStore, ToolResultStor
             conn.commit()
 
     def list_messages(self, conversation_id: str, limit: int, offset: int) -> list[Message]:
-        with psycopg.connect(self.pg_dsn) as conn:
+        with _connect(self.pg_dsn) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "SELECT message_json FROM transcripts WHERE conversation_id=%s ORDER BY id LIMIT %s OFFSET %s",
@@ -132,7 +217,7 @@ class RedisPostgresStore(ConversationStateStore, TranscriptStore, ToolResultStor
 
     def store_tool_result(self, conversation_id: str, tool_result: ToolResult) -> str:
         ref = f"{conversation_id}:{tool_result.tool_call_id}"
-        with psycopg.connect(self.pg_dsn) as conn:
+        with _connect(self.pg_dsn) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "INSERT INTO tool_results (ref, conversation_id, result_json) VALUES (%s, %s, %s) ON CONFLICT (ref) DO UPDATE SET result_json=EXCLUDED.result_json",
@@ -142,7 +227,7 @@ class RedisPostgresStore(ConversationStateStore, TranscriptStore, ToolResultStor
         return ref
 
     def get_tool_result(self, ref: str) -> ToolResult | None:
-        with psycopg.connect(self.pg_dsn) as conn:
+        with _connect(self.pg_dsn) as conn:
             with conn.cursor() as cur:
                 cur.execute("SELECT result_json FROM tool_results WHERE ref=%s", (ref,))
                 row = cur.fetchone()
@@ -150,8 +235,15 @@ class RedisPostgresStore(ConversationStateStore, TranscriptStore, ToolResultStor
             return None
         return ToolResult.model_validate(row[0])
 
+    def append_feedback(self, records: list[FeedbackRecord]) -> None:
+        _append_feedback(self.pg_dsn, records)
+
+    def list_feedback(self, after: int, limit: int) -> list[tuple[int, FeedbackRecord]]:
+        return _list_feedback(self.pg_dsn, after, limit)
 
-class PostgresStore(ConversationStateStore, TranscriptStore, ToolResultStore):
+
+@traced_store
+class PostgresStore(ConversationStateStore, TranscriptStore, ToolResultStore, FeedbackStore):
     """Postgres-only store: stores conversation state, transcripts and tool results in Postgres.
 
     This is used when Redis is not available and the user provides only a DATABASE_URL.
@@ -161,7 +253,7 @@ class PostgresStore(ConversationStateStore, TranscriptStore, ToolResultStore):
         self._init_tables()
 
     def _init_tables(self) -> None:
-        with psycopg.connect(self.pg_dsn) as conn:
+        with _connect(self.pg_dsn) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -184,10 +276,11 @@ class PostgresStore(ConversationStateStore, TranscriptStore, ToolResultStore):
                     );
                     """
                 )
+                cur.execute(FEEDBACK_TABLE_SQL)
             conn.commit()
 
     def get(self, conversation_id: str) -> ConversationState | None:
-        with psycopg.connect(self.pg_dsn) as conn:
+        with _connect(self.pg_dsn) as conn:
             with conn.cursor() as cur:
                 cur.execute("SELECT state_json FROM states WHERE conversation_id=%s", (conversation_id,))
                 row = cur.fetchone()
@@ -201,7 +294,7 @@ class PostgresStore(ConversationStateStore, TranscriptStore, ToolResultStore):
 
     def save(self, state: ConversationState) -> None:
         state.updated_at = datetime.utcnow()
-        with psycopg.connect(self.pg_dsn) as conn:
+        with _connect(self.pg_dsn) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "INSERT INTO states (conversation_id, state_json, updated_at) VALUES (%s, %s, %s)"
@@ -211,7 +304,7 @@ class PostgresStore(ConversationStateStore, TranscriptStore, ToolResultStore):
             conn.commit()
 
     def append_message(self, conversation_id: str, message: Message) -> None:
-        with psycopg.connect(self.pg_dsn) as conn:
+        with _connect(self.pg_dsn) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "INSERT INTO transcripts (conversation_id, message_json) VALUES (%s, %s)",
@@ -220,7 +313,7 @@ class PostgresStore(ConversationStateStore, TranscriptStore, ToolResultStore):
             conn.commit()
 
     def list_messages(self, conversation_id: str, limit: int, offset: int) -> list[Message]:
-        with psycopg.connect(self.pg_dsn) as conn:
+        with _connect(self.pg_dsn) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "SELECT message_json FROM transcripts WHERE conversation_id=%s ORDER BY id LIMIT %s OFFSET %s",
@@ -231,7 +324,7 @@ class PostgresStore(ConversationStateStore, TranscriptStore, ToolResultStore):
 
     def store_tool_result(self, conversation_id: str, tool_result: ToolResult) -> str:
         ref = f"{conversation_id}:{tool_result.tool_call_id}"
-        with psycopg.connect(self.pg_dsn) as conn:
+        with _connect(self.pg_dsn) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "INSERT INTO tool_results (ref, conversation_id, result_json) VALUES (%s, %s, %s) ON CONFLICT (ref) DO UPDATE SET result_json=EXCLUDED.result_json",
@@ -241,10 +334,16 @@ class PostgresStore(ConversationStateStore, TranscriptStore, ToolResultStore):
         return ref
 
     def get_tool_result(self, ref: str) -> ToolResult | None:
-        with psycopg.connect(self.pg_dsn) as conn:
+        with _connect(self.pg_dsn) as conn:
             with conn.cursor() as cur:
                 cur.execute("SELECT result_json FROM tool_results WHERE ref=%s", (ref,))
                 row = cur.fetchone()
         if not row:
             return None
         return ToolResult.model_validate(row[0])
+
+    def append_feedback(self, records: list[FeedbackRecord]) -> None:
+        _append_feedback(self.pg_dsn, records)
+
+    def list_feedback(self, after: int, limit: int) -> list[tuple[int, FeedbackRecord]]:
+        return _list_feedback(self.pg_dsn, after, limit)
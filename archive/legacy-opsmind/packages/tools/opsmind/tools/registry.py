@@ -5,6 +5,7 @@ from datetime import datetime, timedelta
 from typing import Any
 from uuid import uuid4
 
+from opsmind.common.observability import trace_span
 from opsmind.contracts.v1.models import TimeWindow, ToolArtifact, ToolCall, ToolResult
 
 
@@ -38,6 +39,10 @@ class ToolRegistry:
     def execute(self, tool_name: str, tool_input: dict[str, Any], ctx: ToolExecutionContext) -> tuple[ToolCall, ToolResult]:
         if tool_name not in self._tools:
             raise ValueError(f"Unknown tool: {tool_name}")
+        with trace_span(f"tool.{tool_name}"):
+            return self._execute(tool_name, tool_input, ctx)
+
+    def _execute(self, tool_name: str, tool_input: dict[str, Any], ctx: ToolExecutionContext) -> tuple[ToolCall, ToolResult]:
         call = ToolCall(tool_name=tool_name, tool_input=tool_input)
         tw = tool_input.get("time_window")
         time_window = TimeWindow(**tw) if isinstance(tw, dict) else TimeWindow(start=datetime.utcnow()-timedelta(minutes=30), end=datetime.utcnow())
@@ -0,0 +1,179 @@
+from opsmind.contracts.v1.models import (
+    ChannelContext,
+    ConversationState,
+    FeedbackRecord,
+    FeedbackRequest,
+    Scenario,
+    TenantContext,
+    TimeWindow,
+)
+from opsmind.orchestrator.learning import UsefulnessAggregator
+from opsmind.orchestrator.service import OrchestratorService
+from opsmind.orchestrator.workflows import WORKFLOWS
+from opsmind.storage.feedback import BatchedFeedbackWriter
+from opsmind.storage.stores import InMemoryStore
+from opsmind.tools.registry import ToolRegistry
+
+
+class FlakyStore(InMemoryStore):
+    def __init__(self, failures: int):
+        super().__init__()
+        self.failures = failures
+        self.batches = []
+
+    def append_feedback(self, records):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("store unavailable")
+        self.batches.append(len(records))
+        super().append_feedback(records)
+
+
+def make_service():
+    store = InMemoryStore()
+    writer = BatchedFeedbackWriter(store, max_batch=10)
+    usefulness = UsefulnessAggregator(store, min_samples=3)
+    service = OrchestratorService(store, store, store, ToolRegistry(), feedback_writer=writer, usefulness=usefulness)
+    return service, store, writer, usefulness
+
+
+def completed_turn(service, store):
+    state = ConversationState(
+        tenant=TenantContext(org_id="o1", project_id="p1"),
+        channel=ChannelContext(routing_key="web:o1:new"),
+    )
+    state.slots.service = "checkout"
+    state.slots.environment = "prod"
+    state.slots.time_window = TimeWindow(start="2026-02-13T10:00:00", end="2026-02-13T10:30:00")
+    store.create(state)
+    service.handle_turn(state, "500 spike in checkout")
+    return state
+
+
+def record(rating, tool_plan, cited_tools):
+    return FeedbackRecord(
+        conversation_id="c1",
+        scenario=Scenario.HTTP_500_SPIKE,
+        tool_plan=tool_plan,
+        cited_tools=cited_tools,
+        rating=rating,
+    )
+
+
+def test_writer_batches_and_flushes():
+    store = FlakyStore(failures=0)
+    writer = BatchedFeedbackWriter(store, max_batch=4)
+    for rating in [1, 2, 3, 4, 5, 5]:
+        writer.submit(record(rating, ["a"], []))
+    assert store.list_feedback(0, 100) == []
+    assert writer.flush() == 6
+    assert store.batches == [4, 2]
+    assert [seq for seq, _ in store.list_feedback(0, 100)] == [1, 2, 3, 4, 5, 6]
+    assert [seq for seq, _ in store.list_feedback(4, 100)] == [5, 6]
+
+
+def test_writer_keeps_batch_when_store_fails():
+    store = FlakyStore(failures=1)
+    writer = BatchedFeedbackWriter(store, max_batch=10)
+    writer.submit(record(5, ["a"], []))
+    assert writer.flush() == 0
+    assert len(writer.pending) == 1
+    assert writer.flush() == 1
+    assert len(store.list_feedback(0, 100)) == 1
+
+
+def test_feedback_joined_to_last_turn():
+    service, store, writer, _ = make_service()
+    state = completed_turn(service, store)
+    feedback = service.submit_feedback(FeedbackRequest(conversation_id=state.conversation_id, rating=4, comment="useful"))
+    assert feedback.org_id == "o1"
+    assert feedback.scenario == Scenario.HTTP_500_SPIKE
+    assert feedback.tool_plan == WORKFLOWS[Scenario.HTTP_500_SPIKE].tool_plan[: service.max_tool_calls_per_turn]
+    assert feedback.cited_tools and set(feedback.cited_tools) <= set(feedback.tool_plan)
+    assert feedback.hypotheses
+    writer.flush()
+    assert store.list_feedback(0, 10)[0][1].feedback_id == feedback.feedback_id
+
+
+def test_aggregator_reorders_and_prunes():
+    store = InMemoryStore()
+    aggregator = UsefulnessAggregator(store, min_samples=10, prior_strength=2, explore_every=3)
+    store.append_feedback([record(5, ["useful", "slow"], ["useful", "slow"]) for _ in range(10)])
+    store.append_feedback([record(5, ["useful", "slow"], ["useful"]) for _ in range(10)])
+    store.append_feedback([record(1, ["noise"], []) for _ in range(20)])
+    assert aggregator.run_once() == 40
+    plan = ["noise", "unrated", "slow", "useful"]
+    assert aggregator.plan(Scenario.HTTP_500_SPIKE, plan) == ["useful", "slow", "unrated"]
+    assert aggregator.plan(Scenario.HTTP_500_SPIKE, ["noise"]) == ["noise"]
+    assert aggregator.plan(Scenario.HTTP_500_SPIKE, plan) == ["useful", "slow", "unrated", "noise"]
+    assert aggregator.run_once() == 0
+
+
+def test_orchestrator_skips_pruned_tools():
+    service, store, writer, usefulness = make_service()
+    scenario = Scenario.HTTP_500_SPIKE
+    plan = WORKFLOWS[scenario].tool_plan
+    store.append_feedback([record(1, [plan[0]], []) for _ in range(10)])
+    store.append_feedback([record(5, plan[1:], plan[1:]) for _ in range(10)])
+    usefulness.run_once()
+    state = completed_turn(service, store)
+    called = [call.tool_name for call in state.execution.tool_calls]
+    assert plan[0] not in called
+    assert called
+
+
+class LateCommitStore(InMemoryStore):
+    """Hands out sequence numbers up front and makes records visible on commit, like BIGSERIAL."""
+
+    def __init__(self):
+        super().__init__()
+        self.committed: dict[int, FeedbackRecord] = {}
+
+    def commit(self, sequence, record):
+        self.committed[sequence] = record
+
+    def list_feedback(self, after, limit):
+        return [(sequence, self.committed[sequence]) for sequence in sorted(self.committed) if sequence > after][:limit]
+
+
+def test_aggregator_picks_up_late_commits():
+    store = LateCommitStore()
+    aggregator = UsefulnessAggregator(store, page_size=2, rescan_window=10)
+    store.commit(1, record(5, ["a"], ["a"]))
+    store.commit(3, record(5, ["a"], ["a"]))
+    assert aggregator.run_once() == 2
+    store.commit(2, record(1, ["a"], []))
+    assert aggregator.run_once() == 1
+    assert aggregator.run_once() == 0
+    assert aggregator.tools[(Scenario.HTTP_500_SPIKE, "a")].samples == 3
+    for sequence in range(4, 30):
+        store.commit(sequence, record(3, ["a"], []))
+    assert aggregator.run_once() == 26
+    assert min(aggregator._recent) > aggregator.high_water - 10
+
+
+def test_contribution_follows_cited_hypothesis_evidence():
+    service, store, writer, _ = make_service()
+    state = completed_turn(service, store)
+    last_turn = state.workflow.engine_state["last_turn"]
+    # The error breakdown backs no hypothesis, so it is in the plan but not cited.
+    assert "logs.query_error_breakdown" in last_turn["tool_plan"]
+    assert "logs.query_error_breakdown" not in last_turn["cited_tools"]
+    assert last_turn["cited_tools"]
+
+
+def test_ratings_on_real_turns_change_the_plan():
+    service, store, writer, usefulness = make_service()
+    plan = WORKFLOWS[Scenario.HTTP_500_SPIKE].tool_plan
+    first = completed_turn(service, store)
+    assert [call.tool_name for call in first.execution.tool_calls] == plan
+    service.submit_feedback(FeedbackRequest(conversation_id=first.conversation_id, rating=2))
+    for _ in range(9):
+        state = completed_turn(service, store)
+        service.submit_feedback(FeedbackRequest(conversation_id=state.conversation_id, rating=2))
+    writer.flush()
+    assert usefulness.run_once() == 10
+    state = completed_turn(service, store)
+    assert [call.tool_name for call in state.execution.tool_calls] == [
+        name for name in plan if name != "logs.query_error_breakdown"
+    ]
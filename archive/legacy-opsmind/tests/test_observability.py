@@ -0,0 +1,151 @@
+import threading
+
+from opsmind.common.observability import (
+    BUCKETS,
+    FOLD_EVERY,
+    TRACER,
+    Histogram,
+    Span,
+    Tracer,
+    bucket_bounds,
+    bucket_index,
+    traced,
+)
+from opsmind.contracts.v1.models import ChannelContext, ConversationState, TenantContext, TimeWindow
+from opsmind.orchestrator.service import OrchestratorService
+from opsmind.storage.stores import InMemoryStore
+from opsmind.tools.registry import ToolRegistry
+
+
+def test_buckets_cover_durations():
+    for ns in [0, 1, 15, 16, 17, 31, 32, 1000, 123_456, 10**9, 10**11]:
+        low, high = bucket_bounds(bucket_index(ns))
+        assert low <= ns < high
+        assert high - low <= max(1, low / 16)
+    assert bucket_index(2**60) == BUCKETS - 1
+
+
+def test_batched_add_matches_bucket_index():
+    samples = [*range(70), 1000, 123_456, 10**9, 10**11, 2**40 - 1, 2**40, 2**41 - 1, 2**41, 2**60]
+    histogram = Histogram()
+    histogram.add(samples)
+    expected = [0] * BUCKETS
+    for ns in samples:
+        expected[bucket_index(ns)] += 1
+    assert histogram.counts == expected
+    assert histogram.count == len(samples)
+    assert histogram.total_ns == sum(samples)
+
+
+def test_quantiles_within_bucket_precision():
+    histogram = Histogram()
+    for ns in range(1, 10_001):
+        histogram.counts[bucket_index(ns * 1000)] += 1
+        histogram.count += 1
+    for q in (0.5, 0.95, 0.99):
+        expected = q * 10_000 * 1000 / 1e9
+        assert abs(histogram.quantile(q) - expected) / expected < 0.07
+
+
+def test_spans_nest_and_record():
+    tracer = Tracer()
+    with Span("outer", tracer) as outer:
+        assert tracer.current_span() is outer
+        with Span("inner", tracer) as inner:
+            assert inner.parent is outer
+            assert tracer.current_span() is inner
+        assert tracer.current_span() is outer
+    assert tracer.current_span() is None
+    snapshot = tracer.snapshot()
+    assert snapshot["outer"].count == 1
+    assert snapshot["inner"].count == 1
+    assert snapshot["outer"].total_ns >= snapshot["inner"].total_ns
+
+
+def test_pending_durations_fold_into_buckets():
+    tracer = Tracer()
+    for _ in range(FOLD_EVERY + 10):
+        with Span("step", tracer):
+            pass
+    histogram = tracer.shard().histograms["step"]
+    assert histogram.count == FOLD_EVERY
+    assert len(histogram.pending) == 10
+    merged = tracer.snapshot()["step"]
+    assert merged.count == sum(merged.counts) == FOLD_EVERY + 10
+    assert not merged.pending
+
+
+def test_span_records_on_error():
+    tracer = Tracer()
+    try:
+        with Span("failing", tracer):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    assert tracer.snapshot()["failing"].count == 1
+    assert tracer.current_span() is None
+
+
+def test_traced_calls_open_spans():
+    TRACER.reset()
+    seen = []
+
+    @traced("outer.call")
+    def outer():
+        span = TRACER.current_span()
+        with Span("inner") as inner:
+            seen.append((span, inner.parent))
+        raise ValueError("boom")
+
+    try:
+        outer()
+    except ValueError:
+        pass
+    (span, parent), = seen
+    assert span.name == "outer.call"
+    assert parent is span
+    assert TRACER.current_span() is None
+    snapshot = TRACER.snapshot()
+    assert snapshot["outer.call"].count == 1
+    assert snapshot["inner"].count == 1
+
+
+def test_thread_shards_merge():
+    tracer = Tracer()
+
+    def work():
+        for _ in range(1000):
+            with Span("work", tracer):
+                pass
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    histogram = tracer.snapshot()["work"]
+    assert histogram.count == 4000
+    assert sum(histogram.counts) == 4000
+
+
+def test_turn_spans_exported():
+    TRACER.reset()
+    store = InMemoryStore()
+    service = OrchestratorService(store, store, store, ToolRegistry())
+    state = ConversationState(
+        tenant=TenantContext(org_id="o1", project_id="p1"),
+        channel=ChannelContext(routing_key="web:o1:new"),
+    )
+    state.slots.service = "checkout"
+    state.slots.environment = "prod"
+    state.slots.time_window = TimeWindow(start="2026-02-13T10:00:00", end="2026-02-13T10:30:00")
+    store.create(state)
+    service.handle_turn(state, "500 spike in checkout")
+    snapshot = TRACER.snapshot()
+    assert snapshot["orchestrator.handle_turn"].count == 1
+    assert snapshot["store.store_tool_result"].count == len(state.execution.tool_calls)
+    assert snapshot[f"tool.{state.execution.tool_calls[0].tool_name}"].count >= 1
+    text = TRACER.render_prometheus()
+    assert "# TYPE opsmind_span_duration_seconds summary" in text
+    assert 'opsmind_span_duration_seconds{span="orchestrator.handle_turn",quantile="0.99"}' in text
+    assert 'opsmind_span_duration_seconds_count{span="orchestrator.handle_turn"} 1' in text